@@ -1,5 +1,11 @@
-from collections.abc import Mapping
+from collections.abc import Iterator, Mapping
+import contextlib
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 import getpass
+import json
+import os
+import queue
+import threading
 import traceback
 from typing import Any, Optional, Iterable, Sequence, Union, Protocol, Type
 from typing import Literal
@@ -102,6 +108,7 @@ class ClientProvider(Protocol):
                sort: dict | list[str] | None = None,
                search_after: list[Union[
                    str, int, float, Any, None]] | None = None,
+               slice: dict | None = None,
                ) -> dict:
         pass
 
@@ -121,6 +128,16 @@ class ClientProvider(Protocol):
     def clear_scroll(self, scroll_id: str | None) -> None:
         pass
 
+    def streaming_bulk(self,
+                       actions: Iterable[dict],
+                       chunk_size: int,
+                       max_retries: int,
+                       initial_backoff: float,
+                       max_backoff: float,
+                       request_timeout: int | None,
+                       ) -> Iterable[tuple[bool, dict]]:
+        pass
+
     # exception handling for import reasons
 
     def has_no_indices(self, err: BaseException) -> bool:
@@ -944,6 +961,446 @@ class CogStack:
 
         return self.__create_dataframe(all_mapped_results, include_fields)
 
+    def stream_data_with_sliced_scroll(
+        self,
+        index: str | Sequence[str],
+        query: dict,
+        include_fields: list[str] | None = None,
+        size: int = 1000,
+        slices: int = 8,
+        n_workers: int = 4,
+        chunk_size: int = 10000,
+        checkpoint_path: str | None = None,
+        output: Literal["pandas", "arrow"] = "pandas",
+        request_timeout: int | None = ES_TIMEOUT,
+        show_progress: bool = True,
+    ) -> Iterator[Any]:
+        """
+        Stream documents from an Elasticsearch or OpenSearch index in chunks
+        of bounded size, reading the search results in parallel using a
+        sliced scroll.
+
+        The search is split into `slices` independent slices which are
+        scrolled through by `n_workers` threads at a time. Only a bounded
+        number of result pages are held in memory at once so the memory use
+        does not depend on the total number of search results.
+        The order of the documents is not defined.
+
+        Parameters
+        ----------
+            index : str or Sequence[str]
+                    The name(s) of the Elasticsearch or OpenSearch indices or
+                    their aliases to search.
+            query : dict
+                    A dictionary containing the search query parameters.
+                    Query can start with `query` key
+                    and contain other query options which will be ignored
+
+                        .. code-block:: json
+                            {"query": {"match": {"title": "python"}}}}
+                    or only consist of content of `query` block
+                        .. code-block:: json
+                            {"match": {"title": "python"}}}
+
+            include_fields : list[str], optional
+                    A list of fields to be included in search results
+                    and presented as columns in the chunks.
+                    If not provided, only _index, _id and _score fields
+                    will be included.
+            size : int, optional, default = 1000
+                    The number of documents to be returned by each search
+                    or scroll request. <strong>MAX: 10,000</strong>.
+            slices : int, optional, default = 8
+                    The number of slices the search is split into.
+            n_workers : int, optional, default = 4
+                    The number of slices read in parallel.
+            chunk_size : int, optional, default = 10000
+                    The (maximum) number of documents in each chunk.
+            checkpoint_path : str, optional
+                    The path of a JSON file used to keep track of the
+                    slices that have been fully read (and processed).
+                    A slice is only marked done once the chunks containing
+                    its documents have been consumed, i.e. the generator
+                    has been asked for the next chunk. If the file exists
+                    (e.g. a previous run failed), the slices marked as done
+                    are skipped. Documents of slices that were in progress
+                    will be read again.
+                    <strong>NOTE:</strong> The same query and `slices` need
+                    to be used when resuming.
+            output : "pandas" or "arrow", optional, default = "pandas"
+                    Whether to yield pandas DataFrames or pyarrow
+                    RecordBatches (requires `pyarrow`).
+            request_timeout : int, optional, default = 300
+                    The time in seconds to wait for a response from
+                    Elasticsearch or OpenSearch before timing out.
+            show_progress : bool, optional, default = True
+                    Whether to show the progress in console.
+
+        Yields
+        ------
+            pandas.DataFrame or pyarrow.RecordBatch
+                The chunks of the retrieved documents.
+
+        Raises
+        ------
+            ValueError
+                If the arguments are invalid or the checkpoint was created
+                with a different number of slices.
+            LookupError
+                If the search failed on any of the shards.
+        """
+        if len(index) == 0:
+            raise ValueError("Provide at least one index or index alias name")
+        self.__validate_size(size=size)
+        if slices < 1 or n_workers < 1 or chunk_size < 1:
+            raise ValueError("The number of slices, workers and the chunk "
+                             "size need to be at least 1")
+        if output not in ("pandas", "arrow"):
+            raise ValueError(f"Unknown output type: {output}")
+        if output == "arrow":
+            try:
+                import pyarrow as pa  # type: ignore[import-untyped]
+            except ImportError as err:
+                raise ImportError(
+                    "Arrow output requires pyarrow. Install with:\n"
+                    "  pip install cogstack-es[arrow]") from err
+        query = self.__extract_query(query=query)
+        include_fields_map: Sequence[Mapping[str, Any]] | None = (
+            [{"field": field} for field in include_fields]
+            if include_fields is not None
+            else None
+        )
+        completed = self.__read_checkpoint(checkpoint_path, slices)
+        pending = [slice_id for slice_id in range(slices)
+                   if slice_id not in completed]
+
+        # NOTE: bounded so that the readers wait for the consumer
+        pages: queue.Queue = queue.Queue(maxsize=2 * n_workers)
+        stop = threading.Event()
+
+        def put(item: tuple) -> None:
+            while not stop.is_set():
+                try:
+                    pages.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    pass
+
+        def read_slice(slice_id: int) -> None:
+            scroll_id = None
+            try:
+                result = self.provider.search(
+                    query=query,
+                    include_fields_map=include_fields_map,
+                    index=index,
+                    size=size,
+                    scroll="10m",
+                    allow_no_indices=False,
+                    rest_total_hits_as_int=True,
+                    source=False,
+                    timeout=request_timeout,
+                    sort=["_doc"],
+                    slice=({"id": slice_id, "max": slices}
+                           if slices > 1 else None),
+                )
+                while not stop.is_set():
+                    if result["_shards"]["failed"] > 0:
+                        raise LookupError(result["_shards"]["failures"])
+                    hits = result["hits"]["hits"]
+                    scroll_id = result.get("_scroll_id")
+                    done = len(hits) < size or not scroll_id
+                    put((slice_id, hits, done))
+                    if done or scroll_id is None:
+                        break
+                    result = self.provider.scroll(
+                        scroll_id=scroll_id,
+                        scroll="10m",
+                        rest_total_hits_as_int=True,
+                    )
+            # NOTE: the error is passed on to (and raised by) the consumer
+            except BaseException as err:  # noqa: BLE001
+                put((slice_id, err, True))
+            finally:
+                if scroll_id:
+                    # the scroll context expires anyway
+                    with contextlib.suppress(Exception):
+                        self.provider.clear_scroll(scroll_id=scroll_id)
+
+        pr_bar = tqdm.tqdm(desc="CogStack retrieved...",
+                           disable=not show_progress, colour="green")
+        executor = ThreadPoolExecutor(max_workers=n_workers,
+                                      thread_name_prefix="cogstack-slice")
+        try:
+            for slice_id in pending:
+                executor.submit(read_slice, slice_id)
+            remaining = len(pending)
+            rows: list[dict] = []
+            received = emitted = 0
+            # the slices that were read fully along with the number of
+            # documents received once they were
+            done_at: list[tuple[int, int]] = []
+            while remaining or rows:
+                if remaining:
+                    slice_id, hits, done = pages.get()
+                    if isinstance(hits, BaseException):
+                        raise hits
+                    rows.extend(self.__map_search_results(hits=hits))
+                    received += len(hits)
+                    pr_bar.update(len(hits))
+                    if done:
+                        remaining -= 1
+                        done_at.append((slice_id, received))
+                    if len(rows) < chunk_size and remaining:
+                        continue
+                chunk, rows = rows[:chunk_size], rows[chunk_size:]
+                if chunk:
+                    df = self.__create_dataframe(chunk, include_fields)
+                    yield (pa.RecordBatch.from_pandas(df, preserve_index=False)
+                           if output == "arrow" else df)
+                    emitted += len(chunk)
+                if checkpoint_path is not None:
+                    newly_done = {slice_id for slice_id, at in done_at
+                                  if at <= emitted}
+                    if newly_done:
+                        completed.update(newly_done)
+                        done_at = [(slice_id, at) for slice_id, at in done_at
+                                   if slice_id not in newly_done]
+                        self.__write_checkpoint(
+                            checkpoint_path, slices, completed)
+        finally:
+            stop.set()
+            executor.shutdown(wait=True, cancel_futures=True)
+            pr_bar.close()
+
+    def stream_texts(
+        self,
+        index: str | Sequence[str],
+        query: dict,
+        text_field: str,
+        **kwargs,
+    ) -> Iterator[tuple[str, str]]:
+        """
+        Stream the document IDs and texts from an Elasticsearch or
+        OpenSearch index.
+
+        The output can be passed directly to
+        `CAT.get_entities_multi_texts`. Documents without any text are
+        skipped.
+
+        Parameters
+        ----------
+            index : str or Sequence[str]
+                    The name(s) of the Elasticsearch or OpenSearch indices or
+                    their aliases to search.
+            query : dict
+                    A dictionary containing the search query parameters.
+            text_field : str
+                    The name of the field containing the text.
+            **kwargs
+                    Other keyword arguments passed to
+                    `stream_data_with_sliced_scroll` (e.g. `slices`,
+                    `n_workers`, `chunk_size` or `checkpoint_path`).
+
+        Yields
+        ------
+            tuple[str, str]
+                The document ID and the text.
+        """
+        for df in self.stream_data_with_sliced_scroll(
+                index, query, include_fields=[text_field], output="pandas",
+                **kwargs):
+            for doc_id, text in zip(df["_id"], df[text_field]):
+                if isinstance(text, str) and text:
+                    yield str(doc_id), text
+
+    def bulk_index(
+        self,
+        index: str,
+        documents: Iterable[tuple[str, dict]],
+        chunk_size: int = 500,
+        n_workers: int = 4,
+        max_retries: int = 5,
+        initial_backoff: float = 2,
+        max_backoff: float = 600,
+        request_timeout: int | None = ES_TIMEOUT,
+        show_progress: bool = True,
+    ) -> dict:
+        """
+        Index documents into an Elasticsearch or OpenSearch index using
+        bulk requests sent in parallel.
+
+        Documents are indexed with the provided IDs, so indexing the same
+        documents again replaces them rather than creating duplicates.
+        Requests rejected by the cluster because it is overloaded
+        (429 Too Many Requests) are retried with an exponential backoff.
+
+        Parameters
+        ----------
+            index : str
+                    The name of the index (or alias) to write to.
+            documents : Iterable[tuple[str, dict]]
+                    The document IDs and the documents. Consumed lazily so
+                    this can be a generator.
+            chunk_size : int, optional, default = 500
+                    The number of documents in each bulk request.
+            n_workers : int, optional, default = 4
+                    The number of bulk requests sent in parallel.
+            max_retries : int, optional, default = 5
+                    The maximum number of times a rejected document is
+                    retried.
+            initial_backoff : float, optional, default = 2
+                    The number of seconds to wait before the first retry.
+                    Any subsequent retries wait twice as long as the previous
+                    one.
+            max_backoff : float, optional, default = 600
+                    The maximum number of seconds a retry waits.
+            request_timeout : int, optional, default = 300
+                    The time in seconds to wait for a response from
+                    Elasticsearch or OpenSearch before timing out.
+            show_progress : bool, optional, default = True
+                    Whether to show the progress in console.
+
+        Returns
+        -------
+            dict
+                The number of documents `indexed` and `failed` along with the
+                `errors` of the failed documents.
+        """
+        if chunk_size < 1 or n_workers < 1:
+            raise ValueError("The chunk size and the number of workers need "
+                             "to be at least 1")
+
+        def write_chunk(chunk: list[tuple[str, dict]]
+                        ) -> tuple[int, list[dict]]:
+            actions = [{"_index": index, "_id": doc_id, "_source": doc}
+                       for doc_id, doc in chunk]
+            indexed, errors = 0, []
+            for ok, info in self.provider.streaming_bulk(
+                    actions,
+                    chunk_size=chunk_size,
+                    max_retries=max_retries,
+                    initial_backoff=initial_backoff,
+                    max_backoff=max_backoff,
+                    request_timeout=request_timeout):
+                if ok:
+                    indexed += 1
+                else:
+                    errors.append(info)
+            return indexed, errors
+
+        stats: dict[str, Any] = {"indexed": 0, "failed": 0, "errors": []}
+
+        def collect(done: set) -> None:
+            for future in done:
+                indexed, errors = future.result()
+                stats["indexed"] += indexed
+                stats["failed"] += len(errors)
+                stats["errors"].extend(errors)
+                pr_bar.update(indexed + len(errors))
+
+        pr_bar = tqdm.tqdm(desc="CogStack indexed...",
+                           disable=not show_progress, colour="green")
+        with ThreadPoolExecutor(max_workers=n_workers,
+                                thread_name_prefix="cogstack-bulk") as pool:
+            in_flight: set = set()
+            chunk: list[tuple[str, dict]] = []
+            for document in documents:
+                chunk.append(document)
+                if len(chunk) < chunk_size:
+                    continue
+                # NOTE: bounded so that the documents are read lazily
+                if len(in_flight) >= 2 * n_workers:
+                    done, in_flight = wait(in_flight,
+                                           return_when=FIRST_COMPLETED)
+                    collect(done)
+                in_flight.add(pool.submit(write_chunk, chunk))
+                chunk = []
+            if chunk:
+                in_flight.add(pool.submit(write_chunk, chunk))
+            collect(wait(in_flight).done)
+        pr_bar.close()
+        return stats
+
+    def write_annotations(
+        self,
+        index: str,
+        annotations: Iterable[tuple[str | int, Mapping[str, Any]]],
+        source_index: str | None = None,
+        **kwargs,
+    ) -> dict:
+        """
+        Write MedCAT annotations to an Elasticsearch or OpenSearch index,
+        one document per annotation.
+
+        The annotation document IDs are derived from the source document
+        `_id` and the annotation span and CUI, so writing the annotations
+        of the same documents again (e.g. when resuming a failed run)
+        replaces them rather than creating duplicates.
+
+        Parameters
+        ----------
+            index : str
+                    The name of the annotations index (or alias) to write to.
+            annotations : Iterable[tuple[str | int, Mapping[str, Any]]]
+                    The source document IDs and MedCAT entities, e.g. the
+                    output of `CAT.get_entities_multi_texts` with the input
+                    from `stream_texts`.
+            source_index : str, optional
+                    The name of the index the documents were read from.
+                    Saved in each annotation if provided.
+            **kwargs
+                    Other keyword arguments passed to `bulk_index` (e.g.
+                    `chunk_size`, `n_workers` or `max_retries`).
+
+        Returns
+        -------
+            dict
+                The number of annotations `indexed` and `failed` along with
+                the `errors` of the failed annotations.
+        """
+        return self.bulk_index(
+            index, self.__iter_annotation_documents(annotations, source_index),
+            **kwargs)
+
+    def __iter_annotation_documents(
+        self,
+        annotations: Iterable[tuple[str | int, Mapping[str, Any]]],
+        source_index: str | None,
+    ) -> Iterator[tuple[str, dict]]:
+        for source_id, entities in annotations:
+            for ent_id, ent in entities["entities"].items():
+                if isinstance(ent, str):
+                    # only CUIs
+                    doc: dict[str, Any] = {"cui": ent}
+                    doc_id = f"{source_id}_{ent_id}"
+                else:
+                    doc = dict(ent)
+                    doc_id = (f"{source_id}_{ent['start']}_{ent['end']}_"
+                              f"{ent['cui']}")
+                doc["source_id"] = str(source_id)
+                if source_index is not None:
+                    doc["source_index"] = source_index
+                yield doc_id, doc
+
+    def __read_checkpoint(self, checkpoint_path: str | None,
+                          slices: int) -> set[int]:
+        if checkpoint_path is None or not os.path.exists(checkpoint_path):
+            return set()
+        with open(checkpoint_path) as f:
+            checkpoint = json.load(f)
+        if checkpoint["slices"] != slices:
+            raise ValueError(
+                f"The checkpoint at {checkpoint_path} was created with "
+                f"{checkpoint['slices']} slices, but {slices} were requested")
+        return set(checkpoint["completed"])
+
+    def __write_checkpoint(self, checkpoint_path: str, slices: int,
+                           completed: set[int]) -> None:
+        temp_path = f"{checkpoint_path}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump({"slices": slices, "completed": sorted(completed)}, f)
+        os.replace(temp_path, checkpoint_path)
+
     def __extract_query(self, query: dict):
         if "query" in query.keys():
             return query["query"]
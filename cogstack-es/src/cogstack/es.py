@@ -82,6 +82,7 @@ class ClientWrapper:
                sort: dict | list[str] | None = None,
                search_after: list[Union[
                    str, int, float, Any, None]] | None = None,
+               slice: dict | None = None,
                ) -> dict:
         return cast(dict, self.elastic.search(
             index=index,
@@ -97,6 +98,7 @@ class ClientWrapper:
             timeout=f"{timeout}s",
             track_scores=track_scores,
             track_total_hits=track_total_hits,
+            slice=slice,
         ))
 
     def scroll(self,
@@ -121,6 +123,24 @@ class ClientWrapper:
     def clear_scroll(self, scroll_id: str | Sequence[str] | None) -> None:
         self.elastic.clear_scroll(scroll_id=scroll_id)
 
+    def streaming_bulk(self,
+                       actions: Iterable[dict],
+                       chunk_size: int,
+                       max_retries: int,
+                       initial_backoff: float,
+                       max_backoff: float,
+                       request_timeout: int | None,
+                       ) -> Iterable[tuple[bool, dict]]:
+        return es_helpers.streaming_bulk(
+            self.elastic.options(request_timeout=request_timeout),
+            actions,
+            chunk_size=chunk_size,
+            max_retries=max_retries,
+            initial_backoff=initial_backoff,
+            max_backoff=max_backoff,
+            raise_on_error=False,
+        )
+
     # exception handling for import reasons
 
     def has_no_indices(self, err: BaseException) -> bool:
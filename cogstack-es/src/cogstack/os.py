@@ -69,6 +69,7 @@ class ClientWrapper:
                sort: dict | list[str] | None = None,
                search_after: list[Union[
                    str, int, float, Any, None]] | None = None,
+               slice: dict | None = None,
                ) -> dict:
         full_query: dict[str, Any] = {
             "query": query,
@@ -77,6 +78,8 @@ class ClientWrapper:
             full_query["fields"] = include_fields_map
         if search_after:
             full_query["search_after"] = search_after
+        if slice:
+            full_query["slice"] = slice
         if sort is None:
             sort = {"id": "asc"}
         full_query["sort"] = sort
@@ -115,6 +118,25 @@ class ClientWrapper:
     def clear_scroll(self, scroll_id: str | Sequence[str] | None) -> None:
         return self.client.clear_scroll(scroll_id=scroll_id)
 
+    def streaming_bulk(self,
+                       actions: Iterable[dict],
+                       chunk_size: int,
+                       max_retries: int,
+                       initial_backoff: float,
+                       max_backoff: float,
+                       request_timeout: int | None,
+                       ) -> Iterable[tuple[bool, dict]]:
+        return es_helpers.streaming_bulk(
+            self.client,
+            actions,
+            chunk_size=chunk_size,
+            max_retries=max_retries,
+            initial_backoff=initial_backoff,
+            max_backoff=max_backoff,
+            raise_on_error=False,
+            request_timeout=request_timeout,
+        )
+
     # exception handling for import reasons
 
     def has_no_indices(self, err: BaseException) -> bool:
@@ -92,3 +92,144 @@ def test_read_data_with_scan(mock_elasticsearch: tuple[MagicMock, Mock]):
         assert isinstance(result, pd.DataFrame)
         assert len(result) == 2
         assert 'title' in result.columns
+
+
+def _sliced_scroll_provider(mock_inst: Mock, docs_per_slice: dict[int, int],
+                            size: int):
+    """Mock search / scroll to page through the documents of each slice"""
+    pages = {}
+    for slice_id, n_docs in docs_per_slice.items():
+        hits = [{'_index': 'test_index', '_id': f'{slice_id}-{nr}',
+                 '_score': 1.0, 'fields': {'text': [f'text {nr}']}}
+                for nr in range(n_docs)]
+        pages[slice_id] = [hits[start:start + size]
+                           for start in range(0, n_docs + 1, size)]
+
+    def response(slice_id, page_nr):
+        return {'_shards': {'failed': 0},
+                '_scroll_id': f'{slice_id}:{page_nr}',
+                'hits': {'hits': pages[slice_id][page_nr]}}
+
+    def search(**kwargs):
+        return response(kwargs['slice']['id'], 0)
+
+    def scroll(scroll_id, **kwargs):
+        slice_id, page_nr = scroll_id.split(':')
+        return response(int(slice_id), int(page_nr) + 1)
+
+    mock_inst.search.side_effect = search
+    mock_inst.scroll.side_effect = scroll
+
+
+def test_stream_data_with_sliced_scroll(
+        mock_elasticsearch: tuple[MagicMock, Mock]):
+    """Test stream_data_with_sliced_scroll yields all docs in chunks"""
+    _, mock_inst = mock_elasticsearch
+    _sliced_scroll_provider(mock_inst, {0: 7, 1: 3, 2: 0}, size=2)
+    cs = CogStack(['http://localhost:9200'])
+    cs.provider = mock_inst
+
+    chunks = list(cs.stream_data_with_sliced_scroll(
+        'test_index', {"match_all": {}}, ['text'], size=2, slices=3,
+        n_workers=2, chunk_size=4, show_progress=False))
+
+    assert [len(chunk) for chunk in chunks] == [4, 4, 2]
+    ids = pd.concat(chunks)['_id']
+    assert sorted(ids) == sorted(
+        [f'0-{nr}' for nr in range(7)] + [f'1-{nr}' for nr in range(3)])
+    assert mock_inst.search.call_count == 3
+
+
+def test_stream_data_with_sliced_scroll_resumes(
+        mock_elasticsearch: tuple[MagicMock, Mock], tmp_path):
+    """Test completed slices are skipped when resuming from a checkpoint"""
+    _, mock_inst = mock_elasticsearch
+    _sliced_scroll_provider(mock_inst, {0: 3, 1: 3}, size=10)
+    cs = CogStack(['http://localhost:9200'])
+    cs.provider = mock_inst
+    checkpoint = str(tmp_path / 'checkpoint.json')
+
+    stream = cs.stream_data_with_sliced_scroll(
+        'test_index', {"match_all": {}}, ['text'], size=10, slices=2,
+        n_workers=1, chunk_size=3, checkpoint_path=checkpoint,
+        show_progress=False)
+    first = next(stream)
+    # the consumer asking for the next chunk marks the first slice done
+    next(stream)
+    stream.close()
+
+    mock_inst.search.reset_mock()
+    resumed = list(cs.stream_data_with_sliced_scroll(
+        'test_index', {"match_all": {}}, ['text'], size=10, slices=2,
+        n_workers=1, chunk_size=3, checkpoint_path=checkpoint,
+        show_progress=False))
+
+    assert mock_inst.search.call_count == 1
+    assert set(first['_id']).isdisjoint(pd.concat(resumed)['_id'])
+
+
+def test_stream_texts(mock_elasticsearch: tuple[MagicMock, Mock]):
+    """Test stream_texts yields document IDs and texts"""
+    _, mock_inst = mock_elasticsearch
+    _sliced_scroll_provider(mock_inst, {0: 2, 1: 1}, size=5)
+    cs = CogStack(['http://localhost:9200'])
+    cs.provider = mock_inst
+
+    texts = sorted(cs.stream_texts('test_index', {"match_all": {}}, 'text',
+                                   slices=2, show_progress=False))
+
+    assert texts == [('0-0', 'text 0'), ('0-1', 'text 1'), ('1-0', 'text 0')]
+
+
+def test_bulk_index(mock_elasticsearch: tuple[MagicMock, Mock]):
+    """Test bulk_index sends the documents in chunks and counts failures"""
+    _, mock_inst = mock_elasticsearch
+    sent = []
+
+    def streaming_bulk(actions, **kwargs):
+        sent.append(actions)
+        return [(action['_id'] != 'doc-3', {'index': {'_id': action['_id']}})
+                for action in actions]
+
+    mock_inst.streaming_bulk.side_effect = streaming_bulk
+    cs = CogStack(['http://localhost:9200'])
+    cs.provider = mock_inst
+
+    docs = ((f'doc-{nr}', {'nr': nr}) for nr in range(10))
+    stats = cs.bulk_index('annotations', docs, chunk_size=4, n_workers=2,
+                          show_progress=False)
+
+    assert sorted(len(actions) for actions in sent) == [2, 4, 4]
+    assert stats['indexed'] == 9
+    assert stats['failed'] == 1
+    assert stats['errors'] == [{'index': {'_id': 'doc-3'}}]
+    assert all(action['_index'] == 'annotations'
+               for actions in sent for action in actions)
+
+
+def test_write_annotations(mock_elasticsearch: tuple[MagicMock, Mock]):
+    """Test write_annotations derives the annotation IDs from the source"""
+    _, mock_inst = mock_elasticsearch
+    sent = []
+
+    def streaming_bulk(actions, **kwargs):
+        sent.extend(actions)
+        return [(True, {}) for _ in actions]
+
+    mock_inst.streaming_bulk.side_effect = streaming_bulk
+    cs = CogStack(['http://localhost:9200'])
+    cs.provider = mock_inst
+    entities = {'entities': {
+        0: {'cui': 'C01', 'start': 0, 'end': 5},
+        1: {'cui': 'C02', 'start': 10, 'end': 12}}, 'tokens': []}
+
+    stats = cs.write_annotations(
+        'annotations', [('src-1', entities), ('src-2', {'entities': {}})],
+        source_index='notes', show_progress=False)
+
+    assert stats['indexed'] == 2
+    assert [action['_id'] for action in sent] == [
+        'src-1_0_5_C01', 'src-1_10_12_C02']
+    assert sent[0]['_source'] == {'cui': 'C01', 'start': 0, 'end': 5,
+                                  'source_id': 'src-1',
+                                  'source_index': 'notes'}
@@ -1,4 +1,5 @@
 from .local_cache import LocalCache
+from .loaded_models import LoadedModelCache
 
 
-__all__ = ["LocalCache"]
+__all__ = ["LocalCache", "LoadedModelCache"]
@@ -0,0 +1,97 @@
+from typing import Optional
+
+from collections import OrderedDict
+import logging
+import threading
+
+from medcat.cat import CAT
+
+
+logger = logging.getLogger(__name__)
+
+
+class LoadedModelCache:
+    """An in-process LRU cache of loaded models.
+
+    The cache is bounded by the number of models as well as their
+    (estimated) total size. The most recently added model is never
+    evicted, even if it alone exceeds the size limit.
+
+    NOTE: The cached instances are shared, so any changes made to a
+          fetched model (e.g training) will be seen by subsequent fetches.
+
+    Args:
+        max_models (int): The maximum number of models to keep.
+            0 means no limit.
+        max_size (int): The maximum total size of the models (in bytes).
+            0 means no limit.
+    """
+
+    def __init__(self, max_models: int, max_size: int) -> None:
+        self.max_models = max_models
+        self.max_size = max_size
+        self._models: OrderedDict[str, tuple[CAT, int]] = OrderedDict()
+        self._lock = threading.RLock()
+
+    @property
+    def total_size(self) -> int:
+        """The total (estimated) size of the cached models in bytes."""
+        with self._lock:
+            return sum(size for _, size in self._models.values())
+
+    def get(self, key: str) -> Optional[CAT]:
+        """Get a loaded model and mark it as recently used.
+
+        Args:
+            key (str): The model ID.
+
+        Returns:
+            Optional[CAT]: The model, or None if not cached.
+        """
+        with self._lock:
+            if key not in self._models:
+                return None
+            self._models.move_to_end(key)
+            return self._models[key][0]
+
+    def put(self, key: str, cat: CAT, size: int) -> None:
+        """Add a loaded model, evicting the least recently used ones
+        as needed.
+
+        Args:
+            key (str): The model ID.
+            cat (CAT): The loaded model.
+            size (int): The (estimated) size of the model in bytes.
+        """
+        with self._lock:
+            self._models[key] = (cat, size)
+            self._models.move_to_end(key)
+            while len(self._models) > 1 and self._is_over_limit():
+                evicted, _ = self._models.popitem(last=False)
+                logger.info("Evicted loaded model %s from memory", evicted)
+
+    def _is_over_limit(self) -> bool:
+        return bool(
+            (self.max_models and len(self._models) > self.max_models) or
+            (self.max_size and self.total_size > self.max_size))
+
+    def pop(self, key: str) -> Optional[CAT]:
+        """Remove a model from the cache.
+
+        Args:
+            key (str): The model ID.
+
+        Returns:
+            Optional[CAT]: The removed model, if it was cached.
+        """
+        with self._lock:
+            item = self._models.pop(key, None)
+            return item[0] if item else None
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return key in self._models
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._models)
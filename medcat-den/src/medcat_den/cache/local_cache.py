@@ -1,7 +1,10 @@
-from typing import Union, cast
+from typing import Optional, Union, cast
 
 import os
 from io import BytesIO
+import logging
+import tempfile
+import zipfile
 
 import shutil
 
@@ -11,6 +14,10 @@ from medcat_den.den import Den
 from medcat_den.base import ModelInfo
 from medcat_den.wrappers import CATWrapper
 from medcat_den.config import LocalCacheConfig
+from medcat_den.cache.loaded_models import LoadedModelCache
+
+
+logger = logging.getLogger(__name__)
 
 
 DEFAULT_EXPIRATION_TIME = 10 * 24 * 60 * 60  # 10 days
@@ -19,6 +26,7 @@ DEFAULT_EVICTION_POLICY = 'least-recently-used'
 
 
 class LocalCache:
+    unpacked_folder_name = 'unpacked'
 
     def __init__(self, cnf: LocalCacheConfig,) -> None:
         self._cnf = cnf
@@ -26,6 +34,13 @@ class LocalCache:
         self.cache = Cache(self._cnf.path,
                            size_limit=self._cnf.max_size,
                            eviction_policy=self._cnf.eviction_policy)
+        self._unpacked_folder = os.path.join(
+            self._cache_path, self.unpacked_folder_name)
+        self.loaded_models: Optional[LoadedModelCache] = (
+            LoadedModelCache(self._cnf.max_loaded_models,
+                             self._cnf.max_loaded_models_size)
+            if self._cnf.max_loaded_models or self._cnf.max_loaded_models_size
+            else None)
 
     def get(self, key: str) -> str:
         """Fetch file path from cache.
@@ -58,6 +73,7 @@ class LocalCache:
         with open(file_path, "rb") as fh:
             self.cache.set(key, fh, read=True,
                            expire=self._cnf.expiration_time)
+        self._remove_stale_unpacked()
 
     def insert_raw(self, key: str, data: bytes) -> None:
         """Insert raw bytes into the cache.
@@ -69,6 +85,53 @@ class LocalCache:
         with BytesIO(data) as fh:
             self.cache.set(key, fh, read=True,
                            expire=self._cnf.expiration_time)
+        self._remove_stale_unpacked()
+
+    def get_model_folder(self, key: str) -> str:
+        """Get the unpacked model pack folder for a cached model.
+
+        The model pack is unpacked upon first use and the unpacked
+        folder is reused until the model is removed from the cache.
+
+        Args:
+            key (str): The model key (hash).
+
+        Raises:
+            ValueError: If key not found or expired.
+
+        Returns:
+            str: The path to the unpacked model pack folder.
+        """
+        zip_path = self.get(key)
+        folder_path = self._get_unpacked_path(key)
+        if os.path.exists(folder_path):
+            return folder_path
+        os.makedirs(self._unpacked_folder, exist_ok=True)
+        # NOTE: unpacking into a temporary folder and swapping it in once
+        #       done so that a partially unpacked model is never used
+        temp_path = f"{folder_path}.tmp-{os.getpid()}"
+        shutil.unpack_archive(zip_path, extract_dir=temp_path, format="zip")
+        try:
+            os.replace(temp_path, folder_path)
+        except OSError:
+            # unpacked by another process in the meantime
+            shutil.rmtree(temp_path, ignore_errors=True)
+        return folder_path
+
+    def _get_unpacked_path(self, key: str) -> str:
+        return os.path.join(self._unpacked_folder, key)
+
+    def _remove_stale_unpacked(self) -> None:
+        # NOTE: the unpacked folders are not tracked by the (disk) cache
+        #       itself, so they need to be removed when the corresponding
+        #       models have been evicted or have expired
+        if not os.path.exists(self._unpacked_folder):
+            return
+        for folder_name in os.listdir(self._unpacked_folder):
+            if ".tmp-" in folder_name or folder_name in self.cache:
+                continue
+            shutil.rmtree(os.path.join(self._unpacked_folder, folder_name),
+                          ignore_errors=True)
 
     def delete(self, key: str) -> None:
         """Delete a key from the cache.
@@ -77,12 +140,14 @@ class LocalCache:
             key (str): The key to delete.
         """
         if key in self.cache:
-            file_path = self[key]
             del self.cache[key]
-            folder_path = file_path.removesuffix(".zip")
-            if os.path.exists(folder_path):
-                shutil.rmtree(folder_path)
-        # NOTE: if there's an expiry, then the folder will NOT be deleted
+        folder_path = self._get_unpacked_path(key)
+        if os.path.exists(folder_path):
+            shutil.rmtree(folder_path)
+        if self.loaded_models is not None:
+            self.loaded_models.pop(key)
+        # NOTE: if there's an expiry, then the folder will be deleted
+        #       the next time something is inserted
 
     def __getitem__(self, key: str) -> str:
         return self.get(key)
@@ -122,19 +187,77 @@ class LocalCache:
 
         def fetch_wrapper(model_info: ModelInfo) -> CATWrapper:
             model_hash = model_info.model_id
+            if self.loaded_models is not None:
+                loaded = self.loaded_models.get(model_hash)
+                if loaded is not None:
+                    return cast(CATWrapper, loaded)
+            zip_path: Optional[str]
             if model_hash in self:
-                model_path = self[model_hash]
-                return cast(CATWrapper, CATWrapper.load_model_pack(
-                    model_path, model_info=model_info))
-            cat = orig_fetch(model_info)
-            # cache it
-            model_path = f"{model_hash}.zip"
-            self[model_hash] = model_path
+                zip_path = self[model_hash]
+                cat = cast(CATWrapper, CATWrapper.load_model_pack(
+                    self.get_model_folder(model_hash), model_info=model_info,
+                    den_cnf=getattr(den, "_cnf", None)))
+            else:
+                cat = orig_fetch(model_info)
+                # cache it
+                zip_path = self._cache_fetched_model(den, model_info)
+            if self.loaded_models is not None:
+                self.loaded_models.put(
+                    model_hash, cat,
+                    _get_unpacked_size(zip_path) if zip_path else 0)
             return cat
 
         den.fetch_model = fetch_wrapper  # type: ignore
+        # wrap delete_model to also remove from cache
+        orig_delete = den.delete_model
+
+        def delete_wrapper(model_info: ModelInfo,
+                           allow_delete_base_models: bool = False) -> None:
+            orig_delete(model_info, allow_delete_base_models)
+            self.delete(model_info.model_id)
+
+        den.delete_model = delete_wrapper  # type: ignore
         den.cache = self  # type: ignore
 
+    def _cache_fetched_model(self, den: Den, model_info: ModelInfo
+                             ) -> str | None:
+        model_hash = model_info.model_id
+        zip_path = self._get_fetched_zip_path(den, model_info)
+        if zip_path is not None:
+            self[model_hash] = zip_path
+            return zip_path
+        build_folder = getattr(den, "_build_model_folder", None)
+        # NOTE: e.g the local file den only keeps the files of the models
+        #       (in its object store) rather than the model pack zips
+        with tempfile.TemporaryDirectory() as temp_dir:
+            folder_path = os.path.join(temp_dir, model_hash)
+            if build_folder is None or not build_folder(model_info,
+                                                        folder_path):
+                logger.warning("Unable to find the fetched model %s, "
+                               "not caching it locally", model_hash)
+                return None
+            zip_path = shutil.make_archive(
+                folder_path, "zip", root_dir=folder_path)
+            self[model_hash] = zip_path
+        return self[model_hash]
+
+    def _get_fetched_zip_path(self, den: Den, model_info: ModelInfo
+                              ) -> Optional[str]:
+        get_zip_path = getattr(den, "_get_model_zip_path", None)
+        if get_zip_path is not None:
+            model_path = get_zip_path(model_info)
+        else:
+            model_path = f"{model_info.model_id}.zip"
+        if not os.path.exists(model_path):
+            return None
+        return model_path
+
+
+def _get_unpacked_size(zip_path: str) -> int:
+    # NOTE: used to estimate the in-memory size of the loaded model
+    with zipfile.ZipFile(zip_path) as zf:
+        return sum(info.file_size for info in zf.infolist())
+
 
 def has_local_cache(den: Den) -> bool:
     """Check if the given den has a local cache.
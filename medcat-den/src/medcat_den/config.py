@@ -26,3 +26,6 @@ class LocalCacheConfig(BaseModel):
     expiration_time: int
     max_size: int
     eviction_policy: str
+    # in-process cache of loaded models (disabled if both are 0)
+    max_loaded_models: int = 0
+    max_loaded_models_size: int = 0
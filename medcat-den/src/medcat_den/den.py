@@ -164,6 +164,8 @@ def get_default_den(
         eviction_policy: Optional[str] = None,
         remote_allow_local_fine_tune: Optional[str] = None,
         remote_allow_push_fine_tuned: Optional[str] = None,
+        max_loaded_models: Optional[int] = None,
+        max_loaded_models_size: Optional[int] = None,
         ) -> Den:
     """Get the default den.
 
@@ -193,6 +195,12 @@ def get_default_den(
             fine tuning of remote models.
         remote_allow_push_fine_tuned (Optional[str]): Whether to allow pushing
             of locally fine-tuned models to the remote
+        max_loaded_models (Optional[int]): The maximum number of loaded
+            models kept in memory by the local cache. Defaults to 0 (disabled
+            unless a size is specified).
+        max_loaded_models_size (Optional[int]): The maximum (estimated) total
+            size (in bytes) of the loaded models kept in memory by the local
+            cache. Defaults to 0 (disabled unless a count is specified).
 
     Returns:
         Den: The resolved den.
@@ -201,7 +209,8 @@ def get_default_den(
     from medcat_den.resolver import resolve
     return resolve(type_, location, host, credentials, local_cache_path,
                    expiration_time, max_size, eviction_policy,
-                   remote_allow_local_fine_tune, remote_allow_push_fine_tuned)
+                   remote_allow_local_fine_tune, remote_allow_push_fine_tuned,
+                   max_loaded_models, max_loaded_models_size)
 
 
 def get_default_user_local_den(
@@ -5,6 +5,7 @@ from datetime import datetime
 import os
 import sqlite3
 import shutil
+import tempfile
 
 from medcat.cat import CAT
 from medcat.data.mctexport import MedCATTrainerExport
@@ -15,6 +16,7 @@ from medcat_den.backend import DenType
 from medcat_den.base import ModelInfo
 from medcat_den.wrappers import CATWrapper
 from medcat_den.config import LocalDenConfig
+from medcat_den.den_impl.object_store import ObjectStore
 
 
 class SqliteModel:
@@ -35,6 +37,16 @@ class SqliteModel:
                         created_at TIMESTAMP
                         )
                     """)
+        cur.execute("""CREATE TABLE IF NOT EXISTS
+                        model_files(
+                        model_id TEXT NOT NULL REFERENCES models(id),
+                        path TEXT NOT NULL,
+                        hash TEXT,
+                        PRIMARY KEY (model_id, path)
+                        )
+                    """)
+        cur.execute("""CREATE INDEX IF NOT EXISTS model_files_hash
+                        ON model_files(hash)""")
         self._conn.commit()
 
     def insert_model(self, model_info: ModelInfo) -> None:
@@ -102,6 +114,48 @@ class SqliteModel:
             for row in rows
         ]
 
+    def insert_model_files(self, model_id: str,
+                           files: dict[str, Optional[str]]) -> None:
+        """Insert the files (and their hashes) of a model.
+
+        Args:
+            model_id (str): The model ID.
+            files (dict[str, Optional[str]]): The relative paths and hashes
+                of the files (None for directories).
+        """
+        cur = self._conn.cursor()
+        cur.executemany(
+            "INSERT INTO model_files (model_id, path, hash) VALUES (?, ?, ?)",
+            [(model_id, path, obj_hash) for path, obj_hash in files.items()])
+        self._conn.commit()
+
+    def get_model_files(self, model_id: str) -> dict[str, Optional[str]]:
+        """Get the files of a model.
+
+        Models stored as a whole model pack zip have no files.
+
+        Args:
+            model_id (str): The model ID.
+
+        Returns:
+            dict[str, Optional[str]]: The relative paths and hashes.
+        """
+        cur = self._conn.cursor()
+        cur.execute("SELECT path, hash FROM model_files WHERE model_id=?",
+                    (model_id,))
+        return dict(cur.fetchall())
+
+    def list_file_hashes(self) -> set[str]:
+        """List the hashes of the files used by any model.
+
+        Returns:
+            set[str]: The hashes.
+        """
+        cur = self._conn.cursor()
+        cur.execute("""SELECT DISTINCT hash FROM model_files
+                        WHERE hash IS NOT NULL""")
+        return {row[0] for row in cur.fetchall()}
+
     def delete_model(self, model_id: str) -> None:
         """Delete a model from the database.
 
@@ -109,6 +163,9 @@ class SqliteModel:
             model_id (str): The model ID.
         """
         cur = self._conn.cursor()
+        cur.execute("""
+                    DELETE FROM model_files WHERE model_id=?
+                    """, (model_id,))
         cur.execute("""
                     DELETE FROM models WHERE id=?
                     """, (model_id,))
@@ -116,8 +173,18 @@ class SqliteModel:
 
 
 class LocalFileDen(Den):
+    """A den that stores the models on the local file system.
+
+    The files of the model packs are stored in a content-addressed
+    object store, so that files shared between models (e.g between
+    fine-tuned derivatives and their base models) are only stored once.
+    The model pack folders are built from (copies of) the stored files
+    upon fetch and removed once the model is loaded. Models stored as model
+    pack zips (by earlier versions) can still be fetched.
+    """
     folder_name = '.medcat-den'
     models_folder_name = 'models'
+    objects_folder_name = 'objects'
 
     def __init__(self, cnf: LocalDenConfig):
         self._cnf = cnf
@@ -131,6 +198,8 @@ class LocalFileDen(Den):
                                            self.models_folder_name)
         if not os.path.exists(self._models_folder):
             os.mkdir(self._models_folder)
+        self._objects = ObjectStore(
+            os.path.join(self._folder_path, self.objects_folder_name))
         self._den_type = DenType.LOCAL_USER
 
     @property
@@ -156,16 +225,47 @@ class LocalFileDen(Den):
         return os.path.join(self._models_folder,
                             self._get_model_zip_name(model_info.model_id))
 
+    def _build_model_folder(self, model_info: ModelInfo,
+                            folder_path: str) -> bool:
+        """Build the model pack folder from the stored files.
+
+        Args:
+            model_info (ModelInfo): The model info.
+            folder_path (str): The folder to build.
+
+        Returns:
+            bool: Whether the folder was built. Models stored as model
+                pack zips have no stored files.
+        """
+        model_files = self._sqlite.get_model_files(model_info.model_id)
+        if not model_files:
+            return False
+        self._objects.build_folder(model_files, folder_path)
+        return True
+
+    def _load_model(self, model_info: ModelInfo,
+                    model_path: str) -> CATWrapper:
+        return cast(
+            CATWrapper,
+            CATWrapper.load_model_pack(model_path, model_info=model_info,
+                                       den_cnf=self._cnf))
+
     def fetch_model(self, model_info: ModelInfo) -> CATWrapper:
         db_info = self._sqlite.get_model(model_id=model_info.model_id)
         if db_info is None:
             raise ValueError(f"The model info {model_info} does not "
                              "correspond to a model that exists the back end")
-        model_path = self._get_model_zip_path(model_info)
-        return cast(
-            CATWrapper,
-            CATWrapper.load_model_pack(model_path, model_info=model_info,
-                                       den_cnf=self._cnf))
+        # NOTE: the folder is only kept while loading the model so that the
+        #       (copies of the) stored files don't take up any space
+        #       afterwards; memory mapped files remain valid once removed
+        with tempfile.TemporaryDirectory(
+                dir=self._models_folder, ignore_cleanup_errors=True
+                ) as temp_dir:
+            model_path = os.path.join(temp_dir, model_info.model_id)
+            if self._build_model_folder(model_info, model_path):
+                return self._load_model(model_info, model_path)
+        return self._load_model(model_info,
+                                self._get_model_zip_path(model_info))
 
     def push_model(self, cat: CAT, description: str) -> None:
         if isinstance(cat, CATWrapper):
@@ -194,6 +294,12 @@ class LocalFileDen(Den):
         if isinstance(cat, CATWrapper):
             cat._model_info = updated_mi
         self._sqlite.insert_model(updated_mi)
+        folder_path = full_model_pack_path.removesuffix(".zip")
+        self._sqlite.insert_model_files(
+            updated_mi.model_id, self._objects.add_folder(folder_path))
+        # NOTE: the files are in the object store, the model folder is
+        #       rebuilt from it upon fetch
+        shutil.rmtree(folder_path)
         if not full_model_pack_path.endswith(".zip"):
             # NOTE: it should not actually end with .zip coming
             #       out of the above unless only archive is requested
@@ -202,6 +308,9 @@ class LocalFileDen(Den):
         #       if needed - e.g for local cache (i.e in testing -
         #       otherwise it doesn't make sense to use local cache)
         self._push_model_from_file(full_model_pack_path, description)
+        # NOTE: the files are in the object store so the zip is not needed,
+        #       the local cache (if used) has a copy of its own
+        os.remove(full_model_pack_path)
 
     def _push_model_from_file(self, file_path: str, description: str) -> None:
         # NOTE: for local file den this is not needed, but will still be called
@@ -219,10 +328,14 @@ class LocalFileDen(Den):
                              "allow_delete_base_models=True to force.")
         self._sqlite.delete_model(model_info.model_id)
         zip_path = self._get_model_zip_path(model_info)
-        os.remove(zip_path)
-        folder_path = zip_path.removesuffix(".zip")
+        if os.path.exists(zip_path):
+            os.remove(zip_path)
+        # NOTE: folders built upon fetch were kept by earlier versions
+        folder_path = os.path.join(self._models_folder, model_info.model_id)
         if os.path.exists(folder_path):
             shutil.rmtree(folder_path)
+        # NOTE: only removes the files not shared with other models
+        self._objects.remove_unreferenced(self._sqlite.list_file_hashes())
 
     def finetune_model(self, model_info: ModelInfo,
                        data: Union[list[str], MedCATTrainerExport]):
@@ -0,0 +1,182 @@
+from typing import Iterable, Optional
+
+import hashlib
+import logging
+import os
+import shutil
+import stat
+import sys
+
+
+logger = logging.getLogger(__name__)
+
+
+_READ_BUFFER_SIZE = 2**20
+_READ_ONLY = stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH
+# the ioctl request for a copy-on-write clone (reflink) of a file on Linux
+_FICLONE = 0x40049409
+
+
+class ObjectStore:
+    """A content-addressed store for the files of (unpacked) model packs.
+
+    Each distinct file is stored once (named by the SHA-256 of its content),
+    so files that are shared between models (e.g the vocab or MetaCAT
+    models of a fine-tuned derivative and its base model) only take up
+    space once. Model pack folders are built from copies of the stored
+    objects (copy-on-write clones where the file system supports them),
+    so changes to the files of a model pack folder never affect the
+    stored objects.
+
+    The stored objects are made read-only.
+
+    Args:
+        folder (str): The folder to store the objects in.
+    """
+
+    def __init__(self, folder: str) -> None:
+        self._folder = folder
+        os.makedirs(self._folder, exist_ok=True)
+
+    def _get_object_path(self, obj_hash: str) -> str:
+        return os.path.join(self._folder, obj_hash[:2], obj_hash)
+
+    def add_file(self, file_path: str) -> str:
+        """Add a file to the store (unless already present).
+
+        Args:
+            file_path (str): The path of the file.
+
+        Returns:
+            str: The hash of the file content.
+        """
+        obj_hash = _hash_file(file_path)
+        obj_path = self._get_object_path(obj_hash)
+        if not os.path.exists(obj_path):
+            os.makedirs(os.path.dirname(obj_path), exist_ok=True)
+            temp_path = f"{obj_path}.tmp-{os.getpid()}"
+            shutil.copyfile(file_path, temp_path)
+            os.chmod(temp_path, _READ_ONLY)
+            os.replace(temp_path, obj_path)
+        return obj_hash
+
+    def add_folder(self, folder: str) -> dict[str, Optional[str]]:
+        """Add all the files within a folder to the store.
+
+        Args:
+            folder (str): The folder.
+
+        Returns:
+            dict[str, Optional[str]]: The relative paths (with `/` as the
+                separator) and the hashes of the files. Directories are
+                included with a hash of None so that empty ones can be
+                recreated.
+        """
+        contents: dict[str, Optional[str]] = {}
+        for dir_path, dir_names, file_names in os.walk(folder):
+            rel_dir = os.path.relpath(dir_path, folder)
+            for name in dir_names:
+                contents[_to_rel_path(rel_dir, name)] = None
+            for name in file_names:
+                contents[_to_rel_path(rel_dir, name)] = self.add_file(
+                    os.path.join(dir_path, name))
+        return contents
+
+    def build_folder(self, contents: dict[str, Optional[str]],
+                     target_folder: str) -> None:
+        """Build a folder from the stored objects.
+
+        The folder is built next to the target and moved in place once
+        done, so that a partially built folder is never used.
+
+        Args:
+            contents (dict[str, Optional[str]]): The relative paths and
+                hashes, as returned by `add_folder`.
+            target_folder (str): The folder to build.
+
+        Raises:
+            ValueError: If any of the objects are missing.
+        """
+        temp_folder = f"{target_folder}.tmp-{os.getpid()}"
+        if os.path.exists(temp_folder):
+            shutil.rmtree(temp_folder)
+        os.makedirs(temp_folder)
+        # NOTE: sorted so that parent directories are created first
+        for rel_path, obj_hash in sorted(contents.items()):
+            path = os.path.join(temp_folder, *rel_path.split("/"))
+            if obj_hash is None:
+                os.makedirs(path, exist_ok=True)
+                continue
+            obj_path = self._get_object_path(obj_hash)
+            if not os.path.exists(obj_path):
+                shutil.rmtree(temp_folder)
+                raise ValueError(
+                    f"Missing object {obj_hash} for {rel_path}")
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            _copy_object(obj_path, path)
+        try:
+            os.replace(temp_folder, target_folder)
+        except OSError:
+            # built by another process in the meantime
+            shutil.rmtree(temp_folder, ignore_errors=True)
+
+    def remove_unreferenced(self, referenced: Iterable[str]) -> int:
+        """Remove the objects that are not referenced.
+
+        Args:
+            referenced (Iterable[str]): The hashes of all objects in use.
+
+        Returns:
+            int: The number of removed objects.
+        """
+        keep = set(referenced)
+        removed = 0
+        for prefix in os.listdir(self._folder):
+            prefix_folder = os.path.join(self._folder, prefix)
+            for obj_hash in os.listdir(prefix_folder):
+                if obj_hash in keep or ".tmp-" in obj_hash:
+                    continue
+                os.remove(os.path.join(prefix_folder, obj_hash))
+                removed += 1
+        logger.debug("Removed %d unreferenced objects", removed)
+        return removed
+
+    def list_objects(self) -> list[str]:
+        """List the hashes of all stored objects.
+
+        Returns:
+            list[str]: The hashes.
+        """
+        return [obj_hash for prefix in os.listdir(self._folder)
+                for obj_hash in os.listdir(
+                    os.path.join(self._folder, prefix))
+                if ".tmp-" not in obj_hash]
+
+
+def _to_rel_path(rel_dir: str, name: str) -> str:
+    if rel_dir == os.curdir:
+        return name
+    return "/".join(rel_dir.split(os.sep) + [name])
+
+
+def _copy_object(obj_path: str, path: str) -> None:
+    # NOTE: not hard linked since the linked files would share the
+    #       (permissions of the) object and any changes made to them
+    if sys.platform.startswith("linux"):
+        import fcntl
+        try:
+            with open(obj_path, "rb") as src, open(path, "wb") as dst:
+                fcntl.ioctl(dst.fileno(), _FICLONE, src.fileno())
+            return
+        except OSError:
+            # e.g the file system does not support cloning
+            pass
+    shutil.copyfile(obj_path, path)
+
+
+def _hash_file(file_path: str) -> str:
+    hasher = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(_READ_BUFFER_SIZE), b""):
+            hasher.update(block)
+    return hasher.hexdigest()
@@ -38,6 +38,10 @@ MEDCAT_DEN_LOCAL_CACHE_EXPIRATION_TIME = (
 MEDCAT_DEN_LOCAL_CACHE_MAX_SIZE = "MEDCAT_DEN_LOCAL_CACHE_MAX_SIZE"
 MEDCAT_DEN_LOCAL_CACHE_EVICTION_POLICY = (
     "MEDCAT_DEN_LOCAL_CACHE_EVICTION_POLICY")
+MEDCAT_DEN_LOCAL_CACHE_MAX_LOADED_MODELS = (
+    "MEDCAT_DEN_LOCAL_CACHE_MAX_LOADED_MODELS")
+MEDCAT_DEN_LOCAL_CACHE_MAX_LOADED_MODELS_SIZE = (
+    "MEDCAT_DEN_LOCAL_CACHE_MAX_LOADED_MODELS_SIZE")
 MEDCAT_DEN_REMOTE_ALLOW_LOCAL_FINE_TUNE = (
     "MEDCAT_DEN_REMOTE_ALLOW_LOCAL_FINE_TUNE")
 MEDCAT_DEN_REMOTE_ALLOW_PUSH_FINETUNED = (
@@ -126,13 +130,16 @@ def resolve(
     eviction_policy: Optional[str] = None,
     remote_allow_local_fine_tune: Optional[str] = None,
     remote_allow_push_fine_tuned: Optional[str] = None,
+    max_loaded_models: Optional[int] = None,
+    max_loaded_models_size: Optional[int] = None,
 ) -> Den:
     den_cnf = _init_den_cnf(type_, location, host, credentials,
                             remote_allow_local_fine_tune,
                             remote_allow_push_fine_tuned)
     den = resolve_from_config(den_cnf)
     lc_cnf = _init_lc_cnf(
-        local_cache_path, expiration_time, max_size, eviction_policy)
+        local_cache_path, expiration_time, max_size, eviction_policy,
+        max_loaded_models, max_loaded_models_size)
     if lc_cnf:
         _add_local_cache(den, lc_cnf)
     return den
@@ -169,7 +176,9 @@ def resolve_from_config(config: DenConfig) -> Den:
 def _init_lc_cnf(local_cache_path: Optional[str],
                  expiration_time_in: Optional[int],
                  max_size_in: Optional[int],
-                 eviction_policy_in: Optional[str]
+                 eviction_policy_in: Optional[str],
+                 max_loaded_models_in: Optional[int] = None,
+                 max_loaded_models_size_in: Optional[int] = None,
                  ) -> Optional[LocalCacheConfig]:
     local_cache_path = (
         local_cache_path
@@ -185,11 +194,17 @@ def _init_lc_cnf(local_cache_path: Optional[str],
     eviction_policy = str(eviction_policy_in or os.getenv(
         MEDCAT_DEN_LOCAL_CACHE_EVICTION_POLICY,
         DEFAULT_EVICTION_POLICY))
+    max_loaded_models = max_loaded_models_in or int(os.getenv(
+        MEDCAT_DEN_LOCAL_CACHE_MAX_LOADED_MODELS, 0))
+    max_loaded_models_size = max_loaded_models_size_in or int(os.getenv(
+        MEDCAT_DEN_LOCAL_CACHE_MAX_LOADED_MODELS_SIZE, 0))
     return LocalCacheConfig(
             path=local_cache_path,
             expiration_time=expiration_time,
             max_size=max_size,
             eviction_policy=eviction_policy,
+            max_loaded_models=max_loaded_models,
+            max_loaded_models_size=max_loaded_models_size,
     )
 
 
@@ -8,6 +8,7 @@ from medcat_den.den import Den
 from medcat_den.config import LocalDenConfig
 from medcat_den.backend import DenType
 from medcat_den.den_impl import LocalFileDen
+from medcat_den.den_impl.object_store import _hash_file
 from medcat_den.base import ModelInfo, ModelCard
 from medcat_den.wrappers import CannotSaveOnDiskException
 
@@ -192,3 +193,91 @@ def test_den_can_delete_model(den_with_item: Den) -> None:
     mi = den_with_item.list_available_models()[0]
     den_with_item.delete_model(mi, allow_delete_base_models=True)
     assert den_with_item.list_available_base_models() == []
+
+
+# test content-addressed storage
+
+
+@pytest.fixture
+def den_with_derivative(tmp_path: str, model_with_sup_training: CAT):
+    cnf = LocalDenConfig(type=DenType.LOCAL_USER, location=tmp_path)
+    den = LocalFileDen(cnf=cnf)
+    den.push_model(_load_model(MODEL_PATH), "BASE MODEL")
+    den.push_model(model_with_sup_training, "2 lines of training")
+    return den
+
+
+def _get_object_hashes(den: LocalFileDen, model_info: ModelInfo) -> set[str]:
+    return {obj_hash for obj_hash in den._sqlite.get_model_files(
+        model_info.model_id).values() if obj_hash is not None}
+
+
+def test_den_stores_shared_files_once(den_with_derivative: LocalFileDen):
+    base = den_with_derivative.list_available_base_models()[0]
+    deriv = den_with_derivative.list_available_derivative_models(base)[0]
+    base_hashes = _get_object_hashes(den_with_derivative, base)
+    deriv_hashes = _get_object_hashes(den_with_derivative, deriv)
+    assert base_hashes & deriv_hashes
+    assert base_hashes != deriv_hashes
+    assert (set(den_with_derivative._objects.list_objects()) ==
+            base_hashes | deriv_hashes)
+    assert not os.path.exists(den_with_derivative._get_model_zip_path(base))
+
+
+def test_den_rebuilds_model_folder(den_with_derivative: LocalFileDen):
+    base = den_with_derivative.list_available_base_models()[0]
+    deriv = den_with_derivative.list_available_derivative_models(base)[0]
+    model = den_with_derivative.fetch_model(deriv)
+    assert model.get_model_card(True)["Model ID"] == deriv.model_id
+    # the built folder is removed once the model is loaded
+    assert not os.listdir(den_with_derivative._models_folder)
+    model = den_with_derivative.fetch_model(deriv)
+    assert model.get_model_card(True)["Model ID"] == deriv.model_id
+
+
+def _get_disk_usage(path: str) -> int:
+    # NOTE: reflinked copies share their blocks, but are counted in full
+    return sum(os.path.getsize(os.path.join(root, fname))
+               for root, _, fnames in os.walk(path) for fname in fnames)
+
+
+def test_den_fetch_keeps_disk_use_to_object_store(
+        den_with_derivative: LocalFileDen):
+    objects_size = _get_disk_usage(den_with_derivative._objects._folder)
+    base = den_with_derivative.list_available_base_models()[0]
+    deriv = den_with_derivative.list_available_derivative_models(base)[0]
+    den_with_derivative.fetch_model(base)
+    den_with_derivative.fetch_model(deriv)
+    den_size = _get_disk_usage(den_with_derivative._folder_path)
+    registry_size = os.path.getsize(den_with_derivative._sqlite.db_path)
+    assert den_size - registry_size == objects_size
+
+
+def test_den_model_folder_does_not_share_objects(
+        den_with_derivative: LocalFileDen, tmp_path):
+    base = den_with_derivative.list_available_base_models()[0]
+    folder_path = os.path.join(tmp_path, base.model_id)
+    assert den_with_derivative._build_model_folder(base, folder_path)
+    for rel_path, obj_hash in den_with_derivative._sqlite.get_model_files(
+            base.model_id).items():
+        if obj_hash is None:
+            continue
+        path = os.path.join(folder_path, *rel_path.split("/"))
+        with open(path, "ab") as f:
+            f.write(b"changed")
+    for obj_hash in den_with_derivative._objects.list_objects():
+        obj_path = den_with_derivative._objects._get_object_path(obj_hash)
+        assert _hash_file(obj_path) == obj_hash
+
+
+def test_den_delete_keeps_shared_files(den_with_derivative: LocalFileDen):
+    base = den_with_derivative.list_available_base_models()[0]
+    deriv = den_with_derivative.list_available_derivative_models(base)[0]
+    deriv_only = (_get_object_hashes(den_with_derivative, deriv) -
+                  _get_object_hashes(den_with_derivative, base))
+    den_with_derivative.delete_model(deriv)
+    objects = set(den_with_derivative._objects.list_objects())
+    assert objects == _get_object_hashes(den_with_derivative, base)
+    assert not objects & deriv_only
+    model = den_with_derivative.fetch_model(base)
+    assert model.get_model_card(True)["Model ID"] == base.model_id
@@ -0,0 +1,103 @@
+import os
+
+from medcat.cat import CAT
+
+from medcat_den.cache import LoadedModelCache, LocalCache
+from medcat_den.resolver import resolve
+from medcat_den.wrappers import CATWrapper
+
+import pytest
+
+from . import MODEL_PATH
+
+
+class FakeCAT:
+    pass
+
+
+def test_loaded_models_evicts_least_recently_used():
+    cache = LoadedModelCache(max_models=2, max_size=0)
+    cats = [FakeCAT() for _ in range(3)]
+    cache.put("a", cats[0], 10)
+    cache.put("b", cats[1], 10)
+    assert cache.get("a") is cats[0]
+    cache.put("c", cats[2], 10)
+    assert "b" not in cache
+    assert cache.get("a") is cats[0]
+    assert cache.get("c") is cats[2]
+
+
+def test_loaded_models_evicts_by_size():
+    cache = LoadedModelCache(max_models=0, max_size=100)
+    cache.put("a", FakeCAT(), 60)
+    cache.put("b", FakeCAT(), 60)
+    assert "a" not in cache
+    assert cache.total_size == 60
+
+
+def test_loaded_models_keeps_newest_over_size():
+    cache = LoadedModelCache(max_models=0, max_size=100)
+    cache.put("a", FakeCAT(), 60)
+    cache.put("b", FakeCAT(), 200)
+    assert len(cache) == 1
+    assert "b" in cache
+
+
+@pytest.fixture
+def cat() -> CAT:
+    cat = CAT.load_model_pack(MODEL_PATH)
+    cat.config.meta.ontology = ["FAKE-ONT"]
+    return cat
+
+
+@pytest.fixture
+def den_with_cache(cat: CAT, tmp_path: str):
+    den = resolve(local_cache_path=os.path.join(tmp_path, "cache"),
+                  location=os.path.join(tmp_path, "den"),
+                  max_loaded_models=1)
+    den.push_model(cat, "Some Base CAT")
+    return den
+
+
+def test_fetch_reuses_loaded_model(den_with_cache):
+    model_info = den_with_cache.list_available_models()[0]
+    cat1 = den_with_cache.fetch_model(model_info)
+    cat2 = den_with_cache.fetch_model(model_info)
+    assert isinstance(cat1, CATWrapper)
+    assert cat1 is cat2
+
+
+def test_fetch_reuses_unpacked_model(den_with_cache):
+    cache: LocalCache = den_with_cache.cache
+    model_info = den_with_cache.list_available_models()[0]
+    cat1 = den_with_cache.fetch_model(model_info)
+    cache.loaded_models.pop(model_info.model_id)
+    cat2 = den_with_cache.fetch_model(model_info)
+    assert cat1 is not cat2
+    assert isinstance(cat2, CATWrapper)
+    assert cat2._model_info == model_info
+    assert os.path.isdir(cache.get_model_folder(model_info.model_id))
+
+
+def test_delete_removes_from_cache(den_with_cache):
+    cache: LocalCache = den_with_cache.cache
+    model_info = den_with_cache.list_available_models()[0]
+    den_with_cache.fetch_model(model_info)
+    folder = cache.get_model_folder(model_info.model_id)
+    den_with_cache.delete_model(model_info, allow_delete_base_models=True)
+    assert model_info.model_id not in cache
+    assert model_info.model_id not in cache.loaded_models
+    assert not os.path.exists(folder)
+
+
+def test_fetch_caches_model_not_cached(den_with_cache):
+    cache: LocalCache = den_with_cache.cache
+    model_info = den_with_cache.list_available_models()[0]
+    cache.delete(model_info.model_id)
+    cat = den_with_cache.fetch_model(model_info)
+    assert isinstance(cat, CATWrapper)
+    assert model_info.model_id in cache
+    cache.loaded_models.pop(model_info.model_id)
+    cached_cat = den_with_cache.fetch_model(model_info)
+    assert cached_cat._model_info == model_info
+    assert os.path.isdir(cache.get_model_folder(model_info.model_id))
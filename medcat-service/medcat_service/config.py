@@ -26,6 +26,20 @@ class ObservabilitySettings(BaseSettings):
         default=False, description="Enable prometheus metrics collection served on the path /metrics")
 
 
+class MicroBatchingSettings(BaseSettings):
+    model_config = SettingsConfigDict(frozen=True, env_prefix="APP_MICRO_BATCH_")
+
+    enabled: bool = Field(
+        default=True,
+        description="Queue single document requests and process them in small batches off the event loop",
+    )
+    max_size: int = Field(default=16, ge=1, description="The maximum number of documents in a micro batch")
+    max_wait_ms: float = Field(
+        default=5.0, ge=0, description="The time (in ms) to wait for more documents once a micro batch is started"
+    )
+    threads: int = Field(default=1, ge=1, description="The number of micro batches processed at the same time")
+
+
 class Settings(BaseSettings):
     model_config = SettingsConfigDict(
         frozen=True,
@@ -70,12 +84,19 @@ class Settings(BaseSettings):
     # ---- Performance knobs ----
     bulk_nproc: int = Field(8, alias="APP_BULK_NPROC")
     torch_threads: int = Field(-1, alias="APP_TORCH_THREADS")
+    worker_pool_size: int = Field(
+        0,
+        alias="APP_WORKER_POOL_SIZE",
+        description="The number of persistent worker processes (each with the model loaded) used for processing. "
+        "Set to 0 to process within the service process.",
+    )
 
     # ---- Output formatting ----
     # e.g. "dict" | "list" | "json" (service currently uses "dict" default)
     annotations_entity_output_mode: str = Field(default="dict", alias="MEDCAT_ANNOTATIONS_ENTITY_OUTPUT_MODE")
 
     observability: ObservabilitySettings = ObservabilitySettings()
+    micro_batching: MicroBatchingSettings = MicroBatchingSettings()
 
     # ---- Normalizers ---------------------------------------------------------
     @field_validator("app_log_level", "medcat_log_level", mode="before")
@@ -118,3 +139,17 @@ class Settings(BaseSettings):
         if torch.backends.mps.is_available():
             return 1
         return num_procs
+
+    @field_validator("worker_pool_size", mode="before")
+    def adjust_worker_pool_size(cls, num_workers: int) -> int:
+        """Disables the worker pool if MPS (Apple Sillicon) is available, as MPS does not support multiprocessing.
+
+        Args:
+            num_workers (int): number of worker processes requested
+
+        Returns:
+            int: number of worker processes to use
+        """
+        if torch.backends.mps.is_available():
+            return 0
+        return num_workers
@@ -27,6 +27,8 @@ def get_medcat_processor_singleton(settings: Settings) -> MedCatProcessor:
         global _def_medcat_processor
         if _def_medcat_processor is None or _def_medcat_processor[0] != settings:
             log.info("Creating new MedCatProcessor using settings: %s", settings)
+            if _def_medcat_processor is not None:
+                _def_medcat_processor[1].close()
             _def_medcat_processor = (settings, MedCatProcessor(settings))
         return _def_medcat_processor[1]
 
@@ -1,7 +1,11 @@
 #!/usr/bin/env python
 
 import logging
+import math
+import threading
 import time
+from concurrent.futures import Future
+from contextlib import nullcontext
 from datetime import datetime, timezone
 
 import numpy as np
@@ -17,6 +21,7 @@ from medcat.config.config_rel_cat import ConfigRelCAT
 from medcat.vocab import Vocab
 
 from medcat_service.config import Settings
+from medcat_service.nlp_processor.micro_batcher import MicroBatcher
 from medcat_service.types import HealthCheckResponse, ModelCardInfo, ProcessErrorsResult, ProcessResult, ServiceInfo
 
 
@@ -66,8 +71,29 @@ class MedCatProcessor:
 
         self.cat: DeIdModel | CAT = self._create_cat()
 
+        # NOTE: requests are handled off the event loop (i.e on multiple threads)
+        #       so the use of the model within this process is serialised
+        self._model_lock = threading.Lock()
+
         self._is_ready_flag = self._check_medcat_readiness()
 
+        if self.service_settings.worker_pool_size > 0 and isinstance(self.cat, CAT):
+            self.log.info("Starting worker pool with %d workers", self.service_settings.worker_pool_size)
+            # NOTE: the workers get the (pickled) model from this process rather than loading
+            #       the model pack themselves so that they use the CUI filter and config applied
+            #       in `_create_cat`
+            self.cat.start_worker_pool(self.service_settings.worker_pool_size)
+
+        self.micro_batcher: MicroBatcher | None = None
+        batching_settings = self.service_settings.micro_batching
+        if batching_settings.enabled:
+            self.micro_batcher = MicroBatcher(
+                self.process_content_batch,
+                max_batch_size=batching_settings.max_size,
+                max_wait_ms=batching_settings.max_wait_ms,
+                n_threads=batching_settings.threads,
+            )
+
     @staticmethod
     def _get_timestamp() -> str:
         """
@@ -105,6 +131,14 @@ class MedCatProcessor:
                 status="DOWN"
             )
 
+    def close(self) -> None:
+        """Stops the micro batching and the worker pool (if any)."""
+        if self.micro_batcher is not None:
+            self.micro_batcher.stop()
+            self.micro_batcher = None
+        if isinstance(self.cat, CAT):
+            self.cat.shutdown_worker_pool()
+
     def get_app_info(self) -> ServiceInfo:
         """Returns general information about the application.
 
@@ -165,17 +199,87 @@ class MedCatProcessor:
 
         start_time_ns = time.time_ns()
 
-        if self.service_settings.deid_mode and isinstance(self.cat, DeIdModel):
-            entities = self.cat.get_entities(text)
-            text = self.cat.deid_text(text, redact=self.service_settings.deid_redact)
-        else:
-            if text is not None and len(text.strip()) > 0:
+        with self._model_lock:
+            if self.service_settings.deid_mode and isinstance(self.cat, DeIdModel):
                 entities = self.cat.get_entities(text)
+                text = self.cat.deid_text(text, redact=self.service_settings.deid_redact)
             else:
-                entities = []
+                if text is not None and len(text.strip()) > 0:
+                    entities = self.cat.get_entities(text)
+                else:
+                    entities = []
+
+        elapsed_time = (time.time_ns() - start_time_ns) / 10e8  # nanoseconds to seconds
+
+        return self._create_result(content, text, entities, elapsed_time, **kwargs)
+
+    def process_content_batch(self, items):
+        """Processes a batch of single documents (e.g as queued by the micro batcher) extracting the annotations.
+
+        Unlike `process_content_bulk`, each document keeps its own meta annotation filters and the
+        results are the same as processing each document with `process_content`.
+
+        Since the documents are processed together, the time taken per document is not known. The
+        `elapsed_time` of each result is therefore the document's share of the batch, i.e. the time
+        taken for the whole batch divided by the number of documents in the batch.
+
+        Args:
+            items (list): List of (content, meta_anns_filters) pairs, where the content is the document
+                to be processed, containing "text" field.
+
+        Returns:
+            list: Processing results, one per input document.
+        """
+        if self.service_settings.deid_mode or not isinstance(self.cat, CAT):
+            return [self.process_content(content, meta_anns_filters=meta_anns_filters)
+                    for content, meta_anns_filters in items]
+
+        start_time_ns = time.time_ns()
+
+        texts = [(str(i), content["text"]) for i, (content, _) in enumerate(items)
+                 if content.get("text") is not None and len(content["text"].strip()) > 0]
+        worker_pool = self.cat.worker_pool
+        n_workers = worker_pool.n_workers if worker_pool is not None else 1
+        # NOTE: with a worker pool, nothing is processed within this process. And since
+        #       MedCAT only uses the pool for multiple processes, this needs to be more
+        #       than 1 even if there is only a single worker in the pool
+        n_process = max(n_workers, 2) if worker_pool is not None else 1
+        with self._model_lock if worker_pool is None else nullcontext():
+            ann_res = dict(self.cat.get_entities_multi_texts(
+                texts, n_process=n_process, batch_size=max(1, math.ceil(len(texts) / n_workers)),
+                batch_size_chars=-1))
 
         elapsed_time = (time.time_ns() - start_time_ns) / 10e8  # nanoseconds to seconds
+        elapsed_time_per_doc = elapsed_time / len(items) if items else 0.0
 
+        results = []
+        for i, (content, meta_anns_filters) in enumerate(items):
+            if "text" not in content:
+                results.append(self.process_content(content))
+                continue
+            results.append(self._create_result(content, content["text"], ann_res.get(str(i), []),
+                                               elapsed_time_per_doc, meta_anns_filters=meta_anns_filters))
+        return results
+
+    def submit_content(self, content, meta_anns_filters=None) -> Future:
+        """Queues a single document to be processed as part of a micro batch.
+
+        Args:
+            content (dict): Document to be processed, containing "text" field.
+            meta_anns_filters (List[Tuple[str, List[str]]]): The meta annotation filters
+                (see `process_content`).
+
+        Returns:
+            Future: The future for the processing result.
+
+        Raises:
+            ValueError: If micro batching is not enabled.
+        """
+        if self.micro_batcher is None:
+            raise ValueError("Micro batching is not enabled")
+        return self.micro_batcher.submit((content, meta_anns_filters))
+
+    def _create_result(self, content, text, entities, elapsed_time, **kwargs):
         meta_anns_filters = kwargs.get("meta_anns_filters")
         if meta_anns_filters:
             if isinstance(entities, dict):
@@ -219,23 +323,12 @@ class MedCatProcessor:
 
         start_time_ns = time.time_ns()
 
-        try:
-
-            text_input = MedCatProcessor._generate_input_doc(content, invalid_doc_ids)
-            if self.service_settings.deid_mode and isinstance(self.cat, DeIdModel):
-                text_to_deid_from_tuple = (x[1] for x in text_input)
+        uses_worker_pool = (isinstance(self.cat, CAT) and self.cat.worker_pool is not None
+                            and self.service_settings.bulk_nproc > 1)
 
-                ann_res = self.cat.deid_multi_texts(
-                    list(text_to_deid_from_tuple),
-                    redact=self.service_settings.deid_redact,
-                    n_process=self.service_settings.bulk_nproc,
-                )
-            elif isinstance(self.cat, CAT):
-                ann_res = {
-                    ann_id: res for ann_id, res in
-                    self.cat.get_entities_multi_texts(
-                        text_input, n_process=self.service_settings.bulk_nproc)
-                }
+        try:
+            with self._model_lock if not uses_worker_pool else nullcontext():
+                ann_res = self._get_bulk_annotations(content, invalid_doc_ids)
         except Exception as e:
             self.log.error("Unable to process data", exc_info=e)
 
@@ -243,6 +336,25 @@ class MedCatProcessor:
 
         return self._generate_result(content, ann_res, elapsed_time)
 
+    def _get_bulk_annotations(self, content, invalid_doc_ids):
+        ann_res = {}
+        text_input = MedCatProcessor._generate_input_doc(content, invalid_doc_ids)
+        if self.service_settings.deid_mode and isinstance(self.cat, DeIdModel):
+            text_to_deid_from_tuple = (x[1] for x in text_input)
+
+            ann_res = self.cat.deid_multi_texts(
+                list(text_to_deid_from_tuple),
+                redact=self.service_settings.deid_redact,
+                n_process=self.service_settings.bulk_nproc,
+            )
+        elif isinstance(self.cat, CAT):
+            ann_res = {
+                ann_id: res for ann_id, res in
+                self.cat.get_entities_multi_texts(
+                    text_input, n_process=self.service_settings.bulk_nproc)
+            }
+        return ann_res
+
     def _populate_model_card_info(self, config: Config) -> None:
         """Populates model card information from config.
 
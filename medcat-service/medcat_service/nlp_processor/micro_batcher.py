@@ -0,0 +1,139 @@
+import logging
+import queue
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import Future
+from typing import Generic, TypeVar
+
+log = logging.getLogger(__name__)
+
+ItemT = TypeVar("ItemT")
+ResultT = TypeVar("ResultT")
+
+# NOTE: put onto the queue to stop a batching thread
+_STOP = object()
+
+
+class MicroBatcher(Generic[ItemT, ResultT]):
+    """Collects individually submitted items into small batches.
+
+    Items are queued and picked up by dedicated batching thread(s). A batch is
+    started with the first item available and is then filled with any items
+    that arrive within `max_wait_ms` (up to `max_batch_size` items). The whole
+    batch is then processed in one go on the batching thread.
+
+    Since the processing happens on the batching threads, callers on an event loop
+    can simply await the returned future (e.g via `asyncio.wrap_future`) without
+    blocking the loop.
+
+    Args:
+        process_batch (Callable[[list[ItemT]], list[ResultT]]): The function to process
+            a batch. Needs to return one result per item, in the same order.
+        max_batch_size (int): The maximum number of items in a batch.
+        max_wait_ms (float): The maximum time (in milliseconds) to wait for more items
+            after the first item of the batch was picked up.
+        n_threads (int): The number of batching threads (i.e batches processed at once).
+    """
+
+    def __init__(
+        self,
+        process_batch: Callable[[list[ItemT]], list[ResultT]],
+        max_batch_size: int = 16,
+        max_wait_ms: float = 5.0,
+        n_threads: int = 1,
+    ):
+        if max_batch_size < 1:
+            raise ValueError(f"Batch size needs to be at least 1, got {max_batch_size}")
+        if n_threads < 1:
+            raise ValueError(f"Need at least 1 batching thread, got {n_threads}")
+        self._process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self._queue: queue.Queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._stopped = False
+        self._threads = [
+            threading.Thread(target=self._run, name=f"micro-batcher-{thread_nr}", daemon=True)
+            for thread_nr in range(n_threads)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, item: ItemT) -> Future:
+        """Queue an item to be processed as part of a batch.
+
+        Args:
+            item (ItemT): The item to process.
+
+        Returns:
+            Future: The future for the result of the item.
+
+        Raises:
+            RuntimeError: If the batcher has been stopped.
+        """
+        future: Future = Future()
+        with self._lock:
+            if self._stopped:
+                raise RuntimeError("Unable to submit to a stopped micro batcher")
+            self._queue.put((item, future))
+        return future
+
+    def stop(self, timeout: float | None = None) -> None:
+        """Stop the batching threads once the already queued items have been processed.
+
+        Args:
+            timeout (float | None): The time (in seconds) to wait for each thread.
+        """
+        with self._lock:
+            if self._stopped:
+                return
+            self._stopped = True
+            for _ in self._threads:
+                self._queue.put(_STOP)
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def _collect_batch(self, first: tuple[ItemT, Future]) -> tuple[list[tuple[ItemT, Future]], bool]:
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait_ms / 1000
+        while len(batch) < self.max_batch_size:
+            try:
+                remaining = deadline - time.monotonic()
+                entry = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if entry is _STOP:
+                return batch, True
+            batch.append(entry)
+        return batch, False
+
+    def _run(self) -> None:
+        stop = False
+        while not stop:
+            first = self._queue.get()
+            if first is _STOP:
+                break
+            batch, stop = self._collect_batch(first)
+            # NOTE: futures cancelled in the mean time are not processed
+            batch = [(item, future) for item, future in batch if future.set_running_or_notify_cancel()]
+            if batch:
+                self._handle(batch)
+
+    def _handle(self, batch: list[tuple[ItemT, Future]]) -> None:
+        log.debug("Processing micro batch of %d items", len(batch))
+        try:
+            results = self._process_batch([item for item, _ in batch])
+            if len(results) != len(batch):
+                raise ValueError(f"Got {len(results)} results for a batch of {len(batch)}")
+        except Exception as e:
+            if len(batch) == 1:
+                batch[0][1].set_exception(e)
+                return
+            # NOTE: process one by one so that a single bad item doesn't fail the rest
+            log.warning("Unable to process micro batch of %d items, processing one at a time", len(batch), exc_info=e)
+            for entry in batch:
+                self._handle([entry])
+            return
+        for (_, future), result in zip(batch, results, strict=True):
+            future.set_result(result)
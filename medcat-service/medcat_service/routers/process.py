@@ -1,7 +1,9 @@
+import asyncio
 import logging
 from typing import Annotated, Union
 
 from fastapi import APIRouter, Body
+from fastapi.concurrency import run_in_threadpool
 from fastapi.exceptions import RequestValidationError
 from pydantic import ValidationError
 
@@ -46,6 +48,9 @@ async def process(
 ) -> ProcessAPIResponse:
     """
     Returns the annotations extracted from a provided single document
+
+    The document is queued and processed (along with other concurrent requests) in a micro batch
+    outside the event loop, so other requests are not blocked while it is being processed.
     """
     try:
         if isinstance(payload, ProcessAPIInput):
@@ -60,7 +65,12 @@ async def process(
                 log.error("Invalid payload", exc_info=ve)
                 raise RequestValidationError(errors=ve.errors())
 
-        process_result = medcat_processor.process_content(content, meta_anns_filters=meta_filters)
+        if medcat_processor.micro_batcher is not None:
+            process_result = await asyncio.wrap_future(
+                medcat_processor.submit_content(content, meta_anns_filters=meta_filters))
+        else:
+            process_result = await run_in_threadpool(
+                medcat_processor.process_content, content, meta_anns_filters=meta_filters)
         app_info = medcat_processor.get_app_info()
         return ProcessAPIResponse(result=process_result, medcat_info=app_info)
     except Exception as e:
@@ -74,7 +84,8 @@ async def process_bulk(payload: BulkProcessAPIInput, medcat_processor: MedCatPro
     Returns the annotations extracted from the provided set of documents
     """
     try:
-        result = list(medcat_processor.process_content_bulk(payload.model_dump()["content"]))
+        content = payload.model_dump()["content"]
+        result = await run_in_threadpool(lambda: list(medcat_processor.process_content_bulk(content)))
         app_info = medcat_processor.get_app_info()
         return BulkProcessAPIResponse(result=result, medcat_info=app_info)
     except Exception as e:
@@ -1,8 +1,17 @@
+import os
+import tempfile
 import unittest
+from unittest.mock import patch
 
 from medcat_service.config import Settings
-from medcat_service.nlp_processor import MedCatProcessor
-from medcat_service.test.common import setup_medcat_processor
+from medcat_service.nlp_processor import MedCatProcessor, medcat_processor
+from medcat_service.test.common import (
+    get_blank_documents,
+    get_example_long_document,
+    get_example_short_document,
+    setup_medcat_processor,
+)
+from medcat_service.types import ProcessErrorsResult
 
 
 class TestMedCatProcessorReadiness(unittest.TestCase):
@@ -20,5 +29,97 @@ class TestMedCatProcessorReadiness(unittest.TestCase):
         self.assertFalse(result)
 
 
+class TestMedCatProcessorContentBatch(unittest.TestCase):
+    TEXTS = [get_example_short_document(), get_example_long_document(), get_blank_documents()[0]]
+
+    @classmethod
+    def setUpClass(cls):
+        setup_medcat_processor()
+        cls.processor = MedCatProcessor(Settings())
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.processor.close()
+
+    def test_same_as_single_documents(self):
+        results = self.processor.process_content_batch([({"text": text}, None) for text in self.TEXTS])
+        self.assertEqual(len(results), len(self.TEXTS))
+        for text, result in zip(self.TEXTS, results, strict=True):
+            with self.subTest(text):
+                exp = self.processor.process_content({"text": text})
+                self.assertEqual(result.text, exp.text)
+                self.assertEqual(result.annotations, exp.annotations)
+
+    def test_applies_meta_anns_filters_per_document(self):
+        text = get_example_short_document()
+        results = self.processor.process_content_batch([
+            ({"text": text}, [("Presence", ["No such value"])]),
+            ({"text": text}, None),
+        ])
+        self.assertEqual(results[0].annotations, [[]])
+        self.assertGreater(len(results[1].annotations[0]), 0)
+
+    def test_missing_text_does_not_fail_others(self):
+        results = self.processor.process_content_batch([
+            ({"bad_request": "NA"}, None),
+            ({"text": get_example_short_document()}, None),
+        ])
+        self.assertIsInstance(results[0], ProcessErrorsResult)
+        self.assertTrue(results[1].success)
+        self.assertGreater(len(results[1].annotations[0]), 0)
+
+    def test_splits_elapsed_time_over_documents(self):
+        with patch.object(medcat_processor, "time") as mock_time:
+            # 3 seconds for the entire batch
+            mock_time.time_ns.side_effect = [0, 3 * 10 ** 9]
+            results = self.processor.process_content_batch([({"text": text}, None) for text in self.TEXTS])
+        for result in results:
+            self.assertAlmostEqual(result.elapsed_time, 1.0)
+
+
+class TestMedCatProcessorWorkerPool(unittest.TestCase):
+    TEXTS = [get_example_short_document(), get_example_long_document()]
+
+    @classmethod
+    def setUpClass(cls):
+        setup_medcat_processor()
+        unfiltered = MedCatProcessor(Settings())
+        results = unfiltered.process_content_batch([({"text": text}, None) for text in cls.TEXTS])
+        unfiltered.close()
+        all_cuis = sorted({ent["cui"] for result in results for ent in result.annotations[0].values()})
+        # NOTE: only keep some of the concepts the unfiltered model finds
+        cls.cuis_to_keep = all_cuis[::2]
+        cls.removed_cuis = set(all_cuis) - set(cls.cuis_to_keep)
+        cls._tmp_dir = tempfile.TemporaryDirectory()
+        cui_filter_path = os.path.join(cls._tmp_dir.name, "cui_filter.txt")
+        with open(cui_filter_path, "w") as cui_file:
+            cui_file.write("\n".join(cls.cuis_to_keep))
+        cls.processor = MedCatProcessor(Settings(worker_pool_size=1, model_cui_filter_path=cui_filter_path))
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.processor.close()
+        cls._tmp_dir.cleanup()
+
+    def _process_batch(self):
+        return self.processor.process_content_batch([({"text": text}, None) for text in self.TEXTS])
+
+    def test_uses_worker_pool_with_single_worker(self):
+        self.assertIsNotNone(self.processor.cat.worker_pool)
+        with patch.object(self.processor.cat, "_mp_worker_func") as in_process:
+            self._process_batch()
+        in_process.assert_not_called()
+
+    def test_worker_pool_uses_cui_filter(self):
+        self.assertTrue(self.removed_cuis)
+        results = self._process_batch()
+        for text, result in zip(self.TEXTS, results, strict=True):
+            with self.subTest(text):
+                cuis = {ent["cui"] for ent in result.annotations[0].values()}
+                self.assertTrue(cuis)
+                self.assertFalse(cuis & self.removed_cuis)
+                self.assertEqual(result.annotations, self.processor.process_content({"text": text}).annotations)
+
+
 if __name__ == "__main__":
     unittest.main()
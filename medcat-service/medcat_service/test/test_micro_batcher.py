@@ -0,0 +1,76 @@
+import asyncio
+import threading
+import time
+import unittest
+
+from medcat_service.nlp_processor.micro_batcher import MicroBatcher
+
+
+class TestMicroBatcher(unittest.TestCase):
+    def setUp(self):
+        self.batches = []
+        self.release = threading.Event()
+        self.release.set()
+
+    def tearDown(self):
+        self.release.set()
+        self.batcher.stop(timeout=5)
+
+    def _process(self, items):
+        self.release.wait(5)
+        self.batches.append(list(items))
+        if "fail" in items:
+            raise ValueError("Failed batch")
+        return [item.upper() for item in items]
+
+    def test_processes_single_item(self):
+        self.batcher = MicroBatcher(self._process, max_batch_size=4, max_wait_ms=1)
+        self.assertEqual(self.batcher.submit("a").result(timeout=5), "A")
+
+    def test_batches_queued_items(self):
+        self.batcher = MicroBatcher(self._process, max_batch_size=4, max_wait_ms=50)
+        # NOTE: hold the first batch so the rest gets queued in the mean time
+        self.release.clear()
+        first = self.batcher.submit("first")
+        time.sleep(0.1)
+        futures = [self.batcher.submit(f"item{nr}") for nr in range(6)]
+        self.release.set()
+        self.assertEqual(first.result(timeout=5), "FIRST")
+        self.assertEqual([future.result(timeout=5) for future in futures], [f"ITEM{nr}" for nr in range(6)])
+        self.assertEqual([len(batch) for batch in self.batches], [1, 4, 2])
+
+    def test_failing_item_does_not_fail_batch(self):
+        self.batcher = MicroBatcher(self._process, max_batch_size=4, max_wait_ms=50)
+        self.release.clear()
+        self.batcher.submit("first")
+        time.sleep(0.1)
+        good = self.batcher.submit("good")
+        bad = self.batcher.submit("fail")
+        self.release.set()
+        self.assertEqual(good.result(timeout=5), "GOOD")
+        with self.assertRaises(ValueError):
+            bad.result(timeout=5)
+
+    def test_does_not_block_event_loop(self):
+        self.batcher = MicroBatcher(self._process, max_batch_size=4, max_wait_ms=1)
+        self.release.clear()
+
+        async def run():
+            pending = asyncio.wrap_future(self.batcher.submit("slow"))
+            # the loop can still do other work while the item is processed
+            await asyncio.sleep(0.05)
+            self.assertFalse(pending.done())
+            self.release.set()
+            return await pending
+
+        self.assertEqual(asyncio.run(run()), "SLOW")
+
+    def test_cannot_submit_after_stop(self):
+        self.batcher = MicroBatcher(self._process)
+        self.batcher.stop(timeout=5)
+        with self.assertRaises(RuntimeError):
+            self.batcher.submit("a")
+
+
+if __name__ == "__main__":
+    unittest.main()
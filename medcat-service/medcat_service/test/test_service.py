@@ -2,6 +2,7 @@
 
 import logging
 import unittest
+from concurrent.futures import ThreadPoolExecutor
 
 from fastapi.testclient import TestClient
 
@@ -107,6 +108,24 @@ class TestMedcatService(unittest.TestCase):
             data = response.json()
             self.assertEqual(len(data["result"]["annotations"][0]), 0)
 
+    def testProcessSingleConcurrentDocs(self):
+        # NOTE: concurrent requests are processed in micro batches
+        docs = [common.get_example_short_document(), common.get_example_long_document()] * 4
+
+        def post(doc):
+            payload = common.create_payload_content_from_doc_single(doc)
+            return self.client.post(self.ENDPOINT_PROCESS_SINGLE, json=payload)
+
+        with ThreadPoolExecutor(max_workers=len(docs)) as executor:
+            responses = list(executor.map(post, docs))
+
+        for doc, response in zip(docs, responses, strict=True):
+            self.assertEqual(response.status_code, 200)
+            result = response.json()["result"]
+            self.assertEqual(result["text"], doc)
+            self.assertGreater(len(result["annotations"][0]), 0)
+            self.assertGreaterEqual(result["elapsed_time"], 0)
+
     def testProcessBadRequest(self):
         payload = {"content": {"bad_request": "NA"}}
         response = self.client.post(self.ENDPOINT_PROCESS_SINGLE, json=payload)
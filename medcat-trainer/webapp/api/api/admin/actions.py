@@ -3,11 +3,11 @@ import json
 import logging
 from datetime import datetime
 from io import StringIO
-from typing import Dict, List
+from typing import Any, Dict, IO, Iterable, Iterator, List
 
 from background_task import background
-from django.db.models import QuerySet
-from django.http import HttpResponse
+from django.db.models import Prefetch, QuerySet
+from django.http import HttpResponse, StreamingHttpResponse
 from rest_framework.exceptions import PermissionDenied
 
 from api.models import AnnotatedEntity, MetaAnnotation, EntityRelation, Document, ConceptDB
@@ -20,6 +20,9 @@ logger = logging.getLogger(__name__)
 
 _dt_fmt = '%Y-%m-%d %H:%M:%S.%f'
 
+# the number of documents (and their annotations / relations) held in memory at once during export
+EXPORT_DOC_CHUNK_SIZE = 100
+
 
 def reset_project(modeladmin, request, queryset):
     if not request.user.is_staff:
@@ -127,14 +130,9 @@ def download(modeladmin, request, queryset):
 
 
 def download_projects_with_text(projects: QuerySet):
-    all_projects = retrieve_project_data(projects)
-
-    sio = StringIO()
-    json.dump(all_projects, sio)
-    sio.seek(0)
-
     f_name = "MedCAT_Export_With_Text_{}.json".format(datetime.now().strftime('%Y-%m-%d:%H:%M:%S'))
-    response = HttpResponse(sio, content_type='text/json')
+    # the export is streamed as it's generated so memory use does not grow with the size of the projects
+    response = StreamingHttpResponse(iter_project_data_json(projects), content_type='text/json')
     response['Content-Disposition'] = 'attachment; filename={}'.format(f_name)
 
     return response
@@ -237,97 +235,166 @@ def retrieve_project_data(projects: QuerySet) -> Dict[str, List]:
     """
     all_projects = {'projects': []}
     for project in projects:
-        out = {}
-        out['name'] = project.name
-        out['id'] = project.id
-        out['cuis'] = project.cuis
-        out['project_group_id'] = project.group.id if project.group else None
-        out['project_group_name'] = project.group.name if project.group else None
-        out['project_status'] = project.project_status
-        out['project_locked'] = project.project_locked
-        out['meta_anno_defs'] = [{'name': t.name, 'values': [v.name for v in t.values.all()]}
-                                 for t in project.tasks.all()]
-        out['relation_anno_defs'] = [r.label for r in project.relations.all()]
+        out = _project_header(project)
+        out['documents'] = list(_iter_project_documents(project))
+        all_projects['projects'].append(out)
+    return all_projects
+
+
+def iter_project_data_json(projects: QuerySet, chunk_size: int = EXPORT_DOC_CHUNK_SIZE) -> Iterator[str]:
+    """
+    Incrementally generates the JSON export of the projects, i.e. the same output as `json.dumps` of
+    `retrieve_project_data`, without ever holding more than `chunk_size` documents in memory.
+
+    Args:
+        projects (QuerySet): the projects to export data for.
+        chunk_size (int): the number of documents to fetch (along with their annotations) at once.
+
+    Yields:
+        str: consecutive parts of the JSON output.
+    """
+    yield '{"projects": ['
+    for project_num, project in enumerate(projects):
+        out = _project_header(project)
         out['documents'] = []
+        header = json.dumps(out)
+        # NOTE: 'documents' is the last key, so the documents are written in place of the empty list
+        yield (', ' if project_num else '') + header[:-len('[]}')] + '['
+        for doc_num, out_doc in enumerate(_iter_project_documents(project, chunk_size)):
+            yield (', ' if doc_num else '') + json.dumps(out_doc)
+        yield ']}'
+    yield ']}'
 
-        if project.cuis_file is not None and project.cuis_file:
-            # Add cuis from json file if it exists
-            cuis_from_file = ",".join(json.load(open(project.cuis_file.path)))
-            all_cuis = out['cuis'] + "," + cuis_from_file if len(out['cuis']) > 0 else cuis_from_file
-            out['cuis'] = all_cuis
 
-        for doc in project.validated_documents.all():
+def write_project_data(projects: QuerySet, out_file: IO[str], chunk_size: int = EXPORT_DOC_CHUNK_SIZE):
+    """
+    Writes the JSON export of the projects to a file (see `iter_project_data_json`).
+
+    Args:
+        projects (QuerySet): the projects to export data for.
+        out_file (IO[str]): the (text) file to write to.
+        chunk_size (int): the number of documents to fetch (along with their annotations) at once.
+    """
+    for part in iter_project_data_json(projects, chunk_size):
+        out_file.write(part)
+
+
+def _project_header(project) -> Dict[str, Any]:
+    out = {}
+    out['name'] = project.name
+    out['id'] = project.id
+    out['cuis'] = project.cuis
+    out['project_group_id'] = project.group.id if project.group else None
+    out['project_group_name'] = project.group.name if project.group else None
+    out['project_status'] = project.project_status
+    out['project_locked'] = project.project_locked
+    out['meta_anno_defs'] = [{'name': t.name, 'values': [v.name for v in t.values.all()]}
+                             for t in project.tasks.prefetch_related('values')]
+    out['relation_anno_defs'] = [r.label for r in project.relations.all()]
+
+    if project.cuis_file is not None and project.cuis_file:
+        # Add cuis from json file if it exists
+        with open(project.cuis_file.path) as f:
+            cuis_from_file = ",".join(json.load(f))
+        all_cuis = out['cuis'] + "," + cuis_from_file if len(out['cuis']) > 0 else cuis_from_file
+        out['cuis'] = all_cuis
+    return out
+
+
+def _chunked(items: Iterable, chunk_size: int) -> Iterator[list]:
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _iter_project_documents(project, chunk_size: int = EXPORT_DOC_CHUNK_SIZE) -> Iterator[Dict[str, Any]]:
+    # NOTE: the documents are fetched in chunks, along with all the annotations, meta annotations and
+    #       relations of each chunk in bulk queries, rather than querying these for each document / annotation
+    docs = project.validated_documents.all().iterator(chunk_size=chunk_size)
+    for doc_chunk in _chunked(docs, chunk_size):
+        doc_ids = [doc.id for doc in doc_chunk]
+        anns_per_doc: Dict[int, list] = {doc_id: [] for doc_id in doc_ids}
+        anns = AnnotatedEntity.objects.filter(project=project, document_id__in=doc_ids)\
+            .select_related('user', 'entity')\
+            .prefetch_related(Prefetch('metaannotation_set',
+                                       queryset=MetaAnnotation.objects.select_related('meta_task', 'meta_task_value')
+                                       .order_by('id')))
+        for ann in anns:
+            anns_per_doc[ann.document_id].append(ann)
+        rels_per_doc: Dict[int, list] = {doc_id: [] for doc_id in doc_ids}
+        rels = EntityRelation.objects.filter(project=project, document_id__in=doc_ids)\
+            .select_related('user', 'relation', 'start_entity__entity', 'end_entity__entity')
+        for rel in rels:
+            rels_per_doc[rel.document_id].append(rel)
+
+        for doc in doc_chunk:
             out_doc = {}
             out_doc['id'] = doc.id
             out_doc['name'] = doc.name
             out_doc['text'] = doc.text
             out_doc['last_modified'] = doc.last_modified.strftime(_dt_fmt)
-            out_doc['annotations'] = []
-
-            anns = AnnotatedEntity.objects.filter(project=project, document=doc)
-
-            for ann in anns:
-                out_ann = {}
-                out_ann['id'] = ann.id
-                out_ann['user'] = ann.user.username
-                out_ann['cui'] = ann.entity.label
-                out_ann['value'] = ann.value
-                out_ann['start'] = ann.start_ind
-                out_ann['end'] = ann.end_ind
-                out_ann['validated'] = ann.validated
-                out_ann['correct'] = ann.correct
-                out_ann['deleted'] = ann.deleted
-                out_ann['alternative'] = ann.alternative
-                out_ann['killed'] = ann.killed
-                out_ann['irrelevant'] = ann.irrelevant
-                out_ann['create_time'] = ann.create_time.strftime(_dt_fmt)
-                out_ann['last_modified'] = ann.last_modified.strftime(_dt_fmt)
-                out_ann['comment'] = ann.comment
-                out_ann['manually_created'] = ann.manually_created
-                out_ann['acc'] = ann.acc
-                out_ann['meta_anns'] = {}
-
-                # Get MetaAnnotations
-                meta_anns = MetaAnnotation.objects.filter(annotated_entity=ann)
-                for meta_ann in meta_anns:
-                    o_meta_ann = {}
-                    o_meta_ann['name'] = meta_ann.meta_task.name
-                    o_meta_ann['value'] = meta_ann.meta_task_value.name
-                    o_meta_ann['acc'] = meta_ann.acc
-                    o_meta_ann['validated'] = meta_ann.validated
-
-                    # Add annotation
-                    key = meta_ann.meta_task.name
-                    out_ann['meta_anns'][key] = o_meta_ann
-
-                out_doc['annotations'].append(out_ann)
-
+            out_doc['annotations'] = [_annotation_to_dict(ann) for ann in anns_per_doc[doc.id]]
             # Add relations if they exist
-            rels = EntityRelation.objects.filter(project=project, document=doc)
-            out_rels = []
-            out_rel = {}
-            for rel in rels:
-                out_rel['start_entity'] = rel.start_entity.id
-                out_rel['start_entity_cui'] = rel.start_entity.entity.label
-                out_rel['start_entity_value'] = rel.start_entity.value
-                out_rel['start_entity_start_idx'] = rel.start_entity.start_ind
-                out_rel['start_entity_end_idx'] = rel.start_entity.end_ind
-                out_rel['end_entity'] = rel.end_entity.id
-                out_rel['end_entity_cui'] = rel.end_entity.entity.label
-                out_rel['end_entity_value'] = rel.end_entity.value
-                out_rel['end_entity_start_idx'] = rel.end_entity.start_ind
-                out_rel['end_entity_end_idx'] = rel.end_entity.end_ind
-                out_rel['user'] = rel.user.username
-                out_rel['relation'] = rel.relation.label
-                out_rel['validated'] = rel.validated
-
-                out_rels.append(out_rel)
-                out_rel = {}
-            out_doc['relations'] = out_rels
-
-            out['documents'].append(out_doc)
-        all_projects['projects'].append(out)
-    return all_projects
+            out_doc['relations'] = [_relation_to_dict(rel) for rel in rels_per_doc[doc.id]]
+            yield out_doc
+
+
+def _annotation_to_dict(ann: AnnotatedEntity) -> Dict[str, Any]:
+    out_ann = {}
+    out_ann['id'] = ann.id
+    out_ann['user'] = ann.user.username
+    out_ann['cui'] = ann.entity.label
+    out_ann['value'] = ann.value
+    out_ann['start'] = ann.start_ind
+    out_ann['end'] = ann.end_ind
+    out_ann['validated'] = ann.validated
+    out_ann['correct'] = ann.correct
+    out_ann['deleted'] = ann.deleted
+    out_ann['alternative'] = ann.alternative
+    out_ann['killed'] = ann.killed
+    out_ann['irrelevant'] = ann.irrelevant
+    out_ann['create_time'] = ann.create_time.strftime(_dt_fmt)
+    out_ann['last_modified'] = ann.last_modified.strftime(_dt_fmt)
+    out_ann['comment'] = ann.comment
+    out_ann['manually_created'] = ann.manually_created
+    out_ann['acc'] = ann.acc
+    out_ann['meta_anns'] = {}
+
+    # MetaAnnotations (prefetched)
+    for meta_ann in ann.metaannotation_set.all():
+        o_meta_ann = {}
+        o_meta_ann['name'] = meta_ann.meta_task.name
+        o_meta_ann['value'] = meta_ann.meta_task_value.name
+        o_meta_ann['acc'] = meta_ann.acc
+        o_meta_ann['validated'] = meta_ann.validated
+
+        # Add annotation
+        key = meta_ann.meta_task.name
+        out_ann['meta_anns'][key] = o_meta_ann
+    return out_ann
+
+
+def _relation_to_dict(rel: EntityRelation) -> Dict[str, Any]:
+    out_rel = {}
+    out_rel['start_entity'] = rel.start_entity.id
+    out_rel['start_entity_cui'] = rel.start_entity.entity.label
+    out_rel['start_entity_value'] = rel.start_entity.value
+    out_rel['start_entity_start_idx'] = rel.start_entity.start_ind
+    out_rel['start_entity_end_idx'] = rel.start_entity.end_ind
+    out_rel['end_entity'] = rel.end_entity.id
+    out_rel['end_entity_cui'] = rel.end_entity.entity.label
+    out_rel['end_entity_value'] = rel.end_entity.value
+    out_rel['end_entity_start_idx'] = rel.end_entity.start_ind
+    out_rel['end_entity_end_idx'] = rel.end_entity.end_ind
+    out_rel['user'] = rel.user.username
+    out_rel['relation'] = rel.relation.label
+    out_rel['validated'] = rel.validated
+    return out_rel
 
 
 def clone_projects(modeladmin, request, queryset):
@@ -32,4 +32,12 @@ class ApiConfig(AppConfig):
                             except Exception as e:
                                 logger.error("Failed to re-submit doc on startup with exception %s", e)
                     logger.info("Finished resubmitting Project %s", project.name)
+        preload_projects = os.environ.get('PRELOAD_MEDCAT_PROJECTS', None)
+        if preload_projects:
+            # NOTE: models loaded here, before the app server forks its workers, are shared (copy-on-write)
+            #       by the workers rather than each worker loading its own copy
+            from api.model_cache import prewarm_models
+            logger.info('Found env var PRELOAD_MEDCAT_PROJECTS, pre-warming models for projects: %s',
+                        preload_projects)
+            prewarm_models(preload_projects)
         logger.info("MedCATTrainer App API ready...")
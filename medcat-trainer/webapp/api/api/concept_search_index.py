@@ -0,0 +1,227 @@
+"""
+A local (in-process) concept search index, an alternative to the Solr concept search service.
+
+Each CDB gets an SQLite file with the concepts along with an inverted index of the normalised names and
+name tokens of each concept. Since the names / tokens are stored in B-tree indices, prefix (typeahead)
+queries are range scans that do not need an external service.
+
+Results are ranked by how well a name matches the query:
+    -1: the query is the CUI
+     0: the query is one of the names of the concept
+     1: one of the names starts with the query
+     2: every query token is a prefix of a token in one of the names
+and then by the concept `count_train` and the length of the pretty name.
+"""
+import json
+import logging
+import os
+import re
+import sqlite3
+from typing import List, Dict, Iterable
+
+from django.http import HttpResponseServerError
+from medcat.cdb import CDB
+from rest_framework.response import Response
+
+from api.models import ConceptDB
+from core.settings import CONCEPT_SEARCH_INDEX_DIR
+
+logger = logging.getLogger(__name__)
+
+# the number of concepts written to the index in a single transaction
+_IMPORT_BATCH_SIZE = 5000
+# the number of results per CDB, as with the solr search
+_MAX_RESULTS = 15
+# upper bound for prefix range scans
+_PREFIX_END = '\U0010ffff'
+_RESULT_COLUMNS = 'c.cui, c.pretty_name, c.type_ids, c.synonyms, c.count_train'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS concepts (
+    cui TEXT PRIMARY KEY,
+    pretty_name TEXT NOT NULL,
+    type_ids TEXT NOT NULL,
+    synonyms TEXT NOT NULL,
+    count_train INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS names (name TEXT NOT NULL, cui TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS tokens (token TEXT NOT NULL, cui TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS names_name ON names (name, cui);
+CREATE INDEX IF NOT EXISTS names_cui ON names (cui);
+CREATE INDEX IF NOT EXISTS tokens_token ON tokens (token, cui);
+CREATE INDEX IF NOT EXISTS tokens_cui ON tokens (cui);
+"""
+
+
+def _index_name(cdb_model: ConceptDB) -> str:
+    return f'{cdb_model.name}_id_{cdb_model.id}'
+
+
+def _index_path(index_name: str) -> str:
+    return os.path.join(CONCEPT_SEARCH_INDEX_DIR, f'{index_name}.sqlite3')
+
+
+def _normalise(text: str) -> str:
+    return ' '.join(_tokenise(text))
+
+
+def _tokenise(text: str) -> List[str]:
+    return re.findall(r'\w+', text.lower())
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path)
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def _concept_rows(cui: str, cdb: CDB):
+    info = cdb.cui2info[cui]
+    pretty_name = cdb.get_name(cui)
+    synonyms = list(info['original_names'] or []) or [pretty_name]
+    names = {_normalise(name) for name in [re.sub(r'\([\w+\s]+\)', '', pretty_name)] + synonyms} - {''}
+    tokens = {tkn for name in names for tkn in name.split(' ')}
+    concept = (str(cui), pretty_name, json.dumps(list(info['type_ids'])), json.dumps(synonyms),
+               info.get('count_train', 0) or 0)
+    return concept, [(name, str(cui)) for name in names], [(tkn, str(cui)) for tkn in tokens]
+
+
+def _write_concepts(conn: sqlite3.Connection, cdb: CDB, cuis: Iterable[str], replace: bool = False):
+    concepts, names, tokens = [], [], []
+    for cui in cuis:
+        concept, concept_names, concept_tokens = _concept_rows(cui, cdb)
+        concepts.append(concept)
+        names.extend(concept_names)
+        tokens.extend(concept_tokens)
+    with conn:
+        if replace:
+            cui_params = [(c[0],) for c in concepts]
+            conn.executemany('DELETE FROM names WHERE cui = ?', cui_params)
+            conn.executemany('DELETE FROM tokens WHERE cui = ?', cui_params)
+        conn.executemany('INSERT OR REPLACE INTO concepts VALUES (?, ?, ?, ?, ?)', concepts)
+        conn.executemany('INSERT INTO names VALUES (?, ?)', names)
+        conn.executemany('INSERT INTO tokens VALUES (?, ?)', tokens)
+
+
+def import_all_concepts(cdb: CDB, cdb_model: ConceptDB):
+    index_name = _index_name(cdb_model)
+    os.makedirs(CONCEPT_SEARCH_INDEX_DIR, exist_ok=True)
+    path = _index_path(index_name)
+    # NOTE: the index is built in a separate file and swapped in once complete,
+    #       so the previous index can be searched in the mean time
+    tmp_path = f'{path}.tmp'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = _connect(tmp_path)
+    try:
+        cuis = list(cdb.cui2info)
+        for start in range(0, len(cuis), _IMPORT_BATCH_SIZE):
+            _write_concepts(conn, cdb, cuis[start:start + _IMPORT_BATCH_SIZE])
+            logger.info(f'Indexed {min(start + _IMPORT_BATCH_SIZE, len(cuis))} / {len(cuis)} concepts '
+                        f'for concept search index {index_name}')
+        conn.execute('ANALYZE')
+    finally:
+        conn.close()
+    os.replace(tmp_path, path)
+    logger.info(f'Successfully built concept search index {index_name}, {len(cuis)} Concepts now searchable')
+
+
+def drop_collection(cdb_model: ConceptDB):
+    index_name = _index_name(cdb_model)
+    path = _index_path(index_name)
+    if os.path.exists(path):
+        os.remove(path)
+        logger.info(f'Successfully dropped concept search index:{index_name}')
+    else:
+        logger.warning(f'Error dropping concept search index {index_name}, the index does not exist')
+
+
+def ensure_concept_searchable(cui, cdb: CDB, cdb_model: ConceptDB):
+    """
+    Adds (or updates) a single cui and associated metadata to the local search index, if the index exists.
+    Args:
+        cui: concept unique identifier of the concept to make searchable
+        cdb: the MedCAT CDB where the cui can be found
+        cdb_model: the associated Django model instance for the CDB.
+    """
+    path = _index_path(_index_name(cdb_model))
+    if os.path.exists(path):
+        conn = _connect(path)
+        try:
+            _write_concepts(conn, cdb, [cui], replace=True)
+        finally:
+            conn.close()
+
+
+def collections_available(cdbs: List[int]):
+    if os.path.isdir(CONCEPT_SEARCH_INDEX_DIR):
+        collections = sorted(f_name[:-len('.sqlite3')] for f_name in os.listdir(CONCEPT_SEARCH_INDEX_DIR)
+                             if f_name.endswith('.sqlite3'))
+    else:
+        collections = []
+    current_collections_cdb_ids = [c.split('_id_')[-1] for c in collections]
+    if len(cdbs):
+        return Response({'results': {cdb_id: cdb_id in current_collections_cdb_ids for cdb_id in cdbs}})
+    else:
+        return Response({'results': {cdb_id: {'imported': False, 'index_name': col}
+                                     for cdb_id, col in zip(current_collections_cdb_ids, collections)}})
+
+
+def _search_index(path: str, raw_query: str, rows: int = _MAX_RESULTS) -> List[Dict]:
+    query = _normalise(raw_query)
+    name_sql = f"""
+        WITH matches AS (
+            SELECT cui, -1 AS rank FROM concepts WHERE cui = ?
+            UNION ALL
+            SELECT cui, MIN(CASE WHEN name = ? THEN 0 ELSE 1 END) FROM names
+                WHERE name >= ? AND name < ? GROUP BY cui
+        )
+        SELECT {_RESULT_COLUMNS}, m.rank
+        FROM (SELECT cui, MIN(rank) AS rank FROM matches GROUP BY cui) m JOIN concepts c ON c.cui = m.cui
+        ORDER BY m.rank, c.count_train DESC, length(c.pretty_name)
+        LIMIT ?
+    """
+    conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+    try:
+        results = list(conn.execute(name_sql, [raw_query.strip(), query, query, query + _PREFIX_END, rows]))
+        query_tokens = query.split(' ') if query else []
+        if len(results) < rows and query_tokens:
+            # NOTE: only fall back to matching the tokens separately (which is slower for short / common
+            #       tokens) if there are not enough results matching the names
+            found = [r[0] for r in results]
+            token_matches = ' INTERSECT '.join(['SELECT cui FROM tokens WHERE token >= ? AND token < ?']
+                                               * len(query_tokens))
+            token_sql = f"""
+                SELECT {_RESULT_COLUMNS}, 2 FROM ({token_matches}) m JOIN concepts c ON c.cui = m.cui
+                WHERE c.cui NOT IN ({', '.join('?' * len(found))})
+                ORDER BY c.count_train DESC, length(c.pretty_name)
+                LIMIT ?
+            """
+            params = [param for tkn in query_tokens for param in (tkn, tkn + _PREFIX_END)]
+            results.extend(conn.execute(token_sql, params + found + [rows - len(results)]))
+    finally:
+        conn.close()
+    return [{'cui': cui, 'pretty_name': pretty_name, 'type_ids': json.loads(type_ids),
+             'synonyms': json.loads(synonyms), 'count_train': count_train, 'rank': rank}
+            for cui, pretty_name, type_ids, synonyms, count_train, rank in results]
+
+
+def search_collection(cdbs: List[int], raw_query: str):
+    if not raw_query or not raw_query.strip():
+        return Response({'results': []})
+    uniq_results_map = {}
+    for cdb in cdbs:
+        cdb_model = ConceptDB.objects.get(id=cdb)
+        index_name = _index_name(cdb_model)
+        path = _index_path(index_name)
+        if not os.path.exists(path):
+            return HttpResponseServerError(f'Concept Search Index {index_name} not available, '
+                                           f'import concept DB first before trying to search it.')
+        for result in _search_index(path, raw_query):
+            prev = uniq_results_map.get(result['cui'])
+            if prev is None or result['rank'] < prev['rank']:
+                uniq_results_map[result['cui']] = result
+    results = sorted(uniq_results_map.values(),
+                     key=lambda r: (r['rank'], -r['count_train'], len(r['pretty_name'])))
+    res = [{k: r[k] for k in ('cui', 'pretty_name', 'type_ids', 'synonyms')} for r in results]
+    return Response({'results': res})
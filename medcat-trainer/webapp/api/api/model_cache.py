@@ -1,6 +1,10 @@
 import logging
 import os
-from typing import Dict, Optional, Any
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from typing import Dict, Optional, Any, Iterator
 
 from pydantic import ValidationError
 
@@ -11,15 +15,7 @@ from medcat.cdb import CDB
 from medcat.vocab import Vocab
 from medcat.utils.legacy.convert_cdb import get_cdb_from_old
 
-from api.models import ConceptDB
-
-"""
-Module level caches for CDBs, Vocabs and CAT instances.
-"""
-# Maps between IDs and objects
-CDB_MAP = {}
-VOCAB_MAP = {}
-CAT_MAP = {}
+from api.models import ConceptDB, ProjectAnnotateEntities
 
 logger = logging.getLogger(__name__)
 
@@ -29,16 +25,148 @@ except ValueError:
     _MAX_MODELS_LOADED = 1
     logger.warning("MAX_MEDCAT_MODELS is not an integer, using default value of 1")
 
+try:
+    _MAX_MODELS_MEMORY = int(float(os.getenv("MAX_MEDCAT_MODELS_MEMORY_MB", 0)) * 1024 ** 2)
+except ValueError:
+    _MAX_MODELS_MEMORY = 0
+    logger.warning("MAX_MEDCAT_MODELS_MEMORY_MB is not a number, not limiting model cache memory")
+
+
+class ModelCache(MutableMapping):
+    """
+    A least recently used (LRU) cache of loaded models.
+
+    Items are evicted (least recently used first) once there are more than `max_items` items or the estimated
+    total size of the items is over `max_bytes`. The most recently added item is never evicted, so a single
+    model larger than the byte budget can still be loaded.
+    Looking up an item (i.e. `cache[key]` or `cache.get(key)`) marks it as used and is counted as a hit or miss,
+    while `key in cache` does neither.
+
+    Args:
+        name (str): the name of the cache, used for logging and stats.
+        max_items (int): the maximum number of items to keep.
+        max_bytes (int): the (estimated) maximum total size of the items in bytes, 0 for no limit.
+    """
+    def __init__(self, name: str, max_items: int, max_bytes: int = 0):
+        self.name = name
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self._items: OrderedDict = OrderedDict()
+        self._sizes: Dict[Any, int] = {}
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.loads = 0
+        self.load_time = 0.0
+
+    def __getitem__(self, key):
+        with self._lock:
+            try:
+                value = self._items[key]
+            except KeyError:
+                self.misses += 1
+                raise
+            self._items.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def __setitem__(self, key, value):
+        self.put(key, value)
+
+    def __delitem__(self, key):
+        with self._lock:
+            del self._items[key]
+            self._sizes.pop(key, None)
+
+    def __contains__(self, key) -> bool:
+        return key in self._items
+
+    def __iter__(self) -> Iterator:
+        return iter(list(self._items))
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    @property
+    def total_size(self) -> int:
+        return sum(self._sizes.values())
+
+    def put(self, key, value, size: int = 0, load_time: Optional[float] = None):
+        """
+        Adds an item to the cache as the most recently used item, evicting other items as needed.
+
+        Args:
+            key: the key of the item.
+            value: the item.
+            size (int): the (estimated) size of the item in bytes.
+            load_time (Optional[float]): the time (in seconds) it took to load the item, if it was loaded.
+        """
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            self._sizes[key] = size
+            if load_time is not None:
+                self.loads += 1
+                self.load_time += load_time
+            self._evict()
+
+    def _evict(self):
+        while len(self._items) > 1 and (len(self._items) > self.max_items or
+                                        (self.max_bytes and self.total_size > self.max_bytes)):
+            key, _ = self._items.popitem(last=False)
+            size = self._sizes.pop(key, 0)
+            self.evictions += 1
+            logger.info('Evicted %s from %s cache, estimated size: %.1fMB', key, self.name, size / 1024 ** 2)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'items': list(self._items),
+            'size_mb': round(self.total_size / 1024 ** 2, 1),
+            'max_items': self.max_items,
+            'max_size_mb': round(self.max_bytes / 1024 ** 2, 1) if self.max_bytes else None,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'loads': self.loads,
+            'avg_load_time_s': round(self.load_time / self.loads, 2) if self.loads else None,
+        }
+
 
-def _clear_models(cdb_map: Dict[str, CDB]=CDB_MAP,
-                  vocab_map: Dict[str, Vocab]=VOCAB_MAP,
-                  cat_map: Dict[str, CAT]=CAT_MAP):
-    if len(cat_map) > _MAX_MODELS_LOADED:
-        (k := next(iter(cat_map)), cat_map.pop(k))
-    if len(cdb_map) > _MAX_MODELS_LOADED:
-        (k := next(iter(cdb_map)), cdb_map.pop(k))
-    if len(vocab_map) > _MAX_MODELS_LOADED:
-        (k := next(iter(vocab_map)), vocab_map.pop(k))
+"""
+Module level caches for CDBs, Vocabs and CAT instances.
+"""
+# Maps between IDs and objects
+CDB_MAP = ModelCache('cdb', _MAX_MODELS_LOADED)
+VOCAB_MAP = ModelCache('vocab', _MAX_MODELS_LOADED)
+CAT_MAP = ModelCache('cat', _MAX_MODELS_LOADED, _MAX_MODELS_MEMORY)
+
+
+def _path_size(path: str) -> int:
+    """The size on disk of a file or directory, used as the estimate of the size of the model loaded from it."""
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    total = 0
+    for root, _, files in os.walk(path):
+        for f_name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, f_name))
+            except OSError:
+                pass
+    return total
+
+
+def _put(cache: Dict, key, value, path: Optional[str] = None, start_time: Optional[float] = None):
+    if isinstance(cache, ModelCache):
+        load_time = None if start_time is None else time.perf_counter() - start_time
+        cache.put(key, value, size=_path_size(path) if path else 0, load_time=load_time)
+    else:
+        cache[key] = value
+
+
+def cache_stats() -> Dict[str, Dict[str, Any]]:
+    """The state and hit / miss / eviction / load time metrics of the model caches."""
+    return {cache.name: cache.stats() for cache in (CAT_MAP, CDB_MAP, VOCAB_MAP)}
 
 
 def get_medcat_from_cdb_vocab(project,
@@ -48,13 +176,13 @@ def get_medcat_from_cdb_vocab(project,
     cdb_id = project.concept_db.id
     vocab_id = project.vocab.id
     cat_id = str(cdb_id) + "-" + str(vocab_id)
-    if cat_id in cat_map:
-        cat = cat_map[cat_id]
-    else:
-        if cdb_id in cdb_map:
-            cdb = cdb_map[cdb_id]
-        else:
-            cdb_path = project.concept_db.cdb_file.path
+    cat = cat_map.get(cat_id)
+    if cat is None:
+        start_time = time.perf_counter()
+        cdb_path = project.concept_db.cdb_file.path
+        cdb = cdb_map.get(cdb_id)
+        if cdb is None:
+            cdb_start_time = time.perf_counter()
             try:
                 cdb = CDB.load(cdb_path)
             except NotADirectoryError as e:
@@ -62,9 +190,7 @@ def get_medcat_from_cdb_vocab(project,
                 # TODO: deserialise and write back to the model path?
                 cdb = get_cdb_from_old(cdb_path)
                 cdb.save(cdb_path)
-                cdb_map[cdb_id] = cdb
                 cdb_path = project.concept_db.cdb_file.path
-                cdb_map[cdb_id] = cdb
 
             except KeyError as ke:
                 mc_v = mct_version
@@ -83,17 +209,20 @@ def get_medcat_from_cdb_vocab(project,
                 _parse_config_file(cdb.config, custom_config)
             else:
                 logger.info("No MEDCAT_CONFIG_FILE env var set to valid path, using default config available on CDB")
-            cdb_map[cdb_id] = cdb
+            _put(cdb_map, cdb_id, cdb, cdb_path, cdb_start_time)
 
-        if vocab_id in vocab_map:
-            vocab = vocab_map[vocab_id]
-        else:
-            vocab_path = project.vocab.vocab_file.path
+        vocab_path = project.vocab.vocab_file.path
+        vocab = vocab_map.get(vocab_id)
+        if vocab is None:
+            vocab_start_time = time.perf_counter()
             vocab = Vocab.load(vocab_path)
-            vocab_map[vocab_id] = vocab
+            _put(vocab_map, vocab_id, vocab, vocab_path, vocab_start_time)
         cat = CAT(cdb=cdb, config=cdb.config, vocab=vocab)
-        cat_map[cat_id] = cat
-        _clear_models(cat_map=cat_map, cdb_map=cdb_map, vocab_map=vocab_map)
+        if isinstance(cat_map, ModelCache):
+            cat_map.put(cat_id, cat, size=_path_size(cdb_path) + _path_size(vocab_path),
+                        load_time=time.perf_counter() - start_time)
+        else:
+            cat_map[cat_id] = cat
     return cat
 
 
@@ -156,10 +285,14 @@ def _set_value_or_alt(conf: SerialisableBaseModel, key: str, value: Any,
 def get_medcat_from_model_pack(project, cat_map: Dict[str, CAT]=CAT_MAP) -> CAT:
     model_pack_obj = project.model_pack
     cat_id = 'mp' + str(model_pack_obj.id)
-    logger.info('Loading model pack from:%s', model_pack_obj.model_pack.path)
-    cat = CAT.load_model_pack(model_pack_obj.model_pack.path)
-    cat_map[cat_id] = cat
-    _clear_models(cat_map=cat_map)
+    cat = cat_map.get(cat_id)
+    if cat is None:
+        start_time = time.perf_counter()
+        model_pack_path = model_pack_obj.model_pack.path
+        logger.info('Loading model pack from:%s', model_pack_path)
+        cat = CAT.load_model_pack(model_pack_path)
+        unpacked_path = model_pack_path.replace('.zip', '')
+        _put(cat_map, cat_id, cat, unpacked_path if os.path.isdir(unpacked_path) else model_pack_path, start_time)
     return cat
 
 
@@ -203,12 +336,14 @@ def clear_cached_medcat(project, cat_map: Dict[str, CAT]=CAT_MAP):
 
 def get_cached_cdb(cdb_id: str, cdb_map: Dict[str, CDB]=CDB_MAP) -> CDB:
     from api.utils import clear_cdb_cnf_addons
-    if cdb_id not in cdb_map:
+    cdb = cdb_map.get(cdb_id)
+    if cdb is None:
+        start_time = time.perf_counter()
         cdb_obj = ConceptDB.objects.get(id=cdb_id)
         cdb = CDB.load(cdb_obj.cdb_file.path)
         clear_cdb_cnf_addons(cdb, cdb_id)
-        cdb_map[cdb_id] = cdb
-    return cdb_map[cdb_id]
+        _put(cdb_map, cdb_id, cdb, cdb_obj.cdb_file.path, start_time)
+    return cdb
 
 
 def clear_cached_cdb(cdb_id, cdb_map: Dict[str, CDB]=CDB_MAP):
@@ -229,3 +364,30 @@ def is_model_loaded(project,
         return False if not project.model_pack else f'mp{project.model_pack.id}' in cat_map
     else:
         return False if not project.concept_db else project.concept_db.id in cdb_map
+
+
+def prewarm_models(project_ids: str):
+    """
+    Loads the models of the specified projects into the cache, e.g. at start up before serving requests.
+
+    Args:
+        project_ids (str): comma separated project IDs, or 'all' for all projects that are annotating.
+    """
+    if project_ids.strip().lower() == 'all':
+        projects = ProjectAnnotateEntities.objects.filter(project_status='A')
+    else:
+        ids = []
+        for p_id in project_ids.split(','):
+            if not p_id.strip():
+                continue
+            try:
+                ids.append(int(p_id))
+            except ValueError:
+                logger.error('Invalid project ID %r to pre-warm the model for, skipping it', p_id)
+        projects = ProjectAnnotateEntities.objects.filter(id__in=ids)
+    for project in projects:
+        try:
+            get_medcat(project)
+            logger.info('Pre-warmed model for project %s', project.name)
+        except Exception as e:
+            logger.error('Failed to pre-warm model for project %s', project.name, exc_info=e)
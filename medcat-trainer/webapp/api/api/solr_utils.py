@@ -9,14 +9,26 @@ from medcat.cdb import CDB
 from medcat.cdb.concepts import CUIInfo
 from rest_framework.response import Response
 
+from api import concept_search_index
 from api.models import ConceptDB
-from core.settings import SOLR_HOST, SOLR_PORT
+from core.settings import SOLR_HOST, SOLR_PORT, CONCEPT_SEARCH_BACKEND, CONCEPT_SEARCH_LOCAL_FALLBACK
 
 SOLR_INDEX_SCHEMA = {}
 
 logger = logging.getLogger(__name__)
 
 
+def _use_local_index() -> bool:
+    # NOTE: the public functions here defer to the built-in concept search index if configured
+    return CONCEPT_SEARCH_BACKEND == 'local'
+
+
+def _keep_local_fallback() -> bool:
+    # NOTE: if configured, the built-in concept search index is kept alongside solr,
+    #       and searched instead if the solr service cannot be reached
+    return CONCEPT_SEARCH_LOCAL_FALLBACK
+
+
 def _cache_solr_collection_schema_types(collection):
     url = f'http://{SOLR_HOST}:{SOLR_PORT}/solr/{collection}/schema'
     logger.info(f'Retrieving solr schema: {url}')
@@ -31,6 +43,18 @@ def _cache_solr_collection_schema_types(collection):
 
 
 def collections_available(cdbs: List[int]):
+    if _use_local_index():
+        return concept_search_index.collections_available(cdbs)
+    try:
+        return _solr_collections_available(cdbs)
+    except requests.exceptions.ConnectionError as e:
+        if not _keep_local_fallback():
+            raise
+        logger.warning('Unable to connect to solr, using the built-in concept search index instead', exc_info=e)
+        return concept_search_index.collections_available(cdbs)
+
+
+def _solr_collections_available(cdbs: List[int]):
     url = f'http://{SOLR_HOST}:{SOLR_PORT}/solr/admin/collections?action=LIST'
     logger.info(f'Retrieving all SOLR collections: {url}')
     resp = requests.get(url)
@@ -65,6 +89,18 @@ def _process_result_repsonse(resp: Dict):
 
 
 def search_collection(cdbs: List[int], raw_query: str):
+    if _use_local_index():
+        return concept_search_index.search_collection(cdbs, raw_query)
+    try:
+        return _search_solr_collection(cdbs, raw_query)
+    except requests.exceptions.ConnectionError as e:
+        if not _keep_local_fallback():
+            raise
+        logger.warning('Unable to connect to solr, searching the built-in concept search index instead', exc_info=e)
+        return concept_search_index.search_collection(cdbs, raw_query)
+
+
+def _search_solr_collection(cdbs: List[int], raw_query: str):
     query = raw_query.strip().replace(r'\s+', r'\s').split(' ')
     if len(query) == 1 and query[0] == '':
         return Response({'results': []})
@@ -108,6 +144,10 @@ def search_collection(cdbs: List[int], raw_query: str):
 
 
 def import_all_concepts(cdb: CDB, cdb_model: ConceptDB):
+    if _use_local_index():
+        return concept_search_index.import_all_concepts(cdb, cdb_model)
+    if _keep_local_fallback():
+        concept_search_index.import_all_concepts(cdb, cdb_model)
     collection_name = f'{cdb_model.name}_id_{cdb_model.id}'
     base_url = f'http://{SOLR_HOST}:{SOLR_PORT}/solr'
 
@@ -153,6 +193,10 @@ def import_all_concepts(cdb: CDB, cdb_model: ConceptDB):
 
 
 def drop_collection(cdb_model: ConceptDB):
+    if _use_local_index():
+        return concept_search_index.drop_collection(cdb_model)
+    if _keep_local_fallback():
+        concept_search_index.drop_collection(cdb_model)
     collection_name = f'{cdb_model.name}_id_{cdb_model.id}'
     base_url = f'http://{SOLR_HOST}:{SOLR_PORT}/solr'
     url = f'{base_url}/admin/collections?action=DELETE&name={collection_name}'
@@ -171,6 +215,10 @@ def ensure_concept_searchable(cui, cdb: CDB, cdb_model: ConceptDB):
         cdb: the MedCAT CDB where the cui can be found
         cdb_model: the associated Django model instance for the CDB.
     """
+    if _use_local_index():
+        return concept_search_index.ensure_concept_searchable(cui, cdb, cdb_model)
+    if _keep_local_fallback():
+        concept_search_index.ensure_concept_searchable(cui, cdb, cdb_model)
     collection = f'{cdb_model.name}_id_{cdb_model.id}'
     base_url = f'http://{SOLR_HOST}:{SOLR_PORT}/solr'
     url = f'{base_url}/admin/collections?action=LIST'
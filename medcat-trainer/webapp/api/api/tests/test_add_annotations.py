@@ -0,0 +1,244 @@
+import re
+from types import SimpleNamespace
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from medcat.config import Config
+
+from api import utils
+from api.models import (AnnotatedEntity, ConceptDB, Dataset, Document, Entity, ModelPack, ProjectAnnotateEntities,
+                        Vocabulary)
+
+_TEXTS = [
+    'The patient has chronic kidney failure and a kidney stone.',
+    'No kidney stone, but the patient has chronic kidney failure.',
+    'The patient is well.',
+]
+
+# the (value, cui, context similarity) of the entities the model finds in every text they occur in
+_MODEL_ENTS = [
+    ('chronic kidney failure', 'C01', 0.9),
+    # overlap the longer entity above
+    ('kidney failure', 'C02', 0.8),
+    ('kidney', 'C03', 0.7),
+    # below the similarity threshold
+    ('kidney stone', 'C04', 0.1),
+    ('stone', 'C05', 0.6),
+    # excluded by the filters
+    ('patient', 'C06', 0.9),
+]
+
+
+class _Ent:
+
+    def __init__(self, tokens, cui, context_similarity):
+        self._tokens = tokens
+        self.text = ' '.join(tkn.text for tkn in tokens)
+        self.cui = cui
+        self.start_char_index = tokens[0].char_index
+        self.end_char_index = tokens[-1].char_index + len(tokens[-1].text)
+        self.context_similarity = context_similarity
+
+    def __iter__(self):
+        return iter(self._tokens)
+
+
+def _annotate(text):
+    tokens = [SimpleNamespace(index=i, text=m.group(), char_index=m.start())
+              for i, m in enumerate(re.finditer(r'\w+', text))]
+    linked_ents = []
+    for value, cui, context_similarity in _MODEL_ENTS:
+        n_tokens = len(value.split())
+        for start in range(len(tokens) - n_tokens + 1):
+            ent_tokens = tokens[start:start + n_tokens]
+            if ' '.join(tkn.text for tkn in ent_tokens) == value:
+                linked_ents.append(_Ent(ent_tokens, cui, context_similarity))
+    return SimpleNamespace(linked_ents=linked_ents)
+
+
+class _FakeCAT:
+
+    def __init__(self):
+        self.config = Config()
+        self.config.components.linking.filters.cuis_exclude = {'C06'}
+        self.get_docs = mock.Mock(side_effect=lambda texts: [self(text) for text in texts])
+
+    def __call__(self, text):
+        return _annotate(text)
+
+
+def _add_annotations_per_entity(spacy_doc, user, project, document, existing_annotations, cat):
+    """The annotations were added one at a time (with a query per entity) before they were added in bulk."""
+    spacy_doc.linked_ents.sort(key=lambda x: len(x.text), reverse=True)
+    tkns_in = []
+    ents = []
+    existing_annos_intervals = [(ann.start_ind, ann.end_ind) for ann in existing_annotations]
+    filters = cat.config.components.linking.filters
+    for ent in spacy_doc.linked_ents:
+        overlaps_existing = any((ea[0] < ent.start_char_index < ea[1]) or (ea[0] < ent.end_char_index < ea[1])
+                                for ea in existing_annos_intervals)
+        in_filters = (ent.cui in filters.cuis or not filters.cuis) and ent.cui not in filters.cuis_exclude
+        if not overlaps_existing and in_filters:
+            if not any(tkn in tkns_in for tkn in ent):
+                tkns_in.extend(ent)
+                ents.append(ent)
+    for ent in ents:
+        entity, _ = Entity.objects.get_or_create(label=ent.cui)
+        if AnnotatedEntity.objects.filter(project=project, document=document, start_ind=ent.start_char_index,
+                                          end_ind=ent.end_char_index).exists():
+            continue
+        ann_ent = AnnotatedEntity(user=user, project=project, document=document, entity=entity, value=ent.text,
+                                  start_ind=ent.start_char_index, end_ind=ent.end_char_index,
+                                  acc=ent.context_similarity)
+        if ent.context_similarity < cat.config.components.linking.similarity_threshold:
+            ann_ent.deleted = True
+            ann_ent.validated = True
+        ann_ent.save()
+
+
+class _AnnotationsTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='annotator')
+        # NOTE: the dataset file is not loaded, the documents are created below
+        with mock.patch('api.signals.dataset_from_file'):
+            cls.dataset = Dataset.objects.create(name='dataset', original_file='dataset.csv')
+        cls.cdb = ConceptDB(name='cdb', cdb_file='cdb.dat')
+        cls.cdb.save(skip_load=True)
+        cls.vocab = Vocabulary(name='vocab', vocab_file='vocab.dat')
+        cls.vocab.save(skip_load=True)
+        cls.docs = [Document.objects.create(name=f'doc {i}', text=text, dataset=cls.dataset)
+                    for i, text in enumerate(_TEXTS)]
+        # NOTE: only some of the entities exist beforehand
+        Entity.objects.create(label='C01')
+
+    def setUp(self):
+        self.cat = _FakeCAT()
+
+    def _create_project(self, name):
+        project = ProjectAnnotateEntities.objects.create(name=name, dataset=self.dataset, concept_db=self.cdb,
+                                                         vocab=self.vocab, cuis='')
+        # the annotations made before the document is prepared
+        doc = self.docs[1]
+        for value, cui, start_ind in (
+                # the same span as an entity the model finds
+                ('kidney stone', 'C05', doc.text.index('kidney stone')),
+                # partially overlaps an entity the model finds
+                ('has chronic', 'C07', doc.text.index('has chronic'))):
+            AnnotatedEntity.objects.create(user=self.user, project=project, document=doc,
+                                           entity=Entity.objects.get_or_create(label=cui)[0], value=value,
+                                           start_ind=start_ind, end_ind=start_ind + len(value), acc=1.0,
+                                           validated=True, manually_created=True)
+        return project
+
+    def _add(self, add_func, project):
+        for doc in self.docs:
+            existing_annotations = list(AnnotatedEntity.objects.filter(project=project, document=doc))
+            add_func(spacy_doc=self.cat(doc.text), user=self.user, project=project, document=doc,
+                     existing_annotations=existing_annotations, cat=self.cat)
+
+    def _get_annotations(self, project):
+        return sorted((ann.document_id, ann.entity.label, ann.value, ann.start_ind, ann.end_ind, ann.acc,
+                       ann.deleted, ann.validated, ann.manually_created, ann.user_id)
+                      for ann in AnnotatedEntity.objects.filter(project=project).select_related('entity'))
+
+    def _get_expected_annotations(self):
+        project = self._create_project('expected')
+        self._add(_add_annotations_per_entity, project)
+        return self._get_annotations(project)
+
+
+class AddAnnotationsTestCase(_AnnotationsTestCase):
+
+    def test_same_as_per_entity(self):
+        expected = self._get_expected_annotations()
+        project = self._create_project('project')
+        self._add(utils.add_annotations, project)
+        self.assertEqual(self._get_annotations(project), expected)
+
+    def test_overlapping_and_filtered_entities(self):
+        project = self._create_project('project')
+        self._add(utils.add_annotations, project)
+        doc = self.docs[0]
+        anns = {ann.value: ann for ann in AnnotatedEntity.objects.filter(project=project, document=doc)}
+        # the longest of the overlapping entities are kept, the excluded concept is not added
+        self.assertEqual(sorted(anns), ['chronic kidney failure', 'kidney stone'])
+        self.assertEqual(anns['chronic kidney failure'].entity.label, 'C01')
+        self.assertFalse(anns['chronic kidney failure'].deleted)
+        # below the similarity threshold
+        self.assertTrue(anns['kidney stone'].deleted)
+        self.assertTrue(anns['kidney stone'].validated)
+
+    def test_keeps_existing_annotations(self):
+        project = self._create_project('project')
+        self._add(utils.add_annotations, project)
+        doc = self.docs[1]
+        anns = sorted((ann.value, ann.entity.label, ann.manually_created)
+                      for ann in AnnotatedEntity.objects.filter(project=project, document=doc))
+        # the existing span is not added again and the entities overlapping the existing annotations are skipped
+        self.assertEqual(anns, [('has chronic', 'C07', True), ('kidney failure', 'C02', False),
+                                ('kidney stone', 'C05', True)])
+
+    def test_creates_new_entities(self):
+        project = self._create_project('project')
+        self.assertFalse(Entity.objects.filter(label__in=['C02', 'C04']).exists())
+        self._add(utils.add_annotations, project)
+        self.assertEqual(Entity.objects.filter(label__in=['C01', 'C02', 'C04']).count(), 3)
+        # only for the annotations that are added
+        self.assertFalse(Entity.objects.filter(label__in=['C03', 'C06']).exists())
+
+    def test_entity_created_concurrently(self):
+        expected = self._get_expected_annotations()
+        project = self._create_project('project')
+        in_bulk = Entity.objects.in_bulk
+        calls = []
+
+        def in_bulk_missing_first(*args, **kwargs):
+            # NOTE: the first lookup misses the entities (as if created by another process in the meantime)
+            calls.append(args)
+            return in_bulk(*args, **kwargs) if len(calls) > 1 else {}
+
+        with mock.patch.object(Entity.objects, 'in_bulk', side_effect=in_bulk_missing_first):
+            utils.add_annotations(spacy_doc=self.cat(self.docs[0].text), user=self.user, project=project,
+                                  document=self.docs[0], existing_annotations=[], cat=self.cat)
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(Entity.objects.filter(label='C01').count(), 1)
+        self.assertEqual([ann for ann in self._get_annotations(project) if ann[0] == self.docs[0].id],
+                         [ann for ann in expected if ann[0] == self.docs[0].id])
+
+    def test_no_entities(self):
+        project = self._create_project('project')
+        with self.assertNumQueries(0):
+            utils.add_annotations(spacy_doc=SimpleNamespace(linked_ents=[]), user=self.user, project=project,
+                                  document=self.docs[2], existing_annotations=[], cat=self.cat)
+
+
+class PrepDocsTestCase(_AnnotationsTestCase):
+
+    def _prep_docs(self, project):
+        with mock.patch.object(utils, 'get_medcat', return_value=self.cat), \
+                mock.patch.object(utils, 'DOC_PREP_BATCH_SIZE', 2):
+            utils.prep_docs.now(project.id, [doc.id for doc in self.docs], self.user.id)
+
+    def test_prep_docs_same_as_per_entity(self):
+        expected = self._get_expected_annotations()
+        project = self._create_project('project')
+        self._prep_docs(project)
+        self.assertEqual(self._get_annotations(project), expected)
+        self.assertEqual(set(project.prepared_documents.all()), set(self.docs))
+        # in batches of 2 documents
+        self.assertEqual([len(call.args[0]) for call in self.cat.get_docs.call_args_list], [2, 1])
+
+    def test_prep_docs_deid_same_as_per_entity(self):
+        expected = self._get_expected_annotations()
+        project = self._create_project('project')
+        # NOTE: the model pack is not loaded (upon save) since the (fake) model is used instead
+        model_pack, = ModelPack.objects.bulk_create([ModelPack(name='deid', model_pack='deid.zip')])
+        ProjectAnnotateEntities.objects.filter(id=project.id).update(
+            deid_model_annotation=True, model_pack=model_pack, concept_db=None, vocab=None)
+        self._prep_docs(project)
+        # the De-ID model annotates the documents the same as the model it wraps
+        self.assertEqual(self._get_annotations(project), expected)
+        self.assertEqual(set(project.prepared_documents.all()), set(self.docs))
@@ -0,0 +1,91 @@
+from types import SimpleNamespace
+from unittest import mock
+
+from django.test import SimpleTestCase
+from medcat.config import Config
+
+from api import utils
+
+_TEXT = 'The patient has kidney failure.'
+
+
+class _FakeCAT:
+    """Records whether the linker was training whenever the model was run."""
+
+    def __init__(self):
+        self.config = Config()
+        self.trainer = mock.Mock()
+        self.calls = []
+
+    def __call__(self, text):
+        self.calls.append(self.config.components.linking.train)
+        return [SimpleNamespace(char_index=idx, text=tkn) for idx, tkn in
+                ((0, 'The'), (4, 'patient'), (12, 'has'), (16, 'kidney'), (23, 'failure'))]
+
+
+def _annotation(start_ind, value='kidney failure', cui='C01'):
+    return SimpleNamespace(entity=SimpleNamespace(label=cui), value=value, start_ind=start_ind,
+                           validated=True, killed=False, deleted=False, irrelevant=False,
+                           manually_created=False, alternative=False)
+
+
+class AnnotatedDocCacheTestCase(SimpleTestCase):
+
+    def setUp(self):
+        cache_patcher = mock.patch.object(utils, '_ANNOTATED_DOC_CACHE', utils.OrderedDict())
+        cache_patcher.start()
+        self.addCleanup(cache_patcher.stop)
+
+    def _train(self, cat):
+        document = SimpleNamespace(text=_TEXT)
+        anns = [_annotation(16)]
+        with mock.patch.object(utils, 'AnnotatedEntity') as annotated_entity:
+            annotated_entity.objects.filter.return_value.select_related.return_value = anns
+            utils.train_medcat(cat, project=None, document=document)
+
+    def test_hit_reuses_document(self):
+        cat = _FakeCAT()
+        doc = utils.annotate_document(cat, _TEXT)
+        self.assertIs(utils.get_annotated_document(cat, _TEXT), doc)
+        self.assertEqual(len(cat.calls), 1)
+
+    def test_miss_runs_model_without_linker_training(self):
+        cat = _FakeCAT()
+        self.assertTrue(cat.config.components.linking.train)
+        utils.get_annotated_document(cat, _TEXT)
+        self.assertEqual(cat.calls, [False])
+        self.assertTrue(cat.config.components.linking.train)
+        # the document is cached afterwards
+        utils.get_annotated_document(cat, _TEXT)
+        self.assertEqual(cat.calls, [False])
+
+    def test_other_model_misses(self):
+        cat, other_cat = _FakeCAT(), _FakeCAT()
+        utils.annotate_document(cat, _TEXT)
+        utils.get_annotated_document(other_cat, _TEXT)
+        self.assertEqual(other_cat.calls, [False])
+
+    def test_cached_documents_are_evicted(self):
+        cat = _FakeCAT()
+        with mock.patch.object(utils, '_ANNOTATED_DOC_CACHE_SIZE', 1):
+            utils.cache_annotated_document(cat, 'text 1', 'doc 1')
+            utils.cache_annotated_document(cat, 'text 2', 'doc 2')
+            self.assertEqual(utils.get_annotated_document(cat, 'text 2'), 'doc 2')
+            self.assertEqual(len(cat.calls), 0)
+            utils.get_annotated_document(cat, 'text 1')
+            self.assertEqual(len(cat.calls), 1)
+
+    def test_train_same_upon_hit_and_miss(self):
+        hit_cat, miss_cat = _FakeCAT(), _FakeCAT()
+        utils.annotate_document(hit_cat, _TEXT)
+        self._train(hit_cat)
+        self._train(miss_cat)
+        # the model is only run (implicitly training the linker) when the document is prepared
+        self.assertEqual(hit_cat.calls, [True])
+        self.assertEqual(miss_cat.calls, [False])
+        for cat in (hit_cat, miss_cat):
+            cat.trainer.add_and_train_concept.assert_called_once()
+            kwargs = cat.trainer.add_and_train_concept.call_args.kwargs
+            self.assertEqual(kwargs['cui'], 'C01')
+            self.assertEqual(kwargs['name'], 'kidney failure')
+            self.assertEqual([tkn.text for tkn in kwargs['mut_entity']], ['kidney'])
@@ -0,0 +1,145 @@
+import os
+import tempfile
+from unittest import mock
+
+import requests
+from django.test import SimpleTestCase
+from medcat.cdb import CDB
+from medcat.cdb.concepts import get_new_cui_info
+from medcat.config import Config
+
+from api import concept_search_index, solr_utils
+from api.models import ConceptDB
+
+
+def _add_concept(cdb: CDB, cui: str, pretty_name: str, names, count_train: int = 0):
+    cdb.cui2info[cui] = get_new_cui_info(cui, pretty_name, names=set(names), type_ids={'T047'},
+                                         original_names=set(names), count_train=count_train)
+
+
+def _test_cdb() -> CDB:
+    cdb = CDB(Config())
+    _add_concept(cdb, 'C01', 'Kidney failure', ['kidney failure', 'renal failure'], count_train=5)
+    _add_concept(cdb, 'C02', 'Kidney stone', ['kidney stone', 'nephrolithiasis'], count_train=10)
+    _add_concept(cdb, 'C03', 'Kidney', ['kidney'])
+    _add_concept(cdb, 'C04', 'Chronic kidney disease', ['chronic kidney disease', 'ckd'], count_train=1)
+    _add_concept(cdb, 'C05', 'Fever', ['fever', 'pyrexia'])
+    return cdb
+
+
+class ConceptSearchIndexTestCase(SimpleTestCase):
+
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp_dir.cleanup)
+        self.index_dir = os.path.join(self._tmp_dir.name, 'concept_search')
+        dir_patcher = mock.patch.object(concept_search_index, 'CONCEPT_SEARCH_INDEX_DIR', self.index_dir)
+        dir_patcher.start()
+        self.addCleanup(dir_patcher.stop)
+        get_patcher = mock.patch.object(ConceptDB.objects, 'get', side_effect=self._get_cdb_model)
+        get_patcher.start()
+        self.addCleanup(get_patcher.stop)
+        self.cdb = _test_cdb()
+        self.cdb_model = ConceptDB(id=1, name='test_cdb')
+
+    def _get_cdb_model(self, id):
+        self.assertEqual(id, self.cdb_model.id)
+        return self.cdb_model
+
+    def _search(self, query):
+        return concept_search_index.search_collection([self.cdb_model.id], query).data['results']
+
+    def _search_cuis(self, query):
+        return [r['cui'] for r in self._search(query)]
+
+    def test_import_creates_index(self):
+        concept_search_index.import_all_concepts(self.cdb, self.cdb_model)
+        self.assertTrue(os.path.exists(os.path.join(self.index_dir, 'test_cdb_id_1.sqlite3')))
+        self.assertFalse(os.path.exists(os.path.join(self.index_dir, 'test_cdb_id_1.sqlite3.tmp')))
+        self.assertEqual(concept_search_index.collections_available(['1', '2']).data['results'],
+                         {'1': True, '2': False})
+
+    def test_search_without_index_fails(self):
+        resp = concept_search_index.search_collection([self.cdb_model.id], 'kidney')
+        self.assertEqual(resp.status_code, 500)
+
+    def test_empty_query_has_no_results(self):
+        concept_search_index.import_all_concepts(self.cdb, self.cdb_model)
+        self.assertEqual(self._search('  '), [])
+
+    def test_search_result_fields(self):
+        concept_search_index.import_all_concepts(self.cdb, self.cdb_model)
+        result, = self._search('pyrexia')
+        self.assertEqual(result['cui'], 'C05')
+        self.assertEqual(result['pretty_name'], 'Fever')
+        self.assertEqual(result['type_ids'], ['T047'])
+        self.assertEqual(sorted(result['synonyms']), ['fever', 'pyrexia'])
+
+    def test_search_ranks_cui_first(self):
+        concept_search_index.import_all_concepts(self.cdb, self.cdb_model)
+        self.assertEqual(self._search_cuis('C03')[0], 'C03')
+
+    def test_search_ranks_exact_then_prefix_then_token_matches(self):
+        concept_search_index.import_all_concepts(self.cdb, self.cdb_model)
+        # exact name, then name prefixes by count_train, then the token prefix match
+        self.assertEqual(self._search_cuis('kidney'), ['C03', 'C02', 'C01', 'C04'])
+
+    def test_search_matches_name_prefix(self):
+        concept_search_index.import_all_concepts(self.cdb, self.cdb_model)
+        self.assertEqual(self._search_cuis('nephrol'), ['C02'])
+        self.assertEqual(self._search_cuis('Kidney Fail'), ['C01'])
+
+    def test_search_matches_token_prefixes(self):
+        concept_search_index.import_all_concepts(self.cdb, self.cdb_model)
+        self.assertEqual(self._search_cuis('fail ren'), ['C01'])
+        self.assertEqual(self._search_cuis('dis kid'), ['C04'])
+        self.assertEqual(self._search_cuis('kidney pyrexia'), [])
+
+    def test_ensure_concept_searchable_updates_index(self):
+        concept_search_index.import_all_concepts(self.cdb, self.cdb_model)
+        self.cdb.cui2info['C05']['original_names'].add('high temperature')
+        concept_search_index.ensure_concept_searchable('C05', self.cdb, self.cdb_model)
+        _add_concept(self.cdb, 'C06', 'Headache', ['headache', 'cephalgia'])
+        concept_search_index.ensure_concept_searchable('C06', self.cdb, self.cdb_model)
+        self.assertEqual(self._search_cuis('high temp'), ['C05'])
+        self.assertEqual(self._search_cuis('cephal'), ['C06'])
+        # the names of the updated concept are not duplicated
+        self.assertEqual(self._search_cuis('fever'), ['C05'])
+
+    def test_ensure_concept_searchable_without_index(self):
+        concept_search_index.ensure_concept_searchable('C05', self.cdb, self.cdb_model)
+        self.assertFalse(os.path.exists(self.index_dir))
+
+    def test_drop_collection_removes_index(self):
+        concept_search_index.import_all_concepts(self.cdb, self.cdb_model)
+        concept_search_index.drop_collection(self.cdb_model)
+        self.assertEqual(os.listdir(self.index_dir), [])
+        self.assertEqual(concept_search_index.collections_available(['1']).data['results'], {'1': False})
+
+    def test_solr_unavailable_falls_back_to_index(self):
+        concept_search_index.import_all_concepts(self.cdb, self.cdb_model)
+        with mock.patch.object(solr_utils, 'CONCEPT_SEARCH_BACKEND', 'solr'), \
+                mock.patch.object(solr_utils, 'CONCEPT_SEARCH_LOCAL_FALLBACK', True), \
+                mock.patch.object(solr_utils.requests, 'get', side_effect=requests.exceptions.ConnectionError):
+            results = solr_utils.search_collection([self.cdb_model.id], 'renal').data['results']
+            available = solr_utils.collections_available(['1']).data['results']
+        self.assertEqual([r['cui'] for r in results], ['C01'])
+        self.assertEqual(available, {'1': True})
+
+    def test_solr_unavailable_without_fallback_raises(self):
+        concept_search_index.import_all_concepts(self.cdb, self.cdb_model)
+        with mock.patch.object(solr_utils, 'CONCEPT_SEARCH_BACKEND', 'solr'), \
+                mock.patch.object(solr_utils, 'CONCEPT_SEARCH_LOCAL_FALLBACK', False), \
+                mock.patch.object(solr_utils.requests, 'get', side_effect=requests.exceptions.ConnectionError):
+            with self.assertRaises(requests.exceptions.ConnectionError):
+                solr_utils.search_collection([self.cdb_model.id], 'renal')
+            with self.assertRaises(requests.exceptions.ConnectionError):
+                solr_utils.collections_available(['1'])
+
+    def test_local_backend_uses_index(self):
+        with mock.patch.object(solr_utils, 'CONCEPT_SEARCH_BACKEND', 'local'), \
+                mock.patch.object(solr_utils.requests, 'get') as get:
+            solr_utils.import_all_concepts(self.cdb, self.cdb_model)
+            results = solr_utils.search_collection([self.cdb_model.id], 'ckd').data['results']
+        get.assert_not_called()
+        self.assertEqual([r['cui'] for r in results], ['C04'])
@@ -0,0 +1,107 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from api import model_cache
+from api.model_cache import ModelCache
+
+_MB = 1024 ** 2
+
+
+class ModelCacheTestCase(SimpleTestCase):
+
+    def test_evicts_least_recently_used(self):
+        cache = ModelCache('test', max_items=2)
+        cache['a'] = 1
+        cache['b'] = 2
+        # marks 'a' as recently used, so 'b' is evicted next
+        self.assertEqual(cache['a'], 1)
+        cache['c'] = 3
+        self.assertEqual(list(cache), ['a', 'c'])
+        self.assertEqual(cache.evictions, 1)
+
+    def test_evicts_over_memory_budget(self):
+        cache = ModelCache('test', max_items=10, max_bytes=100 * _MB)
+        cache.put('a', 1, size=60 * _MB)
+        cache.put('b', 2, size=30 * _MB)
+        cache.put('c', 3, size=30 * _MB)
+        self.assertEqual(list(cache), ['b', 'c'])
+        self.assertEqual(cache.total_size, 60 * _MB)
+
+    def test_keeps_newest_item_over_memory_budget(self):
+        cache = ModelCache('test', max_items=10, max_bytes=100 * _MB)
+        cache.put('a', 1, size=10 * _MB)
+        cache.put('big', 2, size=200 * _MB)
+        self.assertEqual(list(cache), ['big'])
+
+    def test_counts_hits_and_misses(self):
+        cache = ModelCache('test', max_items=2)
+        cache['a'] = 1
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        with self.assertRaises(KeyError):
+            cache['b']
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+
+    def test_contains_does_not_count_or_mark_used(self):
+        cache = ModelCache('test', max_items=2)
+        cache['a'] = 1
+        cache['b'] = 2
+        self.assertIn('a', cache)
+        cache['c'] = 3
+        self.assertNotIn('a', cache)
+        self.assertEqual((cache.hits, cache.misses), (0, 0))
+
+    def test_stats(self):
+        cache = ModelCache('test', max_items=2)
+        cache.put('a', 1, size=_MB, load_time=2.0)
+        cache.put('b', 2, size=_MB, load_time=4.0)
+        stats = cache.stats()
+        self.assertEqual(stats['items'], ['a', 'b'])
+        self.assertEqual(stats['size_mb'], 2.0)
+        self.assertEqual(stats['loads'], 2)
+        self.assertEqual(stats['avg_load_time_s'], 3.0)
+
+    def test_delete(self):
+        cache = ModelCache('test', max_items=2)
+        cache.put('a', 1, size=_MB)
+        del cache['a']
+        self.assertNotIn('a', cache)
+        self.assertEqual(cache.total_size, 0)
+
+
+@mock.patch.object(model_cache, 'get_medcat')
+@mock.patch.object(model_cache, 'ProjectAnnotateEntities')
+class PrewarmModelsTestCase(SimpleTestCase):
+
+    def _projects(self, mock_project_model, *names):
+        projects = [mock.Mock() for _ in names]
+        for project, name in zip(projects, names):
+            project.name = name
+        mock_project_model.objects.filter.return_value = projects
+        return projects
+
+    def test_prewarms_specified_projects(self, mock_project_model, mock_get_medcat):
+        projects = self._projects(mock_project_model, 'p1', 'p2')
+        model_cache.prewarm_models('1, 2')
+        mock_project_model.objects.filter.assert_called_once_with(id__in=[1, 2])
+        self.assertEqual([c.args[0] for c in mock_get_medcat.call_args_list], projects)
+
+    def test_prewarms_all_annotating_projects(self, mock_project_model, mock_get_medcat):
+        self._projects(mock_project_model, 'p1')
+        model_cache.prewarm_models('all')
+        mock_project_model.objects.filter.assert_called_once_with(project_status='A')
+        self.assertEqual(mock_get_medcat.call_count, 1)
+
+    def test_skips_invalid_project_ids(self, mock_project_model, mock_get_medcat):
+        self._projects(mock_project_model, 'p1')
+        with self.assertLogs(model_cache.logger, level='ERROR'):
+            model_cache.prewarm_models('1,abc,,3')
+        mock_project_model.objects.filter.assert_called_once_with(id__in=[1, 3])
+
+    def test_continues_after_failed_load(self, mock_project_model, mock_get_medcat):
+        self._projects(mock_project_model, 'p1', 'p2')
+        mock_get_medcat.side_effect = [Exception('Failed to load'), mock.Mock()]
+        with self.assertLogs(model_cache.logger, level='ERROR'):
+            model_cache.prewarm_models('1,2')
+        self.assertEqual(mock_get_medcat.call_count, 2)
@@ -0,0 +1,91 @@
+import json
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from api.admin import actions
+from api.models import (AnnotatedEntity, ConceptDB, Dataset, Document, Entity, EntityRelation, MetaAnnotation,
+                        MetaTask, MetaTaskValue, ProjectAnnotateEntities, Relation, Vocabulary)
+
+
+class ProjectDataExportTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='annotator')
+        # NOTE: the dataset file is not loaded, the documents are created below
+        with mock.patch('api.signals.dataset_from_file'):
+            dataset = Dataset.objects.create(name='dataset', original_file='dataset.csv')
+        cdb = ConceptDB(name='cdb', cdb_file='cdb.dat')
+        cdb.save(skip_load=True)
+        vocab = Vocabulary(name='vocab', vocab_file='vocab.dat')
+        vocab.save(skip_load=True)
+        cls.docs = [Document.objects.create(name=f'doc {i}', text=f'The patient has kidney failure {i}.',
+                                            dataset=dataset) for i in range(5)]
+
+        presence = MetaTask.objects.create(name='Presence')
+        values = [MetaTaskValue.objects.create(name=name) for name in ('True', 'False')]
+        presence.values.set(values)
+        relation = Relation.objects.create(label='causes')
+
+        def create_project(name, cuis):
+            project = ProjectAnnotateEntities.objects.create(name=name, dataset=dataset, concept_db=cdb, vocab=vocab,
+                                                             cuis=cuis)
+            project.tasks.add(presence)
+            project.relations.add(relation)
+            return project
+
+        cls.project = create_project('project', 'C01,C02')
+        cls.project.validated_documents.add(*cls.docs)
+        kidney_failure, kidney = Entity.objects.create(label='C01'), Entity.objects.create(label='C02')
+        for doc in cls.docs[:3]:
+            ann = AnnotatedEntity.objects.create(user=cls.user, project=cls.project, document=doc,
+                                                 entity=kidney_failure, value='kidney failure', start_ind=16,
+                                                 end_ind=30, acc=0.9, validated=True, correct=True)
+            other_ann = AnnotatedEntity.objects.create(user=cls.user, project=cls.project, document=doc,
+                                                       entity=kidney, value='kidney', start_ind=16, end_ind=22,
+                                                       acc=1.0, validated=True, killed=True, comment='too short')
+            MetaAnnotation.objects.create(annotated_entity=ann, meta_task=presence, meta_task_value=values[0],
+                                          acc=0.8, validated=True)
+            EntityRelation.objects.create(user=cls.user, project=cls.project, document=doc, relation=relation,
+                                          start_entity=ann, end_entity=other_ann, validated=True)
+        # NOTE: a project without any (validated) documents
+        cls.empty_project = create_project('empty project', '')
+
+    def _export(self, projects, chunk_size=actions.EXPORT_DOC_CHUNK_SIZE):
+        return ''.join(actions.iter_project_data_json(projects, chunk_size))
+
+    def test_same_as_retrieved_project_data(self):
+        projects = ProjectAnnotateEntities.objects.filter(id__in=[self.project.id, self.empty_project.id])
+        exported = json.loads(self._export(projects))
+        self.assertEqual(exported, actions.retrieve_project_data(projects))
+        self.assertEqual([p['name'] for p in exported['projects']], ['project', 'empty project'])
+        self.assertEqual(len(exported['projects'][0]['documents']), len(self.docs))
+        self.assertEqual(exported['projects'][1]['documents'], [])
+
+    def test_same_in_chunks(self):
+        projects = ProjectAnnotateEntities.objects.filter(id__in=[self.project.id, self.empty_project.id])
+        # NOTE: more than a single chunk, with a partial chunk at the end
+        self.assertEqual(json.loads(self._export(projects, chunk_size=2)), json.loads(self._export(projects)))
+
+    def test_exports_annotations(self):
+        exported = json.loads(self._export(ProjectAnnotateEntities.objects.filter(id=self.project.id)))
+        doc = exported['projects'][0]['documents'][0]
+        self.assertEqual(doc['text'], self.docs[0].text)
+        self.assertEqual([(ann['cui'], ann['start'], ann['end']) for ann in doc['annotations']],
+                         [('C01', 16, 30), ('C02', 16, 22)])
+        self.assertEqual(doc['annotations'][0]['meta_anns'],
+                         {'Presence': {'name': 'Presence', 'value': 'True', 'acc': 0.8, 'validated': True}})
+        self.assertEqual([(rel['start_entity_cui'], rel['relation'], rel['end_entity_cui'])
+                          for rel in doc['relations']], [('C01', 'causes', 'C02')])
+        # documents without any annotations are still exported
+        self.assertEqual(exported['projects'][0]['documents'][-1]['annotations'], [])
+
+    def test_only_empty_project(self):
+        exported = json.loads(self._export(ProjectAnnotateEntities.objects.filter(id=self.empty_project.id)))
+        self.assertEqual(len(exported['projects']), 1)
+        self.assertEqual(exported['projects'][0]['documents'], [])
+
+    def test_no_projects(self):
+        self.assertEqual(json.loads(self._export(ProjectAnnotateEntities.objects.none())), {'projects': []})
@@ -1,7 +1,11 @@
+import hashlib
 import json
 import logging
 import os
-from typing import List
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Iterable, Iterator, List
 
 from background_task import background
 from django.contrib.auth.models import User
@@ -10,8 +14,8 @@ from django.db.models.signals import post_save
 from django.dispatch import receiver
 from medcat.cat import CAT
 from medcat.cdb import CDB
-from medcat.components.ner.trf.deid import DeIdModel
 from medcat.tokenizing.tokens import UnregisteredDataPathException
+from medcat.utils.config_utils import temp_changed_config
 
 from .model_cache import get_medcat
 from .models import Entity, AnnotatedEntity, ProjectAnnotateEntities, \
@@ -19,6 +23,89 @@ from .models import Entity, AnnotatedEntity, ProjectAnnotateEntities, \
 
 logger = logging.getLogger('trainer')
 
+# the number of documents run through the model (and stored) at once during document preparation
+try:
+    DOC_PREP_BATCH_SIZE = max(int(os.getenv('DOC_PREP_BATCH_SIZE', 32)), 1)
+except ValueError:
+    DOC_PREP_BATCH_SIZE = 32
+    logger.warning("DOC_PREP_BATCH_SIZE is not an integer, using default value of 32")
+
+try:
+    _ANNOTATED_DOC_CACHE_SIZE = int(os.getenv('ANNOTATED_DOC_CACHE_SIZE', 50))
+except ValueError:
+    _ANNOTATED_DOC_CACHE_SIZE = 50
+    logger.warning("ANNOTATED_DOC_CACHE_SIZE is not an integer, using default value of 50")
+
+# LRU cache of the documents produced by the models, by document text hash, so that training on a
+# (submitted) document does not need to run the model over it again
+_ANNOTATED_DOC_CACHE: OrderedDict = OrderedDict()
+_ANNOTATED_DOC_CACHE_LOCK = threading.Lock()
+
+
+def _doc_cache_key(cat: CAT, text: str):
+    return id(cat), hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def annotate_document(cat: CAT, text: str):
+    """
+    Runs the model over the text, caching the resulting document for later training on the same text.
+
+    Args:
+        cat (CAT): the model to use.
+        text (str): the document text.
+
+    Returns:
+        the annotated document.
+    """
+    doc = cat(text)
+    cache_annotated_document(cat, text, doc)
+    return doc
+
+
+def cache_annotated_document(cat: CAT, text: str, doc):
+    """
+    Caches a document the model has been run over, for later training on the same text.
+
+    Args:
+        cat (CAT): the model used.
+        text (str): the document text.
+        doc: the annotated document.
+    """
+    if _ANNOTATED_DOC_CACHE_SIZE > 0:
+        key = _doc_cache_key(cat, text)
+        with _ANNOTATED_DOC_CACHE_LOCK:
+            # NOTE: a weak reference to the model so the cache does not keep evicted models loaded
+            _ANNOTATED_DOC_CACHE[key] = (weakref.ref(cat), doc)
+            _ANNOTATED_DOC_CACHE.move_to_end(key)
+            while len(_ANNOTATED_DOC_CACHE) > _ANNOTATED_DOC_CACHE_SIZE:
+                _ANNOTATED_DOC_CACHE.popitem(last=False)
+
+
+def get_annotated_document(cat: CAT, text: str):
+    """
+    Gets the document for the text, from the cache if the model has already been run over the same text.
+
+    Otherwise the model is run over the text with the (unsupervised) linker training disabled, so that
+    training on the document gives the same result whether or not it was cached.
+
+    Args:
+        cat (CAT): the model to use.
+        text (str): the document text.
+
+    Returns:
+        the annotated document.
+    """
+    key = _doc_cache_key(cat, text)
+    with _ANNOTATED_DOC_CACHE_LOCK:
+        cached = _ANNOTATED_DOC_CACHE.get(key)
+        if cached is not None:
+            _ANNOTATED_DOC_CACHE.move_to_end(key)
+    # NOTE: the id of a model can be reused once it's no longer loaded, so the model needs to match as well
+    if cached is not None and cached[0]() is cat:
+        return cached[1]
+    with temp_changed_config(cat.config.components.linking, 'train', False):
+        return annotate_document(cat, text)
+
 
 def remove_annotations(document, project, partial=False):
     try:
@@ -39,9 +126,11 @@ def remove_annotations(document, project, partial=False):
 def add_annotations(spacy_doc, user, project, document, existing_annotations, cat):
     spacy_doc.linked_ents.sort(key=lambda x: len(x.text), reverse=True)
 
-    tkns_in = []
+    # indices of the tokens already covered by an entity to be added
+    tkns_in = set()
     ents = []
     existing_annos_intervals = [(ann.start_ind, ann.end_ind) for ann in existing_annotations]
+    existing_annos_spans = set(existing_annos_intervals)
     # all MetaTasks and associated values
     # that can be produced are expected to have available models
     try:
@@ -69,66 +158,64 @@ def add_annotations(spacy_doc, user, project, document, existing_annotations, ca
 
     for ent in spacy_doc.linked_ents:
         if not check_ents(ent) and check_filters(ent.cui, cat.config.components.linking.filters):
-            to_add = True
-            for tkn in ent:
-                if tkn in tkns_in:
-                    to_add = False
-            if to_add:
-                for tkn in ent:
-                    tkns_in.append(tkn)
+            ent_tkns = {tkn.index for tkn in ent}
+            if tkns_in.isdisjoint(ent_tkns):
+                tkns_in.update(ent_tkns)
                 ents.append(ent)
 
     logger.debug('Found %s annotations to store', len(ents))
+    if not ents:
+        return
+
+    # resolve (and create any missing) entities in bulk
+    labels = {ent.cui for ent in ents}
+    label2entity = Entity.objects.in_bulk(labels, field_name='label')
+    missing_labels = labels - label2entity.keys()
+    if missing_labels:
+        Entity.objects.bulk_create([Entity(label=label) for label in missing_labels], ignore_conflicts=True)
+        label2entity = Entity.objects.in_bulk(labels, field_name='label')
+
+    MIN_ACC = cat.config.components.linking.similarity_threshold
+    ann_ents = []
     for ent in ents:
-        logger.debug('Processing annotation ent %s of %s', ents.index(ent), len(ents))
-        label = ent.cui
-
-        if not Entity.objects.filter(label=label).exists():
-            # Create the entity
-            entity = Entity()
-            entity.label = label
-            entity.save()
-        else:
-            entity = Entity.objects.get(label=label)
-
-        ann_ent = AnnotatedEntity.objects.filter(project=project,
-                                                  document=document,
-                                                  start_ind=ent.start_char_index,
-                                                  end_ind=ent.end_char_index).first()
-        if ann_ent is None:
-            # If this entity doesn't exist already
-            ann_ent = AnnotatedEntity()
-            ann_ent.user = user
-            ann_ent.project = project
-            ann_ent.document = document
-            ann_ent.entity = entity
-            ann_ent.value = ent.text
-            ann_ent.start_ind = ent.start_char_index
-            ann_ent.end_ind = ent.end_char_index
-            ann_ent.acc = ent.context_similarity
-
-            MIN_ACC = cat.config.components.linking.similarity_threshold
-            if ent.context_similarity < MIN_ACC:
-                ann_ent.deleted = True
-                ann_ent.validated = True
-
-            ann_ent.save()
-
-            # TODO: Fix before v2 release.
-            # check the ent.get_addon_data('meta_cat_meta_anns') if it exists
-            # if hasattr(ent, 'get_addon_data') and \
-            #            len(metatask2obj) > 0 and
-            #            len(metataskvals2obj) > 0:
-            #     logger.debug('Found %s meta annos on ent', len(ent._.meta_anns.items()))
-            #     for meta_ann_task, pred in ent._.meta_anns.items():
-            #         meta_anno_obj = MetaAnnotation()
-            #         meta_anno_obj.predicted_meta_task_value = metataskvals2obj[meta_ann_task][pred['value']]
-            #         meta_anno_obj.meta_task = metatask2obj[meta_ann_task]
-            #         meta_anno_obj.annotated_entity = ann_ent
-            #         meta_anno_obj.meta_task_value = metataskvals2obj[meta_ann_task][pred['value']]
-            #         meta_anno_obj.acc = pred['confidence']
-            #         meta_anno_obj.save()
-            #         logger.debug('Successfully saved %s', meta_anno_obj)
+        if (ent.start_char_index, ent.end_char_index) in existing_annos_spans:
+            # this entity exists already
+            continue
+        ann_ent = AnnotatedEntity()
+        ann_ent.user = user
+        ann_ent.project = project
+        ann_ent.document = document
+        ann_ent.entity = label2entity[ent.cui]
+        ann_ent.value = ent.text
+        ann_ent.start_ind = ent.start_char_index
+        ann_ent.end_ind = ent.end_char_index
+        ann_ent.acc = ent.context_similarity
+
+        if ent.context_similarity < MIN_ACC:
+            ann_ent.deleted = True
+            ann_ent.validated = True
+        ann_ents.append(ann_ent)
+
+    # NOTE: bulk_create skips AnnotatedEntity.save, so project.last_modified is only updated
+    #       when the caller saves the project after adding the annotations
+    AnnotatedEntity.objects.bulk_create(ann_ents)
+    logger.debug('Stored %s annotations', len(ann_ents))
+
+    # TODO: Fix before v2 release.
+    # check the ent.get_addon_data('meta_cat_meta_anns') if it exists
+    # if hasattr(ent, 'get_addon_data') and \
+    #            len(metatask2obj) > 0 and
+    #            len(metataskvals2obj) > 0:
+    #     logger.debug('Found %s meta annos on ent', len(ent._.meta_anns.items()))
+    #     for meta_ann_task, pred in ent._.meta_anns.items():
+    #         meta_anno_obj = MetaAnnotation()
+    #         meta_anno_obj.predicted_meta_task_value = metataskvals2obj[meta_ann_task][pred['value']]
+    #         meta_anno_obj.meta_task = metatask2obj[meta_ann_task]
+    #         meta_anno_obj.annotated_entity = ann_ent
+    #         meta_anno_obj.meta_task_value = metataskvals2obj[meta_ann_task][pred['value']]
+    #         meta_anno_obj.acc = pred['confidence']
+    #         meta_anno_obj.save()
+    #         logger.debug('Successfully saved %s', meta_anno_obj)
 
 
 def clear_cdb_cnf_addons(cdb: CDB, cdb_id: str | int):
@@ -213,15 +300,19 @@ def create_annotation(source_val: str, selection_occurrence_index: int, cui: str
 
 def train_medcat(cat, project, document):
     # Get all annotations
-    anns = AnnotatedEntity.objects.filter(project=project, document=document, validated=True, killed=False)
+    all_anns = list(AnnotatedEntity.objects.filter(project=project, document=document).select_related('entity'))
+    anns = [ann for ann in all_anns if ann.validated and not ann.killed]
     text = document.text
-    spacy_doc = cat(text)
 
     if len(anns) > 0 and text is not None and len(text) > 5:
+        # NOTE: reuses the document from when it was prepared (if available), rather than running the model again
+        spacy_doc = get_annotated_document(cat, text)
+        char_index2token = {tkn.char_index: tkn for tkn in spacy_doc}
         for ann in anns:
             cui = ann.entity.label
             # Indices for this annotation
-            spacy_entity = [tkn for tkn in spacy_doc if tkn.char_index == ann.start_ind]
+            tkn = char_index2token.get(ann.start_ind)
+            spacy_entity = [tkn] if tkn is not None else []
             # This will add the concept if it doesn't exist and if it
             # does just link the new name to the concept, if the namee is
             # already linked then it will just train.
@@ -239,14 +330,14 @@ def train_medcat(cat, project, document):
             )
 
     # Completely remove concept names that the user killed
-    killed_anns = AnnotatedEntity.objects.filter(project=project, document=document, killed=True)
+    killed_anns = [ann for ann in all_anns if ann.killed]
     for ann in killed_anns:
         cui = ann.entity.label
         name = ann.value
         cat.trainer.unlink_concept_name(cui=cui, name=name)
 
     # Add irrelevant cuis to cui_exclude
-    irrelevant_anns = AnnotatedEntity.objects.filter(project=project, document=document, irrelevant=True)
+    irrelevant_anns = [ann for ann in all_anns if ann.irrelevant]
     for ann in irrelevant_anns:
         cui = ann.entity.label
         if 'cuis_exclude' not in cat.config.components.linking.filters:
@@ -258,7 +349,7 @@ def train_medcat(cat, project, document):
 def prep_docs(project_id: List[int], doc_ids: List[int], user_id: int):
     user = User.objects.get(id=user_id)
     project = ProjectAnnotateEntities.objects.get(id=project_id)
-    docs = Document.objects.filter(id__in=doc_ids)
+    docs = Document.objects.filter(id__in=doc_ids).iterator(chunk_size=DOC_PREP_BATCH_SIZE)
 
     logger.info('Loading CAT object in bg process for project: %s', project.id)
     cat = get_medcat(project=project)
@@ -266,28 +357,42 @@ def prep_docs(project_id: List[int], doc_ids: List[int], user_id: int):
     # Set CAT filters
     cat.config.components.linking.filters.cuis = project.cuis
 
-    for doc in docs:
-        logger.info(f'Running MedCAT model for project {project.id}:{project.name} over doc: {doc.id}')
-        if not project.deid_model_annotation:
-            spacy_doc = cat(doc.text)
-        else:
-            deid = DeIdModel(cat)
-            spacy_doc = deid(doc.text)
-        anns = AnnotatedEntity.objects.filter(document=doc).filter(project=project)
+    for batch in _batched(docs, DOC_PREP_BATCH_SIZE):
+        logger.info('Running MedCAT model for project %s:%s over docs: %s', project.id, project.name,
+                    [doc.id for doc in batch])
+        # NOTE: the De-ID model just wraps the CAT, so both run the documents through the CAT pipeline
+        spacy_docs = cat.get_docs([doc.text for doc in batch])
+        doc_anns = {doc.id: [] for doc in batch}
+        for ann in AnnotatedEntity.objects.filter(project=project, document__in=batch):
+            doc_anns[ann.document_id].append(ann)
+        # NOTE: the documents are not cached for training on submit since this runs in the background
+        #       task process, the cache of which is never used by the web workers
         with transaction.atomic():
-            add_annotations(spacy_doc=spacy_doc,
-                            user=user,
-                            project=project,
-                            document=doc,
-                            cat=cat,
-                            existing_annotations=anns)
-            # add doc to prepared_documents
-        project.prepared_documents.add(doc)
+            for doc, spacy_doc in zip(batch, spacy_docs):
+                add_annotations(spacy_doc=spacy_doc,
+                                user=user,
+                                project=project,
+                                document=doc,
+                                cat=cat,
+                                existing_annotations=doc_anns[doc.id])
+            # add docs to prepared_documents
+            project.prepared_documents.add(*batch)
     project.save()
     logger.info('Prepared all docs for project: %s, docs processed: %s',
                 project.id, project.prepared_documents)
 
 
+def _batched(items: Iterable, batch_size: int) -> Iterator[list]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
 @receiver(post_save, sender=ProjectAnnotateEntities)
 def save_project_anno(sender, instance, **kwargs):
     if instance.cuis_file:
@@ -15,17 +15,18 @@ from medcat.utils.cdb_utils import ch2pt_from_pt2ch, get_all_ch, snomed_ct_conce
 from rest_framework import viewsets
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
-from medcat.components.ner.trf.deid import DeIdModel
 
 from .admin import download_projects_with_text, download_projects_without_text, \
     import_concepts_from_cdb
 from .data_utils import upload_projects_export
 from .metrics import calculate_metrics
-from .model_cache import get_medcat, get_cached_cdb, VOCAB_MAP, clear_cached_medcat, CAT_MAP, CDB_MAP, is_model_loaded
+from .model_cache import get_medcat, get_cached_cdb, VOCAB_MAP, clear_cached_medcat, CAT_MAP, CDB_MAP, is_model_loaded, \
+    cache_stats
 from .permissions import *
 from .serializers import *
 from .solr_utils import collections_available, search_collection, ensure_concept_searchable
-from .utils import add_annotations, remove_annotations, train_medcat, create_annotation, prep_docs
+from .utils import add_annotations, remove_annotations, train_medcat, create_annotation, prep_docs, \
+    annotate_document, get_annotated_document
 
 # For local testing, put envs
 """
@@ -283,13 +284,8 @@ def prepare_documents(request):
                     # Set CAT filters
                     cat.config.components.linking.filters.cuis = cuis
 
-                    if not project.deid_model_annotation:
-                        spacy_doc = cat(document.text)
-                    else:
-                        deid = DeIdModel(cat)
-                        spacy_doc = deid(document.text)
-
-                    spacy_doc = cat(document.text)
+                    # NOTE: the De-ID model just wraps the CAT, so both run the document through the CAT pipeline
+                    spacy_doc = annotate_document(cat, document.text)
 
                     add_annotations(spacy_doc=spacy_doc,
                                     user=user,
@@ -419,7 +415,7 @@ def add_concept(request):
         logger.error(err_msg)
         return Response({'err': err_msg}, 400)
 
-    spacy_doc = cat(document.text)
+    spacy_doc = get_annotated_document(cat, document.text)
     spacy_entity = None
     if source_val in spacy_doc.text:
         start = spacy_doc.text.index(source_val)
@@ -739,7 +735,7 @@ def model_loaded(_):
     for p in ProjectAnnotateEntities.objects.all():
         models_loaded[p.id] = is_model_loaded(p)
 
-    return Response({'model_states': models_loaded})
+    return Response({'model_states': models_loaded, 'cache_stats': cache_stats()})
 
 
 @api_view(http_method_names=['GET', 'POST'])
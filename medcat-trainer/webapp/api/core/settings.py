@@ -271,6 +271,14 @@ BACKGROUND_TASK_ASYNC_THREADS = 4
 SOLR_HOST = os.environ.get('CONCEPT_SEARCH_SERVICE_HOST', 'solr')
 SOLR_PORT = os.environ.get('CONCEPT_SEARCH_SERVICE_PORT', '8983')
 
+# Concept search backend: 'solr' for the Solr concept search service, or 'local' for the built-in index
+CONCEPT_SEARCH_BACKEND = os.environ.get('CONCEPT_SEARCH_BACKEND', 'solr').lower()
+if CONCEPT_SEARCH_BACKEND not in ('solr', 'local'):
+    raise ValueError("CONCEPT_SEARCH_BACKEND must be 'solr' or 'local'")
+# Whether to also keep the built-in index when using solr, and search it if solr cannot be reached
+CONCEPT_SEARCH_LOCAL_FALLBACK = os.environ.get('CONCEPT_SEARCH_LOCAL_FALLBACK', 'false').lower() in ('1', 'y', 'true')
+CONCEPT_SEARCH_INDEX_DIR = os.environ.get('CONCEPT_SEARCH_INDEX_DIR', os.path.join(MEDIA_ROOT, 'concept_search'))
+
 SILENCED_SYSTEM_CHECKS = ['admin.E130']
 
 # For testing only
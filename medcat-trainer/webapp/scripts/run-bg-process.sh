@@ -2,6 +2,8 @@
 
 # env vars that should only be on for app running...
 export RESUBMIT_ALL_ON_STARTUP=0
+TMP_PRELOAD_MEDCAT_PROJECTS_VAR=$PRELOAD_MEDCAT_PROJECTS
+export PRELOAD_MEDCAT_PROJECTS=
 
 # Collect static files and migrate if needed
 python /home/api/manage.py collectstatic --noinput
@@ -10,4 +12,5 @@ python /home/api/manage.py makemigrations api --noinput
 python /home/api/manage.py migrate --noinput
 python /home/api/manage.py migrate api --noinput
 
+export PRELOAD_MEDCAT_PROJECTS=$TMP_PRELOAD_MEDCAT_PROJECTS_VAR
 python /home/api/manage.py process_tasks --log-std
@@ -1,9 +1,10 @@
 from typing import Optional, Union, Any, overload, Literal, Iterable, Iterator
-from typing import cast, Type, TypeVar
+from typing import cast, Type, TypeVar, Callable
 import os
 import json
 from datetime import date
-from concurrent.futures import ProcessPoolExecutor, as_completed, Future
+from concurrent.futures import ProcessPoolExecutor, Future
+from concurrent.futures import wait, FIRST_COMPLETED
 import itertools
 from contextlib import contextmanager
 from collections import deque
@@ -36,6 +37,7 @@ from medcat.utils.defaults import doing_legacy_conversion_message
 from medcat.utils.defaults import LegacyConversionDisabledError
 from medcat.utils.usage_monitoring import UsageMonitor, _NoDelUM
 from medcat.utils.import_utils import MissingDependenciesError
+from medcat.utils.worker_pool import WorkerPool
 
 
 logger = logging.getLogger(__name__)
@@ -71,6 +73,7 @@ class CAT(AbstractSerialisable):
             self.config.merge_config(config_dict)
 
         self._trainer: Optional[Trainer] = None
+        self._worker_pool: Optional[WorkerPool] = None
         self._pipeline = self._recreate_pipe(model_load_path, addon_config_dict)
         self.usage_monitor = UsageMonitor(
             self._get_hash, self.config.general.usage_monitor)
@@ -102,14 +105,42 @@ class CAT(AbstractSerialisable):
             '_pipeline',  # need to recreate regardless
             'config',  # will be loaded along with CDB
             'usage_monitor',  # will be created at startup
+            '_worker_pool',  # needs to be started explicitly
         ]
 
+    def __getstate__(self) -> dict[str, Any]:
+        # NOTE: the worker pool (if present) can't be sent to other processes
+        state = self.__dict__.copy()
+        state['_worker_pool'] = None
+        return state
+
     def __call__(self, text: str) -> Optional[MutableDocument]:
         doc = self._pipeline.get_doc(text)
         if self.usage_monitor.should_monitor:
             self.usage_monitor.log_inference(len(text), len(doc.linked_ents))
         return doc
 
+    def get_docs(self, texts: Iterable[str]) -> list[MutableDocument]:
+        """Get the annotated documents for multiple texts.
+
+        This is the batched equivalent of calling the model on each text.
+        The addons that support batching process all the documents at once.
+
+        Args:
+            texts (Iterable[str]): The input texts.
+
+        Returns:
+            list[MutableDocument]: The documents (in the same order as
+                the texts).
+        """
+        texts = list(texts)
+        docs = self._pipeline.get_docs(texts)
+        if self.usage_monitor.should_monitor:
+            for text, doc in zip(texts, docs):
+                self.usage_monitor.log_inference(
+                    len(text), len(doc.linked_ents))
+        return docs
+
     def _ensure_not_training(self) -> None:
         """Method to ensure config is not set to train.
 
@@ -195,9 +226,27 @@ class CAT(AbstractSerialisable):
                 addon._init_data_paths(self._pipeline.tokenizer)
             elif has_rel_cat and isinstance(addon, RelCATAddon):
                 addon._rel_cat._init_data_paths()
-        return [
-            (text_index, self.get_entities(text, only_cui=only_cui))
-            for text, text_index, only_cui in texts_and_indices]
+        if not self.config.components.batch_addons:
+            return [
+                (text_index, self.get_entities(text, only_cui=only_cui))
+                for text, text_index, only_cui in texts_and_indices]
+        return self._get_entities_batch(texts_and_indices)
+
+    def _get_entities_batch(
+            self,
+            texts_and_indices: list[tuple[str, str, bool]]
+            ) -> list[tuple[str, Union[dict, Entities, OnlyCUIEntities]]]:
+        self._ensure_not_training()
+        docs = self._pipeline.get_docs(
+            [text for text, _, _ in texts_and_indices])
+        out: list[tuple[str, Union[dict, Entities, OnlyCUIEntities]]] = []
+        for doc, (text, text_index, only_cui) in zip(docs, texts_and_indices):
+            if self.usage_monitor.should_monitor:
+                self.usage_monitor.log_inference(
+                    len(text), len(doc.linked_ents))
+            out.append((text_index, self._doc_to_out(doc, only_cui=only_cui)
+                        if doc else {}))
+        return out
 
     def _generate_batches_by_char_length(
             self,
@@ -268,56 +317,84 @@ class CAT(AbstractSerialisable):
             ]
             text_index += len(batch)
 
-    def _mp_one_batch_per_process(
+    @staticmethod
+    def _pop_ready_batches(
+            pending: deque[Union[Future, list]], ordered: bool
+            ) -> list[list[tuple[str, Union[dict, Entities, OnlyCUIEntities]]]]:
+        def is_done(entry: Union[Future, list]) -> bool:
+            return not isinstance(entry, Future) or entry.done()
+
+        def get_results(entry: Union[Future, list]) -> list:
+            return entry.result() if isinstance(entry, Future) else entry
+
+        ready: list[list] = []
+        if ordered:
+            while pending and is_done(pending[0]):
+                ready.append(get_results(pending.popleft()))
+            return ready
+        not_done: list[Union[Future, list]] = []
+        for entry in pending:
+            if is_done(entry):
+                ready.append(get_results(entry))
+            else:
+                not_done.append(entry)
+        if ready:
+            pending.clear()
+            pending.extend(not_done)
+        return ready
+
+    def _mp_stream_batches(
             self,
-            executor: ProcessPoolExecutor,
+            submit: Callable[[list[tuple[str, str, bool]]], Future],
             batch_iter: Iterator[list[tuple[str, str, bool]]],
-            external_processes: int,
+            max_in_flight: int,
+            ordered: bool,
             saver: Optional[BatchAnnotationSaver],
+            use_main_process: bool,
             ) -> Iterator[tuple[str, Union[dict, Entities, OnlyCUIEntities]]]:
-        futures: list[Future] = []
-        # submit batches, one for each external processes
-        for _ in range(external_processes):
-            try:
-                batch = next(batch_iter)
-                futures.append(
-                    executor.submit(self._mp_worker_func, batch))
-            except StopIteration:
-                break
-        if not futures:
-            # NOTE: if there wasn't any data, we didn't process anything
-            raise OutOfDataException()
-        # Main process works on next batch while workers are busy
-        main_batch: Optional[list[tuple[str, str, bool]]]
+        # NOTE: each entry is either the future of a batch submitted to a
+        #       worker or the results of a batch done in the main process
+        #       and they're kept in input order
+        pending: deque[Union[Future, list]] = deque()
+        out_of_data = False
         try:
-            main_batch = next(batch_iter)
-            main_results = self._mp_worker_func(main_batch)
-            if saver:
-                saver(main_results)
-            # Yield main process results immediately
-            yield from main_results
-
-        except StopIteration:
-            main_batch = None
-        # since the main process did around the same amount of work
-        # we would expect all subprocess to have finished by now
-        # so we're going to wait for them to finish, yield their results,
-        # and subsequently submit the next batch to keep them busy
-        for _ in range(external_processes):
-            if not futures:
-                # NOTE: if there's no futures then there can't be
-                #       anything to batch
-                break
-            # Wait for any future to complete
-            done_future = next(as_completed(futures))
-            futures.remove(done_future)
-
-            cur_results = done_future.result()
-            if saver:
-                saver(cur_results)
-
-            # Yield all results from this batch
-            yield from cur_results
+            while True:
+                # refill as soon as something is done, but never hold on
+                # to more than the allowed number of batches
+                while not out_of_data and len(pending) < max_in_flight:
+                    batch = next(batch_iter, None)
+                    if batch is None:
+                        out_of_data = True
+                    else:
+                        pending.append(submit(batch))
+                if not pending:
+                    break
+                ready = self._pop_ready_batches(pending, ordered)
+                if ready:
+                    for results in ready:
+                        if saver:
+                            saver(results)
+                        yield from results
+                    continue
+                # nothing ready, so the main process may work on one
+                # extra batch while the workers are busy
+                if (use_main_process and not out_of_data and
+                        len(pending) <= max_in_flight):
+                    batch = next(batch_iter, None)
+                    if batch is None:
+                        out_of_data = True
+                    else:
+                        pending.append(self._mp_worker_func(batch))
+                    continue
+                # NOTE: if ordered, only the first batch is relevant
+                to_wait = [pending[0]] if ordered else pending
+                wait([entry for entry in to_wait if isinstance(entry, Future)],
+                     return_when=FIRST_COMPLETED)
+        finally:
+            # NOTE: if the consumer stops early, don't do any more work
+            for entry in pending:
+                if isinstance(entry, Future):
+                    entry.cancel()
 
     def save_entities_multi_texts(
             self,
@@ -328,6 +405,7 @@ class CAT(AbstractSerialisable):
             batch_size: int = -1,
             batch_size_chars: int = 1_000_000,
             batches_per_save: int = 20,
+            save_format: Literal['pickle', 'parquet'] = 'pickle',
     ) -> None:
         """Saves the resulting entities on disk and allows multiprocessing.
 
@@ -359,6 +437,11 @@ class CAT(AbstractSerialisable):
                 Each process will be given batch of texts with a total
                 number of characters not exceeding this value. Defaults
                 to 1,000,000 characters. Set to -1 to disable.
+            batches_per_save (int):
+                The number of patches to save at once. Defaults to 20.
+            save_format (Literal['pickle', 'parquet']):
+                The format to save the entities in. See
+                `get_entities_multi_texts` for details. Defaults to 'pickle'.
         """
         if save_dir_path is None:
             raise ValueError("Need to specify a save path (`save_dir_path`), "
@@ -366,7 +449,8 @@ class CAT(AbstractSerialisable):
         out_iter = self.get_entities_multi_texts(
             texts, only_cui=only_cui, n_process=n_process,
             batch_size=batch_size, batch_size_chars=batch_size_chars,
-            save_dir_path=save_dir_path, batches_per_save=batches_per_save)
+            save_dir_path=save_dir_path, batches_per_save=batches_per_save,
+            save_format=save_format)
         # NOTE: not keeping anything since it'll be saved on disk
         deque(out_iter, maxlen=0)
 
@@ -379,12 +463,16 @@ class CAT(AbstractSerialisable):
             batch_size_chars: int = 1_000_000,
             save_dir_path: Optional[str] = None,
             batches_per_save: int = 20,
+            ordered: bool = False,
+            max_batches_in_flight: int = -1,
+            save_format: Literal['pickle', 'parquet'] = 'pickle',
             ) -> Iterator[tuple[str, Union[dict, Entities, OnlyCUIEntities]]]:
         """Get entities from multiple texts (potentially in parallel).
 
         If `n_process` > 1, `n_process - 1` new processes will be created
         and data will be processed on those as well as the main process in
-        parallel.
+        parallel. If a worker pool is running (see `start_worker_pool`), its
+        (already initialised) workers are used instead of new processes.
 
         Args:
             texts (Union[Iterable[str], Iterable[tuple[str, str]]]):
@@ -415,6 +503,26 @@ class CAT(AbstractSerialisable):
             batches_per_save (int):
                 The number of patches to save (if `save_dir_path` is specified)
                 at once. Defaults to 20.
+            ordered (bool):
+                Whether to yield the results in the same order as the input
+                texts when multiprocessing. The results are still streamed
+                as they become available. Defaults to False.
+            max_batches_in_flight (int):
+                The maximum number of batches that have been taken off the
+                input but not yet yielded when multiprocessing. This bounds
+                the memory used. A worker gets a new batch as soon as it
+                finishes its previous one as long as this limit allows it.
+                Defaults to -1, in which case twice the number of worker
+                processes is used.
+            save_format (Literal['pickle', 'parquet']):
+                The format to save the entities in (if `save_dir_path` is
+                specified). With 'parquet', each part is saved as a
+                `part_<num>.parquet` file, the saved indices are appended
+                to an `annotated_ids.jsonl` manifest and the texts with
+                indices already in the manifest are skipped (so an
+                interrupted run can be resumed). The output can be read
+                using `medcat.storage.parquet_ents_save.ParquetAnnotationReader`.
+                This requires the `parquet` extra. Defaults to 'pickle'.
 
         Yields:
             Iterator[tuple[str, Union[dict, Entities, OnlyCUIEntities]]]:
@@ -424,18 +532,42 @@ class CAT(AbstractSerialisable):
             Union[Iterator[str], Iterator[tuple[str, str]]], iter(texts))
         batch_iter = self._generate_batches(
             text_iter, batch_size, batch_size_chars, only_cui)
-        if save_dir_path:
+        saver: Optional[BatchAnnotationSaver]
+        if save_dir_path and save_format == 'parquet':
+            from medcat.storage.parquet_ents_save import ParquetAnnotationSaver
+            saver = ParquetAnnotationSaver(save_dir_path, batches_per_save)
+            if saver.annotated_ids:
+                batch_iter = self._skip_annotated(
+                    batch_iter, saver.annotated_ids)
+        elif save_dir_path and save_format == 'pickle':
             saver = BatchAnnotationSaver(save_dir_path, batches_per_save)
+        elif save_dir_path:
+            raise ValueError(f"Unknown save format: {save_format}")
         else:
             saver = None
         yield from self._get_entities_multi_texts(
-            n_process=n_process, batch_iter=batch_iter, saver=saver)
+            n_process=n_process, batch_iter=batch_iter, saver=saver,
+            ordered=ordered, max_batches_in_flight=max_batches_in_flight)
+
+    @staticmethod
+    def _skip_annotated(
+            batch_iter: Iterator[list[tuple[str, str, bool]]],
+            annotated_ids: set[str],
+            ) -> Iterator[list[tuple[str, str, bool]]]:
+        # NOTE: the set is used as is since it's only added to as
+        #       new parts are saved (i.e for texts already processed)
+        for batch in batch_iter:
+            batch = [item for item in batch if item[1] not in annotated_ids]
+            if batch:
+                yield batch
 
     def _get_entities_multi_texts(
             self,
             n_process: int,
             batch_iter: Iterator[list[tuple[str, str, bool]]],
             saver: Optional[BatchAnnotationSaver],
+            ordered: bool = False,
+            max_batches_in_flight: int = -1,
             ) -> Iterator[tuple[str, Union[dict, Entities, OnlyCUIEntities]]]:
         if n_process == 1:
             # just do in series
@@ -449,8 +581,15 @@ class CAT(AbstractSerialisable):
                 saver._save_cache()
             return
 
-        with self._no_usage_monitor_exit_flushing():
-            yield from self._multiprocess(n_process, batch_iter, saver)
+        pool = self.worker_pool
+        if pool is not None:
+            yield from self._multiprocess_with_pool(
+                pool, batch_iter, saver, ordered, max_batches_in_flight)
+        else:
+            with self._no_usage_monitor_exit_flushing():
+                yield from self._multiprocess(
+                    n_process, batch_iter, saver, ordered,
+                    max_batches_in_flight)
         if saver:
             # save remainder
             saver._save_cache()
@@ -474,8 +613,12 @@ class CAT(AbstractSerialisable):
             self, n_process: int,
             batch_iter: Iterator[list[tuple[str, str, bool]]],
             saver: Optional[BatchAnnotationSaver],
+            ordered: bool = False,
+            max_batches_in_flight: int = -1,
             ) -> Iterator[tuple[str, Union[dict, Entities, OnlyCUIEntities]]]:
         external_processes = n_process - 1
+        if max_batches_in_flight < 1:
+            max_batches_in_flight = 2 * external_processes
         if self.FORCE_SPAWN_MP:
             import multiprocessing as mp
             logger.info(
@@ -484,12 +627,86 @@ class CAT(AbstractSerialisable):
                 "libraries using threads or native extensions.")
             mp.set_start_method("spawn", force=True)
         with ProcessPoolExecutor(max_workers=external_processes) as executor:
-            while True:
-                try:
-                    yield from self._mp_one_batch_per_process(
-                        executor, batch_iter, external_processes, saver=saver)
-                except OutOfDataException:
-                    break
+
+            def submit(batch: list[tuple[str, str, bool]]) -> Future:
+                return executor.submit(self._mp_worker_func, batch)
+
+            yield from self._mp_stream_batches(
+                submit, batch_iter, max_batches_in_flight, ordered,
+                saver=saver, use_main_process=True)
+
+    def _multiprocess_with_pool(
+            self, pool: WorkerPool,
+            batch_iter: Iterator[list[tuple[str, str, bool]]],
+            saver: Optional[BatchAnnotationSaver],
+            ordered: bool = False,
+            max_batches_in_flight: int = -1,
+            ) -> Iterator[tuple[str, Union[dict, Entities, OnlyCUIEntities]]]:
+        if max_batches_in_flight < 1:
+            max_batches_in_flight = 2 * pool.n_workers
+        # NOTE: the main process is left free since the pool is generally
+        #       used when it has other things to do (e.g serve requests)
+        yield from self._mp_stream_batches(
+            pool.submit, batch_iter, max_batches_in_flight, ordered,
+            saver=saver, use_main_process=False)
+
+    @property
+    def worker_pool(self) -> Optional[WorkerPool]:
+        """The running worker pool (if any)."""
+        if self._worker_pool is not None and self._worker_pool.is_running:
+            return self._worker_pool
+        return None
+
+    def start_worker_pool(self, n_workers: int,
+                          model_pack_path: Optional[str] = None,
+                          wait_for_workers: bool = True,
+                          timeout: Optional[float] = None,
+                          ) -> WorkerPool:
+        """Start a long lived pool of worker processes.
+
+        Each worker has the model loaded once upon start. While the pool
+        is running, `get_entities_multi_texts` (with `n_process` > 1) uses
+        these workers instead of starting new processes for every call.
+
+        The workers use the model as it was when the pool was started.
+        So if the model changes (e.g due to training), the pool should be
+        restarted.
+
+        Args:
+            n_workers (int): The number of worker processes.
+            model_pack_path (Optional[str]): If specified, the workers load
+                the model pack off disk rather than getting the model
+                from this process. Defaults to None.
+            wait_for_workers (bool): Whether to wait for all the workers to
+                be ready. Defaults to True.
+            timeout (Optional[float]): The time (in seconds) to wait for the
+                workers to start. Defaults to None (no limit).
+
+        Raises:
+            ValueError: If a worker pool is already running.
+
+        Returns:
+            WorkerPool: The started worker pool.
+        """
+        if self.worker_pool is not None:
+            raise ValueError("A worker pool is already running. Shut it "
+                             "down before starting a new one.")
+        pool = WorkerPool(self, n_workers, model_pack_path=model_pack_path,
+                          force_spawn=self.FORCE_SPAWN_MP)
+        pool.start(wait_for_workers=wait_for_workers, timeout=timeout)
+        self._worker_pool = pool
+        return pool
+
+    def shutdown_worker_pool(self, wait: bool = True) -> None:
+        """Shut down the worker pool (if running).
+
+        Args:
+            wait (bool): Whether to wait for the currently running work
+                to finish. Defaults to True.
+        """
+        if self._worker_pool is not None:
+            self._worker_pool.shutdown(wait=wait)
+            self._worker_pool = None
 
     def _get_entity(self, ent: MutableEntity,
                     doc_tokens: list[str],
@@ -674,7 +891,9 @@ class CAT(AbstractSerialisable):
             pack_name (str, optional): The model pack name.
                 Defaults to DEFAULT_PACK_NAME.
             serialiser_type (Union[str, AvailableSerialisers], optional):
-                The serialiser type. Defaults to 'dill'.
+                The serialiser type. Defaults to 'dill'. Use 'dill_mmap'
+                to save the large arrays (e.g vectors) in separate `.npy`
+                files that are memory mapped upon load.
             make_archive (bool):
                 Whether to make the arhive /.zip file. Defaults to True.
             only_archive (bool):
@@ -1027,7 +1246,3 @@ class CAT(AbstractSerialisable):
             addon for addon in self.get_addons()
             if isinstance(addon, addon_type)
         ]
-
-
-class OutOfDataException(ValueError):
-    pass
@@ -1,10 +1,13 @@
-from typing import Iterable, Any, Collection, Union, Literal, Sequence
+from typing import (Iterable, Any, Collection, Union, Literal, Sequence,
+                    Optional)
 import os
+import uuid
 
 from medcat.storage.serialisables import AbstractSerialisable
 from medcat.cdb.concepts import CUIInfo, NameInfo, TypeInfo
 from medcat.cdb.concepts import get_new_cui_info, get_new_name_info
 from medcat.cdb.concepts import reset_cui_training
+from medcat.cdb.context_vectors import DenseContextVectors
 from medcat.storage.serialisers import (
     deserialise, AvailableSerialisers, serialise)
 from medcat.storage.zip_utils import (
@@ -36,11 +39,84 @@ class CDB(AbstractSerialisable):
         self._subnames: set[str] = set()
         self.is_dirty = False
         self.has_changed_names = False
+        self._name_version = 0
+        self._names_id = uuid.uuid4().hex
+        self._dense_context_vectors: Optional[DenseContextVectors] = None
 
     @classmethod
     def get_init_attrs(cls) -> list[str]:
         return ['config']
 
+    @classmethod
+    def ignore_attrs(cls) -> list[str]:
+        # NOTE: the dense context vectors are rebuilt from
+        #       cui2info upon request
+        return ['_dense_context_vectors', '_name_version']
+
+    @property
+    def name_version(self) -> int:
+        """The number of times names have been added or removed.
+
+        This is only ever incremented (and is not saved) so it can be
+        used to check whether the names have changed since a previous
+        point in time.
+        """
+        return self._name_version
+
+    @property
+    def names_id(self) -> str:
+        """A (random) ID of the current names.
+
+        This is changed whenever names are added or removed and is saved
+        along with the CDB, so it can be used to check whether something
+        built for the names (e.g the NER trie) still matches them.
+        """
+        return self._names_id
+
+    def _names_changed(self) -> None:
+        self._name_version += 1
+        self._names_id = uuid.uuid4().hex
+
+    @property
+    def dense_context_vectors(self) -> Optional[DenseContextVectors]:
+        """The dense context vector storage (if enabled)."""
+        return self._dense_context_vectors
+
+    def enable_dense_context_vectors(self) -> DenseContextVectors:
+        """Keep the context vectors in dense matrices.
+
+        This stores all the context vectors of a context type in one
+        contiguous (float32) matrix and replaces the per concept vectors
+        with views into said matrix. This reduces the memory overhead for
+        large CDBs and allows calculating similarities in a vectorised
+        manner.
+
+        If already enabled, the existing storage is returned.
+
+        Returns:
+            DenseContextVectors: The dense storage.
+        """
+        store = self._dense_context_vectors
+        if store is None or store.cui2info is not self.cui2info:
+            store = DenseContextVectors.from_cui2info(self.cui2info)
+            self._dense_context_vectors = store
+        return store
+
+    def disable_dense_context_vectors(self) -> None:
+        """Stop keeping the context vectors in dense matrices.
+
+        The per concept context vectors are copied out of the dense
+        matrices so that the latter can be freed.
+        """
+        if self._dense_context_vectors is None:
+            return
+        for cui_info in self.cui2info.values():
+            if cui_info['context_vectors']:
+                cui_info['context_vectors'] = {
+                    ct: vec.copy()
+                    for ct, vec in cui_info['context_vectors'].items()}
+        self._dense_context_vectors = None
+
     def _reset_subnames(self):
         logger.info("Resetting subnames")
         self._subnames.clear()
@@ -172,6 +248,8 @@ class CDB(AbstractSerialisable):
                     self.token_counts[token] = 1
             self._subnames.update(cui_info['subnames'])
             self.is_dirty = True
+        if names:
+            self._names_changed()
 
     def _add_full_build(self, cui: str, names: dict[str, NameDescriptor],
                         ontologies: set[str], description: str,
@@ -285,6 +363,8 @@ class CDB(AbstractSerialisable):
         """
         for cui_info in self.cui2info.values():
             reset_cui_training(cui_info)
+        if self._dense_context_vectors is not None:
+            self._dense_context_vectors = DenseContextVectors(self.cui2info)
         for name_info in self.name2info.values():
             name_info['count_train'] = 0
         self._subnames.clear()
@@ -350,8 +430,12 @@ class CDB(AbstractSerialisable):
         # set filtered dicts
         self.cui2info = new_cui2info
         self.name2info = new_name2info
+        if self._dense_context_vectors is not None:
+            self._dense_context_vectors = DenseContextVectors.from_cui2info(
+                self.cui2info)
         # redo all subnames
         self._reset_subnames()
+        self._names_changed()
         self.is_dirty = True
 
     def remove_cuis_bulk(self, cuis: Sequence[str]) -> None:
@@ -367,6 +451,9 @@ class CDB(AbstractSerialisable):
                 "Trying remove CUI '%s' which does not exist in CDB", cui)
             return
         ci = self.cui2info.pop(cui)
+        self._names_changed()
+        if self._dense_context_vectors is not None:
+            self._dense_context_vectors.remove(cui)
         for name in ci['names']:
             ni = self.name2info[name]
             del ni['per_cui_status'][cui]
@@ -434,6 +521,7 @@ class CDB(AbstractSerialisable):
                             cuis2status[_cui] = 'PD'
         self.is_dirty = True
         self.has_changed_names = True
+        self._names_changed()
 
     def __eq__(self, other: Any) -> bool:
         if not isinstance(other, CDB):
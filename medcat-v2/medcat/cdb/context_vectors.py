@@ -0,0 +1,236 @@
+from typing import Optional, Iterable
+
+import numpy as np
+
+from medcat.cdb.concepts import CUIInfo
+
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+
+class DenseContextVectors:
+    """Dense storage for the context vectors of the concepts in a CDB.
+
+    All the context vectors of a specific context type are kept in one
+    contiguous matrix (one row per CUI). The norm of each row is cached
+    so that similarities can be calculated without renormalising the
+    vectors every time.
+
+    The `context_vectors` of each `CUIInfo` are replaced by views into
+    these matrices. So any code that reads them keeps working. However,
+    any code that changes them needs to call `set` afterwards in order to
+    keep the matrices (and the views) in sync.
+
+    Args:
+        cui2info (dict[str, CUIInfo]): The CUI to info mapping.
+        dtype (np.dtype): The data type of the matrices.
+            Defaults to `np.float32`.
+        capacity (int): The initial number of rows. Defaults to 16.
+    """
+
+    def __init__(self, cui2info: dict[str, CUIInfo],
+                 dtype: np.dtype = np.dtype(np.float32),
+                 capacity: int = 16) -> None:
+        self.cui2info = cui2info
+        self.dtype = dtype
+        self.cui2row: dict[str, int] = {}
+        self._capacity = max(capacity, 1)
+        self._mats: dict[str, np.ndarray] = {}
+        self._norms: dict[str, np.ndarray] = {}
+        self._present: dict[str, np.ndarray] = {}
+
+    @property
+    def context_types(self) -> list[str]:
+        """The context types currently in storage."""
+        return list(self._mats)
+
+    def get_matrix(self, context_type: str) -> Optional[np.ndarray]:
+        """Get the (raw) matrix of the context type.
+
+        Only the rows of CUIs in `cui2row` are meaningful.
+
+        Args:
+            context_type (str): The context type.
+
+        Returns:
+            Optional[np.ndarray]: The matrix, if present.
+        """
+        mat = self._mats.get(context_type)
+        if mat is None:
+            return None
+        return mat[:len(self.cui2row)]
+
+    def _grow(self, min_capacity: int) -> None:
+        new_capacity = self._capacity
+        while new_capacity < min_capacity:
+            new_capacity *= 2
+        logger.debug("Growing dense context vectors from %d to %d rows",
+                     self._capacity, new_capacity)
+        for context_type, mat in self._mats.items():
+            new_mat = np.zeros((new_capacity, mat.shape[1]), dtype=self.dtype)
+            new_mat[:self._capacity] = mat
+            self._mats[context_type] = new_mat
+            new_norms = np.zeros(new_capacity, dtype=self.dtype)
+            new_norms[:self._capacity] = self._norms[context_type]
+            self._norms[context_type] = new_norms
+            new_present = np.zeros(new_capacity, dtype=bool)
+            new_present[:self._capacity] = self._present[context_type]
+            self._present[context_type] = new_present
+        self._capacity = new_capacity
+        # NOTE: the old views point to the old buffers
+        for cui in self.cui2row:
+            self._set_views(cui)
+
+    def _get_row(self, cui: str) -> int:
+        row = self.cui2row.get(cui)
+        if row is None:
+            row = len(self.cui2row)
+            if row >= self._capacity:
+                self._grow(row + 1)
+            self.cui2row[cui] = row
+        return row
+
+    def _add_context_type(self, context_type: str, dim: int) -> np.ndarray:
+        mat = np.zeros((self._capacity, dim), dtype=self.dtype)
+        self._mats[context_type] = mat
+        self._norms[context_type] = np.zeros(self._capacity, dtype=self.dtype)
+        self._present[context_type] = np.zeros(self._capacity, dtype=bool)
+        return mat
+
+    def _set_views(self, cui: str) -> None:
+        cui_info = self.cui2info.get(cui)
+        if cui_info is None:
+            return
+        row = self.cui2row[cui]
+        if not any(present[row] for present in self._present.values()):
+            return
+        # NOTE: always a new dict since the same dict could (in principle)
+        #       be shared between concepts
+        cui_info['context_vectors'] = {
+            context_type: mat[row]
+            for context_type, mat in self._mats.items()
+            if self._present[context_type][row]}
+
+    def set(self, cui: str) -> None:
+        """Set the vectors of the CUI based on its (current) context vectors.
+
+        This copies the context vectors of the CUI into the dense matrices
+        and replaces them with the corresponding views.
+
+        Args:
+            cui (str): The CUI to update.
+
+        Raises:
+            ValueError: If the vector dimensions do not match.
+        """
+        vectors = self.cui2info[cui]['context_vectors']
+        if not vectors:
+            self.remove(cui)
+            return
+        row = self._get_row(cui)
+        for context_type, present in self._present.items():
+            if context_type not in vectors:
+                present[row] = False
+        for context_type, vector in vectors.items():
+            mat = self._mats.get(context_type)
+            if mat is None:
+                mat = self._add_context_type(context_type, len(vector))
+            elif mat.shape[1] != len(vector):
+                raise ValueError(
+                    f"Context vector for '{cui}' of type '{context_type}' "
+                    f"has dimension {len(vector)} while {mat.shape[1]} was "
+                    "expected")
+            mat[row] = vector
+            self._norms[context_type][row] = np.linalg.norm(mat[row])
+            self._present[context_type][row] = True
+        self._set_views(cui)
+
+    def remove(self, cui: str) -> None:
+        """Mark the CUI as not having any context vectors.
+
+        Args:
+            cui (str): The CUI.
+        """
+        row = self.cui2row.get(cui)
+        if row is None:
+            return
+        for present in self._present.values():
+            present[row] = False
+
+    def get_norms(self, cui: str) -> dict[str, float]:
+        """Get the cached norms of the context vectors of a CUI.
+
+        Args:
+            cui (str): The CUI.
+
+        Returns:
+            dict[str, float]: The norm for each context type present.
+        """
+        row = self.cui2row.get(cui)
+        if row is None:
+            return {}
+        return {context_type: float(norms[row])
+                for context_type, norms in self._norms.items()
+                if self._present[context_type][row]}
+
+    def get_unit_vectors(self, cuis: list[str], context_type: str
+                         ) -> tuple[list[int], Optional[np.ndarray]]:
+        """Get the unit context vectors of the specified CUIs.
+
+        Args:
+            cuis (list[str]): The CUIs in question.
+            context_type (str): The context type.
+
+        Returns:
+            tuple[list[int], Optional[np.ndarray]]: The indices (within
+                `cuis`) of CUIs that have a vector for this context type
+                and the stacked unit vectors (if any).
+        """
+        indices: list[int] = []
+        mat = self._mats.get(context_type)
+        if mat is None:
+            return indices, None
+        present = self._present[context_type]
+        rows: list[int] = []
+        for cui_nr, cui in enumerate(cuis):
+            row = self.cui2row.get(cui)
+            if row is not None and present[row]:
+                indices.append(cui_nr)
+                rows.append(row)
+        if not rows:
+            return indices, None
+        row_arr = np.array(rows, dtype=np.int64)
+        return indices, mat[row_arr] / self._norms[context_type][row_arr,
+                                                                  None]
+
+    @classmethod
+    def from_cui2info(cls, cui2info: dict[str, CUIInfo],
+                      dtype: np.dtype = np.dtype(np.float32),
+                      cuis: Optional[Iterable[str]] = None
+                      ) -> 'DenseContextVectors':
+        """Build the dense storage off the existing context vectors.
+
+        Args:
+            cui2info (dict[str, CUIInfo]): The CUI to info mapping.
+            dtype (np.dtype): The data type of the matrices.
+                Defaults to `np.float32`.
+            cuis (Optional[Iterable[str]]): The CUIs to include. Defaults
+                to all CUIs with context vectors.
+
+        Returns:
+            DenseContextVectors: The dense storage.
+        """
+        if cuis is None:
+            cuis = [cui for cui, ci in cui2info.items()
+                    if ci['context_vectors']]
+        else:
+            cuis = list(cuis)
+        store = cls(cui2info, dtype=dtype, capacity=len(cuis))
+        for cui in cuis:
+            store.set(cui)
+        logger.info("Built dense context vectors for %d concepts and %d "
+                    "context types", len(store.cui2row),
+                    len(store.context_types))
+        return store
@@ -1,6 +1,7 @@
 from typing import Callable, Protocol, Any, runtime_checkable, Optional
 
-from medcat.components.types import BaseComponent, MutableEntity
+from medcat.components.types import (
+    BaseComponent, MutableEntity, MutableDocument)
 from medcat.utils.registry import Registry
 from medcat.config.config import ComponentConfig
 from medcat.cdb import CDB
@@ -45,6 +46,29 @@ class AddonComponent(BaseComponent, Protocol):
         pass
 
 
+@runtime_checkable
+class BatchedAddonComponent(AddonComponent, Protocol):
+    """An addon component that can process multiple documents at once.
+
+    When processing multiple texts, the pipeline runs the core components
+    for each document and then passes all the documents to these addons
+    at once (rather than one by one).
+    """
+
+    def process_batch(self, docs: list[MutableDocument]
+                      ) -> list[MutableDocument]:
+        """Process multiple documents at once.
+
+        Args:
+            docs (list[MutableDocument]): The documents.
+
+        Returns:
+            list[MutableDocument]: The processed documents (in the same
+                order).
+        """
+        pass
+
+
 AddonClass = Callable[[ComponentConfig, BaseTokenizer,
                       CDB, Vocab, Optional[str]], AddonComponent]
 
@@ -123,6 +123,10 @@ class MetaCATAddon(AddonComponent):
     def __call__(self, doc: MutableDocument) -> MutableDocument:
         return self.mc(doc)
 
+    def process_batch(self, docs: list[MutableDocument]
+                      ) -> list[MutableDocument]:
+        return self.mc.process_batch(docs)
+
     def load(self, folder_path: str) -> 'MetaCAT':
         mc_path, tokenizer_folder = self._get_meta_cat_and_tokenizer_paths(
             folder_path)
@@ -794,10 +798,7 @@ class MetaCAT(AbstractSerialisable):
         if len(docs) > 0:
             yield docs
 
-    def _set_meta_anns(self,
-                       doc: MutableDocument,
-                       id2category_value: dict
-                       ) -> MutableDocument:
+    def _get_samples(self, doc: MutableDocument) -> tuple[dict, list]:
         config = self.config
         data: list
         if (not config.general.save_and_reuse_tokens or
@@ -819,13 +820,17 @@ class MetaCAT(AbstractSerialisable):
             # same tokenizer and context size.
             data = []
             data.extend(doc.get_addon_data(_SHARE_TOKENS_PATH)[0])
-        predictions, confidences = predict(
-            self.model, data, config)
+        return ent_id2ind, data
 
+    def _set_predictions(self, doc: MutableDocument, ent_id2ind: dict,
+                         predictions: Any, confidences: Any,
+                         id2category_value: dict, offset: int = 0
+                         ) -> MutableDocument:
+        config = self.config
         ents = self.get_ents(doc)
 
         for ent in ents:
-            ent_ind = ent_id2ind[ent.id]
+            ent_ind = ent_id2ind[ent.id] + offset
             value = id2category_value[predictions[ent_ind]]
             confidence = confidences[ent_ind]
             if ent.get_addon_data(_META_ANNS_PATH) is None:
@@ -846,6 +851,36 @@ class MetaCAT(AbstractSerialisable):
                 }
         return doc
 
+    def _set_meta_anns(self,
+                       doc: MutableDocument,
+                       id2category_value: dict
+                       ) -> MutableDocument:
+        ent_id2ind, data = self._get_samples(doc)
+        predictions, confidences = predict(
+            self.model, data, self.config)
+        return self._set_predictions(doc, ent_id2ind, predictions,
+                                     confidences, id2category_value)
+
+    def _set_meta_anns_batch(self,
+                             docs: list[MutableDocument],
+                             id2category_value: dict
+                             ) -> list[MutableDocument]:
+        # NOTE: the samples of all the documents are predicted on at once
+        #       so that the batches are full (`batch_size_eval`) rather
+        #       than limited by the number of entities in each document
+        all_data: list = []
+        doc_samples: list[tuple[dict, int]] = []
+        for doc in docs:
+            ent_id2ind, data = self._get_samples(doc)
+            doc_samples.append((ent_id2ind, len(all_data)))
+            all_data.extend(data)
+        predictions, confidences = predict(
+            self.model, all_data, self.config)
+        for doc, (ent_id2ind, offset) in zip(docs, doc_samples):
+            self._set_predictions(doc, ent_id2ind, predictions, confidences,
+                                  id2category_value, offset=offset)
+        return docs
+
     # Override
     def __call__(self, doc: MutableDocument) -> MutableDocument:
         """Process one document, used in the spacy pipeline for sequential
@@ -863,6 +898,23 @@ class MetaCAT(AbstractSerialisable):
         self._set_meta_anns(doc, id2category_value)
         return doc
 
+    def process_batch(self, docs: list[MutableDocument]
+                      ) -> list[MutableDocument]:
+        """Process multiple documents at once.
+
+        The entities of all the documents are meta-annotated together
+        (in batches of `config.general.batch_size_eval`).
+
+        Args:
+            docs (list[MutableDocument]): The documents.
+
+        Returns:
+            list[MutableDocument]: The same documents.
+        """
+        id2category_value = {
+            v: k for k, v in self.config.general.category_value2id.items()}
+        return self._set_meta_anns_batch(docs, id2category_value)
+
     @overload
     def get_model_card(self, as_dict: Literal[True]) -> dict:
         pass
@@ -40,6 +40,9 @@ def create_batch_piped_data(data: list[tuple[list[int], int, Optional[int]]],
     """Creates a batch given data and start/end that denote batch size,
     will also add padding and move to the right device.
 
+    The batch is only padded to the length of the longest sample within
+    the batch (rather than within all of the data).
+
     Args:
         data (list[tuple[list[int], int, Optional[int]]]):
             Data in the format: [[<[input_ids]>, <cpos>, Optional[int]], ...],
@@ -63,7 +66,7 @@ def create_batch_piped_data(data: list[tuple[list[int], int, Optional[int]]],
         y (Optional[torch.Tensor]):
             class label of the data
     """
-    max_seq_len = max([len(x[0]) for x in data])
+    max_seq_len = max([len(x[0]) for x in data[start_ind:end_ind]])
     x = [x[0][0:max_seq_len] + [pad_id] * max(0, max_seq_len - len(x[0]))
          for x in data[start_ind:end_ind]]
     cpos = [x[1] for x in data[start_ind:end_ind]]
@@ -83,6 +86,10 @@ def predict(model: nn.Module, data: list[tuple[list[int], int, Optional[int]]],
             config: ConfigMetaCAT) -> tuple[list[int], list[float]]:
     """Predict on data used in the meta_cat.pipe
 
+    The samples are sorted by length before batching so that samples of
+    similar lengths end up in the same batch and little time is spent on
+    padding. The predictions are in the original order regardless.
+
     Args:
         model (nn.Module):
             The model.
@@ -109,10 +116,14 @@ def predict(model: nn.Module, data: list[tuple[list[int], int, Optional[int]]],
     num_batches = math.ceil(len(data) / batch_size)
     all_logits = []
 
+    # NOTE: sorted by length so each batch needs little padding
+    order = sorted(range(len(data)), key=lambda ind: len(data[ind][0]))
+    sorted_data = [data[ind] for ind in order]
+
     with torch.no_grad():
         for i in range(num_batches):
             x, cpos, attention_masks, _ = create_batch_piped_data(
-                data, i * batch_size, (i + 1) * batch_size,
+                sorted_data, i * batch_size, (i + 1) * batch_size,
                 device=device, pad_id=pad_id)
 
             logits = model(x, center_positions=cpos,
@@ -125,7 +136,10 @@ def predict(model: nn.Module, data: list[tuple[list[int], int, Optional[int]]],
 
     # Can be that there are not logits, data is empty
     if all_logits:
-        logits = np.concatenate(all_logits, axis=0)
+        sorted_logits = np.concatenate(all_logits, axis=0)
+        # back to the original order
+        logits = np.empty_like(sorted_logits)
+        logits[order] = sorted_logits
         predictions = np.argmax(logits, axis=1)
         confidences = np.max(softmax(logits, axis=1), axis=1)
 
@@ -1,12 +1,13 @@
 import random
 import logging
-from typing import Iterator, Optional, Union
+from typing import Iterator, Optional, Union, cast
 
 from medcat.components.types import CoreComponentType, AbstractCoreComponent
 from medcat.tokenizing.tokens import MutableEntity, MutableDocument
 from medcat.components.linking.vector_context_model import (
     ContextModel, PerDocumentTokenCache)
 from medcat.cdb import CDB
+from medcat.cdb.context_vectors import DenseContextVectors
 from medcat.vocab import Vocab
 from medcat.config.config import Config, ComponentConfig
 from medcat.utils.defaults import StatusTypes as ST
@@ -35,16 +36,22 @@ class Linker(AbstractCoreComponent):
         self.cdb = cdb
         self.vocab = vocab
         self.config = config
-        self.context_model = ContextModel(self.cdb.cui2info,
-                                          self.cdb.name2info,
-                                          self.cdb.weighted_average_function,
-                                          self.vocab,
-                                          self.config.components.linking,
-                                          self.config.general.separator)
+        if self.config.components.linking.dense_context_vectors:
+            self.cdb.enable_dense_context_vectors()
+        self.context_model = ContextModel(
+            self.cdb.cui2info, self.cdb.name2info,
+            self.cdb.weighted_average_function, self.vocab,
+            self.config.components.linking, self.config.general.separator,
+            get_vector_store=self._get_vector_store)
         # Counter for how often did a pair (name,cui) appear and
         # was used during training
         self.train_counter: dict = {}
 
+    def _get_vector_store(self) -> Optional[DenseContextVectors]:
+        # NOTE: looked up every time since the CDB replaces the storage
+        #       upon e.g `reset_training` or `filter_by_cui`
+        return self.cdb.dense_context_vectors
+
     def get_type(self) -> CoreComponentType:
         return CoreComponentType.linking
 
@@ -117,33 +124,42 @@ class Linker(AbstractCoreComponent):
             cuis: list[str], name: str,
             per_doc_valid_token_cache: PerDocumentTokenCache
             ) -> tuple[Optional[str], float]:
-        cnf_l = self.config.components.linking
         # NOTE: there used to be the condition
         # but if there are cuis, and it's an entity - surely, there's a match?
         # And there wasn't really an alternative anyway (which could have
         # caused and exception to be raised or cui/similarity from previous
         # entity to be used)
         # if len(cuis) > 0:
-        do_disambiguate = False
+        if self._should_disambiguate(cuis, name):
+            cui, context_similarity = self.context_model.disambiguate(
+                cuis, entity, name, doc, per_doc_valid_token_cache)
+        else:
+            cui, context_similarity = self._process_entity_no_disamb(
+                doc, entity, cuis, per_doc_valid_token_cache)
+        return cui, context_similarity
+
+    def _should_disambiguate(self, cuis: list[str], name: str) -> bool:
+        cnf_l = self.config.components.linking
         name_info = self.cdb.name2info[name]
         if len(name) < cnf_l.disamb_length_limit:
-            do_disambiguate = True
+            return True
         elif (len(cuis) == 1 and
                 name_info['per_cui_status'][cuis[0]] in ST.DO_DISAMBUGATION):
-            do_disambiguate = True
+            return True
         elif len(cuis) > 1:
-            do_disambiguate = True
+            return True
+        return False
 
-        if do_disambiguate:
-            cui, context_similarity = self.context_model.disambiguate(
-                cuis, entity, name, doc, per_doc_valid_token_cache)
+    def _process_entity_no_disamb(
+            self, doc: MutableDocument, entity: MutableEntity,
+            cuis: list[str], per_doc_valid_token_cache: PerDocumentTokenCache
+            ) -> tuple[Optional[str], float]:
+        cui = cuis[0]
+        if self.config.components.linking.always_calculate_similarity:
+            context_similarity = self.context_model.similarity(
+                cui, entity, doc, per_doc_valid_token_cache)
         else:
-            cui = cuis[0]
-            if self.config.components.linking.always_calculate_similarity:
-                context_similarity = self.context_model.similarity(
-                    cui, entity, doc, per_doc_valid_token_cache)
-            else:
-                context_similarity = 1  # Direct link, no care for similarity
+            context_similarity = 1  # Direct link, no care for similarity
         return cui, context_similarity
 
     def _check_similarity(self, cui: str, context_similarity: float) -> bool:
@@ -174,6 +190,10 @@ class Linker(AbstractCoreComponent):
             # No name detected, just disambiguate
             cui, context_similarity = self.context_model.disambiguate(
                 cuis, entity, 'unk-unk', doc, per_doc_valid_token_cache)
+        yield from self._maybe_link(entity, cui, context_similarity)
+
+    def _maybe_link(self, entity: MutableEntity, cui: Optional[str],
+                    context_similarity: float) -> Iterator[MutableEntity]:
         logger.debug("Considering CUI %s with sim %f",
                      cui, context_similarity)
 
@@ -186,7 +206,44 @@ class Linker(AbstractCoreComponent):
             entity.context_similarity = context_similarity
             yield entity
 
+    def _inference_batched(self, doc: MutableDocument
+                           ) -> Iterator[MutableEntity]:
+        per_doc_valid_token_cache = PerDocumentTokenCache()
+        results: list[Optional[tuple[Optional[str], float]]] = []
+        to_disamb: list[int] = []
+        for entity in doc.ner_ents:
+            logger.debug("Linker started with entity: %s", entity.base.text)
+            cuis = entity.link_candidates
+            name = entity.detected_name
+            if not cuis:
+                results.append(None)
+            elif name is None:
+                # No name detected, just disambiguate
+                results.append(self.context_model.disambiguate(
+                    cuis, entity, 'unk-unk', doc, per_doc_valid_token_cache))
+            elif self._should_disambiguate(cuis, name):
+                to_disamb.append(len(results))
+                results.append(None)
+            else:
+                results.append(self._process_entity_no_disamb(
+                    doc, entity, cuis, per_doc_valid_token_cache))
+        if to_disamb:
+            entities = [doc.ner_ents[ent_nr] for ent_nr in to_disamb]
+            disambiguated = self.context_model.disambiguate_batch(
+                entities, [ent.link_candidates for ent in entities],
+                [cast(str, ent.detected_name) for ent in entities],
+                doc, per_doc_valid_token_cache)
+            for ent_nr, disamb_result in zip(to_disamb, disambiguated):
+                results[ent_nr] = disamb_result
+        for entity, result in zip(doc.ner_ents, results):
+            if result is None:
+                continue
+            yield from self._maybe_link(entity, *result)
+
     def _inference(self, doc: MutableDocument) -> Iterator[MutableEntity]:
+        if self.config.components.linking.batch_disambiguation:
+            yield from self._inference_batched(doc)
+            return
         per_doc_valid_token_cache = PerDocumentTokenCache()
         for entity in doc.ner_ents:
             logger.debug("Linker started with entity: %s", entity.base.text)
@@ -0,0 +1,94 @@
+from typing import Generic, Hashable, Optional, TypeVar
+from collections import OrderedDict
+
+
+T = TypeVar("T")
+
+
+class ContextEmbeddingCache(Generic[T]):
+    """A bounded least recently used (LRU) cache of context embeddings.
+
+    Clinical text is often templated, so the same context snippets (and
+    surface forms) recur a lot both within and across documents. Caching
+    their embeddings avoids running them through the transformer again.
+
+    The cache also keeps track of its hits and misses as well as of the
+    number of snippets that were deduplicated within a batch so that the
+    savings can be measured.
+
+    Args:
+        max_size (int): The maximum number of embeddings to keep.
+            If 0, nothing is cached (but deduplication is still tracked).
+    """
+
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+        self._items: OrderedDict[Hashable, T] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.deduplicated = 0
+
+    def get(self, key: Hashable) -> Optional[T]:
+        """Get the cached embedding (and mark it as recently used).
+
+        Args:
+            key (Hashable): The key.
+
+        Returns:
+            Optional[T]: The embedding, or None if not cached.
+        """
+        value = self._items.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self._items.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: Hashable, value: T) -> None:
+        """Cache an embedding, evicting the least recently used if needed.
+
+        Args:
+            key (Hashable): The key.
+            value (T): The embedding.
+        """
+        if self.max_size <= 0:
+            return
+        self._items[key] = value
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+
+    def clear(self) -> None:
+        """Clear the cached embeddings and reset the metrics."""
+        self._items.clear()
+        self.hits = 0
+        self.misses = 0
+        self.deduplicated = 0
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._items
+
+    @property
+    def hit_rate(self) -> float:
+        """The fraction of lookups that were found in the cache."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    @property
+    def stats(self) -> dict[str, float]:
+        """The metrics of the cache.
+
+        This includes the number of hits and misses, the hit rate, the
+        number of deduplicated snippets and the current size.
+        """
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate,
+            "deduplicated": self.deduplicated,
+            "size": len(self._items),
+        }
@@ -6,6 +6,10 @@ from medcat.tokenizing.tokenizers import BaseTokenizer
 from typing import Optional, Iterator, Set
 from medcat.vocab import Vocab
 from medcat.utils.postprocessing import create_main_ann
+from medcat.components.linking.name_index import (
+    NameIndex, get_name_index, hash_names)
+from medcat.components.linking.embedding_matrix import EmbeddingMatrix
+from medcat.components.linking.context_cache import ContextEmbeddingCache
 from tqdm import tqdm
 from collections import defaultdict
 import logging
@@ -44,12 +48,14 @@ class Linker(AbstractCoreComponent):
         self.max_length = self.cnf_l.max_token_length
         self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 
-        self._name_keys = list(self.cdb.name2info)
-        self._cui_keys = list(self.cdb.cui2info)
-
-        # these only need to be populated when called for embedding or inference
-        self._names_context_matrix = None
-        self._cui_context_matrix = None
+        # this only needs to be populated when called for embedding or inference
+        # NOTE: the name and cui embedding matrices are kept within the CDB,
+        #       see: _get_context_matrix
+        self._name_index: Optional[NameIndex] = None
+        # embeddings of recently seen context snippets, see: _embed_contexts
+        self.context_cache: ContextEmbeddingCache[Tensor] = ContextEmbeddingCache(
+            self.cnf_l.context_cache_size
+        )
 
         # used for filters and name embedding, and if the name contains a valid cui 
         # see: _set_filters
@@ -73,6 +79,19 @@ class Linker(AbstractCoreComponent):
                 f"{self.cnf_l.prefer_primary_name}."
             )
 
+        self._build_indices()
+
+    def __getstate__(self) -> dict:
+        # NOTE: the embedding matrices are pickled as float32 embeddings
+        #       (see EmbeddingMatrix) so the name index needs to be rebuilt
+        state = self.__dict__.copy()
+        state["_name_index"] = None
+        return state
+
+    def _build_indices(self) -> None:
+        """(Re)build the name and cui indices based on the current CDB."""
+        self._name_keys = list(self.cdb.name2info)
+        self._cui_keys = list(self.cdb.cui2info)
         self._cui_to_idx = {cui: idx for idx, cui in enumerate(self._cui_keys)}
         self._name_to_idx = {name: idx for idx, name in enumerate(self._name_keys)}
         self._name_to_cui_idxs = [
@@ -83,6 +102,9 @@ class Linker(AbstractCoreComponent):
             ]
             for name in self._name_keys
         ]
+        # the filters need to be recalculated for the new indices
+        self._last_include_set = None
+        self._last_exclude_set = None
 
     def create_embeddings(self, 
                           embedding_model_name: Optional[str] = None,
@@ -107,8 +129,157 @@ class Linker(AbstractCoreComponent):
         else:
             self.cnf_l.embedding_model_name = embedding_model_name
         self._load_transformers(embedding_model_name)
+        self._build_indices()
         self._embed_cui_names(embedding_model_name)
         self._embed_names(embedding_model_name)
+        self._record_embedding_model(embedding_model_name)
+        self._reset_embedding_state()
+
+    def update_embeddings(self) -> None:
+        """Embed only the names and cuis that changed since the last embedding.
+
+        Names and cuis that were added to the CDB (or cuis whose longest name
+        changed) are embedded and the embeddings of the ones that were removed
+        are dropped. The rest of the embeddings are kept as is. After small
+        changes to the CDB, this is a lot faster than `create_embeddings`.
+
+        If the CDB has no embeddings (or doesn't keep track of which names and
+        cuis were embedded), or they were embedded with a different model,
+        everything is embedded.
+        """
+        if not all(
+            key in self.cdb.addl_info
+            for key in (
+                "name_embeddings", "name_embeddings_keys",
+                "cui_embeddings", "cui_embeddings_keys", "cui_embeddings_names",
+            )
+        ):
+            logger.warning(
+                "No record of the embedded names and cuis. Embedding all of them."
+            )
+            self.create_embeddings()
+            return
+        embedding_model_name = self.cnf_l.embedding_model_name
+        embedded_with = self.cdb.addl_info.get("embedding_model_name")
+        if embedded_with != embedding_model_name:
+            logger.warning(
+                "The names and cuis were embedded with a different model (%s) "
+                "than the current one (%s). Embedding all of them.",
+                embedded_with, embedding_model_name,
+            )
+            self.create_embeddings()
+            return
+        self._load_transformers(embedding_model_name)
+        model_dim = self._get_embedding_dim()
+        embedded_dim = self.cdb.addl_info.get("embedding_dim")
+        if model_dim is not None and model_dim != embedded_dim:
+            logger.warning(
+                "The names and cuis were embedded with a different dimension (%s) "
+                "than the current model's (%s). Embedding all of them.",
+                embedded_dim, model_dim,
+            )
+            self.create_embeddings()
+            return
+        self._build_indices()
+        cui_names = [self._get_cui_name(cui) for cui in self._cui_keys]
+        n_cuis = self._splice_embeddings(
+            "cui_embeddings", self._cui_keys, cui_names,
+            self.cdb.addl_info["cui_embeddings_keys"],
+            self.cdb.addl_info["cui_embeddings_names"],
+            desc="Embedding changed cuis' preferred names",
+        )
+        n_names = self._splice_embeddings(
+            "name_embeddings", self._name_keys, self._name_keys,
+            self.cdb.addl_info["name_embeddings_keys"],
+            self.cdb.addl_info["name_embeddings_keys"],
+            desc="Embedding changed names",
+        )
+        self.cdb.addl_info["cui_embeddings_keys"] = self._cui_keys
+        self.cdb.addl_info["cui_embeddings_names"] = cui_names
+        self.cdb.addl_info["name_embeddings_keys"] = self._name_keys
+        self._record_embedding_model(embedding_model_name)
+        logger.info("Embedded %d changed cuis and %d changed names", n_cuis, n_names)
+        self._reset_embedding_state()
+
+    def _record_embedding_model(self, embedding_model_name: str) -> None:
+        # the model (and dimension) the stored embeddings were created with,
+        # the embeddings of different models cannot be mixed
+        self.cdb.addl_info["embedding_model_name"] = embedding_model_name
+        embeddings = self.cdb.addl_info["name_embeddings"]
+        self.cdb.addl_info["embedding_dim"] = embeddings.shape[1]
+
+    def _get_embedding_dim(self) -> Optional[int]:
+        # NOTE: the (last token pooled) embeddings are of the model's hidden size
+        model_config = getattr(getattr(self, "model", None), "config", None)
+        return getattr(model_config, "hidden_size", None)
+
+    def _splice_embeddings(
+        self,
+        matrix_key: str,
+        keys: list[str],
+        texts: list[str],
+        old_keys: list[str],
+        old_texts: list[str],
+        desc: str,
+    ) -> int:
+        """Embed only the new (or changed) texts and reuse the rest.
+
+        Args:
+            matrix_key (str): The key of the embeddings in `cdb.addl_info`.
+            keys (list[str]): The current keys (i.e names or cuis).
+            texts (list[str]): The current texts to embed for each key.
+            old_keys (list[str]): The keys of the existing embeddings.
+            old_texts (list[str]): The texts of the existing embeddings.
+            desc (str): The description for the progress bar.
+
+        Returns:
+            int: The number of newly embedded texts.
+        """
+        old_rows = {
+            key_text: row for row, key_text in enumerate(zip(old_keys, old_texts))
+        }
+        rows = [old_rows.get(key_text, -1) for key_text in zip(keys, texts)]
+        to_embed = [text for text, row in zip(texts, rows) if row < 0]
+        stored = self.cdb.addl_info[matrix_key]
+        if isinstance(stored, EmbeddingMatrix):
+            # NOTE: the kept rows stay at the precision the matrix is at
+            matrix = stored
+        else:
+            matrix = EmbeddingMatrix(stored.float())
+        new_embeddings = self._embed_in_batches(to_embed, desc) if to_embed else None
+        self.cdb.addl_info[matrix_key] = matrix.splice(
+            torch.tensor(rows, dtype=torch.long), new_embeddings
+        )
+        return len(to_embed)
+
+    def _reset_embedding_state(self) -> None:
+        # the name index needs to reflect the new embeddings
+        self.cdb.addl_info.pop("name_index", None)
+        self.build_name_index()
+
+    def _get_cui_name(self, cui: str) -> str:
+        # the longest name (alphabetically first, if tied)
+        return min(self.cdb.cui2info[cui]["names"], key=lambda name: (-len(name), name))
+
+    def build_name_index(self) -> NameIndex:
+        """Build the index used to find the most similar names.
+
+        The (approximate) indices are saved within the CDB (in
+        `cdb.addl_info["name_index"]`) so they're only built once
+        for the same names.
+
+        Returns:
+            NameIndex: The name index.
+        """
+        self._name_index = get_name_index(
+            self.cnf_l.name_index, self.names_context_matrix,
+            n_lists=self.cnf_l.ivf_n_lists,
+            n_probe=self.cnf_l.ivf_n_probe,
+            block_size=self.cnf_l.name_index_block_size,
+            saved_state=self.cdb.addl_info.get("name_index"),
+            names_hash=hash_names(self._name_keys))
+        self.cdb.addl_info["name_index"] = self._name_index.to_dict()
+        return self._name_index
 
     def _embed_cui_names(
         self,
@@ -131,28 +302,14 @@ class Linker(AbstractCoreComponent):
             self.cnf_l.embedding_model_name = embedding_model_name
 
         # Use the longest name
-        cui_names = [
-            max(self.cdb.cui2info[cui]["names"], key=len) for cui in self._cui_keys
-        ]
-        # embed each name in batches. Because there can be 3+ million names
-        total_batches = math.ceil(len(cui_names) / self.cnf_l.embedding_batch_size)
-        all_embeddings = []
-        for names in tqdm(
-            self._batch_data(cui_names, self.cnf_l.embedding_batch_size),
-            total=total_batches,
-            desc="Embedding cuis' preferred names",
-        ):
-            with torch.no_grad():
-                # removing ~ from names, as it is used to indicate a space in the CDB
-                names_to_embed = [
-                    name.replace(self.config.general.separator, " ") for name in names
-                ]
-                embeddings = self._embed(names_to_embed, self.device)
-                all_embeddings.append(embeddings.cpu())
-        # cat all batches into one tensor
-        all_embeddings_matrix = torch.cat(all_embeddings, dim=0)
-        self.cdb.addl_info["cui_embeddings"] = all_embeddings_matrix
-        logger.debug("Embedding cui names done, total: %d", len(names))
+        cui_names = [self._get_cui_name(cui) for cui in self._cui_keys]
+        all_embeddings_matrix = self._embed_in_batches(
+            cui_names, "Embedding cuis' preferred names"
+        )
+        self.cdb.addl_info["cui_embeddings"] = all_embeddings_matrix.float()
+        self.cdb.addl_info["cui_embeddings_keys"] = self._cui_keys
+        self.cdb.addl_info["cui_embeddings_names"] = cui_names
+        logger.debug("Embedding cui names done, total: %d", len(cui_names))
 
     def _embed_names(self, embedding_model_name: str) -> None:
         """Obtain embeddings for all names in the CDB using the specified
@@ -167,24 +324,37 @@ class Linker(AbstractCoreComponent):
         else:
             self.cnf_l.embedding_model_name = embedding_model_name
         names = self._name_keys
-        # embed each name in batches. Because there can be 3+ million names
+        all_embeddings_matrix = self._embed_in_batches(names, "Embedding names")
+        self.cdb.addl_info["name_embeddings"] = all_embeddings_matrix.float()
+        self.cdb.addl_info["name_embeddings_keys"] = names
+        logger.debug("Embedding names done, total: %d", len(names))
+
+    def _embed_in_batches(self, names: list[str], desc: str) -> Tensor:
+        """Embed names in batches. Because there can be 3+ million names.
+
+        Args:
+            names (list[str]): The names to embed.
+            desc (str): The description for the progress bar.
+
+        Returns:
+            Tensor: The embeddings (on the CPU).
+        """
         total_batches = math.ceil(len(names) / self.cnf_l.embedding_batch_size)
         all_embeddings = []
-        for names in tqdm(
+        for batch in tqdm(
             self._batch_data(names, self.cnf_l.embedding_batch_size),
             total=total_batches,
-            desc="Embedding names",
+            desc=desc,
         ):
             with torch.no_grad():
                 # removing ~ from names, as it is used to indicate a space in the CDB
                 names_to_embed = [
-                    name.replace(self.config.general.separator, " ") for name in names
+                    name.replace(self.config.general.separator, " ") for name in batch
                 ]
                 embeddings = self._embed(names_to_embed, self.device)
                 all_embeddings.append(embeddings.cpu())
-        all_embeddings_matrix = torch.cat(all_embeddings, dim=0)
-        self.cdb.addl_info["name_embeddings"] = all_embeddings_matrix
-        logger.debug("Embedding names done, total: %d", len(names))
+        # cat all batches into one tensor
+        return torch.cat(all_embeddings, dim=0)
 
     def get_type(self) -> CoreComponentType:
         return CoreComponentType.linking
@@ -277,7 +447,43 @@ class Linker(AbstractCoreComponent):
         for entity in entities:
             text = self._get_context(entity, doc, size)
             texts.append(text)
-        return self._embed(texts, self.device)
+        return self._embed_contexts(texts)
+
+    def _embed_contexts(self, texts: list[str]) -> Tensor:
+        """Embed context snippets, reusing the embeddings of recurring ones.
+
+        The snippets are normalised (whitespace) and identical ones are only
+        embedded once. Recently embedded snippets are taken from the cache.
+        The rest are embedded in batches of similar lengths to reduce padding.
+
+        Args:
+            texts (list[str]): The context snippets.
+
+        Returns:
+            Tensor: The embeddings, in the same order as the snippets.
+        """
+        # NOTE: whitespace doesn't change the tokens, so it's safe to normalise
+        keys = [" ".join(text.split()) for text in texts]
+        model_key = (self.cnf_l.embedding_model_name, self.max_length, self.device)
+        embeddings: dict[str, Tensor] = {}
+        to_embed: list[str] = []
+        for key in dict.fromkeys(keys):
+            cached = self.context_cache.get((model_key, key))
+            if cached is None:
+                to_embed.append(key)
+            else:
+                embeddings[key] = cached
+        self.context_cache.deduplicated += len(keys) - len(embeddings) - len(
+            to_embed
+        )
+        for batch in self._batch_data(
+            sorted(to_embed, key=len), self.cnf_l.context_batch_size
+        ):
+            for key, embedding in zip(batch, self._embed(batch, self.device)):
+                embeddings[key] = embedding
+                # NOTE: cloned so the rest of the batch isn't kept in memory
+                self.context_cache.put((model_key, key), embedding.clone())
+        return torch.stack([embeddings[key] for key in keys])
 
     def _set_filters(self) -> None:
         include_set = self.cnf_l.filters.cuis
@@ -342,20 +548,20 @@ class Linker(AbstractCoreComponent):
 
 
     def _disambiguate_by_cui(
-        self, cui_candidates: list[str], scores: Tensor
+        self, cui_candidates: list[str], context_vector: Tensor
     ) -> tuple[str, float]:
         """Disambiguate a detected concept by a list of potential cuis
         Args:
             cuis (list[str]): Potential cuis
-            cui_to_idx (dict[str, int]): Mapping of cui to relevant idx position
-            scores (Tensor): Scores for the detected cui2info concepts similarity
-            cui_keys (list[str]): idx_to_cui inverse
+            context_vector (Tensor): The context vector of the detected concept
         Returns:
             tuple[str, float]:
                 The CUI and its similarity
         """
         cui_idxs = [self._cui_to_idx[cui] for cui in cui_candidates]
-        candidate_scores = scores[cui_idxs]
+        candidate_scores = self.cui_context_matrix.score(
+            context_vector[None], cui_idxs
+        )[0]
         candidate_idx = int(torch.argmax(candidate_scores).item())
         best_idx = cui_idxs[candidate_idx]
 
@@ -378,12 +584,8 @@ class Linker(AbstractCoreComponent):
             doc, entities, self.cnf_l.context_window_size
         )
 
-        # score all detected contexts vs all names
-        names_scores = detected_context_vectors @ self.names_context_matrix.T
-        cui_scores = detected_context_vectors @ self.cui_context_matrix.T
-        sorted_indices = torch.argsort(names_scores, dim=1, descending=True)
-
-        for i, entity in enumerate(entities):
+        all_link_candidates = []
+        for entity in entities:
             link_candidates = entity.link_candidates
             if self.config.components.linking.filter_before_disamb:
                 link_candidates = [
@@ -391,45 +593,57 @@ class Linker(AbstractCoreComponent):
                     for cui in link_candidates
                     if self.cnf_l.filters.check_filters(cui)
                 ]
-            if len(link_candidates) == 1:
-                best_idx = self._cui_to_idx[link_candidates[0]]
-                predicted_cui = link_candidates[0]
-                similarity = names_scores[i, best_idx].item()
-            elif len(link_candidates) > 1:
+            all_link_candidates.append(link_candidates)
+
+        # only search the names index for entities without link candidates
+        search_rows = [
+            i for i, link_candidates in enumerate(all_link_candidates)
+            if not link_candidates
+        ]
+        top_names = {}
+        if search_rows:
+            top_scores, top_idxs = self.name_index.search(
+                detected_context_vectors[search_rows], 1, self._valid_names
+            )
+            top_names = {
+                row: (float(score), int(name_idx))
+                for row, score, name_idx in zip(
+                    search_rows, top_scores[:, 0].tolist(), top_idxs[:, 0].tolist()
+                )
+            }
+
+        for i, entity in enumerate(entities):
+            link_candidates = all_link_candidates[i]
+            context_vector = detected_context_vectors[i]
+            if link_candidates:
                 name_to_cuis = defaultdict(list)
                 for cui in link_candidates:
                     for name in self.cdb.cui2info[cui]["names"]:
                         name_to_cuis[name].append(cui)
 
+                # score only the names of the link candidates
                 name_idxs = [self._name_to_idx[name] for name in name_to_cuis]
-                indexed_scores = names_scores[i, name_idxs]
+                indexed_scores = self.names_context_matrix.score(
+                    context_vector[None], name_idxs
+                )[0]
 
                 best_local_pos = int(torch.argmax(indexed_scores).item())
-                best_global_idx = name_idxs[best_local_pos]
-                similarity = names_scores[i, best_global_idx].item()
-                best_name = self._name_keys[best_global_idx]
+                similarity = indexed_scores[best_local_pos].item()
+                best_name = self._name_keys[name_idxs[best_local_pos]]
                 cuis = name_to_cuis[best_name]
                 if len(cuis) == 1:
                     predicted_cui = cuis[0]
                 else:
-                    predicted_cui, _ = self._disambiguate_by_cui(cuis, cui_scores[i, :])
+                    predicted_cui, _ = self._disambiguate_by_cui(cuis, context_vector)
             else:
-                row_sorted = sorted_indices[i]  # sorted candidate indices for entity i
-
-                # Find the first candidate in this row with CUIs
-                first_true_pos = int(
-                    torch.nonzero(self._valid_names[row_sorted], as_tuple=True)[0][
-                        0
-                    ].item()
-                )
-
-                # Get global index + name
-                top_name_idx = int(row_sorted[first_true_pos].item())
-                similarity = names_scores[i, top_name_idx].item()
+                similarity, top_name_idx = top_names[i]
+                if top_name_idx < 0:
+                    # no valid names (e.g due to filters)
+                    continue
                 detected_name = self._name_keys[top_name_idx]
                 cuis = list(self.cdb.name2info[detected_name]["per_cui_status"].keys())
 
-                predicted_cui, _ = self._disambiguate_by_cui(cuis, cui_scores[i, :])
+                predicted_cui, _ = self._disambiguate_by_cui(cuis, context_vector)
             if not self.cnf_l.filters.check_filters(predicted_cui):
                 continue
             if self._check_similarity(
@@ -460,15 +674,35 @@ class Linker(AbstractCoreComponent):
                 sequence_lengths,
             ]
 
-    def _build_context_matrices(self) -> None:
-        if "name_embeddings" in self.cdb.addl_info:
-            self._names_context_matrix = (
-                self.cdb.addl_info["name_embeddings"].half().to(self.device)
-            )
-        if "cui_embeddings" in self.cdb.addl_info:
-            self._cui_context_matrix = (
-                self.cdb.addl_info["cui_embeddings"].half().to(self.device)
-            )
+    def _get_precision(self) -> str:
+        precision = self.cnf_l.embedding_precision
+        if precision == "auto":
+            # half precision matmul is only reliably fast on GPUs
+            return "float16" if self.device.type == "cuda" else "float32"
+        return precision
+
+    def _get_context_matrix(self, key: str) -> Optional[EmbeddingMatrix]:
+        stored = self.cdb.addl_info.get(key)
+        if stored is None:
+            return None
+        precision = self._get_precision()
+        if (isinstance(stored, EmbeddingMatrix) and stored.precision == precision
+                and stored.device == self.device):
+            return stored
+        # NOTE: the embeddings are loaded (or newly embedded) as float32 tensors
+        #       (older models have float16 ones). The matrix at the chosen
+        #       precision replaces them within the CDB so that there's only
+        #       ever a single copy of the embeddings. It's saved as float32.
+        if isinstance(stored, EmbeddingMatrix):
+            embeddings = stored.dequantise()
+        else:
+            embeddings = stored.float()
+        matrix = EmbeddingMatrix.from_tensor(embeddings, precision).to(self.device)
+        self.cdb.addl_info[key] = matrix
+        if key == "name_embeddings":
+            # the index would otherwise keep the previous matrix
+            self._name_index = None
+        return matrix
 
     def _generate_link_candidates(
         self, doc: MutableDocument, entities: list[MutableEntity]
@@ -478,32 +712,21 @@ class Linker(AbstractCoreComponent):
         similar name in the cdb to the detected concept."""
         detected_context_vectors = self._get_context_vectors(doc, entities, 0)
 
-        # score all detected contexts vs all names
-        names_scores = detected_context_vectors @ self.names_context_matrix.T
-        sorted_indices = torch.argsort(names_scores, dim=1, descending=True)
+        threshold = self.cnf_l.short_similarity_threshold
+        # without a threshold, only the single best valid name is used
+        k = self.cnf_l.name_index_top_k if threshold > 0 else 1
+        top_scores, top_idxs = self.name_index.search(
+            detected_context_vectors, k, self._valid_names
+        )
 
         for i, entity in enumerate(entities):
-            row_sorted = sorted_indices[i]
             cuis: set[str] = set()
-
-            # scores for this entity row
-            row_scores = names_scores[i, row_sorted]
-            # valid names via filtering and contain at least 1 cui
-            valid_mask = self._valid_names[row_sorted]
-
-            if self.cnf_l.short_similarity_threshold > 0:
-                # thresholded selection
-                above_thresh_mask = row_scores >= self.cnf_l.short_similarity_threshold
-                selected_mask = valid_mask & above_thresh_mask
-                valid_positions = torch.nonzero(selected_mask, as_tuple=True)[0]
-            else:
-                # just take the single best valid candidate
-                first_valid = torch.nonzero(valid_mask, as_tuple=True)[0][:1]
-                valid_positions = first_valid
-
-            for pos in valid_positions.tolist():
-                top_name_idx = int(row_sorted[pos].item())
-                detected_name = self._name_keys[top_name_idx]
+            # sorted by descending score, invalid names (via filtering and
+            # names without cuis) are excluded
+            for score, name_idx in zip(top_scores[i].tolist(), top_idxs[i].tolist()):
+                if name_idx < 0 or (threshold > 0 and score < threshold):
+                    break
+                detected_name = self._name_keys[name_idx]
                 cuis.update(self.cdb.name2info[detected_name]["per_cui_status"].keys())
 
             entity.link_candidates = list(cuis)
@@ -559,7 +782,8 @@ class Linker(AbstractCoreComponent):
             )
             logging.warning(
                 "If you have added new concepts or changes, "
-                "please re-embed the CDB names and cuis before linking."
+                "please update the embeddings (i.e `update_embeddings`) "
+                "before linking."
             )
 
         self._load_transformers(self.cnf_l.embedding_model_name)
@@ -588,15 +812,17 @@ class Linker(AbstractCoreComponent):
 
     @property
     def names_context_matrix(self):
-        if self._names_context_matrix is None:
-            self._build_context_matrices()
-        return self._names_context_matrix
+        return self._get_context_matrix("name_embeddings")
+
+    @property
+    def name_index(self) -> NameIndex:
+        if self._name_index is None:
+            return self.build_name_index()
+        return self._name_index
 
     @property
     def cui_context_matrix(self):
-        if self._cui_context_matrix is None:
-            self._build_context_matrices()
-        return self._cui_context_matrix
+        return self._get_context_matrix("cui_embeddings")
 
     @classmethod
     def create_new_component(
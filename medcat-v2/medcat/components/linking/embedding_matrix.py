@@ -0,0 +1,215 @@
+"""Name and CUI embedding matrices at a configurable precision.
+
+The embedding linker keeps an embedding for every name and CUI in the CDB,
+so these matrices can take up a lot of memory. They can be stored (and
+scored) as:
+- `float32` - Exact, but the largest.
+- `float16` - Half the size. Fast on GPUs, but may be slow on CPUs.
+- `bfloat16` - Half the size. Fast on CPUs with native support.
+- `int8` - A quarter of the size (along with a scale per row). Scored with
+  an int8 matrix multiplication (where available) or by dequantising.
+"""
+from typing import Optional, Union
+import logging
+
+from medcat.utils.import_utils import ensure_optional_extras_installed
+import medcat
+
+# NOTE: the below needs to be before torch imports
+_EXTRA_NAME = "embed-linker"
+ensure_optional_extras_installed(medcat.__name__, _EXTRA_NAME)
+
+# avoid linting issues due to above check
+from torch import Tensor  # noqa: E402
+import torch  # noqa: E402
+
+
+logger = logging.getLogger(__name__)
+
+
+PRECISIONS: dict[str, torch.dtype] = {
+    "float32": torch.float32,
+    "float16": torch.float16,
+    "bfloat16": torch.bfloat16,
+    "int8": torch.int8,
+}
+
+_INT8_MAX = 127
+
+Rows = Union[Tensor, slice, list[int], None]
+
+
+class EmbeddingMatrix:
+    """A matrix of (normalised) embeddings at a specific precision.
+
+    The matrix is pickled as its (dequantised) float32 embeddings, i.e
+    as a plain tensor. So a CDB keeping the matrix is saved the same as
+    one with the float32 embeddings (and can be loaded by older versions).
+
+    Args:
+        values (Tensor): The stored values (n x dim).
+        scales (Optional[Tensor]): The per row scales (for int8 values).
+    """
+
+    def __init__(self, values: Tensor, scales: Optional[Tensor] = None
+                 ) -> None:
+        if values.dtype not in PRECISIONS.values():
+            raise ValueError(f"Unsupported embedding dtype: {values.dtype}")
+        if (values.dtype == torch.int8) != (scales is not None):
+            raise ValueError("Scales are needed for (and only for) int8")
+        self.values = values
+        self.scales = scales
+
+    @classmethod
+    def from_tensor(cls, embeddings: Tensor, precision: str
+                    ) -> "EmbeddingMatrix":
+        """Create the matrix from (floating point) embeddings.
+
+        Args:
+            embeddings (Tensor): The embeddings (n x dim).
+            precision (str): The precision to store them at.
+
+        Raises:
+            ValueError: If the precision is unknown.
+
+        Returns:
+            EmbeddingMatrix: The matrix.
+        """
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown embedding precision: {precision}")
+        if precision != "int8":
+            return cls(embeddings.to(PRECISIONS[precision]))
+        embeddings = embeddings.float()
+        scales = embeddings.abs().amax(dim=1) / _INT8_MAX
+        # avoid dividing by 0 for all-zero rows
+        scales[scales == 0] = 1.0
+        values = torch.round(embeddings / scales[:, None]).clamp_(
+            -_INT8_MAX, _INT8_MAX).to(torch.int8)
+        return cls(values, scales)
+
+    @property
+    def precision(self) -> str:
+        return str(self.values.dtype).removeprefix("torch.")
+
+    @property
+    def shape(self) -> torch.Size:
+        return self.values.shape
+
+    @property
+    def device(self) -> torch.device:
+        return self.values.device
+
+    @property
+    def nbytes(self) -> int:
+        nbytes = self.values.element_size() * self.values.nelement()
+        if self.scales is not None:
+            nbytes += self.scales.element_size() * self.scales.nelement()
+        return nbytes
+
+    def __len__(self) -> int:
+        return self.values.shape[0]
+
+    def __reduce__(self) -> tuple:
+        # NOTE: the float32 values are the same tensor, so they can still
+        #       be memory mapped by the mmap serialiser
+        return torch.as_tensor, (self.dequantise().cpu(),)
+
+    def to(self, device: torch.device) -> "EmbeddingMatrix":
+        """Move the matrix to the specified device.
+
+        Args:
+            device (torch.device): The device.
+
+        Returns:
+            EmbeddingMatrix: The matrix on the device.
+        """
+        if self.values.device == device:
+            return self
+        return EmbeddingMatrix(
+            self.values.to(device),
+            None if self.scales is None else self.scales.to(device))
+
+    def splice(self, rows: Tensor, new_embeddings: Optional[Tensor] = None
+               ) -> "EmbeddingMatrix":
+        """Create a new matrix from existing rows and new embeddings.
+
+        Args:
+            rows (Tensor): The existing row for each row of the new matrix,
+                or -1 where the next new embedding is to be used.
+            new_embeddings (Optional[Tensor]): The new embeddings, in order.
+
+        Raises:
+            ValueError: If the number of new embeddings doesn't match.
+
+        Returns:
+            EmbeddingMatrix: The new matrix (at the same precision).
+        """
+        rows = rows.to(self.device)
+        is_new = rows < 0
+        n_new = int(is_new.sum().item())
+        n_given = 0 if new_embeddings is None else len(new_embeddings)
+        if n_new != n_given:
+            raise ValueError(
+                f"Expected {n_new} new embeddings, but got {n_given}")
+        values = self.values.new_empty((len(rows), self.values.shape[1]))
+        values[~is_new] = self.values[rows[~is_new]]
+        scales = None
+        if self.scales is not None:
+            scales = self.scales.new_empty(len(rows))
+            scales[~is_new] = self.scales[rows[~is_new]]
+        if new_embeddings is not None and n_new:
+            new = EmbeddingMatrix.from_tensor(
+                new_embeddings.to(self.device), self.precision)
+            values[is_new] = new.values
+            if scales is not None and new.scales is not None:
+                scales[is_new] = new.scales
+        return EmbeddingMatrix(values, scales)
+
+    def dequantise(self, rows: Rows = None) -> Tensor:
+        """Get the (float32) embeddings.
+
+        Args:
+            rows (Rows): The rows to get. Defaults to all.
+
+        Returns:
+            Tensor: The embeddings.
+        """
+        values, scales = self._get_rows(rows)
+        if scales is None:
+            return values.float()
+        return values.float() * scales[:, None]
+
+    def score(self, queries: Tensor, rows: Rows = None) -> Tensor:
+        """Score the queries against (some of) the embeddings.
+
+        Args:
+            queries (Tensor): The (normalised) queries (n_queries x dim).
+            rows (Rows): The rows to score against. Defaults to all.
+
+        Returns:
+            Tensor: The (float32) scores (n_queries x n_rows).
+        """
+        values, scales = self._get_rows(rows)
+        if scales is None:
+            return (queries.to(values.dtype) @ values.T).float()
+        return _int8_scores(queries.float(), values) * scales
+
+    def _get_rows(self, rows: Rows) -> tuple[Tensor, Optional[Tensor]]:
+        if rows is None:
+            return self.values, self.scales
+        return (self.values[rows],
+                None if self.scales is None else self.scales[rows])
+
+
+def _int8_scores(queries: Tensor, values: Tensor) -> Tensor:
+    if hasattr(torch, "_int_mm"):
+        # quantise the queries as well so the int8 GEMM can be used
+        query_scales = queries.abs().amax(dim=1, keepdim=True) / _INT8_MAX
+        query_scales[query_scales == 0] = 1.0
+        int_queries = torch.round(queries / query_scales).to(torch.int8)
+        try:
+            return torch._int_mm(int_queries, values.T).float() * query_scales
+        except RuntimeError:
+            # unsupported shapes / device (e.g a single query on GPU)
+            pass
+    return queries @ values.float().T
@@ -0,0 +1,335 @@
+"""Candidate retrieval indices over the (normalised) name embeddings.
+
+The embedding linker needs the most similar names (out of potentially
+millions) for each detected entity. Rather than scoring against every name
+and sorting the full score matrix, the indices here only keep the top `k`
+names (per entity) that are allowed by the current filters.
+
+There are two indices:
+- `ExactNameIndex` scores the names in blocks and keeps a running top `k`.
+  The results are identical to a full sort.
+- `IVFNameIndex` clusters the names (spherical k-means) and only scores
+  the names within the clusters closest to each entity. This is
+  approximate, but a lot faster for large CDBs. The clusters only need
+  to be built once and are saved (within the CDB) with the model pack.
+  They are rebuilt if the (hash of the) names they were built for differ.
+"""
+from typing import Optional, Protocol, Any, Union, Iterable
+import logging
+import math
+
+import xxhash
+
+from medcat.utils.import_utils import ensure_optional_extras_installed
+import medcat
+
+# NOTE: the below needs to be before torch imports
+_EXTRA_NAME = "embed-linker"
+ensure_optional_extras_installed(medcat.__name__, _EXTRA_NAME)
+
+# avoid linting issues due to above check
+from torch import Tensor  # noqa: E402
+import torch  # noqa: E402
+
+from medcat.components.linking.embedding_matrix import (  # noqa: E402
+    EmbeddingMatrix)
+
+
+logger = logging.getLogger(__name__)
+
+
+class NameIndex(Protocol):
+    """The protocol for a name candidate retrieval index."""
+    index_type: str
+
+    def search(self, queries: Tensor, k: int, valid_mask: Tensor
+               ) -> tuple[Tensor, Tensor]:
+        """Find the (at most) `k` most similar valid names for each query.
+
+        Args:
+            queries (Tensor): The (normalised) query vectors (n x dim).
+            k (int): The number of names to find per query.
+            valid_mask (Tensor): The boolean mask of names that are allowed.
+
+        Returns:
+            tuple[Tensor, Tensor]: The scores and the name indices
+                (both n x k), sorted by descending score. If fewer than `k`
+                valid names are found, the rest of the indices are -1.
+        """
+        pass
+
+    def to_dict(self) -> dict[str, Any]:
+        """Get the state of the index that needs to be saved.
+
+        Returns:
+            dict[str, Any]: The state.
+        """
+        pass
+
+
+class ExactNameIndex:
+    """The exact (brute force) name index.
+
+    Args:
+        embeddings (EmbeddingMatrix): The name embeddings (n_names x dim).
+        block_size (int): The number of names to score at once.
+    """
+    index_type = "exact"
+
+    def __init__(self, embeddings: EmbeddingMatrix,
+                 block_size: int = 65536) -> None:
+        self.embeddings = embeddings
+        self.block_size = block_size
+
+    def search(self, queries: Tensor, k: int, valid_mask: Tensor
+               ) -> tuple[Tensor, Tensor]:
+        valid_idxs = torch.nonzero(valid_mask, as_tuple=True)[0]
+        if valid_idxs.numel() <= self.block_size:
+            # few valid names (i.e strict filters), only score those
+            scores = self.embeddings.score(queries, valid_idxs)
+            return _pad(*_topk(scores, k, valid_idxs), k)
+        best_scores: Optional[Tensor] = None
+        best_idxs: Optional[Tensor] = None
+        for start in range(0, len(self.embeddings), self.block_size):
+            end = start + self.block_size
+            scores = self.embeddings.score(queries, slice(start, end))
+            scores.masked_fill_(~valid_mask[start:end], float("-inf"))
+            block_scores, block_idxs = _topk(scores, k)
+            block_idxs += start
+            if best_scores is None or best_idxs is None:
+                best_scores, best_idxs = block_scores, block_idxs
+                continue
+            best_scores, best_idxs = _topk(
+                torch.cat([best_scores, block_scores], dim=1), k,
+                torch.cat([best_idxs, block_idxs], dim=1))
+        # NOTE: there's at least 1 block since there's more valid names
+        #       than the block size
+        assert best_scores is not None and best_idxs is not None
+        best_idxs[best_scores == float("-inf")] = -1
+        return _pad(best_scores, best_idxs, k)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {"index_type": self.index_type,
+                "n_names": len(self.embeddings)}
+
+
+class IVFNameIndex:
+    """The inverted file (IVF) name index.
+
+    The names are clustered around `n_lists` centroids and only the names
+    of the `n_probe` closest clusters are scored for each query.
+    If none of the probed names are valid (i.e due to strict filters),
+    the query falls back to the exact search.
+
+    Args:
+        embeddings (EmbeddingMatrix): The name embeddings (n_names x dim).
+        centroids (Tensor): The (normalised) cluster centroids.
+        list_offsets (Tensor): The offsets of each cluster within the list
+            of name indices (n_lists + 1).
+        list_idxs (Tensor): The name indices, ordered by cluster.
+        n_probe (int): The number of clusters to probe per query.
+        block_size (int): The block size for the exact fallback.
+        names_hash (Optional[str]): The hash of the names the index was
+            built for (see `hash_names`).
+    """
+    index_type = "ivf"
+
+    def __init__(self, embeddings: EmbeddingMatrix, centroids: Tensor,
+                 list_offsets: Tensor, list_idxs: Tensor,
+                 n_probe: int, block_size: int = 65536,
+                 names_hash: Optional[str] = None) -> None:
+        self.embeddings = embeddings
+        self.names_hash = names_hash
+        self.centroids = centroids.to(embeddings.device, torch.float32)
+        self.list_offsets = list_offsets.tolist()
+        self.list_idxs = list_idxs.to(embeddings.device)
+        self.n_probe = min(n_probe, self.centroids.shape[0])
+        self._exact = ExactNameIndex(embeddings, block_size)
+
+    @classmethod
+    def build(cls, embeddings: EmbeddingMatrix, n_lists: int, n_probe: int,
+              block_size: int = 65536, n_iter: int = 10,
+              sample_size: int = 64, seed: int = 42,
+              names_hash: Optional[str] = None) -> "IVFNameIndex":
+        """Build the index by clustering the name embeddings.
+
+        The centroids are found by spherical k-means on a random sample
+        (of `sample_size` names per cluster) after which all names are
+        assigned to their closest centroid.
+
+        Args:
+            embeddings (EmbeddingMatrix): The name embeddings
+                (n_names x dim).
+            n_lists (int): The number of clusters. If 0, `4 * sqrt(n_names)`
+                is used.
+            n_probe (int): The number of clusters to probe per query.
+            block_size (int): The number of names to assign at once.
+            n_iter (int): The number of k-means iterations.
+            sample_size (int): The number of names per cluster to sample
+                for finding the centroids.
+            seed (int): The random seed for the sampling.
+            names_hash (Optional[str]): The hash of the names.
+
+        Returns:
+            IVFNameIndex: The built index.
+        """
+        n_names = len(embeddings)
+        if n_lists <= 0:
+            n_lists = int(4 * math.sqrt(n_names))
+        n_lists = max(1, min(n_lists, n_names))
+        logger.info("Building IVF name index with %d lists for %d names",
+                    n_lists, n_names)
+        gen = torch.Generator().manual_seed(seed)
+        sample_idxs = torch.randperm(n_names, generator=gen)[
+            :n_lists * sample_size].to(embeddings.device)
+        sample = embeddings.dequantise(sample_idxs)
+        centroids = sample[:n_lists].clone()
+        for _ in range(n_iter):
+            assigned = _assign(sample, centroids, block_size)
+            new_centroids = torch.zeros_like(centroids)
+            new_centroids.index_add_(0, assigned, sample)
+            # keep the old centroid for empty clusters
+            empty = new_centroids.norm(dim=1) == 0
+            new_centroids[empty] = centroids[empty]
+            centroids = torch.nn.functional.normalize(new_centroids, dim=1)
+        assignments = _assign(embeddings, centroids, block_size)
+        list_idxs = torch.argsort(assignments, stable=True)
+        counts = torch.bincount(assignments, minlength=n_lists)
+        list_offsets = torch.cat([counts.new_zeros(1),
+                                  torch.cumsum(counts, dim=0)])
+        return cls(embeddings, centroids, list_offsets.cpu(), list_idxs,
+                   n_probe, block_size, names_hash)
+
+    def search(self, queries: Tensor, k: int, valid_mask: Tensor
+               ) -> tuple[Tensor, Tensor]:
+        if int(valid_mask.sum().item()) <= self._exact.block_size:
+            # few valid names, exact search is cheap
+            return self._exact.search(queries, k, valid_mask)
+        probes = torch.topk(queries.float() @ self.centroids.T, self.n_probe,
+                            dim=1).indices.tolist()
+        scores = torch.full((queries.shape[0], k), float("-inf"),
+                            device=queries.device)
+        idxs = torch.full((queries.shape[0], k), -1, dtype=torch.long,
+                          device=queries.device)
+        missing: list[int] = []
+        for row, row_probes in enumerate(probes):
+            cand_idxs = torch.cat([
+                self.list_idxs[self.list_offsets[lst]:
+                               self.list_offsets[lst + 1]]
+                for lst in row_probes])
+            cand_idxs = cand_idxs[valid_mask[cand_idxs]]
+            if not cand_idxs.numel():
+                missing.append(row)
+                continue
+            row_scores, row_idxs = _topk(
+                self.embeddings.score(queries[row][None], cand_idxs), k,
+                cand_idxs[None])
+            found = row_scores.shape[1]
+            scores[row, :found] = row_scores[0]
+            idxs[row, :found] = row_idxs[0]
+        if missing:
+            logger.debug("Falling back to exact search for %d queries",
+                         len(missing))
+            scores[missing], idxs[missing] = self._exact.search(
+                queries[missing], k, valid_mask)
+        return scores, idxs
+
+    def to_dict(self) -> dict[str, Any]:
+        return {"index_type": self.index_type,
+                "n_names": len(self.embeddings),
+                "names_hash": self.names_hash,
+                "centroids": self.centroids.cpu(),
+                "list_offsets": torch.tensor(self.list_offsets),
+                "list_idxs": self.list_idxs.cpu()}
+
+
+def _assign(vectors: Union[Tensor, EmbeddingMatrix], centroids: Tensor,
+            block_size: int) -> Tensor:
+    # NOTE: in blocks to avoid the full (n_vectors x n_lists) score matrix
+    block_size = max(1, block_size // 16)
+    blocks = []
+    for start in range(0, len(vectors), block_size):
+        if isinstance(vectors, EmbeddingMatrix):
+            block = vectors.dequantise(slice(start, start + block_size))
+        else:
+            block = vectors[start:start + block_size]
+        blocks.append(torch.argmax(block @ centroids.T, dim=1))
+    return torch.cat(blocks)
+
+
+def _topk(scores: Tensor, k: int, idxs: Optional[Tensor] = None
+          ) -> tuple[Tensor, Tensor]:
+    top_scores, top_pos = torch.topk(scores, min(k, scores.shape[1]), dim=1)
+    if idxs is None:
+        return top_scores, top_pos
+    if idxs.dim() == 1:
+        return top_scores, idxs[top_pos]
+    return top_scores, torch.gather(idxs, 1, top_pos)
+
+
+def _pad(scores: Tensor, idxs: Tensor, k: int) -> tuple[Tensor, Tensor]:
+    missing = k - scores.shape[1]
+    if missing <= 0:
+        return scores, idxs
+    return (torch.nn.functional.pad(scores, (0, missing),
+                                    value=float("-inf")),
+            torch.nn.functional.pad(idxs, (0, missing), value=-1))
+
+
+def hash_names(names: Iterable[str]) -> str:
+    """Hash the (ordered) names of the rows of the name embeddings.
+
+    Args:
+        names (Iterable[str]): The names, in the order of the embeddings.
+
+    Returns:
+        str: The hash.
+    """
+    hasher = xxhash.xxh64()
+    for name in names:
+        hasher.update(name.encode("utf-8"))
+        hasher.update(b"\0")
+    return hasher.hexdigest()
+
+
+def get_name_index(index_type: str, embeddings: EmbeddingMatrix,
+                   n_lists: int = 0, n_probe: int = 16,
+                   block_size: int = 65536,
+                   saved_state: Optional[dict[str, Any]] = None,
+                   names_hash: Optional[str] = None,
+                   ) -> NameIndex:
+    """Get the name index of the specified type.
+
+    If a saved state for the same names is provided, the index is loaded
+    from it. Otherwise, the index is built.
+
+    Args:
+        index_type (str): The type of index (`exact` or `ivf`).
+        embeddings (EmbeddingMatrix): The name embeddings (n_names x dim).
+        n_lists (int): The number of IVF clusters (0 for automatic).
+        n_probe (int): The number of IVF clusters to probe per query.
+        block_size (int): The number of names to score at once.
+        saved_state (Optional[dict[str, Any]]): The previously saved state.
+        names_hash (Optional[str]): The hash of the names of the rows of
+            the embeddings (see `hash_names`).
+
+    Raises:
+        ValueError: If the index type is unknown.
+
+    Returns:
+        NameIndex: The name index.
+    """
+    if index_type == ExactNameIndex.index_type:
+        return ExactNameIndex(embeddings, block_size)
+    elif index_type == IVFNameIndex.index_type:
+        if (saved_state and
+                saved_state.get("index_type") == index_type and
+                saved_state.get("n_names") == len(embeddings) and
+                saved_state.get("names_hash") == names_hash):
+            return IVFNameIndex(
+                embeddings, saved_state["centroids"],
+                saved_state["list_offsets"], saved_state["list_idxs"],
+                n_probe, block_size, names_hash)
+        return IVFNameIndex.build(embeddings, n_lists, n_probe, block_size,
+                                  names_hash=names_hash)
+    raise ValueError(f"Unknown name index type: {index_type}")
@@ -8,11 +8,12 @@ from itertools import chain
 
 from medcat.vocab import Vocab
 from medcat.cdb.concepts import CUIInfo, NameInfo
+from medcat.cdb.context_vectors import DenseContextVectors
 from medcat.config.config import Linking
 from medcat.tokenizing.tokens import (MutableToken, MutableEntity,
                                        MutableDocument)
 from medcat.utils.defaults import StatusTypes as ST
-from medcat.utils.matutils import unitvec
+from medcat.utils.matutils import unitvec, unit_rows
 from medcat.storage.serialisables import AbstractSerialisable
 
 
@@ -38,6 +39,12 @@ class ContextModel(AbstractSerialisable):
         vocab (Vocab): The vocabulary
         config (Linking): The config to be used
         name_separator (str): The name separator
+        disamb_preprocessors (list[DisambPreprocessor]): The preprocessors
+            applied to the similarities before disambiguation.
+        get_vector_store (Optional[Callable[[], Optional[DenseContextVectors]]]):
+            Gets the current dense context vector storage (if used). The
+            storage is looked up upon every use since the CDB may replace
+            (or drop) it. If present, it will be kept in sync upon training.
     """
 
     def __init__(self, cui2info: dict[str, CUIInfo],
@@ -45,7 +52,10 @@ class ContextModel(AbstractSerialisable):
                  weighted_average_function: Callable[[int], float],
                  vocab: Vocab, config: Linking,
                  name_separator: str,
-                 disamb_preprocessors: list[DisambPreprocessor] = []) -> None:
+                 disamb_preprocessors: list[DisambPreprocessor] = [],
+                 get_vector_store: Optional[
+                     Callable[[], Optional[DenseContextVectors]]] = None
+                 ) -> None:
         self.cui2info = cui2info
         self.name2info = name2info
         self.weighted_average_function = weighted_average_function
@@ -54,6 +64,19 @@ class ContextModel(AbstractSerialisable):
         self.name_separator = name_separator
         self._disamb_preprocessors = (  # copy if default/empty
             disamb_preprocessors or disamb_preprocessors.copy())
+        self._get_vector_store = get_vector_store
+
+    @property
+    def vector_store(self) -> Optional[DenseContextVectors]:
+        """The current dense context vector storage (if used)."""
+        if self._get_vector_store is None:
+            return None
+        return self._get_vector_store()
+
+    def _sync_vectors(self, cui: str) -> None:
+        vector_store = self.vector_store
+        if vector_store is not None:
+            vector_store.set(cui)
 
     def get_context_tokens(self, entity: MutableEntity, doc: MutableDocument,
                            size: int,
@@ -197,9 +220,14 @@ class ContextModel(AbstractSerialisable):
 
         train_threshold = self.config.train_count_threshold
         if cui_vectors and cui_info['count_train'] >= train_threshold:
+            vector_store = self.vector_store
+            if vector_store is not None:
+                cui_norms = vector_store.get_norms(cui)
+            else:
+                cui_norms = None
             return get_similarity(cui_vectors, vectors,
                                   self.config.context_vector_weights,
-                                  cui, self.cui2info)
+                                  cui, self.cui2info, cur_norms=cui_norms)
         else:
             return -1
 
@@ -272,6 +300,216 @@ class ContextModel(AbstractSerialisable):
         else:
             return [None], [0], 0
 
+    def _get_unit_cui_vectors(self, cuis: list[str], context_type: str
+                              ) -> tuple[list[int], Optional[np.ndarray]]:
+        """Get the unit context vectors of the specified CUIs.
+
+        Args:
+            cuis (list[str]): The CUIs in question.
+            context_type (str): The context type.
+
+        Returns:
+            tuple[list[int], Optional[np.ndarray]]: The indices (within
+                `cuis`) of CUIs that have a vector for this context type
+                and the stacked unit vectors (if any).
+        """
+        vector_store = self.vector_store
+        if vector_store is not None:
+            return vector_store.get_unit_vectors(cuis, context_type)
+        rows: list[int] = []
+        vecs: list[np.ndarray] = []
+        for cui_nr, cui in enumerate(cuis):
+            cui_vectors = self.cui2info[cui]['context_vectors']
+            if cui_vectors and context_type in cui_vectors:
+                rows.append(cui_nr)
+                vecs.append(cui_vectors[context_type])
+        if not vecs:
+            return rows, None
+        return rows, unit_rows(np.stack(vecs))
+
+    def _batch_similarities(self, vectors: list[dict[str, np.ndarray]],
+                            ent_indices: np.ndarray, cuis: list[str]
+                            ) -> np.ndarray:
+        """Calculate similarities for many entity - CUI pairs at once.
+
+        Args:
+            vectors (list[dict[str, np.ndarray]]): The context vectors
+                for each entity.
+            ent_indices (np.ndarray): The index of the entity (in `vectors`)
+                for each pair.
+            cuis (list[str]): The CUI for each pair.
+
+        Returns:
+            np.ndarray: The similarity for each pair.
+        """
+        unique_cuis = list(dict.fromkeys(cuis))
+        cui2row = {cui: row for row, cui in enumerate(unique_cuis)}
+        cui_indices = np.array([cui2row[cui] for cui in cuis], dtype=np.int64)
+        train_threshold = self.config.train_count_threshold
+        is_valid = np.array([
+            bool(self.cui2info[cui]['context_vectors']) and
+            self.cui2info[cui]['count_train'] >= train_threshold
+            for cui in unique_cuis], dtype=bool)
+        valid_cuis = [cui for cui, valid in zip(unique_cuis, is_valid)
+                      if valid]
+        valid_rows = np.flatnonzero(is_valid)
+        sims = np.zeros(len(cuis), dtype=np.float64)
+        for context_type, weight in self.config.context_vector_weights.items():
+            ent_rows = np.asarray(
+                [ent_nr for ent_nr, ent_vecs in enumerate(vectors)
+                 if context_type in ent_vecs], dtype=np.intp)
+            if not len(ent_rows):
+                continue
+            cui_rows, cui_mat = self._get_unit_cui_vectors(
+                valid_cuis, context_type)
+            if cui_mat is None:
+                continue
+            ent_mat = unit_rows(np.stack([vectors[ent_nr][context_type]
+                                          for ent_nr in ent_rows]))
+            type_sims = np.zeros((len(vectors), len(unique_cuis)),
+                                 dtype=np.float64)
+            cui_cols = valid_rows[np.asarray(cui_rows, dtype=np.intp)]
+            type_sims[np.ix_(ent_rows, cui_cols)] = ent_mat @ cui_mat.T
+            sims += weight * type_sims[ent_indices, cui_indices]
+        sims[~is_valid[cui_indices]] = -1
+        return sims
+
+    def _preprocess_disamb_similarities_batch(
+            self, entities: list[MutableEntity], names: list[str],
+            cuis: list[str], offsets: np.ndarray, similarities: np.ndarray
+            ) -> np.ndarray:
+        """The array form of `_preprocess_disamb_similarities`.
+
+        Args:
+            entities (list[MutableEntity]): The entities.
+            names (list[str]): The name for each entity.
+            cuis (list[str]): The (flattened) CUIs of all the entities.
+            offsets (np.ndarray): The start of each entity's CUIs within
+                `cuis` (with the total number of CUIs at the end).
+            similarities (np.ndarray): The similarity for each CUI.
+
+        Returns:
+            np.ndarray: The preprocessed similarities.
+        """
+        if self._disamb_preprocessors:
+            for ent_nr, entity in enumerate(entities):
+                start, end = offsets[ent_nr], offsets[ent_nr + 1]
+                cur_sims = similarities[start:end].tolist()
+                for preprocessor in self._disamb_preprocessors:
+                    preprocessor(entity, names[ent_nr], cuis[start:end],
+                                 cur_sims)
+                similarities[start:end] = cur_sims
+        seg_lens = np.diff(offsets)
+        if self.config.prefer_primary_name > 0:
+            logger.debug("Preferring primary names")
+            per_pair_names = np.repeat(np.array(names, dtype=object),
+                                       seg_lens)
+            is_primary = np.array([
+                self.name2info[name]['per_cui_status'].get(
+                    cui, ST.AUTOMATIC) in ST.PRIMARY_STATUS
+                for name, cui in zip(per_pair_names, cuis)], dtype=bool)
+            to_change = is_primary & (similarities > 0)
+            similarities[to_change] = np.minimum(
+                0.99, similarities[to_change] *
+                (1 + self.config.prefer_primary_name))
+        if self.config.prefer_frequent_concepts > 0:
+            logger.debug("Preferring frequent concepts")
+            cnts = np.array([self.cui2info[cui]['count_train']
+                             for cui in cuis], dtype=np.float64)
+            mins = np.minimum.reduceat(cnts, offsets[:-1])
+            mins[mins == 0] = 1
+            per_pair_min = np.repeat(mins, seg_lens)
+            scales = np.where(
+                cnts > 10,
+                np.log10(np.maximum(cnts, 1) / per_pair_min) *
+                self.config.prefer_frequent_concepts, 0)
+            similarities = np.minimum(0.99,
+                                      similarities + similarities * scales)
+        return similarities
+
+    def get_all_similarities_batch(
+            self, entities: list[MutableEntity], cuis: list[list[str]],
+            names: list[str], doc: MutableDocument,
+            per_doc_valid_token_cache: 'PerDocumentTokenCache'
+            ) -> list[tuple[Union[list[str], list[None]], list[float], int]]:
+        """Batched version of `get_all_similarities`.
+
+        The context vectors of all the entities are gathered and the
+        similarities for all the candidate CUIs are calculated with one
+        matrix multiplication per context type. The primary name and
+        frequency based preprocessing is applied in array form as well.
+
+        Args:
+            entities (list[MutableEntity]): The entities.
+            cuis (list[list[str]]): The candidate CUIs for each entity.
+            names (list[str]): The detected name for each entity.
+            doc (MutableDocument): The document.
+            per_doc_valid_token_cache (PerDocumentTokenCache):
+                Per document cache for token validation.
+
+        Returns:
+            list[tuple[Union[list[str], list[None]], list[float], int]]:
+                The suitable CUIs, similarities, and index of the best
+                CUI for each entity.
+        """
+        filters = self.config.filters
+        if self.config.filter_before_disamb:
+            logger.debug("Is trainer, subsetting CUIs")
+            cuis = [[cui for cui in ent_cuis if filters.check_filters(cui)]
+                    for ent_cuis in cuis]
+        out: list[tuple[Union[list[str], list[None]], list[float], int]] = [
+            ([None], [0], 0) for _ in entities]
+        todo = [ent_nr for ent_nr, ent_cuis in enumerate(cuis) if ent_cuis]
+        if not todo:
+            return out
+        vectors = [self.get_context_vectors(
+            entities[ent_nr], doc, per_doc_valid_token_cache)
+            for ent_nr in todo]
+        seg_lens = np.array([len(cuis[ent_nr]) for ent_nr in todo],
+                            dtype=np.int64)
+        offsets = np.concatenate(([0], np.cumsum(seg_lens)))
+        flat_cuis = [cui for ent_nr in todo for cui in cuis[ent_nr]]
+        ent_indices = np.repeat(np.arange(len(todo)), seg_lens)
+        similarities = self._batch_similarities(
+            vectors, ent_indices, flat_cuis)
+        logger.debug("Similarities: %s",
+                     list(zip(flat_cuis, similarities.tolist())))
+        similarities = self._preprocess_disamb_similarities_batch(
+            [entities[ent_nr] for ent_nr in todo],
+            [names[ent_nr] for ent_nr in todo],
+            flat_cuis, offsets, similarities)
+        for batch_nr, ent_nr in enumerate(todo):
+            start, end = offsets[batch_nr], offsets[batch_nr + 1]
+            cur_sims = similarities[start:end]
+            out[ent_nr] = (cuis[ent_nr], cur_sims.tolist(),
+                           int(np.argmax(cur_sims)))
+        return out
+
+    def disambiguate_batch(
+            self, entities: list[MutableEntity], cuis: list[list[str]],
+            names: list[str], doc: MutableDocument,
+            per_doc_valid_token_cache: 'PerDocumentTokenCache'
+            ) -> list[tuple[Optional[str], float]]:
+        """Batched version of `disambiguate`.
+
+        Args:
+            entities (list[MutableEntity]): The entities.
+            cuis (list[list[str]]): The candidate CUIs for each entity.
+            names (list[str]): The detected name for each entity.
+            doc (MutableDocument): The document.
+            per_doc_valid_token_cache (PerDocumentTokenCache):
+                Per document cache for token validation.
+
+        Returns:
+            list[tuple[Optional[str], float]]: The best CUI and its
+                similarity for each entity.
+        """
+        return [
+            (suitable_cuis[best_index], sims[best_index])
+            for suitable_cuis, sims, best_index in
+            self.get_all_similarities_batch(
+                entities, cuis, names, doc, per_doc_valid_token_cache)]
+
     def disambiguate(self, cuis: list[str], entity: MutableEntity, name: str,
                      doc: MutableDocument,
                      per_doc_valid_token_cache: 'PerDocumentTokenCache'
@@ -318,6 +556,7 @@ class ContextModel(AbstractSerialisable):
             update_context_vectors(
                 cui_info['context_vectors'], cui, vectors, lr,
                 negative=negative)
+        self._sync_vectors(cui)
         if not negative:
             cui_info['count_train'] += 1
         # Debug
@@ -374,6 +613,7 @@ class ContextModel(AbstractSerialisable):
                     update_context_vectors(
                         info['context_vectors'], cui, vectors, lr,
                         negative=True)
+                self._sync_vectors(_cui)
 
             logger.debug("Devalued via names.\n\tBase cui: %s \n\t"
                          "To be devalued: %s\n", cui, _other_cuis)
@@ -405,6 +645,7 @@ class ContextModel(AbstractSerialisable):
         else:
             update_context_vectors(cui_info['context_vectors'], cui, vectors,
                                    lr, negative=True)
+        self._sync_vectors(cui)
 
 
 class PerDocumentTokenCache(dict[MutableToken, bool]):
@@ -435,7 +676,8 @@ def get_lr_linking(config: Linking, cui_count: int) -> float:
 def get_similarity(cur_vectors: dict[str, np.ndarray],
                    other: dict[str, np.ndarray],
                    weights: dict[str, float], cui: str,
-                   cui2info: dict[str, CUIInfo]) -> float:
+                   cui2info: dict[str, CUIInfo],
+                   cur_norms: Optional[dict[str, float]] = None) -> float:
     sim = 0
     for vec_type in weights:
         if vec_type not in other:
@@ -453,7 +695,11 @@ def get_similarity(cur_vectors: dict[str, np.ndarray],
         w = weights[vec_type]
         v1 = cur_vectors[vec_type]
         v2 = other[vec_type]
-        s = np.dot(unitvec(v1), unitvec(v2))
+        if cur_norms is not None and vec_type in cur_norms:
+            # NOTE: the norms are cached by the dense vector storage
+            s = np.dot(v1 / cur_norms[vec_type], unitvec(v2))
+        else:
+            s = np.dot(unitvec(v1), unitvec(v2))
         sim += w * s
         logger.debug("Similarity for CUI: %s, Count: %s, Context Type: %.10s, "
                      "Weight: %s.2f, Similarity: %s.3f, S*W: %s.3f",
@@ -8,6 +8,7 @@ from typing import Iterable, Iterator, Optional, Union, Callable
 from typing import cast
 import inspect
 from functools import partial
+from bisect import bisect_right
 
 from medcat.cdb.cdb import CDB
 from medcat.components.addons.meta_cat.ml_utils import set_all_seeds
@@ -109,6 +110,10 @@ class TransformersNER(AbstractCoreComponent):
     def __call__(self, doc: MutableDocument) -> MutableDocument:
         return self._component(doc)
 
+    def process_batch(self, docs: list[MutableDocument]
+                      ) -> list[MutableDocument]:
+        return list(self._component.pipe(docs))
+
     # for manual serialisability
 
     def get_folder_name(self) -> str:
@@ -710,25 +715,32 @@ class TransformersNERComponent:
         batch_size_chars = self.config.general.pipe_batch_size_in_chars
         yield from self._process(stream, batch_size_chars)  # type: ignore
 
-    def _process_doc(self, doc: MutableDocument):
+    def _process_docs(self, docs: list[MutableDocument]):
         aggr_strat = self.config.general.ner_aggregation_strategy
-        res = self.ner_pipe(doc.base.text,
-                            aggregation_strategy=aggr_strat)
+        # NOTE: the HF pipeline batches the documents (or their chunks if
+        #       they're longer than the model's max length) and pads each
+        #       batch to the longest sequence within it
+        results = self.ner_pipe(
+            [doc.base.text for doc in docs],
+            aggregation_strategy=aggr_strat,
+            batch_size=self.config.general.inference_batch_size)
+        for doc, res in zip(docs, results):
+            self._set_entities(doc, res)
+
+    def _set_entities(self, doc: MutableDocument, res: list[dict]):
         doc.ner_ents = []  # type: ignore
+        # the (increasing) end character of each token
+        end_chars = [word.base.char_index + len(word.base.text)
+                     for word in doc]
         for r in res:
-            inds = []
-            for ind, word in enumerate(doc):
-                end_char = word.base.char_index + len(word.base.text)
-                if end_char <= r['end'] and end_char > r['start']:
-                    inds.append(ind)
-                # To not loop through everything
-                if end_char > r['end']:
-                    break
-            if not inds:
+            # the tokens that end within the entity
+            start_ind = bisect_right(end_chars, r['start'])
+            end_ind = bisect_right(end_chars, r['end'])
+            if start_ind >= end_ind:
                 continue
 
             entity: MutableEntity = self.base_tokenizer.create_entity(
-                doc, min(inds), max(inds) + 1,
+                doc, start_ind, end_ind,
                 label=r['entity_group'])
             entity.cui = r['entity_group']
             entity.context_similarity = r['score']
@@ -745,10 +757,7 @@ class TransformersNERComponent:
             self.create_eval_pipeline()
         for docs in self.batch_generator(
                 stream, batch_size_chars):  # type: ignore
-            # For now we will process the documents one by one, should be
-            # improved in the future to use batching
-            for doc in docs:
-                self._process_doc(doc)
+            self._process_docs(docs)
             yield from docs
 
     # Override
@@ -0,0 +1,299 @@
+from typing import Optional, Iterable
+
+import os
+import logging
+
+import dill
+
+from medcat.tokenizing.tokens import MutableDocument
+from medcat.components.types import CoreComponentType, AbstractCoreComponent
+from medcat.components.ner.vocab_based_annotator import maybe_annotate_name
+from medcat.tokenizing.tokenizers import BaseTokenizer
+from medcat.storage.serialisables import SerialisingStrategy
+from medcat.vocab import Vocab
+from medcat.cdb import CDB
+from medcat.config.config import ComponentConfig
+
+
+logger = logging.getLogger(__name__)
+
+
+class TokenTrie:
+    """A token level trie over the subnames of a CDB.
+
+    Each (sub)name is split by the separator and every part is an edge
+    in the trie. Since splitting by the separator is the inverse of
+    joining with it, stepping from the node of `name` through the parts
+    of `text` lands on the node of `name + separator + text`. This
+    means checking `cdb.has_subname(name + sep + text)` can be done
+    by following a few edges without any string concatenation.
+
+    Args:
+        separator (str): The separator used within the CDB names.
+    """
+    ROOT = 0
+    """The ID of the root node (i.e the empty name)."""
+    MISSING = -1
+    """The ID returned when no such node exists."""
+
+    def __init__(self, separator: str) -> None:
+        self.separator = separator
+        self._edges: dict[tuple[int, str], int] = {}
+        self._is_subname = bytearray(1)
+
+    def __len__(self) -> int:
+        return len(self._is_subname)
+
+    def add(self, subname: str) -> None:
+        """Add a subname to the trie.
+
+        Args:
+            subname (str): The subname to add.
+        """
+        node = self.ROOT
+        for part in subname.split(self.separator):
+            key = (node, part)
+            child = self._edges.get(key)
+            if child is None:
+                child = len(self._is_subname)
+                self._edges[key] = child
+                self._is_subname.append(0)
+            node = child
+        self._is_subname[node] = 1
+
+    def step(self, node: int, text: str) -> int:
+        """Step from a node to the node of `<node name><sep><text>`.
+
+        Args:
+            node (int): The node to start from.
+            text (str): The text to append.
+
+        Returns:
+            int: The node ID or `TokenTrie.MISSING` if there's no such node.
+        """
+        edges = self._edges
+        for part in text.split(self.separator):
+            node = edges.get((node, part), self.MISSING)
+            if node == self.MISSING:
+                break
+        return node
+
+    def find(self, name: str) -> int:
+        """Find the node corresponding to the name.
+
+        Args:
+            name (str): The full name.
+
+        Returns:
+            int: The node ID or `TokenTrie.MISSING` if there's no such node.
+        """
+        return self.step(self.ROOT, name)
+
+    def is_subname(self, node: int) -> bool:
+        """Whether the node corresponds to a subname in the CDB.
+
+        Args:
+            node (int): The node ID.
+
+        Returns:
+            bool: Whether the node is a subname.
+        """
+        return node != self.MISSING and self._is_subname[node] == 1
+
+    @classmethod
+    def from_subnames(cls, subnames: Iterable[str], separator: str
+                      ) -> 'TokenTrie':
+        """Build a trie from subnames.
+
+        Args:
+            subnames (Iterable[str]): The subnames.
+            separator (str): The separator used in the names.
+
+        Returns:
+            TokenTrie: The built trie.
+        """
+        trie = cls(separator)
+        for subname in subnames:
+            trie.add(subname)
+        return trie
+
+
+class NER(AbstractCoreComponent):
+    """Vocab based NER that uses a precompiled token level trie.
+
+    This produces the exact same entities as the default (vocab based) NER
+    (including the `max_skip_tokens` and `try_reverse_word_order` semantics).
+    However, instead of building each candidate name out of strings and
+    checking whether it's a subname in the CDB, a trie is followed token by
+    token.
+
+    The trie is saved alongside the model pack and rebuilt only if
+    the names within the CDB have changed.
+
+    Args:
+        tokenizer (BaseTokenizer): The tokenizer.
+        cdb (CDB): The Concept database.
+        trie (Optional[TokenTrie]): The prebuilt trie (if available).
+        names_id (Optional[str]): The ID of the CDB names the prebuilt
+            trie was built from (see `CDB.names_id`).
+    """
+    name = 'cat_trie_ner'
+    TRIE_FILE = 'trie.dat'
+
+    def __init__(self, tokenizer: BaseTokenizer,
+                 cdb: CDB, trie: Optional[TokenTrie] = None,
+                 names_id: Optional[str] = None) -> None:
+        self.tokenizer = tokenizer
+        self.cdb = cdb
+        self.config = self.cdb.config
+        self._ensure_subnames()
+        if (trie is None or
+                trie.separator != self.config.general.separator or
+                names_id != self.cdb.names_id):
+            self._rebuild_trie()
+        else:
+            self._trie = trie
+            self._name_version = self.cdb.name_version
+
+    def _ensure_subnames(self) -> None:
+        # NOTE: same logic as in CDB.has_subname
+        if (self.cdb.has_changed_names or
+                len(self.cdb._subnames) < len(self.cdb.name2info)):
+            self.cdb._reset_subnames()
+
+    def _rebuild_trie(self) -> None:
+        # NOTE: every time the names in the CDB change
+        #       this will be recalculated
+        logger.info("Rebuilding NER trie")
+        self._trie = TokenTrie.from_subnames(
+            self.cdb._subnames, self.config.general.separator)
+        self._name_version = self.cdb.name_version
+        logger.debug("Built NER trie with %d nodes", len(self._trie))
+
+    def get_type(self) -> CoreComponentType:
+        return CoreComponentType.ner
+
+    def __call__(self, doc: MutableDocument) -> MutableDocument:
+        """Detect candidates for concepts - linker will then be able
+        to do the rest. It adds `entities` to the doc.entities and each
+        entity can have the entity.link_candidates - that the linker
+        will resolve.
+
+        Args:
+            doc (MutableDocument):
+                Spacy document to be annotated with named entities.
+
+        Returns:
+            doc (MutableDocument):
+                Spacy document with detected entities.
+        """
+        self._ensure_subnames()
+        if self._name_version != self.cdb.name_version:
+            self._rebuild_trie()
+        trie = self._trie
+        name2info = self.cdb.name2info
+        max_skip_tokens = self.config.components.ner.max_skip_tokens
+        try_reverse = self.config.components.ner.try_reverse_word_order
+        _sep = self.config.general.separator
+        # Just take the tokens we need
+        _doc = [tkn for tkn in doc if not tkn.to_skip]
+        for i, tkn in enumerate(_doc):
+            tkns = [tkn]
+            name = ""
+            node = trie.MISSING
+            for name_version in tkn.base.text_versions:
+                cur_node = trie.find(name_version)
+                if trie.is_subname(cur_node):
+                    name, node = name_version, cur_node
+                    break
+            # if name is not a subname CDB (explicitly)
+            if not name:
+                # There has to be at least something appended to the name
+                # to go forward
+                continue
+            # if name is in CDB
+            if name in name2info and not tkn.base.is_stop:
+                maybe_annotate_name(self.tokenizer, name, tkns, doc,
+                                    self.cdb, self.config)
+            # if name is a part of a concept
+            # we start adding onto it to get a match
+            for j in range(i + 1, len(_doc)):
+                if (_doc[j].base.index - _doc[j - 1].base.index - 1
+                        > max_skip_tokens):
+                    # Do not allow to skip more than limit
+                    break
+                tkn = _doc[j]
+                tkns.append(tkn)
+
+                name_changed = False
+                name_reverse = None
+                for name_version in tkn.base.text_versions:
+                    cur_node = trie.step(node, name_version)
+                    if trie.is_subname(cur_node):
+                        # Append the name and break
+                        name = name + _sep + name_version
+                        node = cur_node
+                        name_changed = True
+                        break
+
+                    if try_reverse:
+                        _name_reverse = name_version + _sep + name
+                        if trie.is_subname(trie.find(_name_reverse)):
+                            name_reverse = _name_reverse
+
+                if name_changed:
+                    if name in name2info:
+                        maybe_annotate_name(self.tokenizer, name, tkns, doc,
+                                            self.cdb, self.config)
+                elif name_reverse is not None:
+                    if name_reverse in name2info:
+                        maybe_annotate_name(self.tokenizer, name_reverse, tkns,
+                                            doc, self.cdb, self.config)
+                else:
+                    break
+
+        return doc
+
+    # for manual serialisability
+
+    def serialise_to(self, folder_path: str) -> None:
+        # make sure the saved trie matches the names
+        self._ensure_subnames()
+        if self._name_version != self.cdb.name_version:
+            self._rebuild_trie()
+        os.makedirs(folder_path, exist_ok=True)
+        with open(os.path.join(folder_path, self.TRIE_FILE), 'wb') as f:
+            dill.dump({'trie': self._trie, 'names_id': self.cdb.names_id}, f)
+
+    @classmethod
+    def deserialise_from(cls, folder_path: str, **init_kwargs) -> 'NER':
+        trie_path = os.path.join(folder_path, cls.TRIE_FILE)
+        trie: Optional[TokenTrie] = None
+        names_id: Optional[str] = None
+        if os.path.exists(trie_path):
+            with open(trie_path, 'rb') as f:
+                saved = dill.load(f)
+            trie, names_id = saved['trie'], saved.get('names_id')
+        return cls(init_kwargs['tokenizer'], init_kwargs['cdb'],
+                   trie=trie, names_id=names_id)
+
+    def get_strategy(self) -> SerialisingStrategy:
+        return SerialisingStrategy.MANUAL
+
+    @classmethod
+    def get_init_attrs(cls) -> list[str]:
+        return []
+
+    @classmethod
+    def ignore_attrs(cls) -> list[str]:
+        return []
+
+    @classmethod
+    def include_properties(cls) -> list[str]:
+        return []
+
+    @classmethod
+    def create_new_component(
+            cls, cnf: ComponentConfig, tokenizer: BaseTokenizer,
+            cdb: CDB, vocab: Vocab, model_load_path: Optional[str]) -> 'NER':
+        return cls(tokenizer, cdb)
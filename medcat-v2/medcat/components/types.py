@@ -69,6 +69,28 @@ class CoreComponent(BaseComponent, Protocol):
         pass
 
 
+@runtime_checkable
+class BatchedCoreComponent(CoreComponent, Protocol):
+    """A core component that can process multiple documents at once.
+
+    When processing multiple texts, the pipeline passes all the documents
+    to these components at once (rather than one by one).
+    """
+
+    def process_batch(self, docs: list[MutableDocument]
+                      ) -> list[MutableDocument]:
+        """Process multiple documents at once.
+
+        Args:
+            docs (list[MutableDocument]): The documents.
+
+        Returns:
+            list[MutableDocument]: The processed documents (in the same
+                order).
+        """
+        pass
+
+
 class AbstractCoreComponent(CoreComponent):
     NAME_PREFIX = "core_"
 
@@ -125,6 +147,8 @@ _DEFAULT_NER: dict[str, tuple[str, str]] = {
                 "NER.create_new_component"),
     "dict": ("medcat.components.ner.dict_based_ner",
              "NER.create_new_component"),
+    "trie": ("medcat.components.ner.trie_based_ner",
+             "NER.create_new_component"),
     "transformers_ner": ("medcat.components.ner.trf.transformers_ner",
                          "TransformersNER.create_new_component"),
 }
@@ -380,6 +380,20 @@ class Linking(ComponentConfig):
     context_ignore_center_tokens: bool = False
     """If true when the context of a concept is calculated (embedding)
     the words making that concept are not taken into account"""
+    batch_disambiguation: bool = True
+    """If true, all entities within a document that need to be disambiguated
+    will be disambiguated at once. Their candidates' context vectors are
+    stacked and the similarities are calculated with one matrix
+    multiplication per context type rather than one CUI at a time."""
+    dense_context_vectors: bool = False
+    """If true, the context vectors of all concepts are kept in one
+    contiguous (float32) matrix per context type along with cached norms
+    (see `CDB.enable_dense_context_vectors`). This reduces memory usage
+    for large CDBs and avoids renormalising the vectors upon every
+    comparison.
+
+    NB! For these changes to take effect, the pipe would need to be recreated.
+    """
     additional: Optional[Any] = None
     """Some additional config for non-default linkers.
     E.g the 2-step linker uses this for alpha calculations
@@ -433,6 +447,44 @@ class EmbeddingLinking(Linking):
     you want to trust them or not."""
     use_similarity_threshold: bool = True
     """Do we have a similarity threshold we care about?"""
+    embedding_precision: Literal[
+        'auto', 'float32', 'float16', 'bfloat16', 'int8'] = 'auto'
+    """The precision the name and CUI embeddings are stored and scored at.
+    The `auto` option uses `float16` on GPUs and `float32` on CPUs.
+    Using `bfloat16` (on CPUs with native support) or `float16` halves the
+    memory use and `int8` (with a scale per embedding) roughly quarters it,
+    at a small cost in scoring accuracy. The embeddings are converted to this
+    precision once the linker first uses them and only this copy is kept
+    (within the CDB). They are still saved at `float32`, but with a reduced
+    precision these are the (slightly lossy) dequantised values."""
+    context_batch_size: int = 64
+    """How many context snippets are embedded at once. The snippets are
+    sorted by length before batching to reduce padding."""
+    context_cache_size: int = 10000
+    """How many context snippet embeddings to cache (least recently used
+    ones are evicted). Identical snippets (e.g in templated text) are only
+    embedded once. Use 0 to disable the cache.
+
+    NB! For changes to take effect, the linker would need to be recreated."""
+    name_index: Literal['exact', 'ivf'] = 'exact'
+    """The index used to find the most similar names for detected entities.
+    The `exact` index scores all names (in blocks). The `ivf` index clusters
+    the names and only scores the names in the closest clusters. This is
+    approximate, but a lot faster for large CDBs. The clusters are built
+    once and saved within the CDB."""
+    name_index_top_k: int = 64
+    """The maximum number of names (above the short similarity threshold)
+    used to generate link candidates for each entity."""
+    name_index_block_size: int = 65536
+    """How many names are scored at once in the exact search."""
+    ivf_n_lists: int = 0
+    """The number of clusters in the `ivf` name index. If 0, this is
+    chosen based on the number of names (4 * sqrt(n_names)).
+
+    NB! For changes to take effect, the index needs to be rebuilt."""
+    ivf_n_probe: int = 16
+    """The number of closest clusters to score names from in the `ivf`
+    name index. Higher values improve recall at the cost of speed."""
 
 class Preprocessing(SerialisableBaseModel):
     """The preprocessing part of the config"""
@@ -525,6 +577,14 @@ class Components(SerialisableBaseModel):
     comp_order: list[str] = ['tagging', 'token_normalizing',
                              'ner', 'linking']
     addons: list[ComponentConfig] = []
+    batch_addons: bool = True
+    """Whether to pass a batch of documents to the addons at once when
+    processing multiple texts (i.e `CAT.get_entities_multi_texts`).
+
+    The core components still process each document separately. But the
+    addons that support it (e.g MetaCAT) can then process the entities of
+    all the documents in the batch together, which is usually a lot faster
+    than doing so one document at a time."""
 
 
 class TrainingDescriptor(SerialisableBaseModel):
@@ -16,6 +16,10 @@ class General(SerialisableBaseModel):
     """Should provide a basic description of this MetaCAT model"""
     pipe_batch_size_in_chars: int = 20000000
     """How many characters are piped at once into the meta_cat class"""
+    inference_batch_size: int = 8
+    """How many sequences (i.e documents or their chunks) are passed through
+    the model at once during inference. The sequences in a batch are padded
+    to the longest one within it."""
     ner_aggregation_strategy: str = 'simple'
     """Agg strategy for HF pipeline for NER"""
     chunking_overlap_window: Optional[int] = 5
@@ -1,4 +1,5 @@
 from typing import Optional, Iterable, Union
+from concurrent.futures import ThreadPoolExecutor
 import logging
 import os
 
@@ -6,12 +7,13 @@ from medcat.utils.defaults import COMPONENTS_FOLDER
 from medcat.tokenizing.tokenizers import BaseTokenizer, create_tokenizer
 from medcat.components.types import (
     CoreComponentType, create_core_component, CoreComponent, BaseComponent,
-    AbstractCoreComponent)
-from medcat.components.addons.addons import AddonComponent, create_addon
+    AbstractCoreComponent, BatchedCoreComponent)
+from medcat.components.addons.addons import (
+    AddonComponent, BatchedAddonComponent, create_addon)
 from medcat.tokenizing.tokens import (MutableDocument, MutableEntity,
                                       MutableToken)
 from medcat.storage.serialisers import (
-    AvailableSerialisers, serialise, deserialise)
+    AvailableSerialisers, serialise, deserialise, get_serialiser)
 from medcat.storage.serialisables import Serialisable
 from medcat.vocab import Vocab
 from medcat.cdb import CDB
@@ -307,15 +309,50 @@ class Pipeline:
         Returns:
             MutableDocument: The resulting document.
         """
+        doc = self._run_core_components(text)
+        for addon in self._addons:
+            doc = addon(doc)
+        return doc
+
+    def _run_core_components(self, text: str) -> MutableDocument:
         doc = self._tokenizer(text)
         for comp in self._components:
             logger.info("Running component %s for %d of text (%s)",
                         comp.full_name, len(text), id(text))
             doc = comp(doc)
-        for addon in self._addons:
-            doc = addon(doc)
         return doc
 
+    def get_docs(self, texts: Iterable[str]) -> list[MutableDocument]:
+        """Get the documents for multiple texts.
+
+        The components that support batching (see `BatchedCoreComponent`
+        and `BatchedAddonComponent`) process all the documents at once,
+        while the rest process them one by one.
+
+        Args:
+            texts (Iterable[str]): The input texts.
+
+        Returns:
+            list[MutableDocument]: The resulting documents (in the same
+                order as the texts).
+        """
+        docs = [self._tokenizer(text) for text in texts]
+        if not docs:
+            return docs
+        for comp in self._components:
+            logger.info("Running component %s for %d documents",
+                        comp.full_name, len(docs))
+            if isinstance(comp, BatchedCoreComponent):
+                docs = comp.process_batch(docs)
+            else:
+                docs = [comp(doc) for doc in docs]
+        for addon in self._addons:
+            if isinstance(addon, BatchedAddonComponent):
+                docs = addon.process_batch(docs)
+            else:
+                docs = [addon(doc) for doc in docs]
+        return docs
+
     def entity_from_tokens(self, tokens: list[MutableToken]) -> MutableEntity:
         """Get the entity from the list of tokens.
 
@@ -357,6 +394,7 @@ class Pipeline:
     def save_components(self,
                         serialiser_type: Union[AvailableSerialisers, str],
                         components_folder: str) -> None:
+        comps_and_folders: list[tuple[Serialisable, str]] = []
         for component in self.iter_all_components():
             if not isinstance(component, Serialisable):
                 continue
@@ -376,7 +414,21 @@ class Pipeline:
                 raise ValueError(
                     f"Unknown component: {type(component)} - does not appear "
                     "to be a CoreComponent or an AddonComponent")
-            serialise(serialiser_type, component, comp_folder)
+            comps_and_folders.append((component, comp_folder))
+        max_workers = get_serialiser(serialiser_type).max_workers
+        if max_workers <= 1 or len(comps_and_folders) <= 1:
+            for ser_comp, comp_folder in comps_and_folders:
+                serialise(serialiser_type, ser_comp, comp_folder)
+            return
+        # NOTE: the components are independent so they can be
+        #       written in parallel
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(serialise, serialiser_type, ser_comp,
+                                comp_folder)
+                for ser_comp, comp_folder in comps_and_folders]
+            for future in futures:
+                future.result()
 
     def iter_all_components(self) -> Iterable[BaseComponent]:
         for component in self._components:
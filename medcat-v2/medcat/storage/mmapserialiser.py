@@ -0,0 +1,175 @@
+"""A dill based serialiser that keeps the numeric data in raw `.npy` files.
+
+The (potentially) large numeric parts of a model (e.g the vocab vectors,
+the context vectors of the concepts or the embeddings used by the embedding
+linker) are taken out of the pickled data and written into separate `.npy`
+files. Upon load, these files are memory mapped (`np.load(mmap_mode='r')`)
+so the data itself is never copied into process memory. This means that
+multiple processes that load the same model on the same node share the
+same (OS page cache) pages and loading is mostly limited by unpickling the
+(relatively small) non-numeric data.
+
+The 1D arrays of the same type and length (i.e per word or per concept
+vectors) are stacked into one matrix and each original array is loaded
+as a (read only) view into that matrix.
+"""
+from typing import Any, Optional, Hashable, Literal
+import sys
+import logging
+
+import dill as _dill
+import numpy as np
+
+from medcat.storage.serialisers import Serialiser, AvailableSerialisers
+from medcat.utils.legacy.v2_beta import RemappingUnpickler
+
+
+logger = logging.getLogger(__name__)
+
+
+ARRAY_FILE_SUFFIX = '.npy'
+_NDARRAY = 'ndarray'
+_TENSOR = 'tensor'
+
+MmapMode = Optional[Literal['r+', 'r', 'w+', 'c']]
+
+
+def _get_arrays_file(target_file: str, file_nr: int) -> str:
+    return f"{target_file}.{file_nr}{ARRAY_FILE_SUFFIX}"
+
+
+class _ArrayExtractingPickler(_dill.Pickler):
+    """Pickler that takes numeric arrays out of the pickled data.
+
+    The arrays are kept in memory until `save_arrays` is called.
+    """
+
+    def __init__(self, *args, min_size: int, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._min_size = min_size
+        self._files: list[list[np.ndarray]] = []
+        self._file_kinds: list[str] = []
+        self._groups: dict[Hashable, int] = {}
+        # NOTE: the same array (object) only ever gets saved once
+        #       the array is kept alive so the ID can't be reused
+        self._saved: dict[int, tuple[tuple, Any]] = {}
+
+    def _get_file_nr(self, kind: str, group: Optional[Hashable]) -> int:
+        if group is not None and (kind, group) in self._groups:
+            return self._groups[(kind, group)]
+        file_nr = len(self._files)
+        self._files.append([])
+        self._file_kinds.append(kind)
+        if group is not None:
+            self._groups[(kind, group)] = file_nr
+        return file_nr
+
+    def _as_array(self, obj: Any) -> Optional[tuple[str, np.ndarray]]:
+        if type(obj) is np.ndarray or isinstance(obj, np.memmap):
+            return _NDARRAY, obj
+        torch = sys.modules.get('torch')
+        if (torch is None or type(obj) is not torch.Tensor or
+                obj.requires_grad or obj.device.type != 'cpu'):
+            return None
+        try:
+            return _TENSOR, obj.numpy()
+        except TypeError:
+            # e.g bfloat16 has no numpy equivalent
+            return None
+
+    def persistent_id(self, obj: Any) -> Optional[tuple]:
+        kind_and_arr = self._as_array(obj)
+        if kind_and_arr is None:
+            return None
+        kind, arr = kind_and_arr
+        if arr.dtype.hasobject or arr.ndim == 0 or arr.size < self._min_size:
+            return None
+        prev = self._saved.get(id(obj))
+        if prev is not None:
+            return prev[0]
+        pid: tuple
+        if arr.ndim == 1:
+            file_nr = self._get_file_nr(kind, (arr.dtype.str, arr.shape[0]))
+            rows = self._files[file_nr]
+            pid = (kind, file_nr, len(rows))
+            rows.append(arr)
+        else:
+            file_nr = self._get_file_nr(kind, None)
+            self._files[file_nr].append(arr)
+            pid = (kind, file_nr, None)
+        self._saved[id(obj)] = (pid, obj)
+        return pid
+
+    def save_arrays(self, target_file: str) -> None:
+        for file_nr, arrays in enumerate(self._files):
+            arr_path = _get_arrays_file(target_file, file_nr)
+            if arrays[0].ndim == 1:
+                np.save(arr_path, np.stack(arrays))
+            else:
+                np.save(arr_path, arrays[0])
+        logger.debug("Saved %d arrays into %d files for %s",
+                     len(self._saved), len(self._files), target_file)
+
+
+class _ArrayMappingUnpickler(RemappingUnpickler):
+    """Unpickler that memory maps the arrays saved alongside the data."""
+
+    def __init__(self, *args, target_file: str, mmap_mode: MmapMode,
+                 **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._target_file = target_file
+        self._mmap_mode = mmap_mode
+        self._loaded: dict[int, np.ndarray] = {}
+
+    def _load_file(self, file_nr: int, mmap_mode: MmapMode
+                   ) -> np.ndarray:
+        arr = self._loaded.get(file_nr)
+        if arr is None:
+            arr_path = _get_arrays_file(self._target_file, file_nr)
+            # NOTE: the memmap is converted to a regular array (view)
+            #       so that any derived arrays are regular arrays as well
+            arr = np.asarray(np.load(arr_path, mmap_mode=mmap_mode))
+            self._loaded[file_nr] = arr
+        return arr
+
+    def persistent_load(self, pid: tuple) -> Any:
+        kind, file_nr, row = pid
+        mmap_mode: MmapMode = self._mmap_mode
+        if kind == _TENSOR and mmap_mode == 'r':
+            # NOTE: torch does not support read only tensors so the
+            #       (copy on write) private mapping is used instead
+            mmap_mode = 'c'
+        arr = self._load_file(file_nr, mmap_mode)
+        if row is not None:
+            arr = arr[row]
+        if kind == _TENSOR:
+            import torch
+            return torch.from_numpy(arr)
+        return arr
+
+
+class DillMmapSerialiser(Serialiser):
+    """The dill based serialiser that memory maps numeric arrays.
+
+    Attributes:
+        min_array_size (int): The minimum number of elements for an array
+            to be saved into a separate file. Smaller arrays are pickled
+            along with the rest of the data.
+        mmap_mode (MmapMode): The mode for memory mapping the arrays
+            (see `np.load`). If `None`, the arrays are read into memory.
+    """
+    ser_type = AvailableSerialisers.dill_mmap
+    min_array_size: int = 16
+    mmap_mode: MmapMode = 'r'
+
+    def serialise(self, raw_parts: dict[str, Any], target_file: str) -> None:
+        with open(target_file, 'wb') as f:
+            pickler = _ArrayExtractingPickler(
+                f, min_size=self.min_array_size)
+            pickler.dump(raw_parts)
+        pickler.save_arrays(target_file)
+
+    def deserialise(self, target_file: str) -> dict[str, Any]:
+        with open(target_file, 'rb') as f:
+            return _ArrayMappingUnpickler(
+                f, target_file=target_file, mmap_mode=self.mmap_mode).load()
@@ -0,0 +1,125 @@
+"""A MessagePack based serialiser.
+
+The raw parts are written in the (compact, binary) MessagePack format.
+Numeric arrays are written as raw buffers (along with their type and shape)
+rather than converted to lists (as done by the JSON serialiser), so writing
+and reading them is (mostly) limited by the memory bandwidth.
+
+The built in types (`dict`, `list`, `str`, `int`, `float`, `bool`, `None`
+and `bytes`) are written as their MessagePack counterparts. Tuples, sets,
+numpy arrays and numpy scalars use MessagePack extension types. Anything
+else (e.g subclasses of the built in types like `Counter` or `defaultdict`)
+is pickled with dill so that all parts can be serialised.
+
+Since the raw parts of the different (nested) serialisable parts (e.g the
+CDB, the vocab and the config) are independent, they are written and read
+in parallel threads.
+"""
+from typing import Any
+from io import BytesIO
+import struct
+
+import dill as _dill
+import numpy as np
+
+import medcat
+from medcat.utils.import_utils import ensure_optional_extras_installed
+from medcat.storage.serialisers import Serialiser, AvailableSerialisers
+from medcat.utils.legacy.v2_beta import RemappingUnpickler
+
+_EXTRA_NAME = "msgpack"
+
+ensure_optional_extras_installed(medcat.__name__, _EXTRA_NAME)
+
+import msgpack  # noqa
+
+
+# the extension type codes
+_TUPLE = 1
+_SET = 2
+_FROZENSET = 3
+_NDARRAY = 4
+_NPSCALAR = 5
+_PICKLED = 6
+
+_HEADER_LEN = struct.Struct("<I")
+
+
+def _pack(obj: Any) -> bytes:
+    return msgpack.packb(obj, default=_encode, strict_types=True)
+
+
+def _unpack(data: bytes) -> Any:
+    return msgpack.unpackb(data, ext_hook=_decode, strict_map_key=False)
+
+
+def _encode_array(arr: np.ndarray) -> bytes:
+    header = msgpack.packb([arr.dtype.str, list(arr.shape)])
+    return (_HEADER_LEN.pack(len(header)) + header +
+            np.ascontiguousarray(arr).tobytes())
+
+
+def _decode_array(data: bytes) -> np.ndarray:
+    view = memoryview(data)
+    (header_len, ) = _HEADER_LEN.unpack_from(view)
+    offset = _HEADER_LEN.size + header_len
+    dtype, shape = msgpack.unpackb(view[_HEADER_LEN.size:offset])
+    # NOTE: copied so that the array is writeable
+    return np.frombuffer(view, dtype=dtype, offset=offset).reshape(
+        shape).copy()
+
+
+def _encode(obj: Any) -> msgpack.ExtType:
+    obj_type = type(obj)
+    if obj_type is tuple:
+        return msgpack.ExtType(_TUPLE, _pack(list(obj)))
+    elif obj_type is set:
+        return msgpack.ExtType(_SET, _pack(list(obj)))
+    elif obj_type is frozenset:
+        return msgpack.ExtType(_FROZENSET, _pack(list(obj)))
+    elif obj_type is np.ndarray and not obj.dtype.hasobject:
+        return msgpack.ExtType(_NDARRAY, _encode_array(obj))
+    elif isinstance(obj, np.generic) and not isinstance(obj, np.object_):
+        return msgpack.ExtType(_NPSCALAR, _encode_array(np.asarray(obj)))
+    return msgpack.ExtType(_PICKLED, _dill.dumps(obj))
+
+
+def _decode(code: int, data: bytes) -> Any:
+    if code == _TUPLE:
+        return tuple(_unpack(data))
+    elif code == _SET:
+        return set(_unpack(data))
+    elif code == _FROZENSET:
+        return frozenset(_unpack(data))
+    elif code == _NDARRAY:
+        return _decode_array(data)
+    elif code == _NPSCALAR:
+        return _decode_array(data)[()]
+    elif code == _PICKLED:
+        return RemappingUnpickler(BytesIO(data)).load()
+    return msgpack.ExtType(code, data)
+
+
+class MsgPackSerialiser(Serialiser):
+    """The MessagePack based serialiser.
+
+    Attributes:
+        max_workers (int): The number of threads used for writing and
+            reading the raw parts.
+    """
+    ser_type = AvailableSerialisers.msgpack
+    max_workers: int = 4
+
+    def serialise(self, raw_parts: dict[str, Any], target_file: str) -> None:
+        packer = msgpack.Packer(default=_encode, strict_types=True)
+        # NOTE: packing one part at a time so that the packed bytes of
+        #       all parts are never in memory at once
+        with open(target_file, 'wb') as f:
+            f.write(packer.pack_map_header(len(raw_parts)))
+            for name, part in raw_parts.items():
+                f.write(packer.pack(name))
+                f.write(packer.pack(part))
+
+    def deserialise(self, target_file: str) -> dict[str, Any]:
+        with open(target_file, 'rb') as f:
+            return _unpack(f.read())
@@ -0,0 +1,270 @@
+"""Columnar (Parquet) storage for the entities of multiple documents.
+
+Each save writes a new `part_<num>.parquet` file with one row per entity
+and appends the IDs of the documents within it to an (append only)
+manifest. Since nothing previously written is rewritten, the cost of each
+save only depends on the size of that save. The manifest also allows an
+interrupted run to be resumed.
+
+The output can be read back (and filtered by CUI) one part at a time
+using `ParquetAnnotationReader` without having to load all the data.
+
+NOTE: The document level information other than the entities (e.g the
+      text) is not saved.
+"""
+from typing import Union, Optional, Iterable, Iterator, Any, cast
+import os
+import json
+import logging
+
+import medcat
+from medcat.utils.import_utils import ensure_optional_extras_installed
+from medcat.data.entities import Entity, Entities, OnlyCUIEntities
+from medcat.storage.mp_ents_save import BatchAnnotationSaver
+
+_EXTRA_NAME = "parquet"
+
+ensure_optional_extras_installed(medcat.__name__, _EXTRA_NAME)
+
+import pyarrow as pa  # noqa
+import pyarrow.compute as pc  # noqa
+import pyarrow.parquet as pq  # noqa
+
+
+logger = logging.getLogger(__name__)
+
+
+MANIFEST_FILE = "annotated_ids.jsonl"
+PART_FILE_PREFIX = "part_"
+PART_FILE_SUFFIX = ".parquet"
+ONLY_CUI_META_KEY = b"medcat.only_cui"
+
+_STR_FIELDS = ['cui', 'pretty_name', 'source_value', 'detected_name']
+_INT_FIELDS = ['start', 'end']
+_FLOAT_FIELDS = ['acc', 'context_similarity']
+_NATIVE_FIELDS = set(
+    ['id', 'type_ids'] + _STR_FIELDS + _INT_FIELDS + _FLOAT_FIELDS)
+
+ENTITY_SCHEMA = pa.schema([
+    pa.field('doc_id', pa.string(), nullable=False),
+    pa.field('ent_id', pa.int64(), nullable=False),
+    pa.field('cui', pa.string()),
+    pa.field('pretty_name', pa.string()),
+    pa.field('source_value', pa.string()),
+    pa.field('detected_name', pa.string()),
+    pa.field('start', pa.int64()),
+    pa.field('end', pa.int64()),
+    pa.field('acc', pa.float64()),
+    pa.field('context_similarity', pa.float64()),
+    pa.field('type_ids', pa.list_(pa.string())),
+    # NOTE: everything else (e.g meta annotations) as a JSON string
+    pa.field('extra', pa.string()),
+])
+"""The schema of the saved entities (one row per entity)."""
+
+
+def get_part_path(save_dir: str, part_num: int) -> str:
+    return os.path.join(save_dir,
+                        f"{PART_FILE_PREFIX}{part_num}{PART_FILE_SUFFIX}")
+
+
+def _json_default(obj: Any) -> Any:
+    # NOTE: numpy scalars
+    if hasattr(obj, 'item'):
+        return obj.item()
+    raise TypeError(f"Unable to save {type(obj)} as JSON")
+
+
+def read_manifest(save_dir: str) -> list[tuple[int, list[str]]]:
+    """Read the manifest of saved parts.
+
+    Args:
+        save_dir (str): The directory of the saved output.
+
+    Returns:
+        list[tuple[int, list[str]]]: The part numbers along with the
+            document IDs saved in each.
+    """
+    manifest_path = os.path.join(save_dir, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        return []
+    parts: list[tuple[int, list[str]]] = []
+    with open(manifest_path) as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # NOTE: an interrupted write, the part is not complete
+                logger.warning("Ignoring incomplete manifest entry in %s",
+                               manifest_path)
+                continue
+            parts.append((entry['part'], entry['ids']))
+    return parts
+
+
+class ParquetAnnotationSaver(BatchAnnotationSaver):
+    """Saves the entities of batches of documents in the Parquet format.
+
+    If the save directory already contains (partial) output, the new parts
+    are added after the existing ones and the IDs of the documents that
+    have already been saved are available through `annotated_ids`.
+
+    Args:
+        save_dir (str): The directory to save the output to.
+        batches_per_save (int): The number of batches to save at once.
+    """
+
+    def __init__(self, save_dir: str, batches_per_save: int):
+        self.save_dir = save_dir
+        self.batches_per_save = batches_per_save
+        self._batch_cache: list[list[
+            tuple[str, Union[dict, Entities, OnlyCUIEntities]]]] = []
+        os.makedirs(save_dir, exist_ok=True)
+        self.manifest_path = os.path.join(save_dir, MANIFEST_FILE)
+        self.annotated_ids: set[str] = set()
+        last_part = -1
+        for part_num, ids in read_manifest(save_dir):
+            self.annotated_ids.update(ids)
+            last_part = max(last_part, part_num)
+        self.part_number = last_part + 1
+        if self.annotated_ids:
+            logger.info("Found %d already annotated documents in %d parts "
+                        "at %s", len(self.annotated_ids), self.part_number,
+                        save_dir)
+
+    def _to_table(self, batches: list[list[
+            tuple[str, Union[dict, Entities, OnlyCUIEntities]]]]
+                  ) -> pa.Table:
+        columns: dict[str, list] = {
+            field.name: [] for field in ENTITY_SCHEMA}
+        only_cui = True
+        for batch in batches:
+            for doc_id, doc in batch:
+                for ent_id, ent in doc.get('entities', {}).items():
+                    columns['doc_id'].append(doc_id)
+                    columns['ent_id'].append(int(ent_id))
+                    if isinstance(ent, str):
+                        ent = cast(Entity, {'cui': ent})
+                    else:
+                        only_cui = False
+                    for field in _STR_FIELDS:
+                        columns[field].append(ent.get(field))
+                    for field in _INT_FIELDS + _FLOAT_FIELDS:
+                        val = ent.get(field)
+                        columns[field].append(
+                            None if val is None else
+                            val.item() if hasattr(val, 'item') else val)
+                    columns['type_ids'].append(ent.get('type_ids'))
+                    extra = {key: val for key, val in ent.items()
+                             if key not in _NATIVE_FIELDS}
+                    columns['extra'].append(
+                        json.dumps(extra, default=_json_default)
+                        if extra else None)
+        schema = ENTITY_SCHEMA.with_metadata(
+            {ONLY_CUI_META_KEY: b"true" if only_cui else b"false"})
+        return pa.Table.from_pydict(columns, schema=schema)
+
+    def _save_cache(self):
+        ids = [doc_id for batch in self._batch_cache for doc_id, _ in batch]
+        if not ids:
+            # nothing to save (e.g everything was saved at the last batch)
+            self._batch_cache.clear()
+            return
+        logger.debug("Saving part %d with %d batches (%d documents)",
+                     self.part_number, len(self._batch_cache), len(ids))
+        part_path = get_part_path(self.save_dir, self.part_number)
+        # NOTE: write to a temporary file first so that a part on disk
+        #       is always complete
+        temp_path = part_path + ".tmp"
+        pq.write_table(self._to_table(self._batch_cache), temp_path)
+        os.replace(temp_path, part_path)
+        # the part is only considered done once it's in the manifest
+        with open(self.manifest_path, 'a') as f:
+            f.write(json.dumps({'part': self.part_number, 'ids': ids}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.annotated_ids.update(ids)
+        self._batch_cache.clear()
+        self.part_number += 1
+
+
+class ParquetAnnotationReader:
+    """Reads the entities saved by the `ParquetAnnotationSaver`.
+
+    The data is read one part at a time so the memory use only depends on
+    the size of the parts rather than the entire output.
+
+    Args:
+        save_dir (str): The directory the output was saved to.
+    """
+
+    def __init__(self, save_dir: str):
+        self.save_dir = save_dir
+        self.parts = read_manifest(save_dir)
+
+    @property
+    def annotated_ids(self) -> set[str]:
+        """The IDs of all the documents that have been saved."""
+        return {doc_id for _, ids in self.parts for doc_id in ids}
+
+    def iter_tables(self, cuis: Optional[Iterable[str]] = None,
+                    columns: Optional[list[str]] = None
+                    ) -> Iterator[pa.Table]:
+        """Iterate over the saved entities one part at a time.
+
+        Args:
+            cuis (Optional[Iterable[str]]): The CUIs to filter for.
+                Defaults to None (i.e all entities).
+            columns (Optional[list[str]]): The columns to read.
+                Defaults to None (i.e all columns).
+
+        Yields:
+            pa.Table: The (filtered) entities for each part.
+        """
+        filters = None
+        if cuis is not None:
+            filters = pc.field('cui').isin(list(cuis))
+        for part_num, _ in self.parts:
+            yield pq.read_table(get_part_path(self.save_dir, part_num),
+                                columns=columns, filters=filters)
+
+    def iter_docs(self, cuis: Optional[Iterable[str]] = None
+                  ) -> Iterator[tuple[str, Union[Entities, OnlyCUIEntities]]]:
+        """Iterate over the saved documents in the order they were saved.
+
+        Args:
+            cuis (Optional[Iterable[str]]): The CUIs to filter for. If
+                specified, only the documents with at least one entity
+                with one of these CUIs are included and only the
+                relevant entities are included. Defaults to None.
+
+        Yields:
+            tuple[str, Union[Entities, OnlyCUIEntities]]: The document ID
+                and its entities.
+        """
+        cui_set = set(cuis) if cuis is not None else None
+        for (part_num, ids), table in zip(self.parts, self.iter_tables(
+                cuis=cui_set)):
+            meta = table.schema.metadata or {}
+            only_cui = meta.get(ONLY_CUI_META_KEY) == b"true"
+            per_doc: dict[str, dict[int, Any]] = {}
+            for row in table.to_pylist():
+                per_doc.setdefault(row['doc_id'], {})[row['ent_id']] = (
+                    row['cui'] if only_cui else self._to_entity(row))
+            for doc_id in ids:
+                ents = per_doc.get(doc_id)
+                if ents is None and cui_set is not None:
+                    continue
+                yield doc_id, cast(Union[Entities, OnlyCUIEntities], {
+                    'entities': ents or {}, 'tokens': []})
+
+    @staticmethod
+    def _to_entity(row: dict[str, Any]) -> Entity:
+        ent: dict[str, Any] = {
+            field: row[field] for field in
+            _STR_FIELDS + _INT_FIELDS + _FLOAT_FIELDS + ['type_ids']
+            if row[field] is not None}
+        ent['id'] = row['ent_id']
+        if row['extra']:
+            ent.update(json.loads(row['extra']))
+        return cast(Entity, ent)
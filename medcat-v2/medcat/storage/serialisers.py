@@ -1,5 +1,6 @@
 from enum import Enum, auto
-from typing import Union, Type, Any, Optional
+from typing import Union, Type, Any, Optional, Callable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
 import os
 from abc import ABC, abstractmethod
 from importlib import import_module
@@ -29,8 +30,14 @@ class Serialiser(ABC):
     """The abstract serialiser base class.
 
     This class is responsible for both serialising and deserialising.
+
+    Attributes:
+        max_workers (int): The number of threads used for writing and
+            reading the raw parts of the (nested) serialisable parts.
+            If 1, the parts are written and read sequentially.
     """
     RAW_FILE = 'raw_dict.dat'
+    max_workers: int = 1
 
     @property
     @abstractmethod
@@ -116,6 +123,25 @@ class Serialiser(ABC):
                 If there's multiple parts with the same name or
                 a file already exists.
         """
+        if self.max_workers <= 1:
+            self._serialise_all(obj, target_folder, overwrite, self.serialise)
+            return
+        futures: list[Future] = []
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+
+            def write_raw(raw_parts: dict[str, Any], raw_file: str) -> None:
+                futures.append(
+                    executor.submit(self.serialise, raw_parts, raw_file))
+
+            self._serialise_all(obj, target_folder, overwrite, write_raw)
+        for future in futures:
+            # raise any exception
+            future.result()
+
+    def _serialise_all(self, obj: Serialisable, target_folder: str,
+                       overwrite: bool,
+                       write_raw: Callable[[dict[str, Any], str], None]
+                       ) -> None:
         if isinstance(obj, ManualSerialisable):
             obj_cls = type(obj)
             logger.info("Serialising obj '%s' manually", obj_cls.__name__)
@@ -135,10 +161,10 @@ class Serialiser(ABC):
             elif not os.path.exists(part_folder):
                 os.mkdir(part_folder)
             # recursive
-            self.serialise_all(part, part_folder, overwrite=overwrite)
+            self._serialise_all(part, part_folder, overwrite, write_raw)
         if raw_parts:
             raw_file = os.path.join(target_folder, self.RAW_FILE)
-            self.serialise(raw_parts, raw_file)
+            write_raw(raw_parts, raw_file)
         schema_path = os.path.join(target_folder, DEFAULT_SCHEMA_FILE)
         save_schema(schema_path, obj.__class__, obj.get_init_attrs())
         self.save_ser_type_file(target_folder)
@@ -179,6 +205,66 @@ class Serialiser(ABC):
         Returns:
             Serialisable: The resulting object.
         """
+        if self.max_workers <= 1:
+            return self._deserialise_all(
+                folder_path, ignore_folders_prefix, ignore_folders_suffix,
+                self.deserialise, **kwargs)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            # NOTE: start reading all the raw parts before building
+            #       the objects (which needs to be done sequentially)
+            futures = {
+                raw_file: executor.submit(self.deserialise, raw_file)
+                for raw_file in self._find_raw_files(
+                    folder_path, ignore_folders_prefix,
+                    ignore_folders_suffix)}
+
+            def read_raw(raw_file: str) -> dict[str, Any]:
+                if raw_file in futures:
+                    return futures.pop(raw_file).result()
+                return self.deserialise(raw_file)
+
+            return self._deserialise_all(
+                folder_path, ignore_folders_prefix, ignore_folders_suffix,
+                read_raw, **kwargs)
+
+    def _iter_part_folders(self, folder_path: str,
+                           ignore_folders_prefix: set[str],
+                           ignore_folders_suffix: set[str]
+                           ) -> Iterator[tuple[str, str]]:
+        for part_name in os.listdir(folder_path):
+            if part_name == DEFAULT_SCHEMA_FILE or part_name == self.RAW_FILE:
+                continue
+            if any(part_name.startswith(ignore_prefix)
+                   for ignore_prefix in ignore_folders_prefix):
+                continue
+            if any(part_name.endswith(ignore_suffix)
+                   for ignore_suffix in ignore_folders_suffix):
+                continue
+            part_path = os.path.join(folder_path, part_name)
+            if not os.path.isdir(part_path):
+                continue
+            yield part_name, part_path
+
+    def _find_raw_files(self, folder_path: str,
+                        ignore_folders_prefix: set[str],
+                        ignore_folders_suffix: set[str]) -> Iterator[str]:
+        if (self.get_manually_serialised_path(folder_path) or
+                get_serialiser_type_from_folder(folder_path) !=
+                self.ser_type):
+            return
+        raw_file = os.path.join(folder_path, self.RAW_FILE)
+        if os.path.exists(raw_file):
+            yield raw_file
+        for _, part_path in self._iter_part_folders(
+                folder_path, ignore_folders_prefix, ignore_folders_suffix):
+            yield from self._find_raw_files(
+                part_path, ignore_folders_prefix, ignore_folders_suffix)
+
+    def _deserialise_all(self, folder_path: str,
+                         ignore_folders_prefix: set[str],
+                         ignore_folders_suffix: set[str],
+                         read_raw: Callable[[str], dict[str, Any]],
+                         **kwargs) -> Serialisable:
         man_cls_path = self.get_manually_serialised_path(folder_path)
         if man_cls_path:
             return self.deserialise_manually(folder_path, man_cls_path)
@@ -190,26 +276,11 @@ class Serialiser(ABC):
         cls: Type = getattr(module, cls_name)
         init_kwargs: dict[str, Serialisable] = kwargs
         non_init_sers: dict[str, Serialisable] = {}
-        for part_name in os.listdir(folder_path):
-            if part_name == DEFAULT_SCHEMA_FILE or part_name == self.RAW_FILE:
-                continue
-            suitable_folder = True
-            for ignore_prefix in ignore_folders_prefix:
-                if part_name.startswith(ignore_prefix):
-                    suitable_folder = False
-                    break
-            for ignore_suffix in ignore_folders_suffix:
-                if part_name.endswith(ignore_suffix):
-                    suitable_folder = False
-                    break
-            if not suitable_folder:
-                continue
-            part_path = os.path.join(folder_path, part_name)
-            if not os.path.isdir(part_path):
-                continue
-            part = self.deserialise_all(
-                part_path, ignore_folders_prefix=ignore_folders_prefix,
-                ignore_folders_suffix=ignore_folders_suffix)
+        for part_name, part_path in self._iter_part_folders(
+                folder_path, ignore_folders_prefix, ignore_folders_suffix):
+            part = self._deserialise_all(
+                part_path, ignore_folders_prefix, ignore_folders_suffix,
+                read_raw)
             if part_name in init_attrs:
                 init_kwargs[part_name] = part
             else:
@@ -217,7 +288,7 @@ class Serialiser(ABC):
         raw_file = os.path.join(folder_path, self.RAW_FILE)
         raw_parts: dict[str, Any]
         if os.path.exists(raw_file):
-            raw_parts = self.deserialise(raw_file)
+            raw_parts = read_raw(raw_file)
         else:
             raw_parts = {}
         missing = set(set(init_attrs) - set(init_kwargs))
@@ -235,6 +306,8 @@ class AvailableSerialisers(Enum):
     """Describes the available serialisers."""
     dill = auto()
     json = auto()
+    dill_mmap = auto()
+    msgpack = auto()
 
     def write_to(self, file_path: str) -> None:
         with open(file_path, 'w') as f:
@@ -284,6 +357,12 @@ def get_serialiser(
     elif serialiser_type is AvailableSerialisers.json:
         from medcat.storage.jsonserialiser import JsonSerialiser
         return JsonSerialiser()
+    elif serialiser_type is AvailableSerialisers.dill_mmap:
+        from medcat.storage.mmapserialiser import DillMmapSerialiser
+        return DillMmapSerialiser()
+    elif serialiser_type is AvailableSerialisers.msgpack:
+        from medcat.storage.msgpackserialiser import MsgPackSerialiser
+        return MsgPackSerialiser()
     raise ValueError("Unknown or unimplemented serialsier type: "
                      f"{serialiser_type}")
 
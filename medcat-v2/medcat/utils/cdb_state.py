@@ -104,6 +104,7 @@ def apply_cdb_state(cdb, state: CDBState) -> None:
     """
     _clear_state(cdb)
     _reapply_state(cdb, state)
+    cdb._names_changed()
 
 
 def _clear_state(cdb) -> None:
@@ -162,6 +163,7 @@ def load_and_apply_cdb_state(cdb, file_path: str) -> None:
     with open(file_path, 'rb') as f:
         state: CDBState = dill.load(f)
     _reapply_state(cdb, state)
+    cdb._names_changed()
 
 
 @contextlib.contextmanager
@@ -18,6 +18,18 @@ def unitvec(vec: np.ndarray) -> np.ndarray:
     return vec / np.linalg.norm(vec)
 
 
+def unit_rows(mat: np.ndarray) -> np.ndarray:
+    """Get the matrix with each row normalised to a unit vector.
+
+    Args:
+        mat (np.ndarray): The 2D matrix.
+
+    Returns:
+        np.ndarray: The matrix of unit (row) vectors.
+    """
+    return mat / np.linalg.norm(mat, axis=1, keepdims=True)
+
+
 @overload
 def sigmoid(x: float) -> float:
     pass
@@ -0,0 +1,252 @@
+from typing import Optional, Union, Any, TYPE_CHECKING
+from concurrent.futures import ProcessPoolExecutor, Future, wait
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing as mp
+import os
+import pickle
+import logging
+import time
+
+if TYPE_CHECKING:
+    from medcat.cat import CAT
+    from medcat.data.entities import Entities, OnlyCUIEntities
+
+
+logger = logging.getLogger(__name__)
+
+
+# NOTE: the model loaded within each worker process
+_WORKER_CAT: Optional['CAT'] = None
+
+# NOTE: the time (in seconds) a worker holds on to a ping
+_PING_HOLD = 0.05
+
+
+def _init_worker(cat_bytes: Optional[bytes],
+                 model_pack_path: Optional[str],
+                 load_kwargs: dict[str, Any]) -> None:
+    global _WORKER_CAT
+    if model_pack_path is not None:
+        from medcat.cat import CAT
+        _WORKER_CAT = CAT.load_model_pack(model_pack_path, **load_kwargs)
+    elif cat_bytes is not None:
+        _WORKER_CAT = pickle.loads(cat_bytes)
+    if _WORKER_CAT is not None:
+        # NOTE: this does the (potentially slow) imports and addon set up
+        #       so that the first actual batch doesn't need to
+        _WORKER_CAT._mp_worker_func([])
+    logger.debug("Worker %d initialised", os.getpid())
+
+
+def _worker_ping(hold: float = 0.0) -> tuple[int, bool]:
+    # NOTE: holding on to the ping for a bit keeps a single (fast) worker
+    #       from answering the pings meant for the other workers
+    if hold:
+        time.sleep(hold)
+    return os.getpid(), _WORKER_CAT is not None
+
+
+def _worker_process_batch(
+        texts_and_indices: list[tuple[str, str, bool]]
+        ) -> list[tuple[str, Union[dict, 'Entities', 'OnlyCUIEntities']]]:
+    if _WORKER_CAT is None:
+        raise RuntimeError(
+            f"No model was loaded in worker process {os.getpid()}")
+    return _WORKER_CAT._mp_worker_func(texts_and_indices)
+
+
+class WorkerPool:
+    """A long lived pool of worker processes with a model loaded in each.
+
+    The model is loaded once per worker upon start. Subsequent work reuses
+    the (already warm) workers so that there's no need to pay for process
+    start up and model initialisation every time.
+
+    The model is either loaded off disk within each worker (if a model pack
+    path is provided) or sent over (pickled) from the main process. Either
+    way, the workers use the model as it was upon start. So if the model
+    changes (e.g due to training) the pool needs to be restarted.
+
+    Args:
+        cat (CAT): The model to use in the workers.
+        n_workers (int): The number of worker processes.
+        model_pack_path (Optional[str]): The model pack to load within each
+            worker. Defaults to None.
+        load_kwargs (Optional[dict[str, Any]]): The keyword arguments
+            passed to `CAT.load_model_pack` in the workers (if loading off
+            disk). Defaults to None.
+        force_spawn (bool): Whether to use the 'spawn' start method for the
+            workers. Defaults to True.
+    """
+
+    def __init__(self, cat: 'CAT', n_workers: int,
+                 model_pack_path: Optional[str] = None,
+                 load_kwargs: Optional[dict[str, Any]] = None,
+                 force_spawn: bool = True) -> None:
+        if n_workers < 1:
+            raise ValueError(
+                f"Need at least 1 worker for a worker pool, got {n_workers}")
+        self._cat = cat
+        self.n_workers = n_workers
+        self.model_pack_path = model_pack_path
+        self._load_kwargs = load_kwargs or {}
+        self._force_spawn = force_spawn
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def is_running(self) -> bool:
+        """Whether the pool has been started (and not shut down)."""
+        return self._executor is not None
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        """The underlying executor.
+
+        Raises:
+            ValueError: If the pool is not running.
+        """
+        if self._executor is None:
+            raise ValueError("The worker pool is not running")
+        return self._executor
+
+    def _get_init_args(self) -> tuple[Optional[bytes], Optional[str],
+                                      dict[str, Any]]:
+        if self.model_pack_path is not None:
+            return None, self.model_pack_path, self._load_kwargs
+        with self._cat._no_usage_monitor_exit_flushing():
+            cat_bytes = pickle.dumps(self._cat)
+        return cat_bytes, None, self._load_kwargs
+
+    def start(self, wait_for_workers: bool = True,
+              timeout: Optional[float] = None) -> None:
+        """Start the worker processes.
+
+        Args:
+            wait_for_workers (bool): Whether to wait for all the workers to
+                be up and have the model loaded. Defaults to True.
+            timeout (Optional[float]): The time (in seconds) to wait for the
+                workers. Defaults to None (i.e no limit).
+
+        Raises:
+            ValueError: If the pool is already running.
+            RuntimeError: If the workers failed to start in time.
+        """
+        if self._executor is not None:
+            raise ValueError("The worker pool is already running")
+        mp_context = mp.get_context('spawn') if self._force_spawn else None
+        logger.info("Starting a worker pool with %d workers", self.n_workers)
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.n_workers, mp_context=mp_context,
+            initializer=_init_worker, initargs=self._get_init_args())
+        if not wait_for_workers:
+            # NOTE: submitting work is what (eventually) starts the processes
+            for _ in range(self.n_workers):
+                self._executor.submit(_worker_ping)
+        elif not self._ping_all(self._executor, timeout):
+            self.shutdown()
+            raise RuntimeError("The worker pool failed to start")
+
+    def _ping_all(self, executor: ProcessPoolExecutor,
+                  timeout: Optional[float]) -> bool:
+        # NOTE: the executor may hand several pings to the same worker, so
+        #       keep pinging until every (distinct) worker has responded
+        deadline = None if timeout is None else time.monotonic() + timeout
+        seen_pids: set[int] = set()
+        while True:
+            remaining = (None if deadline is None
+                         else max(0.0, deadline - time.monotonic()))
+            try:
+                futures = [executor.submit(_worker_ping, _PING_HOLD)
+                           for _ in range(self.n_workers)]
+            except (BrokenProcessPool, RuntimeError) as err:
+                logger.warning("Unable to submit to worker pool",
+                               exc_info=err)
+                return False
+            done, not_done = wait(futures, timeout=remaining)
+            for future in not_done:
+                future.cancel()
+            try:
+                results = [future.result() for future in done]
+            except BrokenProcessPool as err:
+                logger.warning("Worker pool is broken", exc_info=err)
+                return False
+            if not all(has_model for _, has_model in results):
+                logger.warning("A worker does not have a model loaded")
+                return False
+            seen_pids.update(pid for pid, _ in results)
+            if len(seen_pids) >= self.n_workers:
+                return True
+            if not_done or (deadline is not None and
+                            time.monotonic() >= deadline):
+                logger.warning("Only %d of %d workers responded in time",
+                               len(seen_pids), self.n_workers)
+                return False
+
+    def health_check(self, timeout: Optional[float] = 30.0) -> bool:
+        """Check that every worker process is alive and has a model.
+
+        Each of the `n_workers` (distinct) worker processes needs to respond
+        within the timeout. So a worker that is dead or stuck (including one
+        busy with a batch that takes longer than the timeout) makes the pool
+        unhealthy.
+
+        Args:
+            timeout (Optional[float]): The time (in seconds) to wait for
+                the workers to respond. Defaults to 30 seconds.
+
+        Returns:
+            bool: Whether the pool is healthy.
+        """
+        if self._executor is None:
+            return False
+        return self._ping_all(self._executor, timeout)
+
+    def submit(self, texts_and_indices: list[tuple[str, str, bool]]
+               ) -> Future:
+        """Submit a batch of texts to be processed by a worker.
+
+        Args:
+            texts_and_indices (list[tuple[str, str, bool]]): The texts,
+                their indices and whether to only output CUIs.
+
+        Returns:
+            Future: The future for the list of indices and entities.
+        """
+        return self.executor.submit(_worker_process_batch, texts_and_indices)
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Shut down the worker processes.
+
+        Args:
+            wait (bool): Whether to wait for the currently running work
+                to finish. Defaults to True.
+        """
+        if self._executor is None:
+            return
+        logger.info("Shutting down worker pool")
+        self._executor.shutdown(wait=wait, cancel_futures=not wait)
+        self._executor = None
+
+    def restart(self, wait_for_workers: bool = True,
+                timeout: Optional[float] = None) -> None:
+        """Restart the worker processes.
+
+        This is useful if the pool is broken (e.g a worker was killed) or
+        the model has changed since it was started.
+
+        Args:
+            wait_for_workers (bool): Whether to wait for all the workers to
+                be up and have the model loaded. Defaults to True.
+            timeout (Optional[float]): The time (in seconds) to wait for the
+                workers. Defaults to None (i.e no limit).
+        """
+        self.shutdown(wait=False)
+        self.start(wait_for_workers=wait_for_workers, timeout=timeout)
+
+    def __enter__(self) -> 'WorkerPool':
+        if not self.is_running:
+            self.start()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.shutdown()
@@ -0,0 +1,190 @@
+from medcat.cdb.context_vectors import DenseContextVectors
+from medcat.cdb.concepts import get_new_cui_info
+from medcat.cat import CAT
+from medcat.components.types import CoreComponentType
+
+import random
+import unittest
+import numpy as np
+
+from .. import UNPACKED_EXAMPLE_MODEL_PACK_PATH
+
+
+class DenseContextVectorsTests(unittest.TestCase):
+    DIM = 5
+    NUM_CUIS = 20
+
+    def setUp(self):
+        rng = np.random.default_rng(42)
+        self.cui2info = {}
+        for cui_nr in range(self.NUM_CUIS):
+            cui = f"C{cui_nr:02d}"
+            vectors = {'short': rng.random(self.DIM),
+                       'long': rng.random(self.DIM)}
+            if cui_nr % 4 == 0:
+                del vectors['short']
+            self.cui2info[cui] = get_new_cui_info(
+                cui, '', context_vectors=vectors)
+        self.cui2info['NOVEC'] = get_new_cui_info('NOVEC', '')
+        self.orig = {cui: dict(ci['context_vectors'])
+                     for cui, ci in self.cui2info.items()
+                     if ci['context_vectors']}
+        self.store = DenseContextVectors.from_cui2info(self.cui2info)
+
+    def test_has_all_vectorised_cuis(self):
+        self.assertEqual(set(self.store.cui2row), set(self.orig))
+
+    def test_keeps_vector_values(self):
+        for cui, vectors in self.orig.items():
+            cur = self.cui2info[cui]['context_vectors']
+            self.assertEqual(set(cur), set(vectors))
+            for ct, vec in vectors.items():
+                np.testing.assert_allclose(cur[ct], vec, rtol=1e-6)
+
+    def test_uses_views(self):
+        for cui in self.orig:
+            for vec in self.cui2info[cui]['context_vectors'].values():
+                self.assertIsNot(vec.base, None)
+                self.assertEqual(vec.dtype, np.float32)
+
+    def test_unit_vectors(self):
+        cuis = list(self.cui2info)
+        indices, mat = self.store.get_unit_vectors(cuis, 'short')
+        exp = [nr for nr, cui in enumerate(cuis)
+               if 'short' in self.orig.get(cui, {})]
+        self.assertEqual(indices, exp)
+        np.testing.assert_allclose(np.linalg.norm(mat, axis=1), 1, rtol=1e-6)
+
+    def test_set_updates_matrix_and_norms(self):
+        new_vec = np.ones(self.DIM)
+        self.cui2info['C01']['context_vectors']['short'] = new_vec
+        self.store.set('C01')
+        row = self.store.cui2row['C01']
+        np.testing.assert_allclose(
+            self.store.get_matrix('short')[row], new_vec)
+        self.assertAlmostEqual(self.store.get_norms('C01')['short'],
+                               np.sqrt(self.DIM), places=5)
+
+    def test_can_add_new_cuis(self):
+        for cui_nr in range(100):
+            cui = f"NEW{cui_nr}"
+            self.cui2info[cui] = get_new_cui_info(
+                cui, '', context_vectors={'long': np.full(self.DIM, cui_nr)})
+            self.store.set(cui)
+        # old views still valid after growing
+        self.test_keeps_vector_values()
+        self.assertEqual(
+            self.cui2info['NEW99']['context_vectors']['long'][0], 99)
+
+    def test_removed_cui_not_present(self):
+        self.store.remove('C01')
+        indices, _ = self.store.get_unit_vectors(['C01', 'C02'], 'long')
+        self.assertEqual(indices, [1])
+
+    def test_raises_on_dim_mismatch(self):
+        self.cui2info['C01']['context_vectors']['long'] = np.ones(
+            self.DIM + 1)
+        with self.assertRaises(ValueError):
+            self.store.set('C01')
+
+
+class DenseContextVectorsInLinkerTests(unittest.TestCase):
+    TEXTS = [
+        "The fittest most fit of chronic kidney failure",
+        "Fittest and healthy. Seizure was fittest. Diabetes, high temperature",
+    ]
+
+    @classmethod
+    def setUpClass(cls):
+        cls.cat = CAT.load_model_pack(UNPACKED_EXAMPLE_MODEL_PACK_PATH)
+        cls.exp_ents = [cls.cat.get_entities(text) for text in cls.TEXTS]
+        cls.cat.config.components.linking.dense_context_vectors = True
+        cls.cat._recreate_pipe()
+        cls.store = cls.cat.cdb.dense_context_vectors
+
+    def test_has_store(self):
+        self.assertIsInstance(self.store, DenseContextVectors)
+        cm = self.cat._pipeline.get_component(
+            CoreComponentType.linking).context_model
+        self.assertIs(cm.vector_store, self.store)
+
+    def test_same_entities(self):
+        for text, exp in zip(self.TEXTS, self.exp_ents):
+            with self.subTest(text):
+                got = self.cat.get_entities(text)['entities']
+                exp = exp['entities']
+                self.assertEqual(got.keys(), exp.keys())
+                for ent_id, ent in got.items():
+                    self.assertEqual(ent['cui'], exp[ent_id]['cui'])
+                    self.assertAlmostEqual(
+                        ent['context_similarity'],
+                        exp[ent_id]['context_similarity'], places=5)
+
+    def test_training_keeps_store_in_sync(self):
+        self.cat.trainer.train_unsupervised(self.TEXTS)
+        for cui, row in self.store.cui2row.items():
+            vectors = self.cat.cdb.cui2info[cui]['context_vectors']
+            for ct, vec in vectors.items():
+                with self.subTest(f"{cui}:{ct}"):
+                    mat = self.store.get_matrix(ct)
+                    self.assertTrue(np.shares_memory(vec, mat))
+                    np.testing.assert_allclose(mat[row], vec)
+                    self.assertAlmostEqual(self.store.get_norms(cui)[ct],
+                                           np.linalg.norm(vec), places=4)
+
+    def test_store_not_saved(self):
+        self.assertIn('_dense_context_vectors', self.cat.cdb.ignore_attrs())
+
+
+class DenseContextVectorsAfterResetTests(unittest.TestCase):
+    TEXTS = DenseContextVectorsInLinkerTests.TEXTS
+
+    @classmethod
+    def setUpClass(cls):
+        cls.sparse_cat = CAT.load_model_pack(UNPACKED_EXAMPLE_MODEL_PACK_PATH)
+        cls.dense_cat = CAT.load_model_pack(UNPACKED_EXAMPLE_MODEL_PACK_PATH)
+        cls.dense_cat.config.components.linking.dense_context_vectors = True
+        cls.dense_cat._recreate_pipe()
+        cls.orig_store = cls.dense_cat.cdb.dense_context_vectors
+        for cat in (cls.sparse_cat, cls.dense_cat):
+            cat.cdb.reset_training()
+            # same (random) negative sampling for both
+            random.seed(42)
+            np.random.seed(42)
+            cat.trainer.train_unsupervised(cls.TEXTS)
+
+    def test_uses_new_store(self):
+        store = self.dense_cat.cdb.dense_context_vectors
+        self.assertIsNot(store, self.orig_store)
+        cm = self.dense_cat._pipeline.get_component(
+            CoreComponentType.linking).context_model
+        self.assertIs(cm.vector_store, store)
+
+    def test_new_store_in_sync(self):
+        store = self.dense_cat.cdb.dense_context_vectors
+        trained = [cui for cui, ci in self.dense_cat.cdb.cui2info.items()
+                   if ci['context_vectors']]
+        self.assertTrue(trained)
+        self.assertEqual(set(store.cui2row), set(trained))
+
+    def test_same_entities_as_sparse(self):
+        for text in self.TEXTS:
+            with self.subTest(text):
+                got = self.dense_cat.get_entities(text)['entities']
+                exp = self.sparse_cat.get_entities(text)['entities']
+                self.assertEqual(got.keys(), exp.keys())
+                for ent_id, ent in got.items():
+                    self.assertEqual(ent['cui'], exp[ent_id]['cui'])
+                    self.assertAlmostEqual(
+                        ent['context_similarity'],
+                        exp[ent_id]['context_similarity'], places=5)
+
+    def test_disabled_store_not_used(self):
+        cdb = self.dense_cat.cdb
+        cm = self.dense_cat._pipeline.get_component(
+            CoreComponentType.linking).context_model
+        cdb.disable_dense_context_vectors()
+        try:
+            self.assertIsNone(cm.vector_store)
+        finally:
+            cdb.enable_dense_context_vectors()
@@ -1,7 +1,8 @@
 from typing import runtime_checkable, Type, Any
 
 from medcat.components.addons.meta_cat import meta_cat
-from medcat.components.addons.addons import AddonComponent
+from medcat.components.addons.addons import (
+    AddonComponent, BatchedAddonComponent)
 from medcat.storage.serialisables import Serialisable, ManualSerialisable
 from medcat.storage.serialisers import serialise, AvailableSerialisers
 from medcat.config.config_meta_cat import ConfigMetaCAT
@@ -146,3 +147,58 @@ class MetaCATWithCATTests(MetaCATBaseTests):
                 self.assertEqual(
                     meta_cat.get_meta_annotations(ent),
                     ents[num]["meta_anns"])
+
+
+class MetaCATBatchedInCATTests(unittest.TestCase):
+    TEXTS = [
+        "This is a fit text for rich and chronic disease like fittest.",
+        "Fittest and healthy. Seizure was fittest. Diabetes, high temperature",
+        "The dog is sitting outside the house.",
+        "The fittest most fit of chronic kidney failure",
+    ] * 3
+
+    @classmethod
+    def _train_tokenizer(cls, tokenizer):
+        tokenizer.hf_tokenizers.train_from_iterator(
+            cls.TEXTS, vocab_size=300, min_frequency=1)
+        tokenizer.hf_tokenizers.add_tokens(['<PAD>'])
+
+    @classmethod
+    def setUpClass(cls):
+        cnf = ConfigMetaCAT()
+        cnf.comp_name = meta_cat.MetaCATAddon.addon_type
+        cnf.general.category_name = 'Status'
+        cnf.general.category_value2id = {'Affirmed': 0, 'Other': 1}
+        cnf.model.nclasses = 2
+        cnf.model.input_size = 20
+        cnf.model.hidden_size = 10
+        cls.cat = CAT.load_model_pack(EXAMPLE_MODEL_PACK_ZIP)
+        cls.meta_cat = meta_cat.MetaCATAddon.create_new(
+            cnf, cls.cat._pipeline.tokenizer, cls._train_tokenizer)
+        cls.cat.add_addon(cls.meta_cat)
+        cls.exp = [cls.cat.get_entities(text) for text in cls.TEXTS]
+
+    def test_is_batched_addon(self):
+        self.assertIsInstance(self.meta_cat, BatchedAddonComponent)
+
+    def test_predicts_once_per_batch(self):
+        with unittest.mock.patch.object(
+                meta_cat, 'predict', wraps=meta_cat.predict) as mock_predict:
+            list(self.cat.get_entities_multi_texts(
+                self.TEXTS, batch_size=len(self.TEXTS), batch_size_chars=-1))
+        mock_predict.assert_called_once()
+
+    def test_same_meta_anns_as_one_by_one(self):
+        got = dict(self.cat.get_entities_multi_texts(
+            self.TEXTS, batch_size=5, batch_size_chars=-1))
+        self.assertEqual(len(got), len(self.TEXTS))
+        for num, exp in enumerate(self.exp):
+            ents = got[str(num)]['entities']
+            self.assertEqual(ents.keys(), exp['entities'].keys())
+            for ent_id, ent in ents.items():
+                with self.subTest(f"{num}:{ent_id}"):
+                    exp_ma = exp['entities'][ent_id]['meta_anns']['Status']
+                    got_ma = ent['meta_anns']['Status']
+                    self.assertEqual(got_ma['value'], exp_ma['value'])
+                    self.assertAlmostEqual(got_ma['confidence'],
+                                           exp_ma['confidence'], places=5)
@@ -0,0 +1,77 @@
+from medcat.components.addons.meta_cat import ml_utils
+from medcat.config.config_meta_cat import ConfigMetaCAT
+
+import unittest
+
+from torch import nn
+
+
+PAD_ID = 0
+
+
+class FakeModel(nn.Module):
+    """Predicts the class based on the first token of the sample."""
+    NCLASSES = 3
+
+    def __init__(self):
+        super().__init__()
+        self.batch_shapes: list[tuple[int, ...]] = []
+
+    def forward(self, x, center_positions, attention_mask, ignore_cpos):
+        self.batch_shapes.append(tuple(x.shape))
+        return nn.functional.one_hot(
+            x[:, 0] % self.NCLASSES, self.NCLASSES).float()
+
+
+def get_data(lengths: list[int]) -> list:
+    return [[[nr + 1] * length, 0] for nr, length in enumerate(lengths)]
+
+
+class CreateBatchPipedDataTests(unittest.TestCase):
+    DATA = get_data([2, 3, 10, 1])
+
+    def test_pads_to_batch_max(self):
+        x, _, mask, _ = ml_utils.create_batch_piped_data(
+            self.DATA, 0, 2, device='cpu', pad_id=PAD_ID)
+        self.assertEqual(tuple(x.shape), (2, 3))
+        self.assertEqual(mask.sum().item(), 5)
+
+    def test_has_y_if_labelled(self):
+        data = [sample + [1] for sample in self.DATA]
+        _, _, _, y = ml_utils.create_batch_piped_data(
+            data, 2, 4, device='cpu', pad_id=PAD_ID)
+        self.assertEqual(y.tolist(), [1, 1])
+
+
+class PredictTests(unittest.TestCase):
+    LENGTHS = [5, 1, 9, 2, 7, 1, 3]
+
+    def setUp(self):
+        self.config = ConfigMetaCAT()
+        self.config.general.batch_size_eval = 2
+        self.config.general.device = 'cpu'
+        self.config.model.padding_idx = PAD_ID
+        self.model = FakeModel()
+        self.data = get_data(self.LENGTHS)
+
+    def test_keeps_original_order(self):
+        predictions, confidences = ml_utils.predict(
+            self.model, self.data, self.config)
+        self.assertEqual(
+            list(predictions),
+            [(nr + 1) % FakeModel.NCLASSES for nr in range(len(self.data))])
+        self.assertEqual(len(confidences), len(self.data))
+
+    def test_batches_similar_lengths(self):
+        ml_utils.predict(self.model, self.data, self.config)
+        self.assertEqual([shape[1] for shape in self.model.batch_shapes],
+                         [1, 3, 7, 9])
+        padded = sum(rows * cols for rows, cols in self.model.batch_shapes)
+        self.assertEqual(padded, 2 * 1 + 2 * 3 + 2 * 7 + 9)
+
+    def test_empty_data(self):
+        predictions, confidences = ml_utils.predict(
+            self.model, [], self.config)
+        self.assertEqual(len(predictions), 0)
+        self.assertEqual(len(confidences), 0)
+        self.assertEqual(self.model.batch_shapes, [])
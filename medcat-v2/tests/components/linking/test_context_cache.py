@@ -0,0 +1,45 @@
+from medcat.components.linking.context_cache import ContextEmbeddingCache
+
+import unittest
+
+
+class ContextEmbeddingCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.cache: ContextEmbeddingCache[int] = ContextEmbeddingCache(2)
+
+    def test_gets_cached(self):
+        self.cache.put("a", 1)
+        self.assertEqual(self.cache.get("a"), 1)
+
+    def test_evicts_least_recently_used(self):
+        self.cache.put("a", 1)
+        self.cache.put("b", 2)
+        self.cache.get("a")
+        self.cache.put("c", 3)
+        self.assertNotIn("b", self.cache)
+        self.assertIn("a", self.cache)
+        self.assertIn("c", self.cache)
+
+    def test_tracks_hit_rate(self):
+        self.cache.put("a", 1)
+        self.cache.get("a")
+        self.cache.get("b")
+        self.cache.get("a")
+        self.assertEqual(self.cache.hits, 2)
+        self.assertEqual(self.cache.misses, 1)
+        self.assertAlmostEqual(self.cache.hit_rate, 2 / 3)
+
+    def test_caches_nothing_with_0_size(self):
+        cache: ContextEmbeddingCache[int] = ContextEmbeddingCache(0)
+        cache.put("a", 1)
+        self.assertEqual(len(cache), 0)
+        self.assertIsNone(cache.get("a"))
+
+    def test_clear_resets_stats(self):
+        self.cache.put("a", 1)
+        self.cache.get("a")
+        self.cache.clear()
+        self.assertEqual(self.cache.stats, {
+            "hits": 0, "misses": 0, "hit_rate": 0.0, "deduplicated": 0,
+            "size": 0})
@@ -1,12 +1,22 @@
 from medcat.components.linking import embedding_linker
+from medcat.components.linking.embedding_matrix import EmbeddingMatrix
 from medcat.components import types
 from medcat.config import Config
 from medcat.vocab import Vocab
 from medcat.cdb.concepts import CUIInfo, NameInfo
 from medcat.components.types import TrainableComponent
 from medcat.components.types import _DEFAULT_LINKING as DEF_LINKING
+from medcat.cat import CAT
+from medcat.cdb import CDB
+from medcat.preprocessors.cleaners import prepare_name
+import os
+import pickle
+import tempfile
+import torch
 import unittest
+import unittest.mock
 from ..helper import ComponentInitTests
+from ... import UNPACKED_EXAMPLE_MODEL_PACK_PATH
 
 class FakeDocument:
     linked_ents = []
@@ -64,4 +74,212 @@ class NonTrainableEmbeddingLinkerTests(unittest.TestCase):
 
     def test_linker_processes_document(self):
         doc = FakeDocument("Test Document")
-        self.linker(doc) 
\ No newline at end of file
+        self.linker(doc) 
+
+def fake_embed(linker, to_embed: list[str], device) -> torch.Tensor:
+    # deterministic embeddings based on the text
+    embeddings = []
+    for text in to_embed:
+        gen = torch.Generator().manual_seed(sum(map(ord, text)) * len(text))
+        embeddings.append(torch.randn(16, generator=gen))
+    return torch.nn.functional.normalize(torch.stack(embeddings), dim=1).half()
+
+
+class IncrementalEmbeddingTests(unittest.TestCase):
+    NEW_CUI = "C99"
+
+    def setUp(self):
+        self.cat = CAT.load_model_pack(UNPACKED_EXAMPLE_MODEL_PACK_PATH)
+        cnf = self.cat.config
+        cnf.components.linking = embedding_linker.EmbeddingLinking()
+        self.embedded: list[str] = []
+
+        def embed(linker, to_embed, device):
+            self.embedded.extend(to_embed)
+            return fake_embed(linker, to_embed, device)
+
+        patchers = [
+            unittest.mock.patch.object(embedding_linker.Linker, "_embed", embed),
+            unittest.mock.patch.object(
+                embedding_linker.Linker, "_load_transformers",
+                lambda linker, name: None),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.linker = embedding_linker.Linker(self.cat.cdb, cnf)
+        self.linker.create_embeddings()
+        self.embedded.clear()
+
+    def add_concept(self, cui: str = NEW_CUI):
+        cnf = self.cat.config
+        names = prepare_name("some completely new concept",
+                             self.cat._pipeline.tokenizer_with_tag, {},
+                             (cnf.general, cnf.preprocessing, cnf.cdb_maker))
+        self.cat.cdb.add_names(cui, names)
+
+    def get_embeddings(self, key: str) -> torch.Tensor:
+        stored = self.cat.cdb.addl_info[key]
+        if isinstance(stored, EmbeddingMatrix):
+            return stored.dequantise()
+        return stored.float()
+
+    def assert_same_as_full_embedding(self):
+        updated = {
+            key: self.get_embeddings(key)
+            for key in ("name_embeddings", "cui_embeddings")}
+        self.linker.create_embeddings()
+        for key, embeddings in updated.items():
+            with self.subTest(key):
+                self.assertTrue(torch.equal(embeddings, self.get_embeddings(key)))
+
+    def test_nothing_embedded_if_unchanged(self):
+        self.linker.update_embeddings()
+        self.assertEqual(self.embedded, [])
+
+    def test_embeds_only_new_concept(self):
+        self.add_concept()
+        self.linker.update_embeddings()
+        self.assertEqual(self.embedded, ["some completely new concept"] * 2)
+        self.assertIn(self.NEW_CUI, self.linker._cui_to_idx)
+        self.assertEqual(len(self.cat.cdb.addl_info["name_embeddings"]),
+                         len(self.cat.cdb.name2info))
+        self.assert_same_as_full_embedding()
+
+    def test_drops_removed_concept(self):
+        cui = next(iter(self.cat.cdb.cui2info))
+        self.cat.cdb.remove_cui(cui)
+        self.linker.update_embeddings()
+        self.assertNotIn(cui, self.linker._cui_to_idx)
+        self.assertEqual(len(self.cat.cdb.addl_info["cui_embeddings"]),
+                         len(self.cat.cdb.cui2info))
+        self.assert_same_as_full_embedding()
+
+    def test_reembeds_renamed_concept(self):
+        # a new longest name for an existing concept
+        self.add_concept(cui="C01")
+        self.linker.update_embeddings()
+        self.assertEqual(self.linker._get_cui_name("C01"),
+                         "some~completely~new~concept")
+        self.assertEqual(self.embedded, ["some completely new concept"] * 2)
+        self.assert_same_as_full_embedding()
+
+    def test_keeps_single_copy_of_embeddings(self):
+        self.cat.config.components.linking.embedding_precision = "int8"
+        self.add_concept()
+        self.linker.update_embeddings()
+        addl_info = self.cat.cdb.addl_info
+        self.assertIs(self.linker.names_context_matrix, addl_info["name_embeddings"])
+        self.assertIs(self.linker.cui_context_matrix, addl_info["cui_embeddings"])
+        self.assertIs(self.linker.name_index.embeddings, addl_info["name_embeddings"])
+        for key in ("name_embeddings", "cui_embeddings"):
+            with self.subTest(key):
+                self.assertEqual(addl_info[key].precision, "int8")
+
+    def test_saves_float32_embeddings(self):
+        self.cat.config.components.linking.embedding_precision = "int8"
+        self.linker.update_embeddings()
+        addl_info = self.cat.cdb.addl_info
+        for serialiser in ("dill", "dill_mmap"):
+            with self.subTest(serialiser), tempfile.TemporaryDirectory() as temp_dir:
+                cdb_path = os.path.join(temp_dir, "cdb")
+                os.mkdir(cdb_path)
+                self.cat.cdb.save(cdb_path, serialiser=serialiser)
+                loaded = CDB.load(cdb_path)
+                for key in ("name_embeddings", "cui_embeddings"):
+                    # saved as plain tensors, i.e the same as before
+                    got = loaded.addl_info[key]
+                    self.assertIs(type(got), torch.Tensor)
+                    self.assertEqual(got.dtype, torch.float32)
+                    self.assertTrue(torch.equal(got, addl_info[key].dequantise()))
+
+    def test_pickled_linker_rebuilds_name_index(self):
+        self.cat.config.components.linking.embedding_precision = "int8"
+        self.linker.update_embeddings()
+        exp = self.linker.name_index.search(
+            self.linker.names_context_matrix.dequantise()[:3], 1,
+            torch.ones(len(self.linker._name_keys), dtype=torch.bool))
+        linker = pickle.loads(pickle.dumps(self.linker))
+        self.assertIsNone(linker._name_index)
+        self.assertIsInstance(linker.cdb.addl_info["name_embeddings"], torch.Tensor)
+        got = linker.name_index.search(
+            self.linker.names_context_matrix.dequantise()[:3], 1,
+            torch.ones(len(linker._name_keys), dtype=torch.bool))
+        self.assertIs(linker.name_index.embeddings, linker.cdb.addl_info["name_embeddings"])
+        for exp_part, got_part in zip(exp, got):
+            self.assertTrue(torch.allclose(exp_part.float(), got_part.float(), atol=1e-2))
+
+    def test_records_embedding_model(self):
+        addl_info = self.cat.cdb.addl_info
+        self.assertEqual(addl_info["embedding_model_name"],
+                         self.cat.config.components.linking.embedding_model_name)
+        self.assertEqual(addl_info["embedding_dim"], 16)
+
+    def test_embeds_all_for_different_model(self):
+        self.cat.config.components.linking.embedding_model_name = "other-model"
+        self.linker.update_embeddings()
+        self.assertEqual(len(self.embedded), len(self.cat.cdb.name2info) +
+                         len(self.cat.cdb.cui2info))
+        self.assertEqual(self.cat.cdb.addl_info["embedding_model_name"],
+                         "other-model")
+
+    def test_embeds_all_for_different_dimension(self):
+        self.linker.model = unittest.mock.Mock()
+        self.linker.model.config.hidden_size = 32
+        self.linker.update_embeddings()
+        self.assertEqual(len(self.embedded), len(self.cat.cdb.name2info) +
+                         len(self.cat.cdb.cui2info))
+
+    def test_embeds_all_without_record(self):
+        del self.cat.cdb.addl_info["name_embeddings_keys"]
+        self.linker.update_embeddings()
+        self.assertEqual(len(self.embedded), len(self.cat.cdb.name2info) +
+                         len(self.cat.cdb.cui2info))
+
+
+class ContextEmbeddingCacheTests(unittest.TestCase):
+    TEXTS = ["Patient has  diabetes", "short", "Patient has diabetes",
+             "a much longer snippet of text", "short"]
+
+    def setUp(self):
+        cnf = Config()
+        cnf.components.linking = embedding_linker.EmbeddingLinking()
+        cnf.components.linking.context_batch_size = 2
+        self.linker = embedding_linker.Linker(FakeCDB(cnf), cnf)
+        self.batches: list[list[str]] = []
+
+        def embed(linker, to_embed, device):
+            self.batches.append(list(to_embed))
+            return fake_embed(linker, to_embed, device)
+
+        patcher = unittest.mock.patch.object(
+            embedding_linker.Linker, "_embed", embed)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_embeds_unique_snippets_once(self):
+        self.linker._embed_contexts(self.TEXTS)
+        embedded = [text for batch in self.batches for text in batch]
+        self.assertEqual(sorted(embedded), sorted(
+            ["Patient has diabetes", "short",
+             "a much longer snippet of text"]))
+        self.assertEqual(self.linker.context_cache.deduplicated, 2)
+
+    def test_same_as_embedding_each(self):
+        embeddings = self.linker._embed_contexts(self.TEXTS)
+        exp = fake_embed(self.linker, [" ".join(text.split())
+                                       for text in self.TEXTS], None)
+        self.assertTrue(torch.equal(embeddings, exp))
+
+    def test_batches_sorted_by_length(self):
+        self.linker._embed_contexts(self.TEXTS)
+        self.assertEqual(self.batches, [
+            ["short", "Patient has diabetes"],
+            ["a much longer snippet of text"]])
+
+    def test_reuses_cached(self):
+        self.linker._embed_contexts(self.TEXTS)
+        self.batches.clear()
+        self.linker._embed_contexts(["short", "something new"])
+        self.assertEqual(self.batches, [["something new"]])
+        self.assertEqual(self.linker.context_cache.hits, 1)
@@ -0,0 +1,117 @@
+from medcat.components.linking.embedding_matrix import EmbeddingMatrix
+
+import pickle
+import torch
+import unittest
+
+
+def get_embeddings(n: int, dim: int = 64, seed: int = 1) -> torch.Tensor:
+    gen = torch.Generator().manual_seed(seed)
+    return torch.nn.functional.normalize(
+        torch.randn(n, dim, generator=gen), dim=1)
+
+
+class EmbeddingMatrixTests(unittest.TestCase):
+    N = 500
+    # max absolute score error (vs float32) per precision
+    TOLERANCES = {"float32": 1e-6, "float16": 2e-3, "bfloat16": 2e-2,
+                  "int8": 2e-2}
+
+    @classmethod
+    def setUpClass(cls):
+        cls.embeddings = get_embeddings(cls.N)
+        cls.queries = get_embeddings(20, seed=2)
+        cls.exp_scores = cls.queries @ cls.embeddings.T
+        cls.matrices = {
+            precision: EmbeddingMatrix.from_tensor(cls.embeddings, precision)
+            for precision in cls.TOLERANCES}
+
+    def test_has_precision(self):
+        for precision, matrix in self.matrices.items():
+            with self.subTest(precision):
+                self.assertEqual(matrix.precision, precision)
+                self.assertEqual(len(matrix), self.N)
+
+    def test_scores_close_to_float32(self):
+        for precision, matrix in self.matrices.items():
+            with self.subTest(precision):
+                scores = matrix.score(self.queries)
+                self.assertEqual(scores.dtype, torch.float32)
+                max_err = (scores - self.exp_scores).abs().max().item()
+                self.assertLess(max_err, self.TOLERANCES[precision])
+
+    def test_same_top_match(self):
+        # queries that are (noisy) copies of some of the embeddings
+        idxs = [0, 10, 250, 499]
+        queries = torch.nn.functional.normalize(
+            self.embeddings[idxs] + 0.1 * get_embeddings(4, seed=3), dim=1)
+        for precision, matrix in self.matrices.items():
+            with self.subTest(precision):
+                top = torch.argmax(matrix.score(queries), dim=1)
+                self.assertEqual(top.tolist(), idxs)
+
+    def test_scores_rows(self):
+        rows = [3, 1, 400]
+        for precision, matrix in self.matrices.items():
+            with self.subTest(precision):
+                self.assertTrue(torch.allclose(
+                    matrix.score(self.queries, rows),
+                    matrix.score(self.queries)[:, rows]))
+                self.assertTrue(torch.allclose(
+                    matrix.score(self.queries, slice(10, 20)),
+                    matrix.score(self.queries)[:, 10:20]))
+
+    def test_int8_uses_quarter_of_memory(self):
+        nbytes = self.matrices["int8"].nbytes
+        # NOTE: including the (float32) scale per row
+        self.assertEqual(nbytes, self.N * (64 + 4))
+        self.assertLess(nbytes, self.matrices["float32"].nbytes / 3.5)
+
+    def test_dequantises_close(self):
+        deq = self.matrices["int8"].dequantise()
+        self.assertLess((deq - self.embeddings).abs().max().item(), 1e-2)
+
+    def test_fails_unknown_precision(self):
+        with self.assertRaises(ValueError):
+            EmbeddingMatrix.from_tensor(self.embeddings, "float8")
+
+    def test_pickles_as_float32_tensor(self):
+        for precision, matrix in self.matrices.items():
+            with self.subTest(precision):
+                got = pickle.loads(pickle.dumps(matrix))
+                self.assertIs(type(got), torch.Tensor)
+                self.assertEqual(got.dtype, torch.float32)
+                self.assertTrue(torch.equal(got, matrix.dequantise()))
+
+
+class EmbeddingMatrixSpliceTests(unittest.TestCase):
+    ROWS = torch.tensor([4, -1, 0, -1, 2])
+
+    @classmethod
+    def setUpClass(cls):
+        cls.embeddings = get_embeddings(5)
+        cls.new_embeddings = get_embeddings(2, seed=4)
+        cls.exp = torch.stack([
+            cls.embeddings[4], cls.new_embeddings[0], cls.embeddings[0],
+            cls.new_embeddings[1], cls.embeddings[2]])
+
+    def test_splices_rows(self):
+        for precision in ("float32", "int8"):
+            with self.subTest(precision):
+                matrix = EmbeddingMatrix.from_tensor(
+                    self.embeddings, precision)
+                spliced = matrix.splice(self.ROWS, self.new_embeddings)
+                self.assertEqual(spliced.precision, precision)
+                self.assertLess(
+                    (spliced.dequantise() - self.exp).abs().max().item(),
+                    1e-2)
+
+    def test_can_only_drop_rows(self):
+        matrix = EmbeddingMatrix.from_tensor(self.embeddings, "float32")
+        spliced = matrix.splice(torch.tensor([3, 1]))
+        self.assertTrue(torch.equal(spliced.values, self.embeddings[[3, 1]]))
+
+    def test_fails_with_wrong_number_of_new(self):
+        matrix = EmbeddingMatrix.from_tensor(self.embeddings, "float32")
+        with self.assertRaises(ValueError):
+            matrix.splice(self.ROWS, self.new_embeddings[:1])
@@ -0,0 +1,139 @@
+from medcat.components.linking import name_index
+from medcat.components.linking.embedding_matrix import EmbeddingMatrix
+
+import torch
+import unittest
+
+
+def get_embeddings(n: int, dim: int = 32, seed: int = 1) -> torch.Tensor:
+    gen = torch.Generator().manual_seed(seed)
+    return torch.nn.functional.normalize(
+        torch.randn(n, dim, generator=gen), dim=1)
+
+
+class ExactNameIndexTests(unittest.TestCase):
+    N_NAMES = 1000
+    K = 5
+
+    @classmethod
+    def setUpClass(cls):
+        cls.embeddings = get_embeddings(cls.N_NAMES)
+        cls.queries = get_embeddings(7, seed=2)
+        cls.index = name_index.ExactNameIndex(
+            EmbeddingMatrix(cls.embeddings), block_size=64)
+        cls.all_valid = torch.ones(cls.N_NAMES, dtype=torch.bool)
+        cls.valid_mask = torch.arange(cls.N_NAMES) % 3 == 0
+
+    def assert_same_as_full_sort(self, valid_mask: torch.Tensor):
+        scores, idxs = self.index.search(self.queries, self.K, valid_mask)
+        full_scores = self.queries @ self.embeddings.T
+        full_scores[:, ~valid_mask] = float("-inf")
+        exp_idxs = torch.argsort(full_scores, dim=1,
+                                 descending=True)[:, :self.K]
+        self.assertTrue(torch.equal(idxs, exp_idxs))
+        self.assertTrue(torch.allclose(
+            scores, torch.gather(full_scores, 1, exp_idxs)))
+
+    def test_same_as_full_sort(self):
+        self.assert_same_as_full_sort(self.all_valid)
+
+    def test_same_as_full_sort_with_mask(self):
+        self.assert_same_as_full_sort(self.valid_mask)
+
+    def test_same_as_full_sort_with_few_valid(self):
+        self.assert_same_as_full_sort(torch.arange(self.N_NAMES) % 50 == 0)
+
+    def test_pads_if_too_few_valid(self):
+        valid_mask = torch.zeros(self.N_NAMES, dtype=torch.bool)
+        valid_mask[[10, 20]] = True
+        scores, idxs = self.index.search(self.queries, self.K, valid_mask)
+        self.assertEqual(idxs.shape, (len(self.queries), self.K))
+        self.assertTrue(torch.all(idxs[:, 2:] == -1))
+        self.assertEqual(set(idxs[:, :2].flatten().tolist()), {10, 20})
+
+
+class IVFNameIndexTests(unittest.TestCase):
+    N_NAMES = 2000
+    K = 10
+
+    @classmethod
+    def setUpClass(cls):
+        cls.embeddings = get_embeddings(cls.N_NAMES)
+        # queries close to some of the names
+        cls.query_idxs = [3, 500, 1234, 1999]
+        cls.queries = torch.nn.functional.normalize(
+            cls.embeddings[cls.query_idxs] +
+            0.1 * get_embeddings(len(cls.query_idxs), seed=3), dim=1)
+        cls.matrix = EmbeddingMatrix(cls.embeddings)
+        cls.index = name_index.IVFNameIndex.build(
+            cls.matrix, n_lists=20, n_probe=4, block_size=100)
+        cls.valid_mask = torch.ones(cls.N_NAMES, dtype=torch.bool)
+
+    def test_all_names_in_lists(self):
+        self.assertEqual(sorted(self.index.list_idxs.tolist()),
+                         list(range(self.N_NAMES)))
+
+    def test_finds_closest(self):
+        _, idxs = self.index.search(self.queries, self.K, self.valid_mask)
+        self.assertEqual(idxs[:, 0].tolist(), self.query_idxs)
+
+    def test_results_sorted(self):
+        scores, _ = self.index.search(self.queries, self.K, self.valid_mask)
+        self.assertTrue(torch.all(scores[:, :-1] >= scores[:, 1:]))
+
+    def test_respects_mask(self):
+        valid_mask = self.valid_mask.clone()
+        valid_mask[self.query_idxs] = False
+        _, idxs = self.index.search(self.queries, self.K, valid_mask)
+        found = idxs[idxs >= 0]
+        self.assertTrue(torch.all(valid_mask[found]))
+
+    def test_falls_back_to_exact_with_strict_mask(self):
+        valid_mask = torch.zeros(self.N_NAMES, dtype=torch.bool)
+        valid_mask[[7, 8]] = True
+        _, idxs = self.index.search(self.queries, self.K, valid_mask)
+        self.assertTrue(torch.all(idxs[:, 0] >= 0))
+        self.assertEqual(set(idxs[:, :2].flatten().tolist()), {7, 8})
+
+    def test_can_load_from_saved_state(self):
+        loaded = name_index.get_name_index(
+            "ivf", self.matrix, n_probe=4, block_size=100,
+            saved_state=self.index.to_dict())
+        self.assertTrue(torch.equal(loaded.centroids, self.index.centroids))
+        scores, idxs = loaded.search(self.queries, self.K, self.valid_mask)
+        exp_scores, exp_idxs = self.index.search(
+            self.queries, self.K, self.valid_mask)
+        self.assertTrue(torch.equal(idxs, exp_idxs))
+
+    def test_rebuilds_for_different_number_of_names(self):
+        state = self.index.to_dict()
+        state["n_names"] -= 1
+        rebuilt = name_index.get_name_index(
+            "ivf", self.matrix, n_lists=5, saved_state=state)
+        self.assertEqual(rebuilt.centroids.shape[0], 5)
+
+    def test_rebuilds_for_different_names(self):
+        names = [f"name{idx}" for idx in range(self.N_NAMES)]
+        state = name_index.IVFNameIndex.build(
+            self.matrix, n_lists=20, n_probe=4, block_size=100,
+            names_hash=name_index.hash_names(names)).to_dict()
+        loaded = name_index.get_name_index(
+            "ivf", self.matrix, n_lists=5, saved_state=state,
+            names_hash=name_index.hash_names(names))
+        self.assertEqual(loaded.centroids.shape[0], 20)
+        # the same number of names, but (some) different ones
+        names[0], names[1] = names[1], "other name"
+        rebuilt = name_index.get_name_index(
+            "ivf", self.matrix, n_lists=5, saved_state=state,
+            names_hash=name_index.hash_names(names))
+        self.assertEqual(rebuilt.centroids.shape[0], 5)
+        self.assertEqual(rebuilt.to_dict()["names_hash"],
+                         name_index.hash_names(names))
+
+
+class GetNameIndexTests(unittest.TestCase):
+
+    def test_fails_for_unknown_type(self):
+        with self.assertRaises(ValueError):
+            name_index.get_name_index(
+                "unknown", EmbeddingMatrix(get_embeddings(10)))
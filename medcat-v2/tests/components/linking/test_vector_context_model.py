@@ -0,0 +1,90 @@
+from medcat.cat import CAT
+from medcat.components.types import CoreComponentType
+from medcat.components.linking.vector_context_model import (
+    PerDocumentTokenCache)
+
+import unittest
+import numpy as np
+
+from ... import UNPACKED_EXAMPLE_MODEL_PACK_PATH
+
+
+class BatchedDisambiguationTests(unittest.TestCase):
+    TEXTS = [
+        "The fittest most fit of chronic kidney failure",
+        "Patient with kidney failure and diabetes mellitus had a fever",
+        "Fittest and healthy. Seizure was fittest. Diabetes, high temperature",
+    ]
+
+    @classmethod
+    def setUpClass(cls):
+        cls.cat = CAT.load_model_pack(UNPACKED_EXAMPLE_MODEL_PACK_PATH)
+        cls.cnf_l = cls.cat.config.components.linking
+        cls.context_model = cls.cat._pipeline.get_component(
+            CoreComponentType.linking).context_model
+
+    def get_ner_doc(self, text: str):
+        doc = self.cat._pipeline.tokenizer(text)
+        for comp in self.cat._pipeline._components:
+            if comp.get_type() is CoreComponentType.linking:
+                break
+            doc = comp(doc)
+        return doc
+
+    def assert_same_similarities(self):
+        for text in self.TEXTS:
+            doc = self.get_ner_doc(text)
+            ents = list(doc.ner_ents)
+            with self.subTest(text):
+                self.assertTrue(ents)
+                batched = self.context_model.get_all_similarities_batch(
+                    ents, [ent.link_candidates for ent in ents],
+                    [ent.detected_name for ent in ents],
+                    doc, PerDocumentTokenCache())
+                for ent, (b_cuis, b_sims, b_mx) in zip(ents, batched):
+                    cuis, sims, mx = self.context_model.get_all_similarities(
+                        ent.link_candidates, ent, ent.detected_name, doc,
+                        PerDocumentTokenCache())
+                    self.assertEqual(b_cuis, cuis)
+                    self.assertEqual(b_mx, mx)
+                    np.testing.assert_allclose(b_sims, sims, rtol=1e-6)
+
+    def test_same_similarities_as_per_cui(self):
+        self.assert_same_similarities()
+
+    def test_same_similarities_no_preferences(self):
+        orig = (self.cnf_l.prefer_primary_name,
+                self.cnf_l.prefer_frequent_concepts)
+        self.cnf_l.prefer_primary_name = 0
+        self.cnf_l.prefer_frequent_concepts = 0
+        try:
+            self.assert_same_similarities()
+        finally:
+            (self.cnf_l.prefer_primary_name,
+             self.cnf_l.prefer_frequent_concepts) = orig
+
+    def test_same_similarities_high_train_threshold(self):
+        orig = self.cnf_l.train_count_threshold
+        # some, but not all CUIs will be ignored
+        self.cnf_l.train_count_threshold = 5
+        try:
+            self.assert_same_similarities()
+        finally:
+            self.cnf_l.train_count_threshold = orig
+
+    def test_same_entities_as_unbatched(self):
+        self.assertTrue(self.cnf_l.batch_disambiguation)
+        batched = [self.cat.get_entities(text) for text in self.TEXTS]
+        self.cnf_l.batch_disambiguation = False
+        try:
+            unbatched = [self.cat.get_entities(text) for text in self.TEXTS]
+        finally:
+            self.cnf_l.batch_disambiguation = True
+        for b_ents, u_ents in zip(batched, unbatched):
+            b_ents, u_ents = b_ents['entities'], u_ents['entities']
+            self.assertEqual(b_ents.keys(), u_ents.keys())
+            for ent_id, b_ent in b_ents.items():
+                u_ent = u_ents[ent_id]
+                self.assertEqual(b_ent['cui'], u_ent['cui'])
+                self.assertAlmostEqual(b_ent['context_similarity'],
+                                       u_ent['context_similarity'])
@@ -0,0 +1,207 @@
+import os
+import shutil
+import tempfile
+
+from medcat.cat import CAT
+from medcat.components.types import CoreComponentType
+from medcat.components.ner import trie_based_ner
+from medcat.components.ner.vocab_based_ner import NER as VocabNER
+from medcat.preprocessors.cleaners import prepare_name
+from medcat.utils.cdb_state import copy_cdb_state, apply_cdb_state
+
+import unittest
+import unittest.mock
+
+from ... import UNPACKED_EXAMPLE_MODEL_PACK_PATH
+
+
+class TokenTrieTests(unittest.TestCase):
+    SEP = '~'
+    SUBNAMES = ['kidney', 'kidney~failure', 'loss~of~kidney']
+
+    @classmethod
+    def setUpClass(cls):
+        cls.trie = trie_based_ner.TokenTrie.from_subnames(
+            cls.SUBNAMES, cls.SEP)
+
+    def test_finds_all_subnames(self):
+        for subname in self.SUBNAMES:
+            with self.subTest(subname):
+                self.assertTrue(self.trie.is_subname(self.trie.find(subname)))
+
+    def test_does_not_find_prefix_only(self):
+        # 'loss~of' was only added as part of a longer subname
+        self.assertFalse(self.trie.is_subname(self.trie.find('loss~of')))
+
+    def test_does_not_find_missing(self):
+        self.assertEqual(self.trie.find('failure'), self.trie.MISSING)
+
+    def test_step_equivalent_to_concat(self):
+        node = self.trie.find('loss')
+        self.assertEqual(self.trie.step(node, 'of~kidney'),
+                         self.trie.find('loss~of~kidney'))
+
+
+class TrieNERTests(unittest.TestCase):
+    TEXTS = [
+        "The fittest most fit of chronic kidney failure",
+        "Patient with kidney failure and diabetes mellitus had a fever",
+        "Failure kidney, no loss of kidney function, HIGH temperature",
+        "Nothing of relevance here",
+    ]
+
+    @classmethod
+    def setUpClass(cls):
+        cls.cat = CAT.load_model_pack(UNPACKED_EXAMPLE_MODEL_PACK_PATH)
+        cls.vocab_ner = cls.cat._pipeline.get_component(CoreComponentType.ner)
+        cls.trie_ner = trie_based_ner.NER(cls.cat._pipeline.tokenizer,
+                                          cls.cat.cdb)
+
+    def get_ents(self, ner, text: str) -> list[tuple]:
+        doc = self.cat._pipeline.tokenizer(text)
+        for comp in self.cat._pipeline._components:
+            if comp.get_type() is CoreComponentType.ner:
+                break
+            doc = comp(doc)
+        doc = ner(doc)
+        return [(ent.base.start_char_index, ent.base.end_char_index,
+                 ent.detected_name, ent.link_candidates)
+                for ent in doc.ner_ents]
+
+    def assert_same_as_vocab_ner(self):
+        for text in self.TEXTS:
+            with self.subTest(text):
+                self.assertEqual(self.get_ents(self.trie_ner, text),
+                                 self.get_ents(self.vocab_ner, text))
+
+    def test_is_default_vocab_ner(self):
+        self.assertIsInstance(self.vocab_ner, VocabNER)
+
+    def test_finds_entities(self):
+        self.assertTrue(self.get_ents(self.trie_ner, self.TEXTS[0]))
+
+    def test_same_as_vocab_ner(self):
+        self.assert_same_as_vocab_ner()
+
+    def test_same_as_vocab_ner_reverse_word_order(self):
+        cnf = self.cat.config.components.ner
+        orig = cnf.try_reverse_word_order
+        cnf.try_reverse_word_order = True
+        try:
+            self.assert_same_as_vocab_ner()
+        finally:
+            cnf.try_reverse_word_order = orig
+
+    def test_rebuilds_upon_name_change(self):
+        cdb = self.cat.cdb
+        name = 'acute~renal~impairment'
+        cnf = self.cat.config
+        names = prepare_name('acute renal impairment',
+                             self.cat._pipeline.tokenizer_with_tag, {},
+                             (cnf.general, cnf.preprocessing, cnf.cdb_maker))
+        cdb.add_names('C01', names)
+        try:
+            text = "Has acute renal impairment"
+            ents = self.get_ents(self.trie_ner, text)
+            self.assertIn(name, [ent[2] for ent in ents])
+            self.assertEqual(ents, self.get_ents(self.vocab_ner, text))
+        finally:
+            cdb._remove_names('C01', [name])
+            cdb.cui2info['C01']['names'].discard(name)
+        ents = self.get_ents(self.trie_ner, text)
+        self.assertNotIn(name, [ent[2] for ent in ents])
+
+    def test_rebuilds_upon_remove_then_add(self):
+        cdb = self.cat.cdb
+        cnf = self.cat.config
+        # warm up the trie
+        self.get_ents(self.trie_ner, self.TEXTS[0])
+        state = copy_cdb_state(cdb)
+        try:
+            # one name removed and another added so that the number
+            # of names and subnames remains the same
+            cdb.remove_cui('C05')
+            names = prepare_name(
+                'nephritis', self.cat._pipeline.tokenizer_with_tag, {},
+                (cnf.general, cnf.preprocessing, cnf.cdb_maker))
+            cdb.add_names('C01', names)
+            for text in self.TEXTS + ["Nephritis but healthy"]:
+                with self.subTest(text):
+                    self.assertEqual(self.get_ents(self.trie_ner, text),
+                                     self.get_ents(self.vocab_ner, text))
+        finally:
+            apply_cdb_state(cdb, state)
+
+
+class TrieNERSaveLoadTests(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.cat = CAT.load_model_pack(UNPACKED_EXAMPLE_MODEL_PACK_PATH)
+        cls.cat.config.components.ner.comp_name = 'trie'
+        cls.cat._recreate_pipe()
+        cls.temp_dir = tempfile.TemporaryDirectory()
+        cls.mpp = cls.cat.save_model_pack(cls.temp_dir.name,
+                                          make_archive=False)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.temp_dir.cleanup()
+
+    def test_uses_trie_ner(self):
+        comp = self.cat._pipeline.get_component(CoreComponentType.ner)
+        self.assertIsInstance(comp, trie_based_ner.NER)
+
+    def test_saves_trie(self):
+        comp_folder = os.path.join(self.mpp, "saved_components",
+                                   "core_ner")
+        self.assertTrue(os.path.exists(os.path.join(
+            comp_folder, trie_based_ner.NER.TRIE_FILE)))
+
+    def _get_trie_path(self, model_pack_path: str) -> str:
+        return os.path.join(model_pack_path, "saved_components", "core_ner",
+                            trie_based_ner.NER.TRIE_FILE)
+
+    def test_rebuilds_trie_for_changed_names(self):
+        loaded = CAT.load_model_pack(self.mpp)
+        removed = set(loaded.cdb.cui2info['C01']['names'])
+        loaded.cdb.remove_cui('C01')
+        changed_folder = os.path.join(self.temp_dir.name, 'changed')
+        os.makedirs(changed_folder)
+        saved_path = loaded.save_model_pack(changed_folder,
+                                            make_archive=False)
+        # the (stale) trie saved for the original names
+        shutil.copyfile(self._get_trie_path(self.mpp),
+                        self._get_trie_path(saved_path))
+        reloaded = CAT.load_model_pack(saved_path)
+        comp = reloaded._pipeline.get_component(CoreComponentType.ner)
+        for name in removed:
+            with self.subTest(name):
+                self.assertNotIn(name, reloaded.cdb.name2info)
+                self.assertFalse(comp._trie.is_subname(comp._trie.find(name)))
+        text = "The patient had chronic kidney failure"
+        self.assertIn('C01', self.cat.get_entities(text, only_cui=True)[
+            'entities'].values())
+        self.assertEqual(reloaded.get_entities(text, only_cui=True)[
+            'entities'], {})
+
+    def test_reuses_trie_for_same_names(self):
+        loaded = CAT.load_model_pack(self.mpp)
+        comp = loaded._pipeline.get_component(CoreComponentType.ner)
+        with unittest.mock.patch.object(
+                trie_based_ner.TokenTrie, 'from_subnames') as from_subnames:
+            reloaded = CAT.load_model_pack(self.mpp)
+        from_subnames.assert_not_called()
+        reloaded_comp = reloaded._pipeline.get_component(
+            CoreComponentType.ner)
+        self.assertEqual(reloaded_comp._trie._edges, comp._trie._edges)
+
+    def test_loads_trie(self):
+        loaded = CAT.load_model_pack(self.mpp)
+        comp = loaded._pipeline.get_component(CoreComponentType.ner)
+        self.assertIsInstance(comp, trie_based_ner.NER)
+        orig = self.cat._pipeline.get_component(CoreComponentType.ner)
+        self.assertEqual(comp._trie._edges, orig._trie._edges)
+        text = "The fittest most fit of chronic kidney failure"
+        self.assertEqual(loaded.get_entities(text, only_cui=True),
+                         self.cat.get_entities(text, only_cui=True))
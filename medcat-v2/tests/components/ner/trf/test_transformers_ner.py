@@ -19,7 +19,7 @@ import unittest.mock
 
 from ...addons.meta_cat.test_meta_cat import FakeTokenizer
 from ....pipeline.test_pipeline import FakeCDB, Config
-from .... import RESOURCES_PATH
+from .... import RESOURCES_PATH, UNPACKED_EXAMPLE_MODEL_PACK_PATH
 from ....utils.ner.test_deid import is_macos_on_ci
 
 
@@ -35,6 +35,50 @@ class TransformersNERTests(TestCase):
         self.assertIsInstance(self.tner, ManualSerialisable)
 
 
+class TransformersNERBatchedInferenceTests(TestCase):
+    TEXTS = ["John Smith lives in London", "Seen by Dr Jones today"]
+    PIPE_RESULTS = [
+        [{'entity_group': 'NAME', 'score': 0.9, 'start': 0, 'end': 10},
+         {'entity_group': 'LOC', 'score': 0.8, 'start': 20, 'end': 26}],
+        [{'entity_group': 'NAME', 'score': 0.7, 'start': 8, 'end': 16},
+         # does not cover the end of any token
+         {'entity_group': 'LOC', 'score': 0.6, 'start': 18, 'end': 19}],
+    ]
+    EXPECTED = [[('NAME', 'John Smith'), ('LOC', 'London')],
+                [('NAME', 'Dr Jones')]]
+
+    @classmethod
+    def setUpClass(cls):
+        from medcat.cat import CAT
+        cls.base_tokenizer = CAT.load_model_pack(
+            UNPACKED_EXAMPLE_MODEL_PACK_PATH)._pipeline.tokenizer
+        # NOTE: avoids loading a HF model since the pipeline is mocked
+        cls.tner = TransformersNERComponent.__new__(TransformersNERComponent)
+        cls.tner.base_tokenizer = cls.base_tokenizer
+        cls.tner.config = ConfigTransformersNER()
+
+    def setUp(self):
+        self.tner.ner_pipe = unittest.mock.Mock(
+            return_value=self.PIPE_RESULTS)
+        self.docs = list(self.tner.pipe(
+            [self.base_tokenizer(text) for text in self.TEXTS]))
+
+    def test_passes_all_docs_at_once(self):
+        self.tner.ner_pipe.assert_called_once()
+        texts = self.tner.ner_pipe.call_args.args[0]
+        self.assertEqual(texts, self.TEXTS)
+        self.assertEqual(
+            self.tner.ner_pipe.call_args.kwargs['batch_size'],
+            self.tner.config.general.inference_batch_size)
+
+    def test_aligns_entities_to_tokens(self):
+        for doc, expected in zip(self.docs, self.EXPECTED):
+            with self.subTest(doc.base.text):
+                self.assertEqual(
+                    [(ent.cui, ent.base.text) for ent in doc.ner_ents],
+                    expected)
+
+
 class TestTransformersNER(TestCase):
 
     @classmethod
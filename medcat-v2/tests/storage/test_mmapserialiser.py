@@ -0,0 +1,159 @@
+import os
+import tempfile
+import importlib.util
+from unittest import mock
+
+from medcat.storage.serialisers import AvailableSerialisers, serialise
+from medcat.storage.serialisers import deserialise
+from medcat.storage.mmapserialiser import (
+    DillMmapSerialiser, ARRAY_FILE_SUFFIX)
+from medcat.cat import CAT
+from medcat.cdb import CDB
+from medcat.vocab import Vocab
+from medcat.config import Config
+
+import numpy as np
+import unittest
+
+from .. import UNPACKED_EXAMPLE_MODEL_PACK_PATH
+
+
+def get_test_classes():
+    # NOTE: see test_jsonserialiser for the reason behind the wrapping
+    from .test_serialisers import (
+        SerialiserWorksTests, SerialiserFailsTests,
+        NestedSameInstanceSerialisableTests,
+        CanSerialiseCATSimple, CanSerialiseCATSlightlyComplex)
+
+    class MmapSerialiserWorksTests(SerialiserWorksTests):
+        SERIALISER_TYPE = AvailableSerialisers.dill_mmap
+
+    class MmapSerialiserFailsTests(SerialiserFailsTests):
+        SERIALISER_TYPE = AvailableSerialisers.dill_mmap
+
+    class MmapNestedSameInstanceSerialisableTests(
+            NestedSameInstanceSerialisableTests):
+        SERIALISER_TYPE = AvailableSerialisers.dill_mmap
+
+    class MmapCanSerialiseCAT(CanSerialiseCATSimple):
+        SERIALISER_TYPE = AvailableSerialisers.dill_mmap
+
+    class MmapCanSerialiseCATSlightlyComplex(
+        CanSerialiseCATSlightlyComplex
+    ):
+        SERIALISER_TYPE = AvailableSerialisers.dill_mmap
+
+    return (MmapSerialiserWorksTests, MmapSerialiserFailsTests,
+            MmapNestedSameInstanceSerialisableTests,
+            MmapCanSerialiseCAT, MmapCanSerialiseCATSlightlyComplex)
+
+
+CLS1, CLS2, CLS3, CLS4, CLS5 = get_test_classes()
+
+
+def get_vocab(num_words: int = 50, dim: int = 32) -> Vocab:
+    vocab = Vocab()
+    rng = np.random.default_rng(1)
+    for word_nr in range(num_words):
+        vec = rng.random(dim) if word_nr % 5 else None
+        vocab.add_word(f"word{word_nr}", word_nr + 1, vec)
+    vocab.add_word("short", 1, np.ones(2))
+    return vocab
+
+
+class MmapVocabTests(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.vocab = get_vocab()
+        cls._temp_dir = tempfile.TemporaryDirectory()
+        serialise(AvailableSerialisers.dill_mmap, cls.vocab,
+                  cls._temp_dir.name)
+        cls.loaded = deserialise(cls._temp_dir.name)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._temp_dir.cleanup()
+
+    def test_saves_arrays_separately(self):
+        arr_files = [fn for fn in os.listdir(self._temp_dir.name)
+                     if fn.endswith(ARRAY_FILE_SUFFIX)]
+        # NOTE: all the vectors are stacked into one file
+        self.assertEqual(len(arr_files), 1)
+
+    def test_loads_same(self):
+        self.assertIsInstance(self.loaded, Vocab)
+        self.assertEqual(self.loaded, self.vocab)
+
+    def test_vectors_memory_mapped(self):
+        vec1, vec2 = self.loaded.vec("word1"), self.loaded.vec("word2")
+        self.assertIsInstance(vec1.base, np.ndarray)
+        self.assertIs(vec1.base, vec2.base)
+        self.assertFalse(vec1.flags.writeable)
+
+    def test_small_arrays_pickled(self):
+        vec = self.loaded.vec("short")
+        np.testing.assert_array_equal(vec, np.ones(2))
+        self.assertTrue(vec.flags.writeable)
+
+    def test_missing_vectors_kept(self):
+        self.assertIsNone(self.loaded.vec("word0"))
+
+
+@unittest.skipIf(importlib.util.find_spec("torch") is None,
+                 "torch not installed")
+class MmapTensorTests(unittest.TestCase):
+
+    def setUp(self):
+        import torch
+        self.cdb = CDB(Config())
+        self.cdb.addl_info['cui_embeddings'] = torch.rand(10, 32).half()
+        self._temp_dir = tempfile.TemporaryDirectory()
+        serialise(AvailableSerialisers.dill_mmap, self.cdb,
+                  self._temp_dir.name)
+
+    def tearDown(self):
+        self._temp_dir.cleanup()
+
+    def test_loads_same_tensor(self):
+        import torch
+        loaded = deserialise(self._temp_dir.name)
+        got = loaded.addl_info['cui_embeddings']
+        self.assertIsInstance(got, torch.Tensor)
+        self.assertTrue(torch.equal(got, self.cdb.addl_info['cui_embeddings']))
+
+
+class MmapModelPackTests(unittest.TestCase):
+    TEXT = "The fittest most fit of chronic kidney failure"
+
+    @classmethod
+    def setUpClass(cls):
+        cls.cat = CAT.load_model_pack(UNPACKED_EXAMPLE_MODEL_PACK_PATH)
+        cls._temp_dir = tempfile.TemporaryDirectory()
+        # NOTE: the example model pack has tiny vectors
+        with mock.patch.object(DillMmapSerialiser, 'min_array_size', 2):
+            cls.mpp = cls.cat.save_model_pack(
+                cls._temp_dir.name, serialiser_type='dill_mmap',
+                make_archive=False)
+        cls.loaded = CAT.load_model_pack(cls.mpp)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._temp_dir.cleanup()
+
+    def test_context_vectors_memory_mapped(self):
+        for cui, info in self.loaded.cdb.cui2info.items():
+            for ct, vec in (info['context_vectors'] or {}).items():
+                with self.subTest(f"{cui}:{ct}"):
+                    self.assertFalse(vec.flags.writeable)
+                    np.testing.assert_array_equal(
+                        vec, self.cat.cdb.cui2info[cui]['context_vectors'][ct])
+
+    def test_same_entities(self):
+        self.assertEqual(self.loaded.get_entities(self.TEXT),
+                         self.cat.get_entities(self.TEXT))
+
+    def test_can_train(self):
+        cat = CAT.load_model_pack(self.mpp)
+        cat.trainer.train_unsupervised([self.TEXT])
+        self.assertTrue(cat.get_entities(self.TEXT)['entities'])
@@ -0,0 +1,147 @@
+from collections import Counter, defaultdict
+from datetime import datetime
+import os
+import tempfile
+
+from medcat.storage.serialisers import AvailableSerialisers, serialise
+from medcat.storage.serialisers import deserialise
+from medcat.storage.msgpackserialiser import MsgPackSerialiser
+from medcat.cat import CAT
+
+import numpy as np
+import unittest
+
+from .. import UNPACKED_EXAMPLE_MODEL_PACK_PATH
+from .test_mmapserialiser import get_vocab
+
+
+def get_test_classes():
+    # NOTE: see test_jsonserialiser for the reason behind the wrapping
+    from .test_serialisers import (
+        SerialiserWorksTests, SerialiserFailsTests,
+        NestedSameInstanceSerialisableTests,
+        CanSerialiseCATSimple, CanSerialiseCATSlightlyComplex)
+
+    class MsgPackSerialiserWorksTests(SerialiserWorksTests):
+        SERIALISER_TYPE = AvailableSerialisers.msgpack
+
+    class MsgPackSerialiserFailsTests(SerialiserFailsTests):
+        SERIALISER_TYPE = AvailableSerialisers.msgpack
+
+    class MsgPackNestedSameInstanceSerialisableTests(
+            NestedSameInstanceSerialisableTests):
+        SERIALISER_TYPE = AvailableSerialisers.msgpack
+
+    class MsgPackCanSerialiseCAT(CanSerialiseCATSimple):
+        SERIALISER_TYPE = AvailableSerialisers.msgpack
+
+    class MsgPackCanSerialiseCATSlightlyComplex(
+        CanSerialiseCATSlightlyComplex
+    ):
+        SERIALISER_TYPE = AvailableSerialisers.msgpack
+
+    return (MsgPackSerialiserWorksTests, MsgPackSerialiserFailsTests,
+            MsgPackNestedSameInstanceSerialisableTests,
+            MsgPackCanSerialiseCAT, MsgPackCanSerialiseCATSlightlyComplex)
+
+
+CLS1, CLS2, CLS3, CLS4, CLS5 = get_test_classes()
+
+
+class MsgPackRawPartsTests(unittest.TestCase):
+    RAW_PARTS = {
+        "arr": np.arange(12, dtype=np.float32).reshape(3, 4),
+        "scalar": np.int64(3),
+        "tuple": (1, "a", (2.0, None)),
+        "set": {"a", "b"},
+        "frozen": frozenset([1, 2]),
+        "tuple_keys": {(1, 2): "x", 3: "y"},
+        "counter": Counter("abca"),
+        "defaultdict": defaultdict(list, {"a": [1]}),
+        "when": datetime(2024, 1, 2, 3, 4),
+        "nested": {"vecs": [np.ones(3), None], "bytes": b"\x00\x01"},
+    }
+
+    @classmethod
+    def setUpClass(cls):
+        cls._temp_dir = tempfile.TemporaryDirectory()
+        cls.file_path = os.path.join(cls._temp_dir.name, "raw.dat")
+        ser = MsgPackSerialiser()
+        ser.serialise(cls.RAW_PARTS, cls.file_path)
+        cls.loaded = ser.deserialise(cls.file_path)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._temp_dir.cleanup()
+
+    def test_loads_same_keys(self):
+        self.assertEqual(set(self.loaded), set(self.RAW_PARTS))
+
+    def test_loads_same_types(self):
+        for name, part in self.RAW_PARTS.items():
+            with self.subTest(name):
+                self.assertIs(type(self.loaded[name]), type(part))
+
+    def test_loads_same_values(self):
+        for name, part in self.RAW_PARTS.items():
+            if name in ("arr", "nested"):
+                continue
+            with self.subTest(name):
+                self.assertEqual(self.loaded[name], part)
+
+    def test_loads_writeable_array(self):
+        arr = self.loaded["arr"]
+        np.testing.assert_array_equal(arr, self.RAW_PARTS["arr"])
+        self.assertEqual(arr.dtype, np.float32)
+        self.assertTrue(arr.flags.writeable)
+
+    def test_loads_nested(self):
+        vecs = self.loaded["nested"]["vecs"]
+        np.testing.assert_array_equal(vecs[0], np.ones(3))
+        self.assertIsNone(vecs[1])
+        self.assertEqual(self.loaded["nested"]["bytes"], b"\x00\x01")
+
+
+class MsgPackVocabTests(unittest.TestCase):
+
+    def test_loads_same(self):
+        vocab = get_vocab()
+        with tempfile.TemporaryDirectory() as temp_dir:
+            serialise(AvailableSerialisers.msgpack, vocab, temp_dir)
+            loaded = deserialise(temp_dir)
+        self.assertEqual(loaded, vocab)
+
+
+class MsgPackModelPackTests(unittest.TestCase):
+    TEXT = "The fittest most fit of chronic kidney failure"
+
+    @classmethod
+    def setUpClass(cls):
+        cls.cat = CAT.load_model_pack(UNPACKED_EXAMPLE_MODEL_PACK_PATH)
+        cls._temp_dir = tempfile.TemporaryDirectory()
+        cls.mpp = cls.cat.save_model_pack(
+            cls._temp_dir.name, serialiser_type='msgpack',
+            make_archive=False)
+        cls.loaded = CAT.load_model_pack(cls.mpp)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._temp_dir.cleanup()
+
+    def test_same_context_vectors(self):
+        self.assertEqual(self.loaded.cdb.cui2info.keys(),
+                         self.cat.cdb.cui2info.keys())
+        for cui, info in self.loaded.cdb.cui2info.items():
+            for ct, vec in (info['context_vectors'] or {}).items():
+                with self.subTest(f"{cui}:{ct}"):
+                    np.testing.assert_array_equal(
+                        vec, self.cat.cdb.cui2info[cui]['context_vectors'][ct])
+
+    def test_same_entities(self):
+        self.assertEqual(self.loaded.get_entities(self.TEXT),
+                         self.cat.get_entities(self.TEXT))
+
+    def test_can_train(self):
+        cat = CAT.load_model_pack(self.mpp)
+        cat.trainer.train_unsupervised([self.TEXT])
+        self.assertTrue(cat.get_entities(self.TEXT)['entities'])
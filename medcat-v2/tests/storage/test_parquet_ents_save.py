@@ -0,0 +1,158 @@
+import os
+import tempfile
+
+from medcat.cat import CAT
+from medcat.storage import parquet_ents_save
+
+import unittest
+
+from .. import UNPACKED_EXAMPLE_MODEL_PACK_PATH
+
+
+def get_ent(cui: str, ent_id: int, start: int) -> dict:
+    return {
+        'pretty_name': f"Name of {cui}", 'cui': cui, 'type_ids': ['T1'],
+        'source_value': 'value', 'detected_name': 'value', 'acc': 0.5,
+        'context_similarity': 0.5, 'start': start, 'end': start + 5,
+        'id': ent_id, 'meta_anns': {
+            'Status': {'value': 'Affirmed', 'confidence': 0.9,
+                       'name': 'Status'}},
+    }
+
+
+BATCHES = [
+    [('0', {'entities': {0: get_ent('C01', 0, 0), 1: get_ent('C02', 1, 10)},
+            'tokens': []}),
+     ('1', {'entities': {}, 'tokens': []})],
+    [('2', {'entities': {0: get_ent('C02', 0, 3)}, 'tokens': []})],
+    [('3', {'entities': {0: get_ent('C03', 0, 3)}, 'tokens': []})],
+]
+
+
+class ParquetAnnotationSaverTests(unittest.TestCase):
+    BATCHES_PER_SAVE = 2
+
+    def setUp(self):
+        self._temp_dir = tempfile.TemporaryDirectory()
+        self.save_dir = self._temp_dir.name
+        saver = parquet_ents_save.ParquetAnnotationSaver(
+            self.save_dir, self.BATCHES_PER_SAVE)
+        for batch in BATCHES:
+            saver(batch)
+        saver._save_cache()
+        self.reader = parquet_ents_save.ParquetAnnotationReader(
+            self.save_dir)
+
+    def tearDown(self):
+        self._temp_dir.cleanup()
+
+    def test_saves_parts(self):
+        self.assertEqual([part_num for part_num, _ in self.reader.parts],
+                         [0, 1])
+        for part_num in range(2):
+            self.assertTrue(os.path.exists(
+                parquet_ents_save.get_part_path(self.save_dir, part_num)))
+
+    def test_does_not_save_empty_cache(self):
+        saver = parquet_ents_save.ParquetAnnotationSaver(
+            self.save_dir, self.BATCHES_PER_SAVE)
+        saver._save_cache()
+        self.assertEqual(
+            parquet_ents_save.read_manifest(self.save_dir), self.reader.parts)
+        self.assertFalse(os.path.exists(parquet_ents_save.get_part_path(
+            self.save_dir, saver.part_number)))
+
+    def test_has_all_ids(self):
+        self.assertEqual(self.reader.annotated_ids, {'0', '1', '2', '3'})
+
+    def test_reads_same_docs(self):
+        exp = [doc for batch in BATCHES for doc in batch]
+        self.assertEqual(list(self.reader.iter_docs()), exp)
+
+    def test_filters_by_cui(self):
+        got = list(self.reader.iter_docs(cuis=['C02']))
+        self.assertEqual([doc_id for doc_id, _ in got], ['0', '2'])
+        for _, doc in got:
+            self.assertEqual({ent['cui'] for ent in doc['entities'].values()},
+                             {'C02'})
+
+    def test_reads_columns(self):
+        tables = list(self.reader.iter_tables(columns=['doc_id', 'cui']))
+        self.assertEqual(sum(table.num_rows for table in tables), 4)
+        self.assertEqual(tables[0].column_names, ['doc_id', 'cui'])
+
+    def test_resumes(self):
+        saver = parquet_ents_save.ParquetAnnotationSaver(
+            self.save_dir, self.BATCHES_PER_SAVE)
+        self.assertEqual(saver.annotated_ids, {'0', '1', '2', '3'})
+        self.assertEqual(saver.part_number, 2)
+        saver([('4', {'entities': {}, 'tokens': []})])
+        saver._save_cache()
+        reader = parquet_ents_save.ParquetAnnotationReader(self.save_dir)
+        self.assertEqual(len(list(reader.iter_docs())), 5)
+
+    def test_ignores_incomplete_manifest_entry(self):
+        manifest_path = os.path.join(self.save_dir,
+                                     parquet_ents_save.MANIFEST_FILE)
+        with open(manifest_path, 'a') as f:
+            f.write('{"part": 2, "ids": ["4"')
+        self.assertEqual(len(parquet_ents_save.read_manifest(self.save_dir)),
+                         2)
+
+
+class ParquetOnlyCUITests(unittest.TestCase):
+
+    def test_reads_only_cuis(self):
+        batch = [('0', {'entities': {0: 'C01', 3: 'C05'}, 'tokens': []})]
+        with tempfile.TemporaryDirectory() as temp_dir:
+            saver = parquet_ents_save.ParquetAnnotationSaver(temp_dir, 1)
+            saver(batch)
+            reader = parquet_ents_save.ParquetAnnotationReader(temp_dir)
+            self.assertEqual(list(reader.iter_docs()), batch)
+
+
+class CATSaveAsParquetTests(unittest.TestCase):
+    TEXTS = [
+        "The fittest most fit of chronic kidney failure",
+        "The dog is sitting outside the house.",
+    ] * 5
+
+    @classmethod
+    def setUpClass(cls):
+        cls.cat = CAT.load_model_pack(UNPACKED_EXAMPLE_MODEL_PACK_PATH)
+        cls.cat.config.components.linking.train = False
+
+    def setUp(self):
+        self._temp_dir = tempfile.TemporaryDirectory()
+        self.save_dir = self._temp_dir.name
+
+    def tearDown(self):
+        self._temp_dir.cleanup()
+
+    def test_saves_same_as_output(self):
+        out = dict(self.cat.get_entities_multi_texts(
+            self.TEXTS, batch_size=3, batch_size_chars=-1,
+            save_dir_path=self.save_dir, batches_per_save=2,
+            save_format='parquet'))
+        reader = parquet_ents_save.ParquetAnnotationReader(self.save_dir)
+        self.assertEqual(dict(reader.iter_docs()), out)
+
+    def test_resumes_run(self):
+        self.cat.save_entities_multi_texts(
+            self.TEXTS[:4], self.save_dir, batch_size=3, batch_size_chars=-1,
+            save_format='parquet')
+        # NOTE: the first 4 are the same and should be skipped
+        out = list(self.cat.get_entities_multi_texts(
+            self.TEXTS, batch_size=3, batch_size_chars=-1,
+            save_dir_path=self.save_dir, save_format='parquet'))
+        self.assertEqual([doc_id for doc_id, _ in out],
+                         [str(nr) for nr in range(4, len(self.TEXTS))])
+        reader = parquet_ents_save.ParquetAnnotationReader(self.save_dir)
+        self.assertEqual(reader.annotated_ids,
+                         {str(nr) for nr in range(len(self.TEXTS))})
+
+    def test_fails_with_unknown_format(self):
+        with self.assertRaises(ValueError):
+            list(self.cat.get_entities_multi_texts(
+                self.TEXTS, save_dir_path=self.save_dir,
+                save_format='unknown'))
@@ -16,6 +16,7 @@ from medcat.tokenizing.tokens import UnregisteredDataPathException
 from medcat.tokenizing.tokenizers import TOKENIZER_PREFIX
 from medcat.utils.cdb_state import captured_state_cdb
 from medcat.components.addons.meta_cat import MetaCATAddon
+from medcat.components.types import CoreComponentType
 from medcat.utils.defaults import AVOID_LEGACY_CONVERSION_ENVIRON
 from medcat.utils.defaults import LegacyConversionDisabledError
 
@@ -23,6 +24,8 @@ import unittest
 import tempfile
 import pickle
 import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor, Future
 
 from . import EXAMPLE_MODEL_PACK_ZIP
 from . import V1_MODEL_PACK_PATH, UNPACKED_V1_MODEL_PACK_PATH
@@ -230,6 +233,32 @@ class InferenceFromLoadedTests(TrainedModelTests):
                 self.assertGreaterEqual(ent.base.start_char_index, cur_start)
                 cur_start = ent.base.start_char_index
 
+    def test_get_docs_same_as_single(self):
+        texts = [ConvertedFunctionalityTests.TEXT, "",
+                 ConvertedFunctionalityTests.TEXT * 2]
+        docs = self.model.get_docs(texts)
+        self.assertEqual(len(docs), len(texts))
+        for nr, (text, doc) in enumerate(zip(texts, docs)):
+            with self.subTest(f"{nr}"):
+                self.assertEqual(
+                    [(ent.cui, ent.base.start_char_index)
+                     for ent in doc.linked_ents],
+                    [(ent.cui, ent.base.start_char_index)
+                     for ent in self.model(text).linked_ents])
+
+    def test_get_docs_batches_core_components(self):
+        ner = self.model._pipeline.get_component(CoreComponentType.ner)
+        batch_sizes: list[int] = []
+
+        def process_batch(docs):
+            batch_sizes.append(len(docs))
+            return [ner(doc) for doc in docs]
+
+        with unittest.mock.patch.object(
+                ner, "process_batch", process_batch, create=True):
+            self.model.get_docs(["text one", "text two", "text three"])
+        self.assertEqual(batch_sizes, [3])
+
 
 class InferenceIntoOntologyTests(TrainedModelTests):
     ont_name = "FAKE_ONT"
@@ -626,6 +655,17 @@ class CATWithDictNERSupTrainingTests(CATSupTrainingTests):
             texts, n_process=3, batch_size=2, batch_size_chars=-1))
         self.assert_ents(ents, texts)
 
+    def test_can_get_multiprocess_ordered(self):
+        texts = [
+            "The fittest most fit of chronic kidney failure",
+            "The dog is sitting outside the house."
+        ]*10
+        ents = list(self.cat.get_entities_multi_texts(
+            texts, n_process=3, batch_size=2, batch_size_chars=-1,
+            ordered=True, max_batches_in_flight=3))
+        self.assertEqual([ent_id for ent_id, _ in ents],
+                         [str(i) for i in range(len(texts))])
+
     def _do_mp_run_with_save(
             self, save_to: str,
             chars_per_batch: int = 165,
@@ -788,6 +828,71 @@ class CATWithDictNERSupTrainingTests(CATSupTrainingTests):
             self.assertTrue(os.listdir(tmp_dir))
 
 
+class MultiprocessStreamingTests(unittest.TestCase):
+    NUM_BATCHES = 30
+    MAX_IN_FLIGHT = 4
+
+    @classmethod
+    def setUpClass(cls):
+        cls.cat = cat.CAT.load_model_pack(EXAMPLE_MODEL_PACK_ZIP)
+        cls.executor = ThreadPoolExecutor(max_workers=2)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.executor.shutdown()
+
+    def setUp(self):
+        self.taken = 0
+        self.max_unyielded = 0
+
+    def _batches(self):
+        for batch_nr in range(self.NUM_BATCHES):
+            self.taken += 1
+            yield [(f"text {batch_nr}", str(batch_nr), True)]
+
+    def _process(self, batch: list[tuple[str, str, bool]]) -> list[tuple]:
+        # NOTE: make some batches (much) slower than others
+        time.sleep(0.02 if int(batch[0][1]) % 5 == 0 else 0.001)
+        return [(text_id, text) for text, text_id, _ in batch]
+
+    def _submit(self, batch: list[tuple[str, str, bool]]) -> Future:
+        return self.executor.submit(self._process, batch)
+
+    def stream(self, ordered: bool) -> list[str]:
+        out: list[str] = []
+        for text_id, _ in self.cat._mp_stream_batches(
+                self._submit, self._batches(), self.MAX_IN_FLIGHT,
+                ordered=ordered, saver=None, use_main_process=False):
+            self.max_unyielded = max(self.max_unyielded,
+                                     self.taken - len(out))
+            out.append(text_id)
+        return out
+
+    def test_gets_all_unordered(self):
+        got = self.stream(ordered=False)
+        self.assertEqual(sorted(got, key=int),
+                         [str(nr) for nr in range(self.NUM_BATCHES)])
+
+    def test_gets_all_ordered(self):
+        got = self.stream(ordered=True)
+        self.assertEqual(got, [str(nr) for nr in range(self.NUM_BATCHES)])
+
+    def test_bounded_input_consumption(self):
+        for ordered in (True, False):
+            with self.subTest(f"Ordered: {ordered}"):
+                self.setUp()
+                self.stream(ordered=ordered)
+                self.assertLessEqual(self.max_unyielded, self.MAX_IN_FLIGHT)
+
+    def test_stops_consuming_input_when_closed(self):
+        stream = self.cat._mp_stream_batches(
+            self._submit, self._batches(), self.MAX_IN_FLIGHT,
+            ordered=True, saver=None, use_main_process=False)
+        next(stream)
+        stream.close()
+        self.assertLessEqual(self.taken, self.MAX_IN_FLIGHT + 1)
+
+
 class CATWithDocAddonTests(CATIncludingTests):
     EXAMPLE_TEXT = "Example text to tokenize"
     ADDON_PATH = 'SMTH'
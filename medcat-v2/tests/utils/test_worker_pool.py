@@ -0,0 +1,93 @@
+from medcat.cat import CAT
+from medcat.utils import worker_pool
+
+import time
+import unittest
+
+from .. import UNPACKED_EXAMPLE_MODEL_PACK_PATH
+
+
+def _without_pretty_names(results: list[tuple]) -> list[tuple]:
+    # NOTE: the pretty name of a concept with multiple (equally good)
+    #       names may differ between processes
+    return sorted(
+        (text_id, {ent_id: {key: val for key, val in ent.items()
+                            if key != 'pretty_name'}
+                   for ent_id, ent in ents['entities'].items()})
+        for text_id, ents in results)
+
+
+class WorkerPoolTests(unittest.TestCase):
+    N_WORKERS = 2
+    TEXTS = [
+        "The fittest most fit of chronic kidney failure",
+        "The dog is sitting outside the house."
+    ] * 5
+
+    @classmethod
+    def setUpClass(cls):
+        cls.cat = CAT.load_model_pack(UNPACKED_EXAMPLE_MODEL_PACK_PATH)
+        cls.cat.config.components.linking.train = False
+        cls.exp = _without_pretty_names(cls.cat.get_entities_multi_texts(
+            cls.TEXTS, batch_size=2, batch_size_chars=-1))
+        cls.pool = cls.cat.start_worker_pool(
+            cls.N_WORKERS, model_pack_path=UNPACKED_EXAMPLE_MODEL_PACK_PATH)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.cat.shutdown_worker_pool()
+
+    def get_ents(self) -> list[tuple]:
+        return _without_pretty_names(self.cat.get_entities_multi_texts(
+            self.TEXTS, n_process=self.N_WORKERS + 1, batch_size=2,
+            batch_size_chars=-1))
+
+    def test_pool_is_running(self):
+        self.assertIs(self.cat.worker_pool, self.pool)
+        self.assertTrue(self.pool.is_running)
+
+    def test_is_healthy(self):
+        self.assertTrue(self.pool.health_check())
+
+    def test_not_healthy_with_stuck_worker(self):
+        # NOTE: the other worker would be able to answer all the pings
+        stuck = self.pool.executor.submit(time.sleep, 3)
+        try:
+            self.assertFalse(self.pool.health_check(timeout=1))
+        finally:
+            stuck.result()
+        self.assertTrue(self.pool.health_check())
+
+    def test_gets_same_entities(self):
+        self.assertEqual(self.get_ents(), self.exp)
+
+    def test_reuses_workers(self):
+        self.get_ents()
+        pids_before = set(self.pool.executor._processes)
+        self.get_ents()
+        self.assertEqual(set(self.pool.executor._processes), pids_before)
+
+    def test_cannot_start_twice(self):
+        with self.assertRaises(ValueError):
+            self.cat.start_worker_pool(self.N_WORKERS)
+
+    def test_cat_can_be_pickled_with_pool(self):
+        state = self.cat.__getstate__()
+        self.assertIsNone(state['_worker_pool'])
+
+
+class WorkerPoolFromMemoryTests(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.cat = CAT.load_model_pack(UNPACKED_EXAMPLE_MODEL_PACK_PATH)
+
+    def test_needs_workers(self):
+        with self.assertRaises(ValueError):
+            worker_pool.WorkerPool(self.cat, 0)
+
+    def test_can_start_and_shut_down(self):
+        with worker_pool.WorkerPool(self.cat, 1) as pool:
+            self.assertTrue(pool.health_check())
+        self.assertFalse(pool.is_running)
+        self.assertFalse(pool.health_check())